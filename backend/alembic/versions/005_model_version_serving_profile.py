@@ -0,0 +1,31 @@
+"""Add serving profile columns to model versions
+
+Revision ID: 005_model_version_serving_profile
+Revises: 004_security_notifications
+Create Date: 2024-01-01 00:04:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '005_model_version_serving_profile'
+down_revision = '004_security_notifications'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('model_versions', sa.Column('optimal_batch_size', sa.Integer(), nullable=True))
+    op.add_column('model_versions', sa.Column(
+        'serving_profile',
+        postgresql.JSONB(astext_type=sa.Text()),
+        server_default=sa.text("'{}'::jsonb"),
+        nullable=False
+    ))
+
+
+def downgrade() -> None:
+    op.drop_column('model_versions', 'serving_profile')
+    op.drop_column('model_versions', 'optimal_batch_size')
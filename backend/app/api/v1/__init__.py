@@ -1,5 +1,5 @@
 # API v1 modules
-from . import auth, organizations, projects, models, experiments, deployments, api_keys, inference
+from . import auth, organizations, projects, models, experiments, deployments, api_keys, inference, batch_jobs, features
 
 __all__ = [
     "auth",
@@ -9,5 +9,7 @@ __all__ = [
     "experiments",
     "deployments",
     "api_keys",
-    "inference"
+    "inference",
+    "batch_jobs",
+    "features"
 ]
\ No newline at end of file
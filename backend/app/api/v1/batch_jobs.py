@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, status
+from sqlalchemy.orm import Session
+
+from app.core.database import get_db
+from app.api.dependencies import get_current_active_user
+from app.models.user import User
+from app.services.batch_job_service import BatchJobService
+from app.schemas.batch_job import BatchJobCreate, BatchJobResponse
+
+router = APIRouter()
+
+@router.post("/", response_model=BatchJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_batch_job(data: BatchJobCreate, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+    service = BatchJobService(db)
+    job = await service.create_job(current_user.id, data)
+    return BatchJobResponse(**job)
+
+@router.get("/{job_id}", response_model=BatchJobResponse)
+async def get_batch_job(job_id: str, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+    service = BatchJobService(db)
+    job = await service.get_job(job_id, current_user.id)
+    return BatchJobResponse(**job)
+
+@router.post("/{job_id}/cancel", response_model=BatchJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def cancel_batch_job(job_id: str, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+    service = BatchJobService(db)
+    job = await service.cancel_job(job_id, current_user.id)
+    return BatchJobResponse(**job)
@@ -0,0 +1,29 @@
+import uuid
+
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, status
+from sqlalchemy.orm import Session
+
+from app.core.database import get_db
+from app.api.dependencies import get_current_active_user
+from app.models.user import User
+from app.services.feature_store import FeatureStoreService, feature_store
+from app.schemas.feature_store import FeatureIngestRequest, FeatureLoadRequest, FeatureSetStats
+
+router = APIRouter()
+
+@router.post("/{feature_set}/rows", response_model=FeatureSetStats)
+async def ingest_features(feature_set: str, data: FeatureIngestRequest, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+    service = FeatureStoreService(db)
+    return await service.ingest(current_user.id, feature_set, data)
+
+@router.post("/{feature_set}/load", response_model=FeatureSetStats, status_code=status.HTTP_202_ACCEPTED)
+async def load_features(feature_set: str, data: FeatureLoadRequest, background_tasks: BackgroundTasks, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+    service = FeatureStoreService(db)
+    service.authorize_load(current_user.id, data)
+    background_tasks.add_task(feature_store.load, data.organization_id, feature_set, data)
+    return feature_store.stats(data.organization_id, feature_set)
+
+@router.get("/{feature_set}", response_model=FeatureSetStats)
+async def get_feature_set(feature_set: str, organization_id: uuid.UUID = Query(...), current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+    service = FeatureStoreService(db)
+    return service.get_stats(current_user.id, organization_id, feature_set)
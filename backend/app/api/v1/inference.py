@@ -3,14 +3,22 @@ Model Inference API endpoints.
 Provides REST API for model predictions with validation, caching, and rate limiting.
 """
 
-from typing import List, Dict, Any, Optional
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from fastapi.security import HTTPBearer
+from typing import List, Dict, Any, Optional, AsyncIterator, Awaitable, Callable, Set, Tuple, Union
+from dataclasses import dataclass
+from functools import partial
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from starlette.background import BackgroundTask
+from starlette.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 import numpy as np
 import pandas as pd
+import hashlib
 import json
+import orjson
 import time
 import uuid
 from datetime import datetime, timedelta
@@ -20,20 +28,41 @@ import redis.asyncio as redis
 from app.core.deps import get_db
 from app.core.security import get_current_user
 from app.core.config import settings
+from app.core.request_body import body_digest, decode_request, openapi_body
 from app.models.deployment import Deployment
 from app.models.model_monitoring import ModelMonitoring
 from app.models.api_key import APIKey
 from app.schemas.inference import (
     InferenceRequest,
+    InferenceFrame,
     BatchInferenceRequest,
     InferenceResponse,
     BatchInferenceResponse,
+    BatchInferenceMetadata,
+    PredictionResult,
     ModelSchemaResponse,
     HealthResponse
 )
 from app.services.inference_service import InferenceService
+from app.services.batch_tuner import batch_size_tuner
+from app.services.inference_cache import InferenceCache, instance_digest
+from app.services.cascade_service import CascadeService, cascade_config, cascade_fingerprint
+from app.services.pipeline_service import PipelineService, pipeline_config, pipeline_fingerprint
+from app.services.traffic_service import TrafficService, traffic_config
+from app.services.precomputed_store import PrecomputedStore, precomputed_config, without_entity_key
+from app.services.micro_batcher import MicroBatcher, micro_batching_config
 from app.services.model_loader import ModelLoader
 from app.core.rate_limiter import RateLimiter
+from app.core.scheduler import DEFAULT_TIER, ExecutionClass, execution_class
+from app.core.admission import (
+    AdmissionController,
+    AdmissionRejected,
+    AdmissionTicket,
+    Overloaded,
+    DeadlineExceeded,
+    parse_deadline,
+    check_deadline
+)
 
 router = APIRouter()
 security = HTTPBearer()
@@ -42,25 +71,42 @@ security = HTTPBearer()
 inference_service = InferenceService()
 model_loader = ModelLoader()
 rate_limiter = RateLimiter()
+admission_controller = AdmissionController()
 
 # Redis client for caching
 redis_client = redis.from_url(settings.REDIS_URL)
+inference_cache = InferenceCache(redis_client)
+cascade_service = CascadeService(inference_service, model_loader, redis_client)
+pipeline_service = PipelineService(inference_service, model_loader)
+traffic_service = TrafficService(model_loader, redis_client)
+precomputed_store = PrecomputedStore(inference_service, redis_client)
+micro_batcher = MicroBatcher(inference_service)
+
+# Background work of finished WebSocket frames and gRPC calls; held so the tasks aren't garbage collected mid-run
+_background: Set[asyncio.Task] = set()
 
 
-@router.post("/inference/{deployment_name}", response_model=InferenceResponse)
+@router.post(
+    "/inference/{deployment_name}",
+    response_model=InferenceResponse,
+    openapi_extra=openapi_body(InferenceRequest)
+)
 async def predict(
     deployment_name: str,
-    request: InferenceRequest,
+    http_request: Request,
     background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    api_key: Optional[str] = Depends(security)
+    api_key: Optional[HTTPAuthorizationCredentials] = Depends(security)
 ):
     """
     Make predictions using a deployed model.
     
+    The body (an InferenceRequest) is read raw: a byte-identical repeat of a
+    fully cached request is answered without decoding it.
+    
     Args:
         deployment_name: Name of the deployment
-        request: Inference request with input data
+        http_request: Raw request with the InferenceRequest body, deadline headers and disconnect detection
         background_tasks: For async logging
         db: Database session
         api_key: Optional API key for authentication
@@ -69,189 +115,557 @@ async def predict(
         InferenceResponse with predictions and metadata
     """
     start_time = time.time()
+    deadline = parse_deadline(http_request.headers)
     
     # Get deployment info
     deployment = await get_deployment_by_name(db, deployment_name)
     if not deployment or deployment.status != 'active':
         raise HTTPException(status_code=404, detail="Deployment not found or inactive")
     
-    # Rate limiting check
-    client_id = api_key or "anonymous"
-    if not await rate_limiter.check_rate_limit(client_id, deployment.id):
-        raise HTTPException(status_code=429, detail="Rate limit exceeded")
-    
-    # Check cache for identical requests
-    cache_key = f"inference:{deployment.id}:{hash(json.dumps(request.instances, sort_keys=True))}"
-    cached_result = await redis_client.get(cache_key)
-    
-    if cached_result and request.use_cache:
-        cached_response = json.loads(cached_result)
-        cached_response["cached"] = True
-        return InferenceResponse(**cached_response)
+    # Admission control: shed load before doing any work
+    ticket = admit_request(deployment, deadline)
+    dropped = False
+    sampled = True
     
     try:
-        # Load model if not already loaded
-        model = await model_loader.get_model(deployment.model_version_id)
+        # Rate limiting check
+        client_id = client_identity(api_key)
+        if not await rate_limiter.check_rate_limit(client_id, deployment.id):
+            sampled = False
+            raise HTTPException(status_code=429, detail="Rate limit exceeded")
+        await bind_execution_class(deployment, client_id)
         
-        # Validate input schema
-        validated_instances = await inference_service.validate_input(
-            request.instances, 
-            deployment.model_version.model_schema
-        )
+        # The deployment's own version, or a canary version for this request's share of a split
+        serving = traffic_service.choose_target(db, deployment, client_id)
         
-        # Make predictions
-        predictions = await inference_service.predict(
-            model=model,
-            instances=validated_instances,
-            deployment=deployment
-        )
+        # Bodies are only remembered when use_cache was set, so a known body needs no decoding
+        raw_body = await http_request.body()
+        body_key = body_digest(raw_body)
+        namespace = cache_namespace(serving)
+        digests = inference_cache.body_digests(namespace, body_key)
+        decoded: List[List[Dict[str, Any]]] = []
+        use_cache = True
+        if digests is None:
+            request = decode_request(raw_body, InferenceRequest)
+            decoded.append(request.instances)
+            use_cache = request.use_cache
+            digests = [instance_digest(instance) for instance in request.instances]
         
-        # Create response
-        response = InferenceResponse(
-            predictions=predictions,
-            model_info={
-                "model_id": deployment.model_version.model_id,
-                "model_name": deployment.model_version.model.name,
-                "version": deployment.model_version.version,
-                "deployment_id": deployment.id,
-                "prediction_id": str(uuid.uuid4())
-            },
-            metadata={
-                "latency_ms": round((time.time() - start_time) * 1000, 2),
-                "timestamp": datetime.utcnow().isoformat(),
-                "cached": False
-            }
-        )
+        def load_instances() -> List[Dict[str, Any]]:
+            if not decoded:
+                decoded.append(decode_request(raw_body, InferenceRequest).instances)
+            return decoded[0]
         
-        # Cache response if enabled
-        if request.use_cache:
-            await redis_client.setex(
-                cache_key, 
-                settings.INFERENCE_CACHE_TTL, 
-                json.dumps(response.dict())
+        try:
+            merged, served = await serve_instances(
+                db,
+                deployment,
+                serving,
+                digests,
+                load_instances,
+                use_cache,
+                http_request,
+                deadline,
+                background_tasks
             )
-        
-        # Log request/response in background
-        background_tasks.add_task(
-            log_inference_request,
-            deployment.id,
-            len(request.instances),
-            response.metadata["latency_ms"],
-            api_key
-        )
-        
-        return response
-        
-    except Exception as e:
-        # Log error
-        background_tasks.add_task(
-            log_inference_error,
-            deployment.id,
-            str(e),
-            api_key
-        )
-        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+            sampled = not served["cached"]
+            
+            # Create response
+            response = InferenceResponse(
+                predictions=merged,
+                model_info={
+                    "model_id": serving.model_version.model_id,
+                    "model_name": serving.model_version.model.name,
+                    "version": serving.model_version.version,
+                    "deployment_id": deployment.id,
+                    "prediction_id": str(uuid.uuid4())
+                },
+                metadata={
+                    "latency_ms": round((time.time() - start_time) * 1000, 2),
+                    "timestamp": datetime.utcnow().isoformat(),
+                    **served
+                }
+            )
+            if use_cache:
+                inference_cache.remember_body(namespace, body_key, digests)
+            if traffic_config(deployment).get("split"):
+                background_tasks.add_task(
+                    traffic_service.record_variant,
+                    deployment.id,
+                    serving.model_version_id,
+                    response.metadata.latency_ms
+                )
+            
+            # Log request/response in background
+            background_tasks.add_task(
+                log_inference_request,
+                deployment.id,
+                len(digests),
+                response.metadata.latency_ms,
+                api_key
+            )
+            
+            return response
+            
+        except (HTTPException, RequestValidationError):
+            raise
+        except AdmissionRejected as e:
+            dropped = True
+            admission_controller.record_rejection(deployment, e)
+            raise admission_http_error(e)
+        except Exception as e:
+            # Log error
+            background_tasks.add_task(
+                log_inference_error,
+                deployment.id,
+                str(e),
+                api_key
+            )
+            raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+    finally:
+        ticket.release(dropped=dropped, sample=sampled)
 
 
-@router.post("/inference/{deployment_name}/batch", response_model=BatchInferenceResponse)
+@router.post(
+    "/inference/{deployment_name}/batch",
+    response_model=BatchInferenceResponse,
+    openapi_extra=openapi_body(BatchInferenceRequest)
+)
 async def predict_batch(
     deployment_name: str,
-    request: BatchInferenceRequest,
+    http_request: Request,
     background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    api_key: Optional[str] = Depends(security)
+    api_key: Optional[HTTPAuthorizationCredentials] = Depends(security)
 ):
     """
     Make batch predictions for multiple instances.
     Optimized for large datasets with parallel processing.
     """
     start_time = time.time()
+    deadline = parse_deadline(http_request.headers)
     
     # Get deployment
     deployment = await get_deployment_by_name(db, deployment_name)
     if not deployment or deployment.status != 'active':
         raise HTTPException(status_code=404, detail="Deployment not found or inactive")
     
-    # Rate limiting for batch requests (stricter limits)
-    client_id = api_key or "anonymous"
-    if not await rate_limiter.check_batch_rate_limit(client_id, len(request.instances)):
-        raise HTTPException(status_code=429, detail="Batch rate limit exceeded")
+    ticket = admit_request(deployment, deadline)
+    dropped = False
+    sampled = True
     
     try:
-        # Load model
-        model = await model_loader.get_model(deployment.model_version_id)
+        request = decode_request(await http_request.body(), BatchInferenceRequest)
         
-        # Validate input schema
-        validated_instances = await inference_service.validate_input(
-            request.instances,
-            deployment.model_version.model_schema
-        )
-        
-        # Process in batches for memory efficiency
-        batch_size = request.batch_size or settings.DEFAULT_BATCH_SIZE
-        all_predictions = []
-        failed_indices = []
+        # Rate limiting for batch requests (stricter limits)
+        client_id = client_identity(api_key)
+        if not await rate_limiter.check_batch_rate_limit(client_id, len(request.instances)):
+            sampled = False
+            raise HTTPException(status_code=429, detail="Batch rate limit exceeded")
+        await bind_execution_class(deployment, client_id)
         
-        for i in range(0, len(validated_instances), batch_size):
-            batch = validated_instances[i:i + batch_size]
+        try:
+            # Load model
+            serving = traffic_service.choose_target(db, deployment, client_id)
+            model = await model_loader.get_model(serving.model_version_id, load_options(serving))
+            composite = resolve_composite(db, serving)
+            composite_reports: List[Dict[str, Any]] = []
             
-            try:
-                batch_predictions = await inference_service.predict(
-                    model=model,
-                    instances=batch,
-                    deployment=deployment
+            # Known entities come from the precomputed table; only the rest are scored
+            instances = request.instances
+            precomputed = precomputed_config(deployment) if serving is deployment else None
+            precomputed_rows = None
+            if precomputed is not None:
+                precomputed_rows = precomputed_lookup(deployment, request.instances, background_tasks)
+                live_positions = list(range(len(request.instances)))
+                if precomputed_rows is not None:
+                    live_positions = [i for i, row in enumerate(precomputed_rows) if row is None]
+                    if not precomputed.get("fallback", True):
+                        live_positions = []
+                instances = [request.instances[i] for i in live_positions]
+            instances = await inference_service.join_features(instances, deployment)
+            if precomputed is not None:
+                instances = [without_entity_key(precomputed, instance) for instance in instances]
+            
+            # Validate and score chunks through a bounded pipeline, reassembled in order
+            batch_size = request.batch_size or default_batch_size(serving, background_tasks)
+            chunks = [
+                (i, instances[i:i + batch_size])
+                for i in range(0, len(instances), batch_size)
+            ]
+            check_deadline(deadline, "execution")
+            score_start = time.perf_counter()
+            chunk_results = await admission_controller.run_guarded(
+                score_chunks_pipelined(
+                    model,
+                    serving,
+                    chunks,
+                    batch_parallelism(deployment),
+                    request.fail_on_error,
+                    composite,
+                    composite_reports
+                ),
+                http_request,
+                deadline
+            )
+            score_ms = (time.perf_counter() - score_start) * 1000
+            if composite is not None and composite.record:
+                for report in composite_reports:
+                    background_tasks.add_task(composite.record, report)
+            
+            all_predictions = []
+            failed_indices = []
+            for (offset, chunk), result in zip(chunks, chunk_results):
+                if isinstance(result, Exception):
+                    # A failed chunk only fails its own rows
+                    for j in range(len(chunk)):
+                        failed_indices.append(offset + j)
+                        all_predictions.append({
+                            "error": str(result),
+                            "index": offset + j
+                        })
+                    continue
+                for j, prediction in enumerate(result):
+                    if isinstance(prediction, PredictionResult):
+                        prediction.index = offset + j
+                    all_predictions.append(prediction)
+            
+            shadow = traffic_service.sample_shadow(deployment)
+            if shadow is not None:
+                scored = [
+                    (instance, prediction)
+                    for instance, prediction in zip(instances, all_predictions)
+                    if not (isinstance(prediction, dict) and "error" in prediction)
+                ]
+                background_tasks.add_task(
+                    traffic_service.submit,
+                    deployment.id,
+                    deployment.deployment_config,
+                    shadow,
+                    [instance for instance, _ in scored],
+                    [prediction for _, prediction in scored],
+                    score_ms * len(scored) / max(len(instances), 1)
                 )
-                all_predictions.extend(batch_predictions)
-            except Exception as e:
-                # Mark failed batch indices
-                for j in range(len(batch)):
-                    failed_indices.append(i + j)
-                    all_predictions.append({
-                        "error": str(e),
-                        "index": i + j
-                    })
-        
-        # Create response
-        response = BatchInferenceResponse(
-            predictions=all_predictions,
-            model_info={
-                "model_id": deployment.model_version.model_id,
-                "model_name": deployment.model_version.model.name,
-                "version": deployment.model_version.version,
-                "deployment_id": deployment.id,
-                "batch_id": str(uuid.uuid4())
-            },
-            metadata={
-                "total_instances": len(request.instances),
-                "successful_predictions": len(all_predictions) - len(failed_indices),
-                "failed_predictions": len(failed_indices),
-                "batch_size": batch_size,
-                "total_latency_ms": round((time.time() - start_time) * 1000, 2),
-                "avg_latency_per_instance": round(((time.time() - start_time) * 1000) / len(request.instances), 2),
-                "timestamp": datetime.utcnow().isoformat()
-            }
-        )
-        
-        # Log batch request
-        background_tasks.add_task(
-            log_batch_inference_request,
-            deployment.id,
-            len(request.instances),
-            len(failed_indices),
-            response.metadata["total_latency_ms"],
-            api_key
-        )
-        
-        return response
+            
+            if precomputed is not None:
+                all_predictions, failed_indices = merge_precomputed(
+                    precomputed_rows, live_positions, all_predictions, failed_indices
+                )
+            
+            # Create response
+            response = BatchInferenceResponse(
+                predictions=all_predictions,
+                model_info={
+                    "model_id": serving.model_version.model_id,
+                    "model_name": serving.model_version.model.name,
+                    "version": serving.model_version.version,
+                    "deployment_id": deployment.id,
+                    "batch_id": str(uuid.uuid4())
+                },
+                metadata={
+                    "total_instances": len(request.instances),
+                    "successful_predictions": len(all_predictions) - len(failed_indices),
+                    "failed_predictions": len(failed_indices),
+                    "batch_size": batch_size,
+                    "total_latency_ms": round((time.time() - start_time) * 1000, 2),
+                    "avg_latency_per_instance": round(((time.time() - start_time) * 1000) / len(request.instances), 2),
+                    "timestamp": datetime.utcnow().isoformat()
+                }
+            )
+            
+            if traffic_config(deployment).get("split"):
+                background_tasks.add_task(
+                    traffic_service.record_variant,
+                    deployment.id,
+                    serving.model_version_id,
+                    response.metadata.total_latency_ms
+                )
+            
+            # Log batch request
+            background_tasks.add_task(
+                log_batch_inference_request,
+                deployment.id,
+                len(request.instances),
+                len(failed_indices),
+                response.metadata.total_latency_ms,
+                api_key
+            )
+            
+            return response
+            
+        except (HTTPException, RequestValidationError):
+            raise
+        except AdmissionRejected as e:
+            dropped = True
+            admission_controller.record_rejection(deployment, e)
+            raise admission_http_error(e)
+        except BatchChunkError as e:
+            # fail_on_error turns a bad chunk into a failed request; the rows are the client's to fix
+            background_tasks.add_task(
+                log_inference_error,
+                deployment.id,
+                f"Batch prediction failed: {str(e)}",
+                api_key
+            )
+            raise HTTPException(status_code=422, detail=f"Batch prediction failed: {str(e)}")
+        except Exception as e:
+            background_tasks.add_task(
+                log_inference_error,
+                deployment.id,
+                f"Batch prediction failed: {str(e)}",
+                api_key
+            )
+            raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+    finally:
+        ticket.release(dropped=dropped, sample=sampled)
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """
+    Streaming response that does not listen for disconnects on `receive`.
+
+    The body iterator consumes the request stream itself (and sees the
+    disconnect there), so a concurrent listener would steal request chunks.
+    """
+    
+    media_type = "application/x-ndjson"
+    
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await self.stream_response(send)
+        finally:
+            # Run the body's cleanup now even if sending failed, rather than whenever the generator is collected
+            await self.body_iterator.aclose()
+            if self.background is not None:
+                await self.background()
+
+
+@router.post("/inference/{deployment_name}/batch/stream", response_class=NDJSONStreamingResponse)
+async def predict_batch_stream(
+    deployment_name: str,
+    http_request: Request,
+    batch_size: Optional[int] = Query(None, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    api_key: Optional[HTTPAuthorizationCredentials] = Depends(security)
+):
+    """
+    Stream batch predictions over newline-delimited JSON.
+    
+    The request body is one JSON instance per line. Rows are scored in
+    `batch_size` chunks as they arrive and each result is written back as
+    one NDJSON line, followed by a final `{"metadata": ...}` line, so
+    memory stays bounded regardless of the number of rows. Each chunk is
+    charged to the batch instance quota before it is scored; once the quota
+    is used up the stream ends with an `{"error": ...}` line.
+    """
+    deadline = parse_deadline(http_request.headers)
+    
+    deployment = await get_deployment_by_name(db, deployment_name)
+    if not deployment or deployment.status != 'active':
+        raise HTTPException(status_code=404, detail="Deployment not found or inactive")
+    
+    ticket = admit_request(deployment, deadline)
+    
+    try:
+        client_id = client_identity(api_key)
+        if not await rate_limiter.check_rate_limit(client_id, deployment.id, "batch_inference"):
+            raise HTTPException(status_code=429, detail="Batch rate limit exceeded")
         
+        await bind_execution_class(deployment, client_id)
+        serving = traffic_service.choose_target(db, deployment, client_id)
+        model = await model_loader.get_model(serving.model_version_id, load_options(serving))
+        composite = resolve_composite(db, serving)
+        chunk_size = batch_size or default_batch_size(serving)
+    except HTTPException:
+        ticket.release(sample=False)
+        raise
     except Exception as e:
-        background_tasks.add_task(
-            log_inference_error,
-            deployment.id,
-            f"Batch prediction failed: {str(e)}",
-            api_key
-        )
+        ticket.release()
         raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+    
+    async def score_stream() -> AsyncIterator[bytes]:
+        start_time = time.time()
+        total = 0
+        failed = 0
+        dropped = False
+        chunk: List[Dict[str, Any]] = []
+        chunk_start = 0
+        
+        async def score_chunk(rows: List[Dict[str, Any]], offset: int):
+            # Rows count against the batch instance quota as they are consumed, as /batch counts them up front
+            if not await rate_limiter.charge_batch_instances(client_id, len(rows), deployment.id):
+                raise StreamQuotaExceeded("Batch instance rate limit exceeded")
+            try:
+                check_deadline(deadline, "execution")
+                predictions = await score_rows(deployment, serving, model, composite, rows)
+            except AdmissionRejected:
+                raise
+            except Exception as e:
+                lines = [
+                    ndjson_line({"index": offset + j, "error": str(e)})
+                    for j in range(len(rows))
+                ]
+                return b"".join(lines), len(rows)
+            lines = []
+            for j, prediction in enumerate(predictions):
+                row = prediction.dict() if hasattr(prediction, "dict") else {"prediction": prediction}
+                row["index"] = offset + j
+                lines.append(ndjson_line(row))
+            return b"".join(lines), 0
+        
+        try:
+            async for index, row, error in iter_ndjson_rows(http_request.stream()):
+                total += 1
+                if error is not None:
+                    failed += 1
+                    yield ndjson_line({"index": index, "error": error})
+                    continue
+                if not chunk:
+                    chunk_start = index
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    body, chunk_failed = await score_chunk(chunk, chunk_start)
+                    failed += chunk_failed
+                    yield body
+                    chunk = []
+            
+            if chunk:
+                body, chunk_failed = await score_chunk(chunk, chunk_start)
+                failed += chunk_failed
+                yield body
+            
+            total_latency_ms = round((time.time() - start_time) * 1000, 2)
+            metadata = BatchInferenceMetadata(
+                total_instances=total,
+                successful_predictions=total - failed,
+                failed_predictions=failed,
+                batch_size=chunk_size,
+                total_latency_ms=total_latency_ms,
+                avg_latency_per_instance=round(total_latency_ms / total, 2) if total else 0.0,
+                timestamp=datetime.utcnow().isoformat()
+            )
+            yield ndjson_line({"metadata": metadata.dict()})
+            
+            await log_batch_inference_request(
+                deployment.id, total, failed, total_latency_ms, api_key
+            )
+        except ClientDisconnect:
+            dropped = True
+        except (AdmissionRejected, StreamFormatError, StreamQuotaExceeded) as e:
+            # Headers are already sent; report the error in-band and end the stream
+            dropped = isinstance(e, AdmissionRejected)
+            if dropped:
+                admission_controller.record_rejection(deployment, e)
+            yield ndjson_line({"error": str(e)})
+        finally:
+            ticket.release(dropped=dropped)
+    
+    # The stream releases the ticket when it ends; the background hook covers a response that never starts it
+    return NDJSONStreamingResponse(score_stream(), background=BackgroundTask(ticket.release, sample=False))
+
+
+@router.websocket("/inference/{deployment_name}/ws")
+async def predict_session(
+    websocket: WebSocket,
+    deployment_name: str,
+    db: Session = Depends(get_db)
+):
+    """
+    Persistent inference session over a WebSocket.
+    
+    The API key (a Bearer Authorization header, or an `api_key` query
+    parameter) and the deployment are resolved once, when the socket opens.
+    Each text or binary frame then carries one InferenceFrame:
+    
+        {"id": "a1", "instances": [...], "use_cache": true, "timeout_ms": 50}
+    
+    Frames are pipelined: up to WEBSOCKET_MAX_IN_FLIGHT of them are scored
+    at once, and each is answered in the same frame type as soon as it is
+    done, so replies can arrive out of order and are matched by `id`:
+    
+        {"id": "a1", "predictions": [...], "metadata": {...}}
+        {"id": "a2", "error": {"status_code": 429, "detail": "Rate limit exceeded"}}
+    
+    Rows the precomputed table and cache do not answer go through the
+    micro-batcher, so small frames from every session on the worker share
+    model calls sized to the version's tuned batch size. Rate limits and
+    admission control still apply to every frame.
+    """
+    api_key = websocket_key(websocket)
+    if api_key is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Not authenticated")
+        return
+    deployment = await get_deployment_by_name(db, deployment_name)
+    if not deployment or deployment.status != 'active':
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Deployment not found or inactive")
+        return
+    
+    await websocket.accept()
+    # Untuned versions are batched at the default size until the tuner has run
+    tuning = BackgroundTasks()
+    max_batch_size = micro_batching_config(deployment)["max_batch_size"] or default_batch_size(deployment, tuning)
+    run_after(tuning)
+    await websocket.send_text(orjson.dumps({
+        "session": {
+            "model_id": deployment.model_version.model_id,
+            "model_name": deployment.model_version.model.name,
+            "version": deployment.model_version.version,
+            "deployment_id": deployment.id,
+            "max_batch_size": max_batch_size,
+            "max_in_flight": settings.WEBSOCKET_MAX_IN_FLIGHT
+        }
+    }, default=str).decode())
+    
+    client_id = client_identity(api_key)
+    peer = SessionPeer()
+    send_lock = asyncio.Lock()
+    
+    async def answer(raw: bytes, binary: bool):
+        start_time = time.time()
+        frame_id = None
+        try:
+            request = decode_request(raw, InferenceFrame)
+            frame_id = request.id
+            served = await serve_session_request(db, deployment, client_id, api_key, request, start_time, peer)
+            reply = {"id": frame_id, **served}
+        except RequestValidationError as e:
+            reply = {"id": frame_tag(raw), "error": {"status_code": 422, "detail": e.errors()}}
+        except HTTPException as e:
+            reply = {"id": frame_id, "error": {"status_code": e.status_code, "detail": e.detail}}
+        except Exception as e:
+            reply = {"id": frame_id, "error": {"status_code": 500, "detail": f"Prediction failed: {str(e)}"}}
+        payload = orjson.dumps(reply, default=str)
+        try:
+            async with send_lock:
+                if binary:
+                    await websocket.send_bytes(payload)
+                else:
+                    await websocket.send_text(payload.decode())
+        except Exception:
+            # The socket closed under this frame; the read loop ends the session
+            peer.closed = True
+    
+    pending: Set[asyncio.Task] = set()
+    try:
+        while True:
+            # Backpressure: stop reading frames while the session has its fill in flight
+            if len(pending) >= settings.WEBSOCKET_MAX_IN_FLIGHT:
+                await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            binary = message.get("bytes") is not None
+            raw = message["bytes"] if binary else message.get("text", "").encode()
+            task = asyncio.ensure_future(answer(raw, binary))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Frames still running have nobody to answer to
+        peer.closed = True
+        for task in pending:
+            task.cancel()
 
 
 @router.get("/inference/{deployment_name}/health", response_model=HealthResponse)
@@ -268,8 +682,9 @@ async def health_check(
     
     # Check model loading status
     try:
-        model_loaded = await model_loader.is_model_loaded(deployment.model_version_id)
-        model_health = await model_loader.check_model_health(deployment.model_version_id)
+        model_key = model_loader.model_key(deployment.model_version_id, load_options(deployment))
+        model_loaded = await model_loader.is_model_loaded(model_key)
+        model_health = await model_loader.check_model_health(model_key)
         
         return HealthResponse(
             status="healthy" if model_loaded and model_health else "unhealthy",
@@ -279,7 +694,13 @@ async def health_check(
             last_prediction_at=deployment.last_request_at,
             health_details={
                 "model_health": model_health,
-                "memory_usage": await model_loader.get_memory_usage(deployment.model_version_id),
+                "memory_usage": await model_loader.get_memory_usage(model_key),
+                "admission": admission_controller.get_stats(deployment.id),
+                "scheduler": inference_service.executor.stats(),
+                "cache": await inference_cache.get_stats(deployment.id),
+                "cascade": await cascade_service.get_stats(deployment.id) if cascade_config(deployment) else None,
+                "traffic": await traffic_service.get_stats(deployment.id) if traffic_config(deployment) else None,
+                "precomputed": precomputed_store.get_stats(deployment) if precomputed_config(deployment) else None,
                 "uptime_seconds": (datetime.utcnow() - deployment.deployed_at).total_seconds() if deployment.deployed_at else 0
             }
         )
@@ -324,6 +745,638 @@ async def get_model_schema(
 
 # Helper functions
 
+class StreamFormatError(Exception):
+    """Raised when a streamed request body cannot be framed into rows."""
+
+
+class StreamQuotaExceeded(Exception):
+    """Raised when a streamed batch uses up the client's batch instance quota."""
+
+
+def prediction_row(prediction: Any) -> Dict[str, Any]:
+    """Cacheable form of a single prediction, without its request position."""
+    if isinstance(prediction, PredictionResult):
+        return prediction.dict(exclude={"index"})
+    return {"prediction": prediction}
+
+
+def ndjson_line(payload: Dict[str, Any]) -> bytes:
+    """Serialize one NDJSON output line."""
+    return orjson.dumps(payload, default=str) + b"\n"
+
+
+async def iter_ndjson_rows(byte_stream: AsyncIterator[bytes]):
+    """
+    Incrementally parse newline-delimited JSON from a byte stream.
+    
+    Yields:
+        (index, row, error) tuples; `row` is None when the line is invalid
+    """
+    buffer = b""
+    index = 0
+    
+    def parse(line: bytes):
+        try:
+            row = orjson.loads(line)
+        except ValueError as e:
+            return None, f"Invalid JSON: {str(e)}"
+        if not isinstance(row, dict):
+            return None, "Each line must be a JSON object"
+        return row, None
+    
+    async for chunk in byte_stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        if len(buffer) > settings.STREAM_MAX_LINE_BYTES:
+            raise StreamFormatError(
+                f"NDJSON line exceeds {settings.STREAM_MAX_LINE_BYTES} bytes"
+            )
+        for line in lines:
+            if not line.strip():
+                continue
+            row, error = parse(line)
+            yield index, row, error
+            index += 1
+    
+    if buffer.strip():
+        row, error = parse(buffer)
+        yield index, row, error
+
+
+def run_after(background_tasks: BackgroundTasks):
+    """Run a call's background tasks once its response is on the way, as Starlette does for HTTP routes."""
+    if background_tasks.tasks:
+        task = asyncio.ensure_future(background_tasks())
+        _background.add(task)
+        task.add_done_callback(_background.discard)
+
+
+class SessionPeer:
+    """Disconnect probe over a WebSocket session, for admission_controller.run_guarded."""
+
+    def __init__(self):
+        self.closed = False
+
+    async def is_disconnected(self) -> bool:
+        return self.closed
+
+
+def client_identity(api_key: Optional[Union[str, HTTPAuthorizationCredentials]]) -> str:
+    """
+    Who a caller is for rate limits, tiers and scheduling: the SHA-256 of its
+    API key (the `ApiKey.key_hash` it was issued under), or "anonymous".
+    """
+    key = api_key.credentials if isinstance(api_key, HTTPAuthorizationCredentials) else api_key
+    return hashlib.sha256(key.encode()).hexdigest() if key else "anonymous"
+
+
+def websocket_key(websocket: WebSocket) -> Optional[str]:
+    """The session's API key: a Bearer Authorization header, or an `api_key` query parameter for browsers."""
+    scheme, _, key = websocket.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and key.strip():
+        return key.strip()
+    return websocket.query_params.get("api_key") or None
+
+
+def frame_tag(raw: bytes) -> Any:
+    """Best-effort `id` of a frame that failed validation, so its error reply can still be matched."""
+    try:
+        data = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return None
+    return data.get("id") if isinstance(data, dict) else None
+
+
+async def serve_session_request(
+    db: Session,
+    deployment: Deployment,
+    client_id: str,
+    api_key: Optional[str],
+    request: InferenceFrame,
+    start_time: float,
+    peer: Any
+) -> Dict[str, Any]:
+    """
+    Answer one request on a persistent session (WebSocket or Unix socket).
+    
+    The session has already resolved the deployment and identified the
+    client, so each request only pays for admission, rate limiting and
+    scoring. Misses are scored through the micro-batcher.
+    
+    Returns:
+        The reply's `predictions` and `metadata`
+    
+    Raises:
+        HTTPException: With the status the REST predict endpoint would return
+    """
+    deadline = start_time + request.timeout_ms / 1000.0 if request.timeout_ms else None
+    background_tasks = BackgroundTasks()
+    ticket = admit_request(deployment, deadline)
+    dropped = False
+    sampled = True
+    try:
+        if not await rate_limiter.check_rate_limit(client_id, deployment.id):
+            sampled = False
+            raise HTTPException(status_code=429, detail="Rate limit exceeded")
+        await bind_execution_class(deployment, client_id)
+        
+        serving = traffic_service.choose_target(db, deployment, client_id)
+        try:
+            merged, served = await serve_instances(
+                db,
+                deployment,
+                serving,
+                [instance_digest(instance) for instance in request.instances],
+                lambda: request.instances,
+                request.use_cache,
+                peer,
+                deadline,
+                background_tasks,
+                batched=True
+            )
+        except (HTTPException, RequestValidationError):
+            raise
+        except AdmissionRejected as e:
+            dropped = True
+            admission_controller.record_rejection(deployment, e)
+            raise admission_http_error(e)
+        except Exception as e:
+            background_tasks.add_task(log_inference_error, deployment.id, str(e), api_key)
+            raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+        sampled = not served["cached"]
+        
+        latency_ms = round((time.time() - start_time) * 1000, 2)
+        if traffic_config(deployment).get("split"):
+            background_tasks.add_task(
+                traffic_service.record_variant,
+                deployment.id,
+                serving.model_version_id,
+                latency_ms
+            )
+        background_tasks.add_task(log_inference_request, deployment.id, len(merged), latency_ms, api_key)
+        return {
+            "predictions": [{**prediction_row(prediction), "index": prediction.index} for prediction in merged],
+            "metadata": {
+                "latency_ms": latency_ms,
+                "timestamp": datetime.utcnow().isoformat(),
+                "model_version": serving.model_version.version,
+                **served
+            }
+        }
+    finally:
+        ticket.release(dropped=dropped, sample=sampled)
+        run_after(background_tasks)
+
+
+def admit_request(deployment: Deployment, deadline: Optional[float]) -> AdmissionTicket:
+    """Reject expired or excess requests before any work is done on them."""
+    try:
+        check_deadline(deadline, "admission")
+        return admission_controller.admit(deployment)
+    except AdmissionRejected as e:
+        if not isinstance(e, Overloaded):
+            admission_controller.record_rejection(deployment, e)
+        raise admission_http_error(e)
+
+
+async def bind_execution_class(deployment: Deployment, client_id: str):
+    """Queue this request's model calls under the deployment's organization and the client's API key tier."""
+    tier = await rate_limiter.get_tier(client_id)
+    execution_class.set(ExecutionClass(tenant=str(deployment.organization_id), tier=tier or DEFAULT_TIER))
+
+
+class BatchChunkError(Exception):
+    """A chunk failed while the request asked to fail the whole batch on any error."""
+
+    def __init__(self, start: int, end: int, error: Exception):
+        super().__init__(f"Rows {start}-{end - 1} failed: {str(error)}")
+        self.error = error
+
+
+def batch_parallelism(deployment) -> int:
+    """Chunks scored concurrently by predict_batch for a deployment."""
+    config = (deployment.deployment_config or {}).get("batch", {})
+    return max(1, config.get("parallelism", settings.BATCH_INFERENCE_PARALLELISM))
+
+
+async def score_chunks_pipelined(
+    model,
+    deployment,
+    chunks: List[tuple],
+    parallelism: int,
+    fail_on_error: bool,
+    composite: Optional["Composite"] = None,
+    composite_reports: Optional[List[Dict[str, Any]]] = None
+) -> List[Any]:
+    """
+    Validate and score `(offset, instances)` chunks with at most `parallelism` in flight.
+    
+    Validation of one chunk runs on the event loop while others are predicting
+    on the inference executor. Results come back in chunk order; a failed
+    chunk's slot holds its exception unless `fail_on_error` is set, in which
+    case chunks not yet finished are cancelled and BatchChunkError is raised.
+    Cascade and pipeline deployments score each chunk through `composite`,
+    appending one report per chunk to `composite_reports`.
+    """
+    schema = deployment.model_version.model_schema
+    
+    async def score(instances: List[Dict[str, Any]]) -> List[Any]:
+        if composite is not None:
+            predictions, report = await composite.run(instances)
+            if composite_reports is not None:
+                composite_reports.append(report)
+            return predictions
+        validated = await inference_service.validate_input(instances, schema)
+        return await inference_service.predict(model=model, instances=validated, deployment=deployment)
+    
+    results: List[Any] = [None] * len(chunks)
+    pending: Dict[asyncio.Task, int] = {}
+    next_chunk = 0
+    try:
+        while next_chunk < len(chunks) or pending:
+            while next_chunk < len(chunks) and len(pending) < parallelism:
+                pending[asyncio.ensure_future(score(chunks[next_chunk][1]))] = next_chunk
+                next_chunk += 1
+            
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index = pending.pop(task)
+                try:
+                    results[index] = task.result()
+                except Exception as e:
+                    if fail_on_error:
+                        offset, instances = chunks[index]
+                        raise BatchChunkError(offset, offset + len(instances), e)
+                    results[index] = e
+    finally:
+        # Deadline, disconnect or fail_on_error: drop chunks that are still queued or running
+        for task in pending:
+            task.cancel()
+    return results
+
+
+async def score_rows(
+    deployment: Deployment,
+    serving,
+    model,
+    composite: Optional["Composite"],
+    rows: List[Dict[str, Any]]
+) -> List[Any]:
+    """Join stored features into rows and score them as one chunk of a streamed batch."""
+    rows = await inference_service.join_features(rows, deployment)
+    if composite is not None:
+        predictions, report = await composite.run(rows)
+        if composite.record:
+            await composite.record(report)
+        return predictions
+    validated = await inference_service.validate_input(rows, serving.model_version.model_schema)
+    return await inference_service.predict(model=model, instances=validated, deployment=serving)
+
+
+def default_batch_size(deployment, background_tasks: Optional[BackgroundTasks] = None) -> int:
+    """The version's auto-tuned batch size, scheduling tuning if it hasn't been tuned yet."""
+    tuned = getattr(deployment.model_version, "optimal_batch_size", None)
+    if tuned:
+        return tuned
+    if settings.BATCH_TUNING_ENABLED and background_tasks is not None:
+        background_tasks.add_task(
+            batch_size_tuner.tune_and_store,
+            deployment.model_version_id,
+            deployment.deployment_config
+        )
+    return settings.DEFAULT_BATCH_SIZE
+
+
+def load_options(deployment) -> Optional[Dict[str, Any]]:
+    """
+    Deployment overrides for the model version's load-time serving options.
+    
+    XGBoost takes deployment_config["booster"]["threads"] at load, since its
+    thread count is state of the shared booster rather than a per-call argument.
+    """
+    config = deployment.deployment_config or {}
+    options = config.get("serving") or {}
+    threads = (config.get("booster") or {}).get("threads")
+    if threads:
+        options = {**options, "xgboost": {**options.get("xgboost", {}), "threads": threads}}
+    return options or None
+
+
+@dataclass
+class Composite:
+    """A cascade or pipeline deployment bound to its resolved stages or DAG."""
+    
+    kind: str
+    run: Callable[[List[Dict[str, Any]]], Awaitable[Tuple[List[Any], Dict[str, Any]]]]
+    record: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+
+
+def resolve_composite(db: Session, deployment) -> Optional[Composite]:
+    """The deployment's cascade or pipeline runner, or None for a single-model deployment."""
+    stages = cascade_service.resolve_stages(db, deployment, load_options(deployment))
+    if stages is not None:
+        return Composite(
+            "cascade",
+            partial(cascade_service.predict, deployment, stages),
+            partial(cascade_service.record, deployment.id)
+        )
+    plan = pipeline_service.resolve(db, deployment)
+    if plan is not None:
+        return Composite("pipeline", partial(pipeline_service.predict, deployment, plan))
+    return None
+
+
+def cache_namespace(deployment) -> str:
+    """Model version the cache keys results under; cascades and pipelines also key on their config."""
+    cascade = cascade_config(deployment)
+    if cascade is not None:
+        return f"{deployment.model_version_id}+{cascade_fingerprint(cascade)}"
+    pipeline = pipeline_config(deployment)
+    if pipeline is not None:
+        return f"{deployment.model_version_id}+{pipeline_fingerprint(pipeline)}"
+    return str(deployment.model_version_id)
+
+
+def precomputed_lookup(deployment, instances: List[Dict[str, Any]], background_tasks: BackgroundTasks) -> Optional[List[Optional[Dict[str, Any]]]]:
+    """Rows the deployment's precomputed table has for instances, scheduling a rebuild if it is missing or stale."""
+    table = precomputed_store.table(deployment)
+    if precomputed_store.needs_refresh(deployment, table) and precomputed_store.claim_refresh(deployment.id):
+        background_tasks.add_task(precomputed_store.refresh, deployment.id)
+    return precomputed_store.lookup(deployment, instances)
+
+
+def merge_precomputed(
+    precomputed_rows: Optional[List[Optional[Dict[str, Any]]]],
+    live_positions: List[int],
+    live_predictions: List[Any],
+    live_failed: List[int]
+) -> Tuple[List[Any], List[int]]:
+    """
+    Interleave precomputed rows with predictions for the rows scored live.
+    
+    Rows in neither (no fallback) become errors. Returns all predictions
+    in request order and the failed indices.
+    """
+    live = dict(zip(live_positions, live_predictions))
+    failed = [live_positions[i] for i in live_failed]
+    merged = []
+    for i in range(len(precomputed_rows) if precomputed_rows is not None else len(live_positions)):
+        if i in live:
+            prediction = live[i]
+            if isinstance(prediction, PredictionResult):
+                prediction.index = i
+            elif isinstance(prediction, dict) and "error" in prediction:
+                prediction["index"] = i
+        elif precomputed_rows[i] is not None:
+            prediction = PredictionResult(**precomputed_rows[i], index=i)
+        else:
+            prediction = {"error": "No precomputed prediction", "index": i}
+            failed.append(i)
+        merged.append(prediction)
+    return merged, failed
+
+
+def coalescing_config(deployment) -> Dict[str, Any]:
+    """Single-flight settings for a deployment, with defaults from settings."""
+    config = (deployment.deployment_config or {}).get("coalescing", {})
+    return {
+        "enabled": config.get("enabled", settings.INFERENCE_COALESCING_ENABLED),
+        "distributed": config.get("distributed", settings.INFERENCE_COALESCING_DISTRIBUTED),
+        "lock_ms": config.get("lock_ms", settings.INFERENCE_COALESCING_LOCK_MS)
+    }
+
+
+async def serve_instances(
+    db: Session,
+    deployment: Deployment,
+    serving,
+    digests: List[str],
+    load_instances: Callable[[], List[Dict[str, Any]]],
+    use_cache: bool,
+    client: Any,
+    deadline: Optional[float],
+    background_tasks: BackgroundTasks,
+    batched: bool = False
+) -> Tuple[List[PredictionResult], Dict[str, Any]]:
+    """
+    Answer one request's instances from the precomputed table, the cache or the model.
+
+    Shared by the REST, WebSocket and gRPC predict endpoints. Instances are
+    only decoded (`load_instances`) when some digest is not already answered.
+    For deployments joining stored features, the request's digests are replaced
+    by digests of the joined rows before the cache is consulted.
+    `client` is polled with `is_disconnected()` while the model runs. With
+    `batched`, single-model rows are scored through the micro-batcher.
+
+    Returns:
+        Predictions in request order, and the cache/composite fields of the response metadata
+    """
+    # Known entities are answered from the precomputed table, the rest from cache or the model
+    cached_rows = [None] * len(digests)
+    precomputed = precomputed_config(deployment) if serving is deployment else None
+    precomputed_hits = None
+    if precomputed is not None:
+        cached_rows = precomputed_lookup(deployment, load_instances(), background_tasks) or cached_rows
+        precomputed_hits = sum(1 for row in cached_rows if row is not None)
+        if precomputed_hits < len(cached_rows) and not precomputed.get("fallback", True):
+            raise HTTPException(status_code=404, detail=f"No precomputed prediction for some {precomputed['entity_key']} values")
+
+    # Clients may send only entity keys; stored features are joined in before the cache lookup,
+    # and joined rows are keyed by what the model sees, so updated features aren't served stale
+    model_inputs: Optional[List[Optional[Dict[str, Any]]]] = None
+    pending = [i for i, row in enumerate(cached_rows) if row is None]
+    if pending and (deployment.deployment_config or {}).get("features"):
+        instances = load_instances()
+        joined = await inference_service.join_features([instances[i] for i in pending], deployment)
+        model_inputs = [None] * len(digests)
+        digests = list(digests)
+        for i, row in zip(pending, joined):
+            model_inputs[i] = row
+            digests[i] = instance_digest(row)
+
+    # Look up each remaining instance by content digest; only missed rows are scored
+    namespace = cache_namespace(serving)
+    if use_cache and pending:
+        found, cache_counts = await inference_cache.lookup(namespace, [digests[i] for i in pending])
+        for i, row in zip(pending, found):
+            cached_rows[i] = row
+        background_tasks.add_task(inference_cache.record_lookups, deployment.id, cache_counts)
+
+    # Deduplicate missed rows so identical instances are scored once
+    missed: Dict[str, Dict[str, Any]] = {}
+    if any(row is None for row in cached_rows):
+        for digest, instance, cached_row in zip(digests, model_inputs or load_instances(), cached_rows):
+            if cached_row is None and digest not in missed:
+                missed[digest] = instance
+        if precomputed is not None:
+            missed = {digest: without_entity_key(precomputed, instance) for digest, instance in missed.items()}
+    cache_hits = sum(1 for row in cached_rows if row is not None) - (precomputed_hits or 0)
+
+    scored_rows: Dict[str, Dict[str, Any]] = {}
+    composite_report = None
+    if missed:
+        composite = resolve_composite(db, serving)
+
+        # Share identical in-flight predictions; only digests this request leads are scored here
+        coalescing = coalescing_config(deployment)
+        flight = None
+        leading = list(missed)
+        if use_cache and coalescing["enabled"]:
+            flight = await inference_cache.claim(
+                namespace,
+                leading,
+                distributed=coalescing["distributed"],
+                lock_ms=coalescing["lock_ms"]
+            )
+            leading = flight.leading
+
+        try:
+            if leading:
+                score_start = time.perf_counter()
+                led_rows, composite_report = await score_instances(
+                    serving, {d: missed[d] for d in leading}, client, deadline, composite, batched
+                )
+                score_ms = (time.perf_counter() - score_start) * 1000
+                scored_rows.update(led_rows)
+                # Re-score a sample with the shadow version once the response is out
+                shadow = traffic_service.sample_shadow(deployment)
+                if shadow is not None:
+                    background_tasks.add_task(
+                        traffic_service.submit,
+                        deployment.id,
+                        deployment.deployment_config,
+                        shadow,
+                        [missed[d] for d in leading],
+                        [led_rows[d] for d in leading],
+                        score_ms
+                    )
+                if use_cache:
+                    await inference_cache.set_many(namespace, led_rows)
+                if composite_report is not None and composite.record:
+                    background_tasks.add_task(composite.record, composite_report)
+        except BaseException:
+            # This request will not reach wait(), so release whoever follows its remote digests
+            if flight:
+                inference_cache.abandon(flight)
+            raise
+        finally:
+            if flight:
+                await inference_cache.complete(flight, scored_rows)
+
+        if flight and flight.waiting:
+            timeout = coalescing["lock_ms"] / 1000.0
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.time())
+            coalesced = await inference_cache.wait(flight, timeout)
+            served = {d: row for d, row in coalesced.items() if row is not None}
+            scored_rows.update(served)
+            background_tasks.add_task(
+                inference_cache.record_coalesced,
+                deployment.id,
+                sum(1 for d in served if d not in flight.remote),
+                sum(1 for d in served if d in flight.remote)
+            )
+            # Leaders that failed or timed out: score those rows ourselves
+            retry = {d: missed[d] for d in coalesced if d not in served}
+            if retry:
+                retried_rows, retry_report = await score_instances(
+                    serving, retry, client, deadline, composite, batched
+                )
+                scored_rows.update(retried_rows)
+                await inference_cache.set_many(namespace, retried_rows)
+                if retry_report is not None and composite.record:
+                    background_tasks.add_task(composite.record, retry_report)
+                composite_report = composite_report or retry_report
+
+    merged = [
+        PredictionResult(**(cached_row or scored_rows[digest]), index=i)
+        for i, (digest, cached_row) in enumerate(zip(digests, cached_rows))
+    ]
+    return merged, {
+        "cached": not missed,
+        "cache_hits": cache_hits,
+        "precomputed_hits": precomputed_hits,
+        **({composite.kind: composite_report} if composite_report is not None else {})
+    }
+
+
+async def score_instances(
+    deployment,
+    instances: Dict[str, Dict[str, Any]],
+    client: Any,
+    deadline: Optional[float],
+    composite: Optional[Composite] = None,
+    batched: bool = False
+) -> Tuple[Dict[str, Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Validate and score instances keyed by digest, abandoning them if `client` disconnects.
+    
+    With `batched`, the validated rows join the deployment's next micro-batch,
+    sized to the version's tuned batch size, instead of a model call of their own.
+    
+    Returns:
+        Prediction rows by digest, and the cascade or pipeline report when scored through `composite`
+    """
+    if composite is not None:
+        check_deadline(deadline, "execution")
+        predictions, report = await admission_controller.run_guarded(
+            composite.run(list(instances.values())),
+            client,
+            deadline
+        )
+        return {
+            digest: prediction_row(prediction)
+            for digest, prediction in zip(instances.keys(), predictions)
+        }, report
+    
+    # Load model if not already loaded
+    model = await model_loader.get_model(deployment.model_version_id, load_options(deployment))
+    
+    # Validate input schema
+    check_deadline(deadline, "validation")
+    validated_instances = await inference_service.validate_input(
+        list(instances.values()),
+        deployment.model_version.model_schema
+    )
+    
+    # Make predictions, abandoning them if the client stops waiting
+    check_deadline(deadline, "execution")
+    if batched:
+        batching = micro_batching_config(deployment)
+        work = micro_batcher.predict(
+            model,
+            validated_instances,
+            deployment,
+            batching["max_batch_size"] or default_batch_size(deployment),
+            batching["max_wait_ms"]
+        )
+    else:
+        work = inference_service.predict(
+            model=model,
+            instances=validated_instances,
+            deployment=deployment
+        )
+    predictions = await admission_controller.run_guarded(work, client, deadline)
+    return {
+        digest: prediction_row(prediction)
+        for digest, prediction in zip(instances.keys(), predictions)
+    }, None
+
+
+def admission_http_error(error: AdmissionRejected) -> HTTPException:
+    """Map admission control failures to HTTP errors."""
+    if isinstance(error, Overloaded):
+        return HTTPException(
+            status_code=503,
+            detail=str(error),
+            headers={"Retry-After": str(error.retry_after)}
+        )
+    if isinstance(error, DeadlineExceeded):
+        return HTTPException(status_code=504, detail=str(error))
+    # Client closed the connection; nobody will read this response
+    return HTTPException(status_code=499, detail=str(error))
+
+
 async def get_deployment_by_name(db: Session, deployment_name: str) -> Optional[Deployment]:
     """Get deployment by name with related models."""
     query = (
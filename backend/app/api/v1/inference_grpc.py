@@ -0,0 +1,481 @@
+"""
+gRPC Inference endpoints.
+Binary counterpart of the REST inference API for high-QPS internal callers.
+
+The server runs inside each API worker, next to FastAPI, and scores through
+the same model loader, prediction cache, rate limiter, admission control and
+traffic routing as the REST routes. Messages are Arrow IPC streams carried as
+raw bytes, so there is no protobuf code to generate:
+
+    mlops.inference.v1.Inference/Predict        unary: instances in, predictions out
+    mlops.inference.v1.Inference/PredictStream  bidirectional: each message is scored as one chunk
+
+Request messages are record batches with one column per feature. Responses
+are record batches with `index`, `prediction`, `confidence`, `probabilities`
+(a map of class to probability) and `error` columns. Predict puts the model
+info and response metadata in the schema metadata under `mlops.metadata`;
+PredictStream reports totals in its trailing metadata.
+
+Typed columns are scored without ever becoming per-row Python objects: they
+are validated as numpy arrays and stacked into the model's input matrix, and
+the model's output arrays are written back as Arrow columns. That holds for
+single-model targets with no feature join or precomputed table, and for
+Predict only when the call opts out of the cache (`x-use-cache: false`) and
+the deployment shadows nothing, since those work row by row. Everything else
+goes through the same row path as REST.
+
+Call metadata:
+    x-deployment: deployment name (required)
+    authorization: "Bearer <key>", identifying the client for rate limits and canary routing
+    x-use-cache: "false" to bypass the prediction cache (Predict only)
+
+Deadlines are the call's own gRPC deadline.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from functools import partial
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import grpc
+import numpy as np
+import orjson
+import pyarrow as pa
+from fastapi import BackgroundTasks, HTTPException
+from fastapi.exceptions import RequestValidationError
+
+from app.core.admission import AdmissionRejected, check_deadline
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.request_body import check_instance_count
+from app.schemas.inference import InferenceRequest
+from app.services.cascade_service import cascade_config
+from app.services.inference_cache import instance_digest
+from app.services.pipeline_service import pipeline_config
+from app.services.precomputed_store import precomputed_config
+from app.services.traffic_service import traffic_config
+from app.api.v1.inference import (
+    admission_controller,
+    admission_http_error,
+    admit_request,
+    batch_parallelism,
+    bind_execution_class,
+    client_identity,
+    get_deployment_by_name,
+    inference_service,
+    load_options,
+    log_batch_inference_request,
+    log_inference_error,
+    log_inference_request,
+    model_loader,
+    prediction_row,
+    rate_limiter,
+    resolve_composite,
+    run_after,
+    score_rows,
+    serve_instances,
+    traffic_service
+)
+
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "mlops.inference.v1.Inference"
+METADATA_KEY = b"mlops.metadata"
+
+# HTTP errors raised by the shared inference helpers, as gRPC status codes
+GRPC_STATUS = {
+    400: grpc.StatusCode.INVALID_ARGUMENT,
+    401: grpc.StatusCode.UNAUTHENTICATED,
+    403: grpc.StatusCode.PERMISSION_DENIED,
+    404: grpc.StatusCode.NOT_FOUND,
+    422: grpc.StatusCode.INVALID_ARGUMENT,
+    429: grpc.StatusCode.RESOURCE_EXHAUSTED,
+    499: grpc.StatusCode.CANCELLED,
+    503: grpc.StatusCode.UNAVAILABLE,
+    504: grpc.StatusCode.DEADLINE_EXCEEDED
+}
+
+
+def read_table(payload: bytes) -> pa.Table:
+    """The record batches of an Arrow IPC stream message."""
+    try:
+        return pa.ipc.open_stream(payload).read_all()
+    except (pa.ArrowException, OSError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid Arrow IPC payload: {str(e)}")
+
+
+def table_columns(table: pa.Table) -> Dict[str, np.ndarray]:
+    """One numpy array per column; columns with nulls become object arrays holding None."""
+    return {
+        name: column.to_numpy() if column.null_count == 0 else np.array(column.to_pylist(), dtype=object)
+        for name, column in zip(table.column_names, table.columns)
+    }
+
+
+def write_instances(instances: List[Dict[str, Any]]) -> bytes:
+    """Encode instances as an Arrow IPC stream, as a Python client would."""
+    return _ipc_bytes(pa.RecordBatch.from_pylist(instances))
+
+
+def _column(values: List[Any], type: Optional[pa.DataType] = None) -> pa.Array:
+    """Typed Arrow column, falling back to JSON strings when values don't share a type."""
+    try:
+        return pa.array(values, type=type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array(
+            [None if value is None else orjson.dumps(value, default=str).decode() for value in values],
+            type=pa.string()
+        )
+
+
+PROBABILITIES = pa.map_(pa.string(), pa.float64())
+
+
+def _predictions_batch(arrays: List[pa.Array], metadata: Optional[Dict[str, Any]]) -> bytes:
+    batch = pa.RecordBatch.from_arrays(arrays, names=["index", "prediction", "confidence", "probabilities", "error"])
+    if metadata is not None:
+        batch = batch.replace_schema_metadata({METADATA_KEY: orjson.dumps(metadata, default=str)})
+    return _ipc_bytes(batch)
+
+
+def write_predictions(rows: List[Dict[str, Any]], metadata: Optional[Dict[str, Any]] = None) -> bytes:
+    """Encode prediction rows (with their `index`) as an Arrow IPC stream."""
+    return _predictions_batch(
+        [
+            pa.array([row.get("index") for row in rows], type=pa.int64()),
+            _column([row.get("prediction") for row in rows]),
+            _column([row.get("confidence") for row in rows], pa.float64()),
+            _column([row.get("probabilities") for row in rows], PROBABILITIES),
+            pa.array([row.get("error") for row in rows], type=pa.string())
+        ],
+        metadata
+    )
+
+
+def write_columns(output: Dict[str, Any], offset: int, metadata: Optional[Dict[str, Any]] = None) -> bytes:
+    """Encode InferenceService.postprocess_columns output, rows numbered from `offset`."""
+    predictions = output["predictions"]
+    n_rows = len(predictions)
+    if predictions.ndim == 2:
+        # Multi-output models: one fixed-size list per row
+        prediction = pa.FixedSizeListArray.from_arrays(pa.array(predictions.ravel()), predictions.shape[1])
+    else:
+        prediction = _column(predictions)
+    confidence = output.get("confidence")
+    probabilities = output.get("probabilities")
+    if probabilities is not None:
+        n_classes = probabilities.shape[1]
+        probabilities = pa.MapArray.from_arrays(
+            pa.array(np.arange(0, (n_rows + 1) * n_classes, n_classes, dtype=np.int32)),
+            pa.array(output["classes"] * n_rows, type=pa.string()),
+            pa.array(probabilities.ravel(), type=pa.float64())
+        )
+    return _predictions_batch(
+        [
+            pa.array(np.arange(offset, offset + n_rows, dtype=np.int64)),
+            prediction,
+            pa.array(confidence, type=pa.float64()) if confidence is not None else pa.nulls(n_rows, pa.float64()),
+            probabilities if probabilities is not None else pa.nulls(n_rows, PROBABILITIES),
+            pa.nulls(n_rows, pa.string())
+        ],
+        metadata
+    )
+
+
+def read_predictions(payload: bytes) -> Tuple[pa.Table, Optional[Dict[str, Any]]]:
+    """Decode a response message into its predictions table and metadata, as a Python client would."""
+    table = pa.ipc.open_stream(payload).read_all()
+    metadata = (table.schema.metadata or {}).get(METADATA_KEY)
+    return table, orjson.loads(metadata) if metadata else None
+
+
+def prediction_rows(table: pa.Table) -> List[Dict[str, Any]]:
+    """A predictions table as one dict per row, with probabilities as dicts."""
+    rows = table.to_pylist()
+    for row in rows:
+        if row["probabilities"] is not None:
+            row["probabilities"] = dict(row["probabilities"])
+    return rows
+
+
+def _ipc_bytes(batch: pa.RecordBatch) -> bytes:
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def columnar_target(deployment, serving) -> bool:
+    """Whether the target is a single model with no per-row feature join or precomputed lookup."""
+    return (
+        cascade_config(serving) is None
+        and pipeline_config(serving) is None
+        and not (deployment.deployment_config or {}).get("features")
+        and (serving is not deployment or precomputed_config(deployment) is None)
+    )
+
+
+class CallPeer:
+    """Disconnect probe over a gRPC call, for admission_controller.run_guarded."""
+
+    def __init__(self, context: grpc.aio.ServicerContext):
+        self.context = context
+
+    async def is_disconnected(self) -> bool:
+        return self.context.cancelled()
+
+
+def call_metadata(context: grpc.aio.ServicerContext) -> Dict[str, str]:
+    return {key: value for key, value in context.invocation_metadata() or () if isinstance(value, str)}
+
+
+def call_deadline(context: grpc.aio.ServicerContext) -> Optional[float]:
+    """The call's gRPC deadline as a unix timestamp."""
+    remaining = context.time_remaining()
+    return time.time() + remaining if remaining is not None else None
+
+
+def bearer_key(metadata: Dict[str, str]) -> Optional[str]:
+    scheme, _, key = metadata.get("authorization", "").partition(" ")
+    return key.strip() if scheme.lower() == "bearer" and key.strip() else None
+
+
+async def abort(context: grpc.aio.ServicerContext, error: Exception):
+    """End the call with the gRPC status matching a shared-helper error."""
+    if isinstance(error, HTTPException):
+        await context.abort(GRPC_STATUS.get(error.status_code, grpc.StatusCode.INTERNAL), str(error.detail))
+    if isinstance(error, RequestValidationError):
+        await context.abort(grpc.StatusCode.INVALID_ARGUMENT, orjson.dumps(error.errors(), default=str).decode())
+    logger.error(f"gRPC inference call failed: {str(error)}")
+    await context.abort(grpc.StatusCode.INTERNAL, str(error))
+
+
+async def predict(payload: bytes, context: grpc.aio.ServicerContext) -> bytes:
+    """Predict RPC: the REST predict endpoint over Arrow IPC."""
+    start_time = time.time()
+    metadata = call_metadata(context)
+    deadline = call_deadline(context)
+    api_key = bearer_key(metadata)
+    background_tasks = BackgroundTasks()
+    db = SessionLocal()
+    try:
+        deployment = await get_deployment_by_name(db, metadata.get("x-deployment", ""))
+        if not deployment or deployment.status != 'active':
+            raise HTTPException(status_code=404, detail="Deployment not found or inactive")
+
+        ticket = admit_request(deployment, deadline)
+        dropped = False
+        sampled = True
+        try:
+            client_id = client_identity(api_key)
+            if not await rate_limiter.check_rate_limit(client_id, deployment.id):
+                sampled = False
+                raise HTTPException(status_code=429, detail="Rate limit exceeded")
+            await bind_execution_class(deployment, client_id)
+
+            serving = traffic_service.choose_target(db, deployment, client_id)
+            table = read_table(payload)
+            check_instance_count(table.num_rows, InferenceRequest)
+            use_cache = metadata.get("x-use-cache", "true").lower() != "false"
+
+            try:
+                model = None
+                if not use_cache and not traffic_config(deployment).get("shadow") and columnar_target(deployment, serving):
+                    model = await model_loader.get_model(serving.model_version_id, load_options(serving))
+                if model is not None and inference_service.supports_columns(model, serving):
+                    check_deadline(deadline, "execution")
+                    output = await admission_controller.run_guarded(
+                        inference_service.predict_columns(model, table_columns(table), serving),
+                        CallPeer(context),
+                        deadline
+                    )
+                    served = {"cached": False, "cache_hits": 0, "precomputed_hits": None}
+                    encode = partial(write_columns, inference_service.postprocess_columns(output, serving), 0)
+                else:
+                    instances = table.to_pylist()
+                    merged, served = await serve_instances(
+                        db,
+                        deployment,
+                        serving,
+                        [instance_digest(instance) for instance in instances],
+                        lambda: instances,
+                        use_cache,
+                        CallPeer(context),
+                        deadline,
+                        background_tasks
+                    )
+                    encode = partial(write_predictions, [
+                        {**prediction_row(prediction), "index": prediction.index} for prediction in merged
+                    ])
+            except HTTPException:
+                raise
+            except AdmissionRejected as e:
+                dropped = True
+                admission_controller.record_rejection(deployment, e)
+                raise admission_http_error(e)
+            except Exception as e:
+                background_tasks.add_task(log_inference_error, deployment.id, str(e), api_key)
+                raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+            sampled = not served["cached"]
+
+            latency_ms = round((time.time() - start_time) * 1000, 2)
+            if traffic_config(deployment).get("split"):
+                background_tasks.add_task(
+                    traffic_service.record_variant,
+                    deployment.id,
+                    serving.model_version_id,
+                    latency_ms
+                )
+            background_tasks.add_task(log_inference_request, deployment.id, table.num_rows, latency_ms, api_key)
+            return encode({
+                "model_info": {
+                    "model_id": serving.model_version.model_id,
+                    "model_name": serving.model_version.model.name,
+                    "version": serving.model_version.version,
+                    "deployment_id": deployment.id,
+                    "prediction_id": str(uuid.uuid4())
+                },
+                "latency_ms": latency_ms,
+                "timestamp": datetime.utcnow().isoformat(),
+                **served
+            })
+        finally:
+            ticket.release(dropped=dropped, sample=sampled)
+    except (HTTPException, RequestValidationError) as e:
+        await abort(context, e)
+    finally:
+        db.close()
+        run_after(background_tasks)
+
+
+async def predict_stream(
+    request_iterator: AsyncIterator[bytes],
+    context: grpc.aio.ServicerContext
+) -> AsyncIterator[bytes]:
+    """
+    PredictStream RPC: the NDJSON batch stream over Arrow IPC.
+
+    Up to the deployment's batch parallelism of messages are scored at once,
+    and responses come back in request order. Row indexes count across the
+    whole call. A message that fails to score comes back as error rows.
+    """
+    start_time = time.time()
+    metadata = call_metadata(context)
+    deadline = call_deadline(context)
+    api_key = bearer_key(metadata)
+    db = SessionLocal()
+    pending: deque = deque()
+    try:
+        deployment = await get_deployment_by_name(db, metadata.get("x-deployment", ""))
+        if not deployment or deployment.status != 'active':
+            raise HTTPException(status_code=404, detail="Deployment not found or inactive")
+
+        ticket = admit_request(deployment, deadline)
+        dropped = False
+        try:
+            client_id = client_identity(api_key)
+            if not await rate_limiter.check_rate_limit(client_id, deployment.id, "batch_inference"):
+                raise HTTPException(status_code=429, detail="Batch rate limit exceeded")
+            await bind_execution_class(deployment, client_id)
+
+            try:
+                serving = traffic_service.choose_target(db, deployment, client_id)
+                model = await model_loader.get_model(serving.model_version_id, load_options(serving))
+                composite = resolve_composite(db, serving)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+
+            total = 0
+            failed = 0
+
+            columnar = composite is None and columnar_target(deployment, serving) and inference_service.supports_columns(model, serving)
+
+            async def score_message(table: pa.Table, offset: int) -> Tuple[bytes, int]:
+                if table.num_rows == 0:
+                    return write_predictions([]), 0
+                try:
+                    check_deadline(deadline, "execution")
+                    if columnar:
+                        output = await inference_service.predict_columns(model, table_columns(table), serving)
+                        return write_columns(inference_service.postprocess_columns(output, serving), offset), 0
+                    predictions = await score_rows(deployment, serving, model, composite, table.to_pylist())
+                except AdmissionRejected:
+                    raise
+                except Exception as e:
+                    return write_predictions([
+                        {"index": offset + j, "error": str(e)} for j in range(table.num_rows)
+                    ]), table.num_rows
+                return write_predictions([
+                    {**prediction_row(prediction), "index": offset + j}
+                    for j, prediction in enumerate(predictions)
+                ]), 0
+
+            try:
+                parallelism = batch_parallelism(deployment)
+                async for payload in request_iterator:
+                    table = read_table(payload)
+                    pending.append(asyncio.ensure_future(score_message(table, total)))
+                    total += table.num_rows
+                    if len(pending) >= parallelism:
+                        body, message_failed = await pending.popleft()
+                        failed += message_failed
+                        yield body
+                while pending:
+                    body, message_failed = await pending.popleft()
+                    failed += message_failed
+                    yield body
+            except AdmissionRejected as e:
+                dropped = True
+                admission_controller.record_rejection(deployment, e)
+                raise admission_http_error(e)
+
+            total_latency_ms = round((time.time() - start_time) * 1000, 2)
+            context.set_trailing_metadata((
+                ("x-total-instances", str(total)),
+                ("x-failed-predictions", str(failed)),
+                ("x-total-latency-ms", str(total_latency_ms))
+            ))
+            await log_batch_inference_request(deployment.id, total, failed, total_latency_ms, api_key)
+        finally:
+            ticket.release(dropped=dropped)
+    except (HTTPException, RequestValidationError) as e:
+        await abort(context, e)
+    finally:
+        # Client went away or the call failed: drop messages still being scored
+        for task in pending:
+            task.cancel()
+        db.close()
+
+
+def inference_handler() -> grpc.GenericRpcHandler:
+    """Generic handler for the inference service; payloads are passed through as raw bytes."""
+    return grpc.method_handlers_generic_handler(SERVICE_NAME, {
+        "Predict": grpc.unary_unary_rpc_method_handler(predict),
+        "PredictStream": grpc.stream_stream_rpc_method_handler(predict_stream)
+    })
+
+
+async def start_server(port: Optional[int] = None) -> grpc.aio.Server:
+    """
+    Start the gRPC inference server on this worker's event loop.
+
+    Every API worker binds the same port; the kernel spreads connections
+    across them (SO_REUSEPORT, on by default in gRPC on Linux).
+    """
+    server = grpc.aio.server(
+        handlers=[inference_handler()],
+        options=[
+            ("grpc.max_receive_message_length", settings.GRPC_MAX_MESSAGE_BYTES),
+            ("grpc.max_send_message_length", settings.GRPC_MAX_MESSAGE_BYTES),
+            ("grpc.so_reuseport", 1)
+        ]
+    )
+    bound = server.add_insecure_port(f"0.0.0.0:{port if port is not None else settings.GRPC_PORT}")
+    await server.start()
+    logger.info(f"gRPC inference server listening on port {bound}")
+    return server
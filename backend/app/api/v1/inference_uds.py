@@ -0,0 +1,292 @@
+"""
+Unix Socket Inference server.
+Inference for clients on the same host over a Unix domain socket, with length-prefixed binary frames.
+
+Runs as its own process next to the API workers:
+
+    python -m app.api.v1.inference_uds --path /run/mlops/inference.sock --workers 2
+
+The socket is bound once and shared by the forked workers. Access control is
+the socket file itself: it is created with UDS_SOCKET_MODE (owner and group
+by default) and, with UDS_SOCKET_GROUP, handed to the consumers' group.
+There are no API keys. Rate limits apply per connecting uid, read from the
+peer credentials.
+
+Requests and responses are frames with a fixed big-endian header:
+
+    request:  version u8 | request id u32 | deployment name length u16 | body length u32
+              | deployment name (utf-8) | body
+    response: version u8 | request id u32 | status u16 | body length u32 | body
+
+A request body is a JSON InferenceFrame ({"instances": [...], "use_cache":
+true, "timeout_ms": 50}; the id travels in the header). A 200 response body
+is {"predictions": [...], "metadata": {...}}; any other status carries
+{"detail": ...}, with the same codes as the REST endpoint. Requests are
+pipelined: up to UDS_MAX_IN_FLIGHT per connection are scored at once and
+each is answered as soon as it is done, so responses are matched by id.
+Deployments are resolved once per connection, and rows the cache does not
+answer go through the micro-batcher, as for WebSocket sessions.
+"""
+
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import shutil
+import signal
+import socket
+import struct
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import orjson
+from fastapi import HTTPException
+from fastapi.exceptions import RequestValidationError
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.request_body import decode_request
+from app.models.deployment import Deployment
+from app.schemas.inference import InferenceFrame
+from app.api.v1.inference import SessionPeer, get_deployment_by_name, serve_session_request
+
+
+logger = logging.getLogger(__name__)
+
+PROTOCOL_VERSION = 1
+REQUEST_HEADER = struct.Struct(">BIHI")
+RESPONSE_HEADER = struct.Struct(">BIHI")
+
+
+class FrameError(Exception):
+    """Raised when a peer sends a frame this server cannot read; the connection is closed."""
+
+
+def encode_request(request_id: int, deployment: str, body: bytes) -> bytes:
+    name = deployment.encode("utf-8")
+    return REQUEST_HEADER.pack(PROTOCOL_VERSION, request_id, len(name), len(body)) + name + body
+
+
+def encode_response(request_id: int, status: int, payload: Dict[str, Any]) -> bytes:
+    body = orjson.dumps(payload, default=str)
+    return RESPONSE_HEADER.pack(PROTOCOL_VERSION, request_id, status, len(body)) + body
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Tuple[int, str, bytes]]:
+    """The next `(request id, deployment name, body)` on a connection, or None once the peer closes it."""
+    try:
+        header = await reader.readexactly(REQUEST_HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise FrameError("Connection closed mid-frame")
+        return None
+    version, request_id, name_length, body_length = REQUEST_HEADER.unpack(header)
+    if version != PROTOCOL_VERSION:
+        raise FrameError(f"Unsupported protocol version {version}")
+    if body_length > settings.UDS_MAX_FRAME_BYTES:
+        raise FrameError(f"Frame body exceeds {settings.UDS_MAX_FRAME_BYTES} bytes")
+    try:
+        name = await reader.readexactly(name_length)
+        body = await reader.readexactly(body_length)
+    except asyncio.IncompleteReadError:
+        raise FrameError("Connection closed mid-frame")
+    return request_id, name.decode("utf-8", "replace"), body
+
+
+def peer_client_id(writer: asyncio.StreamWriter) -> str:
+    """Rate-limit identity of a connection: the connecting process's uid."""
+    sock = writer.get_extra_info("socket")
+    try:
+        credentials = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    except (AttributeError, OSError):
+        return "uds"
+    _, uid, _ = struct.unpack("3i", credentials)
+    return f"uds:{uid}"
+
+
+async def handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Serve one client connection until it closes."""
+    client_id = peer_client_id(writer)
+    peer = SessionPeer()
+    db = SessionLocal()
+    deployments: Dict[str, Deployment] = {}
+
+    async def resolve(name: str) -> Deployment:
+        deployment = deployments.get(name)
+        if deployment is None:
+            deployment = await get_deployment_by_name(db, name)
+            if not deployment or deployment.status != 'active':
+                raise HTTPException(status_code=404, detail="Deployment not found or inactive")
+            deployments[name] = deployment
+        return deployment
+
+    async def answer(request_id: int, name: str, body: bytes):
+        start_time = time.time()
+        try:
+            deployment = await resolve(name)
+            request = decode_request(body, InferenceFrame)
+            status, payload = 200, await serve_session_request(
+                db, deployment, client_id, None, request, start_time, peer
+            )
+        except RequestValidationError as e:
+            status, payload = 422, {"detail": e.errors()}
+        except HTTPException as e:
+            status, payload = e.status_code, {"detail": e.detail}
+        except Exception as e:
+            status, payload = 500, {"detail": f"Prediction failed: {str(e)}"}
+        writer.write(encode_response(request_id, status, payload))
+        try:
+            await writer.drain()
+        except ConnectionError:
+            peer.closed = True
+
+    pending: Set[asyncio.Task] = set()
+    try:
+        while True:
+            # Backpressure: stop reading while the connection has its fill in flight
+            if len(pending) >= settings.UDS_MAX_IN_FLIGHT:
+                await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            frame = await read_request(reader)
+            if frame is None:
+                break
+            task = asyncio.ensure_future(answer(*frame))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+    except FrameError as e:
+        logger.warning(f"Closing Unix socket connection from {client_id}: {str(e)}")
+    except ConnectionError:
+        pass
+    finally:
+        # Requests still running have nobody to answer to
+        peer.closed = True
+        for task in pending:
+            task.cancel()
+        db.close()
+        writer.close()
+
+
+def bind_socket(path: str, mode: int, group: Optional[str] = None) -> socket.socket:
+    """Bind and listen on `path`, with the given permissions from the moment it exists."""
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+            raise RuntimeError(f"Another server is listening on {path}")
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(path)  # left over from a server that didn't shut down cleanly
+        finally:
+            probe.close()
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    umask = os.umask(0o777 & ~mode)
+    try:
+        sock.bind(path)
+    finally:
+        os.umask(umask)
+    if group:
+        shutil.chown(path, group=group)
+    sock.listen(socket.SOMAXCONN)
+    return sock
+
+
+async def serve(sock: socket.socket):
+    """Accept connections on a bound socket until SIGTERM or SIGINT."""
+    server = await asyncio.start_unix_server(handle_connection, sock=sock)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+    async with server:
+        await stop.wait()
+
+
+class UnixSocketClient:
+    """Pipelining client for the framed protocol, for Python callers on the same host."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.ids = itertools.count(1)
+        self.waiting: Dict[int, asyncio.Future] = {}
+
+    async def connect(self) -> "UnixSocketClient":
+        self.reader, self.writer = await asyncio.open_unix_connection(self.path)
+        self.reading = asyncio.ensure_future(self._read_responses())
+        return self
+
+    async def predict(
+        self,
+        deployment: str,
+        instances: List[Dict[str, Any]],
+        use_cache: bool = True,
+        timeout_ms: Optional[float] = None
+    ) -> Tuple[int, Dict[str, Any]]:
+        """Send one request and wait for its `(status, body)`."""
+        request_id = next(self.ids) & 0xFFFFFFFF
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[request_id] = future
+        body = {"instances": instances, "use_cache": use_cache}
+        if timeout_ms is not None:
+            body["timeout_ms"] = timeout_ms
+        self.writer.write(encode_request(request_id, deployment, orjson.dumps(body)))
+        await self.writer.drain()
+        return await future
+
+    async def _read_responses(self):
+        try:
+            while True:
+                header = await self.reader.readexactly(RESPONSE_HEADER.size)
+                _, request_id, status, body_length = RESPONSE_HEADER.unpack(header)
+                body = orjson.loads(await self.reader.readexactly(body_length))
+                future = self.waiting.pop(request_id, None)
+                if future is not None and not future.done():
+                    future.set_result((status, body))
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            for future in self.waiting.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(f"Unix socket connection closed: {str(e)}"))
+            self.waiting.clear()
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.reading.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve inference over a Unix domain socket.")
+    parser.add_argument("--path", default=settings.UDS_PATH)
+    parser.add_argument("--workers", type=int, default=settings.UDS_WORKERS)
+    args = parser.parse_args()
+    logging.basicConfig(level=getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO))
+
+    sock = bind_socket(args.path, int(settings.UDS_SOCKET_MODE, 8), settings.UDS_SOCKET_GROUP or None)
+    logger.info(f"Serving inference on unix:{args.path} with {args.workers} workers")
+    children = []
+    for _ in range(max(1, args.workers)):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                asyncio.run(serve(sock))
+            except Exception:
+                logger.exception("Unix socket inference worker failed")
+                code = 1
+            os._exit(code)
+        children.append(pid)
+
+    def stop(signum, frame):
+        for child in children:
+            os.kill(child, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        for child in children:
+            os.waitpid(child, 0)
+    finally:
+        os.unlink(args.path)
+
+
+if __name__ == "__main__":
+    main()
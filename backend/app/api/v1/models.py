@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 import uuid
 
 from app.core.database import get_db
 from app.api.dependencies import get_current_active_user
+from app.core.config import settings
 from app.models.user import User
 from app.services.model_service import ModelService
+from app.services.batch_tuner import batch_size_tuner
+from app.services.version_profiler import version_profiler
 from app.schemas.model import (
     ModelCreate,
     ModelUpdate,
@@ -94,6 +97,7 @@ async def list_versions(
 async def create_version(
     model_id: str,
     data: ModelVersionCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db),
 ):
@@ -103,4 +107,9 @@ async def create_version(
     except ValueError:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid model_id")
     version = service.create_version(model_uuid, current_user.id, data)
+    # Background tasks run in order, so profiling and tuning don't skew each other's timings
+    if settings.PROFILING_ENABLED and settings.PROFILING_ON_REGISTER:
+        background_tasks.add_task(version_profiler.profile_and_store, version.id)
+    if settings.BATCH_TUNING_ENABLED and settings.BATCH_TUNING_ON_REGISTER:
+        background_tasks.add_task(batch_size_tuner.tune_and_store, version.id)
     return ModelVersionResponse.from_orm(version)
\ No newline at end of file
@@ -0,0 +1,302 @@
+"""
+Admission Control.
+Per-deployment adaptive concurrency limits and request deadlines for inference endpoints.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from typing import Any, Awaitable, Dict, Mapping, Optional
+
+from prometheus_client import Counter, Gauge
+
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+DEADLINE_HEADER = "x-request-deadline"
+TIMEOUT_HEADER = "x-request-timeout-ms"
+
+ADMISSION_LIMIT = Gauge(
+    "inference_admission_limit",
+    "Current adaptive concurrency limit per deployment",
+    ["deployment_id"]
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "inference_admission_in_flight",
+    "Inference requests currently admitted per deployment",
+    ["deployment_id"]
+)
+ADMISSION_REJECTED = Counter(
+    "inference_admission_rejected_total",
+    "Inference requests rejected before execution",
+    ["deployment_id", "reason"]
+)
+
+
+class AdmissionRejected(Exception):
+    """Base class for requests that are not worth executing."""
+
+    reason = "rejected"
+
+
+class Overloaded(AdmissionRejected):
+    """Raised when the deployment's concurrency limit is exhausted."""
+
+    reason = "overloaded"
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(AdmissionRejected):
+    """Raised when the client's deadline has passed."""
+
+    reason = "deadline"
+
+
+class ClientDisconnected(AdmissionRejected):
+    """Raised when the client went away while the request was in flight."""
+
+    reason = "disconnected"
+
+
+def parse_deadline(headers: Mapping[str, str], now: Optional[float] = None) -> Optional[float]:
+    """
+    Resolve the request deadline from headers.
+
+    `X-Request-Deadline` is an absolute unix timestamp in seconds,
+    `X-Request-Timeout-Ms` a budget relative to arrival. When both are
+    present the earlier one wins.
+
+    Returns:
+        Deadline as a unix timestamp, or None if the client sent neither
+    """
+    now = time.time() if now is None else now
+    candidates = []
+
+    absolute = headers.get(DEADLINE_HEADER)
+    if absolute:
+        try:
+            candidates.append(float(absolute))
+        except ValueError:
+            logger.warning(f"Ignoring malformed {DEADLINE_HEADER} header: {absolute}")
+
+    relative = headers.get(TIMEOUT_HEADER)
+    if relative:
+        try:
+            candidates.append(now + float(relative) / 1000.0)
+        except ValueError:
+            logger.warning(f"Ignoring malformed {TIMEOUT_HEADER} header: {relative}")
+
+    return min(candidates) if candidates else None
+
+
+def check_deadline(deadline: Optional[float], stage: str) -> None:
+    """Raise DeadlineExceeded if the deadline has already passed."""
+    if deadline is not None and time.time() >= deadline:
+        raise DeadlineExceeded(f"Request deadline exceeded before {stage}")
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Gradient-style concurrency limiter.
+
+    The limit grows while short-term latency tracks the long-term baseline
+    and shrinks proportionally when latency inflates (queueing). Dropped
+    requests (timeouts, deadline misses) apply a multiplicative backoff,
+    giving AIMD behaviour under hard overload.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 20,
+        min_limit: int = 1,
+        max_limit: int = 200,
+        tolerance: float = 2.0,
+        smoothing: float = 0.2,
+        backoff_ratio: float = 0.9,
+        long_window: int = 600,
+        short_window: int = 10
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.backoff_ratio = backoff_ratio
+        self.long_alpha = 2.0 / (long_window + 1)
+        self.short_alpha = 2.0 / (short_window + 1)
+        self.long_rtt: Optional[float] = None
+        self.short_rtt: Optional[float] = None
+        self.in_flight = 0
+
+    @property
+    def current_limit(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    def try_acquire(self) -> bool:
+        """Admit a request if the in-flight count is below the limit."""
+        if self.in_flight >= self.current_limit:
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self, latency_seconds: float, dropped: bool = False, sample: bool = True):
+        """
+        Release a slot and feed the observed latency back into the limit.
+
+        Args:
+            latency_seconds: Time the request spent executing
+            dropped: Whether the request timed out or was abandoned
+            sample: Whether the latency is representative (cache hits are not)
+        """
+        self.in_flight = max(0, self.in_flight - 1)
+
+        if dropped:
+            self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+            return
+
+        if not sample or latency_seconds <= 0:
+            return
+
+        if self.long_rtt is None:
+            self.long_rtt = latency_seconds
+            self.short_rtt = latency_seconds
+            return
+
+        self.short_rtt += self.short_alpha * (latency_seconds - self.short_rtt)
+        self.long_rtt += self.long_alpha * (latency_seconds - self.long_rtt)
+
+        # Let the baseline recover quickly once a latency spike is over
+        if self.long_rtt / self.short_rtt > 2.0:
+            self.long_rtt *= 0.95
+
+        gradient = max(0.5, min(1.0, self.tolerance * self.long_rtt / self.short_rtt))
+        queue_size = math.sqrt(self.limit)
+        new_limit = self.limit * gradient + queue_size
+        new_limit = self.limit * (1 - self.smoothing) + new_limit * self.smoothing
+
+        # Only grow when the limit is actually being exercised
+        if new_limit > self.limit and self.in_flight < self.limit / 2:
+            return
+
+        self.limit = max(self.min_limit, min(self.max_limit, new_limit))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.current_limit,
+            "in_flight": self.in_flight,
+            "long_rtt_ms": round(self.long_rtt * 1000, 2) if self.long_rtt else None,
+            "short_rtt_ms": round(self.short_rtt * 1000, 2) if self.short_rtt else None
+        }
+
+
+class AdmissionTicket:
+    """Handle for an admitted request; must be released exactly once."""
+
+    def __init__(self, limiter: AdaptiveConcurrencyLimiter, deployment_id: str):
+        self.limiter = limiter
+        self.deployment_id = deployment_id
+        self.started_at = time.monotonic()
+        self.released = False
+
+    def release(self, dropped: bool = False, sample: bool = True):
+        if self.released:
+            return
+        self.released = True
+        self.limiter.release(time.monotonic() - self.started_at, dropped=dropped, sample=sample)
+        ADMISSION_LIMIT.labels(self.deployment_id).set(self.limiter.current_limit)
+        ADMISSION_IN_FLIGHT.labels(self.deployment_id).set(self.limiter.in_flight)
+
+
+class AdmissionController:
+    """Holds one adaptive limiter per deployment and guards request execution."""
+
+    def __init__(self):
+        self.limiters: Dict[str, AdaptiveConcurrencyLimiter] = {}
+        self.disconnect_poll_interval = settings.ADMISSION_DISCONNECT_POLL_MS / 1000.0
+
+    def _get_limiter(self, deployment: Any) -> AdaptiveConcurrencyLimiter:
+        deployment_id = str(deployment.id)
+        limiter = self.limiters.get(deployment_id)
+        if limiter is None:
+            config = (deployment.deployment_config or {}).get("admission", {})
+            limiter = AdaptiveConcurrencyLimiter(
+                initial_limit=config.get("initial_limit", settings.ADMISSION_INITIAL_LIMIT),
+                min_limit=config.get("min_limit", settings.ADMISSION_MIN_LIMIT),
+                max_limit=config.get("max_limit", settings.ADMISSION_MAX_LIMIT),
+                tolerance=config.get("tolerance", settings.ADMISSION_RTT_TOLERANCE),
+                smoothing=config.get("smoothing", settings.ADMISSION_SMOOTHING)
+            )
+            self.limiters[deployment_id] = limiter
+        return limiter
+
+    def admit(self, deployment: Any) -> AdmissionTicket:
+        """
+        Admit a request to a deployment or shed it.
+
+        Raises:
+            Overloaded: If the deployment is at its concurrency limit
+        """
+        deployment_id = str(deployment.id)
+        limiter = self._get_limiter(deployment)
+
+        if not limiter.try_acquire():
+            ADMISSION_REJECTED.labels(deployment_id, Overloaded.reason).inc()
+            retry_after = max(1, math.ceil(limiter.short_rtt or 1))
+            raise Overloaded(
+                f"Deployment at concurrency limit ({limiter.current_limit})",
+                retry_after=retry_after
+            )
+
+        ADMISSION_IN_FLIGHT.labels(deployment_id).set(limiter.in_flight)
+        return AdmissionTicket(limiter, deployment_id)
+
+    def record_rejection(self, deployment: Any, error: AdmissionRejected):
+        ADMISSION_REJECTED.labels(str(deployment.id), error.reason).inc()
+
+    async def run_guarded(
+        self,
+        coro: Awaitable[Any],
+        request: Any,
+        deadline: Optional[float] = None
+    ) -> Any:
+        """
+        Run a coroutine, abandoning it if the deadline passes or the client disconnects.
+
+        Args:
+            coro: Work to execute
+            request: Starlette request used to detect client disconnects
+            deadline: Optional unix timestamp after which the result is useless
+
+        Raises:
+            DeadlineExceeded: If the deadline passed first
+            ClientDisconnected: If the client disconnected first
+        """
+        task = asyncio.ensure_future(coro)
+        try:
+            while True:
+                timeout = self.disconnect_poll_interval
+                if deadline is not None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise DeadlineExceeded("Request deadline exceeded during execution")
+                    timeout = min(timeout, remaining)
+
+                done, _ = await asyncio.wait({task}, timeout=timeout)
+                if done:
+                    return task.result()
+
+                if await request.is_disconnected():
+                    raise ClientDisconnected("Client disconnected during execution")
+        finally:
+            if not task.done():
+                task.cancel()
+
+    def get_stats(self, deployment_id: str) -> Optional[Dict[str, Any]]:
+        limiter = self.limiters.get(str(deployment_id))
+        return limiter.stats() if limiter else None
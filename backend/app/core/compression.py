@@ -0,0 +1,293 @@
+"""
+HTTP Compression.
+Content-Encoding negotiation (gzip, zstd, brotli) for request and response bodies.
+
+Requests with `Content-Encoding: gzip|zstd|br` are decoded before the route
+reads them; responses are encoded with the best encoding the client's
+`Accept-Encoding` allows. zstd and brotli are offered only when their
+packages are installed. Both directions work chunk by chunk, so streamed
+NDJSON bodies stay streamed: each response chunk is flushed as soon as it is
+encoded.
+
+Responses smaller than COMPRESSION_MIN_BYTES, responses that aren't text or
+JSON, and responses that already carry a Content-Encoding are sent as they
+are. Chunks of COMPRESSION_OFFLOAD_BYTES or more are (de)compressed on a
+worker thread so a large batch body doesn't stall the event loop.
+"""
+
+import asyncio
+import logging
+import time
+import zlib
+from typing import Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+from prometheus_client import Counter
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+try:
+    import zstandard
+except ImportError:  # zstd is offered only when installed
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # brotli is offered only when installed
+    brotli = None
+
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_BYTES = Counter(
+    "http_compression_bytes_total",
+    "HTTP body bytes passed through (de)compression, before and after encoding",
+    ["direction", "encoding", "form"]
+)
+COMPRESSION_CPU_SECONDS = Counter(
+    "http_compression_cpu_seconds_total",
+    "CPU time spent (de)compressing HTTP bodies",
+    ["direction", "encoding"]
+)
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/problem+json")
+
+# Decoded request bodies are fed to the decompressor in slices this size, bounding how far one slice can expand
+_DECODE_SLICE = 64 * 1024
+
+
+class _GzipEncoder:
+    def __init__(self):
+        self.stream = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        return self.stream.compress(data) + self.stream.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _GzipDecoder:
+    def __init__(self):
+        self.stream = zlib.decompressobj(31)
+
+    def decode(self, data: bytes) -> bytes:
+        return self.stream.decompress(data)
+
+    @property
+    def finished(self) -> bool:
+        return self.stream.eof
+
+
+class _ZstdEncoder:
+    def __init__(self):
+        self.stream = zstandard.ZstdCompressor(level=settings.COMPRESSION_ZSTD_LEVEL).compressobj()
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        flush = zstandard.COMPRESSOBJ_FLUSH_FINISH if final else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        return self.stream.compress(data) + self.stream.flush(flush)
+
+
+class _ZstdDecoder:
+    def __init__(self):
+        self.stream = zstandard.ZstdDecompressor().decompressobj()
+
+    def decode(self, data: bytes) -> bytes:
+        return self.stream.decompress(data)
+
+    @property
+    def finished(self) -> bool:
+        return self.stream.eof
+
+
+class _BrotliEncoder:
+    def __init__(self):
+        self.stream = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_LEVEL)
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        return self.stream.process(data) + (self.stream.finish() if final else self.stream.flush())
+
+
+class _BrotliDecoder:
+    def __init__(self):
+        self.stream = brotli.Decompressor()
+
+    def decode(self, data: bytes) -> bytes:
+        return self.stream.process(data)
+
+    @property
+    def finished(self) -> bool:
+        return self.stream.is_finished()
+
+
+# Encodings this worker can handle, in the order preferred when the client rates several equally
+CODECS: Dict[str, tuple] = {}
+if zstandard is not None:
+    CODECS["zstd"] = (_ZstdEncoder, _ZstdDecoder)
+if brotli is not None:
+    CODECS["br"] = (_BrotliEncoder, _BrotliDecoder)
+CODECS["gzip"] = (_GzipEncoder, _GzipDecoder)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """The response encoding for an Accept-Encoding header, or None to send the body as is."""
+    ratings: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        param, _, value = params.strip().partition("=")
+        if param.strip().lower() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        ratings[name] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in CODECS:
+        quality = ratings.get(encoding, ratings.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+async def _measured(direction: str, encoding: str, work: Callable[[bytes], bytes], data: bytes) -> bytes:
+    """Run `work` on a chunk, on a worker thread when the chunk is large, recording bytes and CPU time."""
+    def run() -> bytes:
+        start = time.thread_time()
+        result = work(data)
+        COMPRESSION_CPU_SECONDS.labels(direction, encoding).inc(time.thread_time() - start)
+        return result
+
+    result = await asyncio.get_running_loop().run_in_executor(None, run) if len(data) >= settings.COMPRESSION_OFFLOAD_BYTES else run()
+    identity, encoded = (result, data) if direction == "request" else (data, result)
+    COMPRESSION_BYTES.labels(direction, encoding, "identity").inc(len(identity))
+    COMPRESSION_BYTES.labels(direction, encoding, "encoded").inc(len(encoded))
+    return result
+
+
+class _DecodingReceive:
+    """ASGI receive that hands the app a request body with its Content-Encoding removed."""
+
+    def __init__(self, receive: Receive, encoding: str):
+        self.receive = receive
+        self.encoding = encoding
+        self.decoder = CODECS[encoding][1]()
+        self.size = 0
+
+    def decode(self, data: bytes) -> bytes:
+        parts: List[bytes] = []
+        for start in range(0, len(data), _DECODE_SLICE):
+            parts.append(self.decoder.decode(data[start:start + _DECODE_SLICE]))
+            self.size += len(parts[-1])
+            if self.size > settings.COMPRESSION_MAX_DECODED_BYTES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Decoded request body exceeds {settings.COMPRESSION_MAX_DECODED_BYTES} bytes"
+                )
+        return b"".join(parts)
+
+    async def __call__(self) -> Message:
+        message = await self.receive()
+        if message["type"] != "http.request":
+            return message
+        try:
+            body = await _measured("request", self.encoding, self.decode, message.get("body", b""))
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Invalid {self.encoding} request body: {str(e)}")
+        if not message.get("more_body", False) and not self.decoder.finished:
+            raise HTTPException(status_code=400, detail=f"Truncated {self.encoding} request body")
+        return {**message, "body": body}
+
+
+class _EncodingSend:
+    """ASGI send that encodes the response body, deciding from its headers and first chunk."""
+
+    def __init__(self, send: Send, encoding: str):
+        self.send = send
+        self.encoding = encoding
+        self.start: Optional[Message] = None
+        self.encoder = None
+        self.passthrough = False
+
+    def should_encode(self, headers: MutableHeaders, body: bytes, more_body: bool) -> bool:
+        if self.start["status"] < 200 or self.start["status"] in (204, 304) or "content-encoding" in headers:
+            return False
+        if not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+            return False
+        return more_body or len(body) >= settings.COMPRESSION_MIN_BYTES
+
+    async def __call__(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.encoder is None:
+            headers = MutableHeaders(raw=self.start["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if not self.should_encode(headers, body, more_body):
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send(message)
+                return
+            self.encoder = CODECS[self.encoding][0]()
+            headers["Content-Encoding"] = self.encoding
+            del headers["Content-Length"]
+            if not more_body:
+                body = await _measured("response", self.encoding, lambda data: self.encoder.encode(data, True), body)
+                headers["Content-Length"] = str(len(body))
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            await self.send(self.start)
+
+        body = await _measured("response", self.encoding, lambda data: self.encoder.encode(data, not more_body), body)
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+
+class CompressionMiddleware:
+    """Decode compressed request bodies and compress responses for clients that accept it."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not settings.COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        content_encoding = headers.get("content-encoding", "identity").strip().lower()
+        if content_encoding not in ("", "identity"):
+            if content_encoding not in CODECS:
+                response = JSONResponse(
+                    {"detail": f"Unsupported Content-Encoding: {content_encoding}"},
+                    status_code=415,
+                    headers={"Accept-Encoding": ", ".join(CODECS)}
+                )
+                await response(scope, receive, send)
+                return
+            # Routes see the decoded body, so its encoded length and encoding no longer apply
+            scope = {
+                **scope,
+                "headers": [
+                    (name, value) for name, value in scope["headers"]
+                    if name not in (b"content-encoding", b"content-length")
+                ]
+            }
+            receive = _DecodingReceive(receive, content_encoding)
+
+        encoding = negotiate_encoding(headers.get("accept-encoding", ""))
+        if encoding is not None:
+            send = _EncodingSend(send, encoding)
+        await self.app(scope, receive, send)
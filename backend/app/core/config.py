@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 import os
 
 class Settings(BaseSettings):
@@ -40,7 +40,116 @@ class Settings(BaseSettings):
     SMTP_PORT: int = 587
     SMTP_USER: str = ""
     SMTP_PASSWORD: str = ""
-    
+
+    # Inference execution
+    INFERENCE_WORKER_THREADS: int = 4
+    # Model calls are queued fairly across organizations; "strict" always runs higher API-key tiers first,
+    # "weighted" shares the workers between tiers by weight. Keys without a tier use "default".
+    INFERENCE_TIER_POLICY: str = "weighted"
+    INFERENCE_TIER_WEIGHTS: Dict[str, float] = {"enterprise": 8.0, "pro": 4.0, "basic": 2.0, "free": 1.0, "default": 1.0}
+    INFERENCE_QUEUE_WAIT_WINDOW: int = 2048  # recent queue waits per tier kept for percentiles
+    API_KEY_TIER_CACHE_SECONDS: float = 30.0
+    TORCH_THREADS: int = 0  # 0 keeps torch's default; override via deployment_config["pytorch"]["threads"]
+    BOOSTER_THREADS: int = 0  # 0 keeps the xgboost/lightgbm default; override via deployment_config["booster"]
+    DEFAULT_BATCH_SIZE: int = 100
+    BATCH_INFERENCE_PARALLELISM: int = 4  # chunks in flight per predict_batch; deployment_config["batch"]["parallelism"]
+    STREAM_MAX_LINE_BYTES: int = 1024 * 1024
+    # HTTP compression: gzip always, zstd/brotli when installed (Content-Encoding and Accept-Encoding)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_BYTES: int = 1024  # smaller responses are sent uncompressed
+    COMPRESSION_OFFLOAD_BYTES: int = 256 * 1024  # chunks this large are (de)compressed on a worker thread
+    COMPRESSION_MAX_DECODED_BYTES: int = 256 * 1024 * 1024  # larger decoded request bodies are rejected with 413
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_ZSTD_LEVEL: int = 3
+    COMPRESSION_BROTLI_LEVEL: int = 4
+    INFERENCE_CACHE_TTL: int = 300
+    INFERENCE_L1_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    INFERENCE_L1_CACHE_TTL: int = 60
+    # Single-flight coalescing (overridable per deployment via deployment_config["coalescing"])
+    INFERENCE_COALESCING_ENABLED: bool = True
+    INFERENCE_COALESCING_DISTRIBUTED: bool = False
+    INFERENCE_COALESCING_LOCK_MS: int = 2000
+    # WebSocket inference sessions; frames are micro-batched (deployment_config["batching"])
+    MICRO_BATCH_MAX_WAIT_MS: float = 2.0
+    WEBSOCKET_MAX_IN_FLIGHT: int = 16  # frames scored concurrently per session before reading pauses
+
+    # ONNX Runtime sessions (model_schema["serving"]["onnx"]["session"], overridable per deployment)
+    ONNX_OPTIMIZED_MODEL_DIR: str = "/tmp/mlops-onnx-optimized"  # optimized graphs are cached under <dir>/<model version>/
+    ONNX_ALLOWED_PROVIDERS: List[str] = ["CPUExecutionProvider", "CUDAExecutionProvider", "TensorrtExecutionProvider"]
+
+    # Batch-size auto-tuning in a separate process (result stored on the model version)
+    BATCH_TUNING_ENABLED: bool = True
+    BATCH_TUNING_ON_REGISTER: bool = True
+    BATCH_TUNING_CANDIDATES: List[int] = [1, 8, 32, 64, 128, 256, 512, 1024]
+    BATCH_TUNING_LATENCY_CEILING_MS: float = 250.0
+    BATCH_TUNING_REPEATS: int = 5
+    BATCH_TUNING_TIMEOUT_SECONDS: float = 600.0
+
+    # Performance profiling of registered versions in a separate process (stored in serving_profile["performance"])
+    PROFILING_ENABLED: bool = True
+    PROFILING_ON_REGISTER: bool = True
+    PROFILING_BATCH_SIZES: List[int] = [1, 32, 256]
+    PROFILING_REPEATS: int = 5
+    PROFILING_TIMEOUT_SECONDS: float = 600.0
+    # Moving a deployment in these environments to a version whose profile regresses by more than this is refused
+    PROFILING_MAX_REGRESSION: float = 0.2
+    PROFILING_GATE_ENVIRONMENTS: List[str] = ["staging", "production"]
+
+    # Cascade deployments: confidence below which a stage escalates a row (per stage in deployment_config["cascade"])
+    CASCADE_DEFAULT_THRESHOLD: float = 0.8
+
+    # Canary splits and shadow evaluation (per deployment in deployment_config["traffic"])
+    SHADOW_SAMPLE_RATE: float = 0.1
+    SHADOW_WORKER_THREADS: int = 1
+    SHADOW_NICENESS: int = 10  # nice value of the shadow threads, so primaries win the CPU
+    SHADOW_MAX_IN_FLIGHT: int = 4  # shadow evaluations per worker; further samples are shed
+    SHADOW_MAX_ROWS: int = 1000
+    SHADOW_AGREEMENT_TOLERANCE: float = 1e-6
+    SHADOW_MIN_AGREEMENT: float = 0.95
+    SHADOW_MONITORING_WINDOW: int = 100  # shadowed requests aggregated into each ModelMonitoring sample
+
+    # Precomputed serving (per deployment in deployment_config["precomputed"])
+    PRECOMPUTED_DIR: str = "/tmp/mlops-precomputed"  # shared by every worker on a host
+    PRECOMPUTED_REFRESH_INTERVAL_S: int = 86400
+    PRECOMPUTED_REFRESH_LOCK_S: int = 3600
+    PRECOMPUTED_RELOAD_CHECK_S: float = 5.0
+
+    # Online feature store (deployment_config["features"] joins a feature set by entity key)
+    FEATURE_STORE_LOCAL_TTL_S: float = 60.0  # how stale a worker's in-process copy of a row may get
+    FEATURE_STORE_LOCAL_MAX_ROWS: int = 1000000
+    FEATURE_STORE_REDIS_TTL_S: int = 0  # 0 keeps rows until overwritten
+    FEATURE_STORE_WRITE_BATCH: int = 1000
+
+    # gRPC inference endpoint (Arrow IPC payloads), served by every API worker on a shared port
+    GRPC_ENABLED: bool = False
+    GRPC_PORT: int = 50051
+    GRPC_MAX_MESSAGE_BYTES: int = 64 * 1024 * 1024
+    GRPC_SHUTDOWN_GRACE_S: float = 5.0
+
+    # Unix socket inference server for co-located clients (python -m app.api.v1.inference_uds)
+    UDS_PATH: str = "/tmp/mlops-inference.sock"
+    UDS_SOCKET_MODE: str = "660"  # octal; the socket file's permissions are its access control
+    UDS_SOCKET_GROUP: str = ""  # group allowed to connect, e.g. the consumers' group; empty keeps the process group
+    UDS_WORKERS: int = 1
+    UDS_MAX_IN_FLIGHT: int = 16  # requests scored concurrently per connection before reading pauses
+    UDS_MAX_FRAME_BYTES: int = 64 * 1024 * 1024
+
+    # Inference admission control (overridable per deployment via deployment_config["admission"])
+    ADMISSION_INITIAL_LIMIT: int = 20
+    ADMISSION_MIN_LIMIT: int = 1
+    ADMISSION_MAX_LIMIT: int = 200
+    ADMISSION_RTT_TOLERANCE: float = 2.0
+    ADMISSION_SMOOTHING: float = 0.2
+    ADMISSION_DISCONNECT_POLL_MS: int = 50
+
+    # Offline bulk scoring jobs; an organization's datasets and outputs live under
+    # BATCH_JOB_DATA_ROOT/<organization_id>/ or s3://BATCH_JOB_S3_BUCKET/<organization_id>/
+    BATCH_JOB_DATA_ROOT: str = "/tmp/mlops-batch-jobs"
+    BATCH_JOB_S3_BUCKET: str = "mlops-batch-jobs"
+    BATCH_JOB_CHUNK_SIZE: int = 10000
+    BATCH_JOB_MAX_WORKERS: int = 4
+    BATCH_JOB_TTL_DAYS: int = 7
+
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -5,6 +5,7 @@ Implements rate limiting for API endpoints with Redis backend.
 
 import json
 import time
+import uuid
 import logging
 from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime, timedelta
@@ -17,6 +18,13 @@ from app.core.config import settings
 logger = logging.getLogger(__name__)
 
 
+def _member_count(member) -> int:
+    """Units a counter member stands for; members written before counts were encoded count once."""
+    member = member.decode() if isinstance(member, bytes) else member
+    parts = member.split(":")
+    return int(parts[2]) if len(parts) == 3 else 1
+
+
 class RateLimiter:
     """Rate limiter with Redis backend supporting multiple rate limiting strategies."""
     
@@ -38,6 +46,9 @@ class RateLimiter:
             'hour': 3600,
             'day': 86400
         }
+        
+        # API key tiers recently read from Redis: client_id -> (tier, expires_at)
+        self._tiers: Dict[str, Tuple[Optional[str], float]] = {}
     
     async def check_rate_limit(
         self, 
@@ -149,6 +160,39 @@ class RateLimiter:
             logger.error(f"Batch rate limiting check failed: {str(e)}")
             return True
     
+    async def charge_batch_instances(
+        self,
+        client_id: str,
+        instance_count: int,
+        deployment_id: Optional[str] = None
+    ) -> bool:
+        """
+        Count rows of a streamed batch against the batch instance quota as they are scored.
+        
+        Args:
+            client_id: Client identifier
+            instance_count: Rows about to be scored
+            deployment_id: Optional deployment-specific limits
+            
+        Returns:
+            True if the rows fit in the remaining quota (and were counted), False once it is used up
+        """
+        try:
+            limits = await self._get_batch_rate_limits(client_id, deployment_id)
+            instance_key = f"rate_limit:batch_instances:{client_id}:minute"
+            current_instances = await self._get_counter_value(instance_key, 60)
+            
+            if current_instances + instance_count > limits['batch_instances_per_minute']:
+                logger.warning(f"Batch instance rate limit exceeded for {client_id} mid-stream")
+                return False
+            
+            await self._increment_counter(instance_key, 60, instance_count)
+            return True
+            
+        except Exception as e:
+            logger.error(f"Batch instance charge failed: {str(e)}")
+            return True
+    
     async def _get_rate_limits(
         self, 
         client_id: str, 
@@ -226,19 +270,39 @@ class RateLimiter:
             logger.error(f"Failed to get custom limits: {str(e)}")
             return None
     
+    async def get_tier(self, client_id: str) -> Optional[str]:
+        """
+        API key tier of a client (free, basic, pro or enterprise), or None if it has none.
+        
+        Tiers are read from Redis and remembered for API_KEY_TIER_CACHE_SECONDS,
+        since every admitted request needs its tier for scheduling.
+        """
+        if client_id == "anonymous":
+            return None
+        now = time.monotonic()
+        cached = self._tiers.get(client_id)
+        if cached and cached[1] > now:
+            return cached[0]
+        try:
+            tier = await self.redis_client.get(f"api_key_tier:{client_id}")
+        except Exception as e:
+            logger.error(f"Failed to get API key tier: {str(e)}")
+            return cached[0] if cached else None
+        tier = tier.decode('utf-8') if tier else None
+        if len(self._tiers) >= 10000:
+            self._tiers = {key: value for key, value in self._tiers.items() if value[1] > now}
+        self._tiers[client_id] = (tier, now + settings.API_KEY_TIER_CACHE_SECONDS)
+        return tier
+    
     async def _get_tier_limits(self, client_id: str) -> Optional[Dict[str, int]]:
         """Get tier-based limits for API key."""
         try:
-            # Get API key tier from cache
-            tier_key = f"api_key_tier:{client_id}"
-            tier = await self.redis_client.get(tier_key)
+            tier = await self.get_tier(client_id)
             
             if not tier:
                 # Fallback to database lookup (simplified)
                 return None
             
-            tier = tier.decode('utf-8')
-            
             # Define tier-based limits
             tier_limits = {
                 'free': {
@@ -315,8 +379,9 @@ class RateLimiter:
         try:
             current_time = time.time()
             
-            # Add current request to sorted set
-            await self.redis_client.zadd(key, {str(current_time): current_time})
+            # One sorted-set member per call, "<time>:<nonce>:<count>", so a batch costs one member however many rows it counts
+            member = f"{current_time}:{uuid.uuid4().hex[:8]}:{increment}"
+            await self.redis_client.zadd(key, {member: current_time})
             
             # Set expiration to window + buffer
             await self.redis_client.expire(key, window_seconds + 60)
@@ -333,8 +398,9 @@ class RateLimiter:
             # Remove expired entries
             await self.redis_client.zremrangebyscore(key, 0, window_start)
             
-            # Count current entries
-            return await self.redis_client.zcard(key)
+            # Sum the counts carried by current entries
+            members = await self.redis_client.zrange(key, 0, -1)
+            return sum(_member_count(member) for member in members)
             
         except Exception as e:
             logger.error(f"Failed to get counter value: {str(e)}")
@@ -0,0 +1,116 @@
+"""
+Request Body Decoding.
+Raw-body JSON decoding for hot inference routes, bypassing FastAPI's Pydantic body parsing.
+"""
+
+import hashlib
+from typing import Any, Dict, List, Type, TypeVar
+
+import orjson
+from annotated_types import MaxLen, MinLen
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError, create_model
+
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+_envelopes: Dict[type, Type[BaseModel]] = {}
+
+
+def body_digest(raw: bytes) -> str:
+    """BLAKE2b digest of the exact request bytes."""
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def openapi_body(schema: Type[BaseModel]) -> Dict[str, Any]:
+    """`openapi_extra` documenting a body the route reads itself."""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": schema.model_json_schema()}}
+        }
+    }
+
+
+def _envelope(schema: Type[BaseModel]) -> Type[BaseModel]:
+    """The request schema without its `instances` field, built once per schema."""
+    envelope = _envelopes.get(schema)
+    if envelope is None:
+        fields = {
+            name: (field.annotation, field)
+            for name, field in schema.model_fields.items()
+            if name != "instances"
+        }
+        envelope = create_model(f"{schema.__name__}Envelope", **fields)
+        _envelopes[schema] = envelope
+    return envelope
+
+
+def _instances_error(message: str, loc: tuple = (), error_type: str = "value_error") -> RequestValidationError:
+    return RequestValidationError([{
+        "type": error_type,
+        "loc": ("body", "instances", *loc),
+        "msg": message,
+        "input": None
+    }])
+
+
+def check_instance_count(count: int, schema: Type[BaseModel]) -> None:
+    """Length bounds declared on the schema's `instances` field, for bodies decoded some other way (e.g. Arrow)."""
+    for constraint in schema.model_fields["instances"].metadata:
+        if isinstance(constraint, MinLen) and count < constraint.min_length:
+            raise _instances_error(f"List should have at least {constraint.min_length} item(s)")
+        if isinstance(constraint, MaxLen) and count > constraint.max_length:
+            raise _instances_error(f"List should have at most {constraint.max_length} item(s)")
+
+
+def _check_instances(value: Any, schema: Type[BaseModel]) -> List[Dict[str, Any]]:
+    """Shape and length checks for `instances`, using the bounds declared on the schema field."""
+    if not isinstance(value, list):
+        raise _instances_error("Input should be a valid list")
+    check_instance_count(len(value), schema)
+    for i, instance in enumerate(value):
+        if not isinstance(instance, dict):
+            raise _instances_error("Input should be a valid dictionary", (i,))
+    return value
+
+
+def decode_request(raw: bytes, schema: Type[ModelT]) -> ModelT:
+    """
+    Decode an inference request body with orjson.
+
+    Only the small envelope (flags, batch size) goes through Pydantic; the
+    instances are checked for shape and length and passed through as decoded,
+    leaving per-feature validation to the model's compiled input schema.
+
+    Raises:
+        RequestValidationError: Same 422 response FastAPI gives for invalid bodies
+    """
+    try:
+        data = orjson.loads(raw)
+    except orjson.JSONDecodeError as e:
+        raise RequestValidationError([{
+            "type": "json_invalid",
+            "loc": ("body", e.pos),
+            "msg": "JSON decode error",
+            "input": {},
+            "ctx": {"error": e.msg}
+        }])
+    if not isinstance(data, dict):
+        raise RequestValidationError([{
+            "type": "model_attributes_type",
+            "loc": ("body",),
+            "msg": "Input should be a valid dictionary or object to extract fields from",
+            "input": None
+        }])
+    if "instances" not in data:
+        raise _instances_error("Field required", error_type="missing")
+
+    instances = _check_instances(data.pop("instances"), schema)
+    try:
+        envelope = _envelope(schema).model_validate(data)
+    except ValidationError as e:
+        raise RequestValidationError([
+            {**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)
+        ])
+    return schema.model_construct(instances=instances, **envelope.model_dump())
@@ -0,0 +1,248 @@
+"""
+Inference Scheduler.
+Fair queuing of model execution across organizations, with priority by API-key tier.
+
+Every model call goes through `InferenceService.executor`. This executor keeps a
+queue per (tier, organization) flow instead of one FIFO, and gives a free
+worker thread to the flow with the smallest virtual start time (start-time
+fair queuing). Each dispatch moves the flow's start time forward by its
+expected cost, which is the flow's smoothed seconds per call divided by its
+tier weight. Once the call finishes, the charge is corrected to the real cost.
+So an organization sending 10k-row chunks is charged for them, and a
+single-row call from another organization overtakes its backlog. A flow that
+was idle restarts at the current virtual time, so it can't bank credit.
+
+INFERENCE_TIER_POLICY picks how tiers interact:
+
+    weighted  every flow shares the workers in proportion to its tier weight
+    strict    a queued call of a higher tier always runs before a lower one;
+              flows within a tier share fairly
+
+Routes set the request's `execution_class` (organization and tier) before
+scoring. The context follows every model call the request makes, including
+batch chunks. Calls made outside a request fall back to the "default" tier.
+A micro-batch is queued under the request that opened it.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+from prometheus_client import Histogram
+
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIER = "default"
+
+QUEUE_WAIT = Histogram(
+    "inference_queue_wait_seconds",
+    "Time model calls wait for an inference worker, per API-key tier",
+    ["tier"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+# Smoothing of per-flow call cost estimates
+_COST_SMOOTHING = 0.2
+
+
+@dataclass(frozen=True)
+class ExecutionClass:
+    """Who a model call is run for: the deployment's organization and the caller's API-key tier."""
+
+    tenant: str
+    tier: str = DEFAULT_TIER
+
+
+execution_class: ContextVar[Optional[ExecutionClass]] = ContextVar("inference_execution_class", default=None)
+
+
+@dataclass
+class _WorkItem:
+    future: Future
+    fn: Callable
+    args: tuple
+    kwargs: dict
+    enqueued_at: float
+
+
+@dataclass
+class _Flow:
+    """Queued calls of one organization at one tier, and its place in virtual time."""
+
+    key: Tuple[str, str]
+    weight: float
+    queue: Deque[_WorkItem] = field(default_factory=deque)
+    start: float = 0.0
+    cost: Optional[float] = None
+    running: int = 0
+
+    @property
+    def tier(self) -> str:
+        return self.key[0]
+
+
+class FairScheduler(Executor):
+    """
+    Executor that runs submitted calls on a fixed set of worker threads in fair-queuing order.
+
+    It can be used anywhere a ThreadPoolExecutor is passed to
+    `loop.run_in_executor`. Submitting reads the caller's `execution_class`.
+    Worker threads start on first use, so a process that forks after
+    importing the services still gets live workers in each child.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        thread_name_prefix: str = "inference",
+        policy: Optional[str] = None,
+        weights: Optional[Dict[str, float]] = None
+    ):
+        self.max_workers = max(1, max_workers)
+        self.thread_name_prefix = thread_name_prefix
+        self.policy = policy or settings.INFERENCE_TIER_POLICY
+        if self.policy not in ("weighted", "strict"):
+            raise ValueError(f"Unknown inference tier policy: {self.policy}")
+        self.weights = dict(weights or settings.INFERENCE_TIER_WEIGHTS)
+        self.weights.setdefault(DEFAULT_TIER, 1.0)
+
+        self._cond = threading.Condition()
+        self._flows: Dict[Tuple[str, str], _Flow] = {}
+        self._virtual_time = 0.0
+        self._mean_cost = 0.001
+        self._queued = 0
+        self._idle = 0
+        self._threads: List[threading.Thread] = []
+        self._shutdown = False
+        self._waits: Dict[str, Deque[float]] = {}
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        current = execution_class.get()
+        tier, tenant = (current.tier, current.tenant) if current else (DEFAULT_TIER, "")
+        if tier not in self.weights:
+            tier = DEFAULT_TIER
+        future: Future = Future()
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            flow = self._flows.get((tier, tenant))
+            if flow is None:
+                flow = self._flows[(tier, tenant)] = _Flow((tier, tenant), self.weights[tier], start=self._virtual_time)
+            elif not flow.queue and not flow.running:
+                # Idle time earns no credit
+                flow.start = max(flow.start, self._virtual_time)
+            flow.queue.append(_WorkItem(future, fn, args, kwargs, time.perf_counter()))
+            self._queued += 1
+            if self._queued > self._idle and len(self._threads) < self.max_workers:
+                thread = threading.Thread(
+                    target=self._work,
+                    name=f"{self.thread_name_prefix}_{len(self._threads)}",
+                    daemon=True
+                )
+                self._threads.append(thread)
+                thread.start()
+            self._cond.notify()
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        with self._cond:
+            self._shutdown = True
+            if cancel_futures:
+                for flow in self._flows.values():
+                    while flow.queue:
+                        flow.queue.popleft().future.cancel()
+                self._queued = 0
+            self._cond.notify_all()
+        if wait:
+            for thread in list(self._threads):
+                thread.join()
+
+    def _next(self) -> Tuple[_Flow, _WorkItem, float]:
+        """Take the next call to run and charge its flow the expected cost. Called with the lock held."""
+        active = [flow for flow in self._flows.values() if flow.queue]
+        if self.policy == "strict":
+            flow = min(active, key=lambda flow: (-flow.weight, flow.start))
+        else:
+            flow = min(active, key=lambda flow: flow.start)
+        item = flow.queue.popleft()
+        self._queued -= 1
+        self._virtual_time = max(self._virtual_time, flow.start)
+        charge = flow.cost if flow.cost is not None else self._mean_cost
+        flow.start += charge / flow.weight
+        flow.running += 1
+
+        wait = time.perf_counter() - item.enqueued_at
+        self._waits.setdefault(flow.tier, deque(maxlen=settings.INFERENCE_QUEUE_WAIT_WINDOW)).append(wait)
+        QUEUE_WAIT.labels(flow.tier).observe(wait)
+        return flow, item, charge
+
+    def _settle(self, flow: _Flow, charge: float, elapsed: Optional[float]):
+        """Replace a dispatch's expected cost with what it took. Called with the lock held."""
+        flow.running -= 1
+        if elapsed is not None:
+            flow.cost = elapsed if flow.cost is None else flow.cost + _COST_SMOOTHING * (elapsed - flow.cost)
+            self._mean_cost += _COST_SMOOTHING * (elapsed - self._mean_cost)
+        flow.start += ((elapsed or 0.0) - charge) / flow.weight
+        if not flow.queue and not flow.running and flow.start <= self._virtual_time:
+            # It would restart at the current virtual time anyway
+            del self._flows[flow.key]
+
+    def _work(self):
+        while True:
+            with self._cond:
+                self._idle += 1
+                while not self._queued and not self._shutdown:
+                    self._cond.wait()
+                self._idle -= 1
+                if not self._queued:
+                    return
+                flow, item, charge = self._next()
+
+            if not item.future.set_running_or_notify_cancel():
+                # Cancelled while queued (deadline, disconnect): refund the charge
+                with self._cond:
+                    self._settle(flow, charge, None)
+                continue
+
+            started = time.perf_counter()
+            try:
+                result = item.fn(*item.args, **item.kwargs)
+            except BaseException as e:
+                item.future.set_exception(e)
+            else:
+                item.future.set_result(result)
+            with self._cond:
+                self._settle(flow, charge, time.perf_counter() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and recent queue-wait percentiles per tier."""
+        with self._cond:
+            waits = {tier: list(samples) for tier, samples in self._waits.items()}
+            queued: Dict[str, int] = {}
+            for flow in self._flows.values():
+                queued[flow.tier] = queued.get(flow.tier, 0) + len(flow.queue)
+            tenants = len({tenant for (_, tenant), flow in self._flows.items() if flow.queue or flow.running})
+
+        tiers = {}
+        for tier in sorted(set(waits) | set(queued), key=lambda tier: (-self.weights.get(tier, 0.0), tier)):
+            samples = waits.get(tier, [])
+            entry: Dict[str, Any] = {"weight": self.weights.get(tier), "queued": queued.get(tier, 0), "samples": len(samples)}
+            if samples:
+                p50, p95, p99 = (float(value) for value in np.percentile(samples, [50, 95, 99]) * 1000.0)
+                entry.update(wait_p50_ms=round(p50, 3), wait_p95_ms=round(p95, 3), wait_p99_ms=round(p99, 3))
+            tiers[tier] = entry
+        return {
+            "policy": self.policy,
+            "workers": self.max_workers,
+            "active_tenants": tenants,
+            "tiers": tiers
+        }
@@ -1,7 +1,8 @@
 from fastapi import FastAPI, Request, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.v1 import auth, organizations, projects, models, experiments, deployments, api_keys, inference
+from app.api.v1 import auth, organizations, projects, models, experiments, deployments, api_keys, inference, batch_jobs, features
 from app.core.config import settings
+from app.core.compression import CompressionMiddleware
 from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
 from starlette.responses import Response
 from sqlalchemy import text
@@ -26,6 +27,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Content-Encoding negotiation for request and response bodies
+app.add_middleware(CompressionMiddleware)
+
 # Include API routers
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["authentication"])
 app.include_router(organizations.router, prefix="/api/v1/organizations", tags=["organizations"])
@@ -35,6 +39,8 @@ app.include_router(experiments.router, prefix="/api/v1/experiments", tags=["expe
 app.include_router(deployments.router, prefix="/api/v1/deployments", tags=["deployments"])
 app.include_router(api_keys.router, prefix="/api/v1", tags=["api-keys"])
 app.include_router(inference.router, prefix="/api/v1", tags=["inference"])
+app.include_router(batch_jobs.router, prefix="/api/v1/batch-jobs", tags=["batch-jobs"])
+app.include_router(features.router, prefix="/api/v1/feature-sets", tags=["features"])
 
 # Configure logging level from settings
 for logger_name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
@@ -116,6 +122,18 @@ if not root_logger.handlers:
     root_logger.addHandler(handler)
 root_logger.setLevel(getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO))
 
+@app.on_event("startup")
+async def start_grpc_server():
+    if settings.GRPC_ENABLED:
+        from app.api.v1 import inference_grpc
+        app.state.grpc_server = await inference_grpc.start_server()
+
+@app.on_event("shutdown")
+async def stop_grpc_server():
+    server = getattr(app.state, "grpc_server", None)
+    if server is not None:
+        await server.stop(settings.GRPC_SHUTDOWN_GRACE_S)
+
 @app.get("/")
 async def root():
     return {"message": "MLOps Platform API", "version": "1.0.0"}
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text, BigInteger, UniqueConstraint
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, BigInteger, Integer, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -18,6 +18,8 @@ class ModelVersion(Base):
     performance_metrics = Column(JSONB, default=dict, nullable=False)  # accuracy, precision, recall, etc.
     training_metrics = Column(JSONB, default=dict, nullable=False)  # loss, epochs, etc.
     model_schema = Column(JSONB, default=dict, nullable=False)  # input/output schema
+    optimal_batch_size = Column(Integer, nullable=True)  # set by the batch-size auto-tuner
+    serving_profile = Column(JSONB, default=dict, nullable=False)  # tuning/profiling results
     description = Column(Text, nullable=True)
     created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     
@@ -0,0 +1,77 @@
+"""
+Batch Scoring Job Schemas.
+Pydantic models for offline bulk scoring jobs over CSV/Parquet datasets.
+"""
+
+from typing import Optional, List, Dict, Any, Literal
+from datetime import datetime
+from pydantic import BaseModel, Field
+import uuid
+
+
+class BatchJobCreate(BaseModel):
+    """Request schema for submitting a bulk scoring job."""
+
+    deployment_id: uuid.UUID
+    input_path: str = Field(
+        ...,
+        min_length=1,
+        description=(
+            "Dataset path, relative to the organization's batch data directory, "
+            "or s3://<batch bucket>/<organization_id>/key"
+        )
+    )
+    input_format: Optional[Literal["csv", "parquet"]] = Field(
+        None,
+        description="Dataset format (inferred from the path extension if omitted)"
+    )
+    output_path: Optional[str] = Field(
+        None,
+        description="Parquet output path, in the same places as input_path (defaults to outputs/<job_id>.parquet)"
+    )
+    feature_columns: Optional[List[str]] = Field(
+        None,
+        description="Columns fed to the model (defaults to all non-passthrough columns)"
+    )
+    passthrough_columns: List[str] = Field(
+        default_factory=list,
+        description="Columns copied unchanged into the output, e.g. entity IDs"
+    )
+    chunk_size: Optional[int] = Field(None, ge=1, le=1000000)
+    max_workers: Optional[int] = Field(None, ge=1, le=64)
+    max_failed_chunks: Optional[int] = Field(
+        None,
+        ge=0,
+        description="Abort the job after this many failed chunks (unlimited if omitted)"
+    )
+
+
+class BatchJobFailure(BaseModel):
+    """A chunk that could not be scored."""
+
+    chunk_index: int
+    row_start: int
+    row_count: int
+    error: str
+
+
+class BatchJobResponse(BaseModel):
+    """Status and progress of a bulk scoring job."""
+
+    job_id: str
+    deployment_id: str
+    organization_id: str
+    status: str = Field(..., description="pending, running, completed, failed, cancelled")
+    input_path: str
+    output_path: str
+    rows_processed: int = 0
+    rows_failed: int = 0
+    chunks_completed: int = 0
+    chunks_failed: int = 0
+    throughput_rows_per_sec: Optional[float] = None
+    error: Optional[str] = None
+    failures: List[BatchJobFailure] = Field(default_factory=list)
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    details: Dict[str, Any] = Field(default_factory=dict)
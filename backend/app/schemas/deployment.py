@@ -21,6 +21,7 @@ class DeploymentCreate(BaseModel):
 
 class DeploymentUpdate(BaseModel):
     name: Optional[str] = None
+    model_version_id: Optional[uuid.UUID] = None
     environment: Optional[str] = None
     endpoint_url: Optional[str] = None
     status: Optional[str] = None
@@ -30,6 +31,8 @@ class DeploymentUpdate(BaseModel):
     auto_scaling: Optional[bool] = None
     deployment_config: Optional[Dict[str, Any]] = None
     health_check_path: Optional[str] = None
+    # Move to a model version even if its performance profile regresses serving capacity
+    allow_capacity_regression: bool = False
 
 
 class DeploymentResponse(BaseModel):
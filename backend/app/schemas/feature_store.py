@@ -0,0 +1,48 @@
+"""
+Feature Store Schemas.
+Pydantic models for pushing and loading online features.
+"""
+
+from typing import Optional, List, Dict, Any, Literal
+from pydantic import BaseModel, Field
+import uuid
+
+
+class FeatureIngestRequest(BaseModel):
+    """Rows pushed into a feature set; each row carries its entity key."""
+
+    organization_id: uuid.UUID
+    entity_key: str = Field(..., min_length=1, description="Column holding the entity ID in each row")
+    rows: List[Dict[str, Any]] = Field(..., min_length=1, max_length=10000)
+
+
+class FeatureLoadRequest(BaseModel):
+    """Bulk load of a feature set from a CSV/Parquet dataset."""
+
+    organization_id: uuid.UUID
+    entity_key: str = Field(..., min_length=1)
+    path: str = Field(
+        ...,
+        min_length=1,
+        description=(
+            "Dataset path, relative to the organization's batch data directory, "
+            "or s3://<batch bucket>/<organization_id>/key"
+        )
+    )
+    format: Optional[Literal["csv", "parquet"]] = Field(
+        None,
+        description="Dataset format (inferred from the path extension if omitted)"
+    )
+    columns: Optional[List[str]] = Field(
+        None,
+        description="Feature columns to load (defaults to every column but the entity key)"
+    )
+
+
+class FeatureSetStats(BaseModel):
+    """Rows held by this worker's in-process tier for a feature set."""
+
+    feature_set: str
+    local_rows: int
+    columns: List[str]
+    loaded_rows: Optional[int] = None
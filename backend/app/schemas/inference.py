@@ -37,6 +37,20 @@ class InferenceRequest(BaseModel):
         return v
 
 
+class InferenceFrame(InferenceRequest):
+    """One request frame on a WebSocket inference session."""
+    
+    id: Optional[Union[str, int]] = Field(
+        None,
+        description="Client tag echoed on the reply frame, which may arrive out of order"
+    )
+    timeout_ms: Optional[float] = Field(
+        None,
+        gt=0,
+        description="Deadline for this frame, counted from when the server reads it"
+    )
+
+
 class BatchInferenceRequest(BaseModel):
     """Request schema for batch model inference."""
     
@@ -85,8 +99,12 @@ class InferenceMetadata(BaseModel):
     latency_ms: float
     timestamp: str
     cached: bool = False
+    cache_hits: Optional[int] = None
     model_version: Optional[str] = None
     prediction_count: Optional[int] = None
+    cascade: Optional[Dict[str, Any]] = None
+    pipeline: Optional[Dict[str, Any]] = None
+    precomputed_hits: Optional[int] = None
 
 
 class BatchInferenceMetadata(BaseModel):
@@ -79,6 +79,8 @@ class ModelVersionResponse(BaseModel):
     performance_metrics: Dict[str, Any]
     training_metrics: Dict[str, Any]
     model_schema: Dict[str, Any]
+    optimal_batch_size: Optional[int] = None
+    serving_profile: Dict[str, Any] = Field(default_factory=dict)
     description: Optional[str]
     created_by: uuid.UUID
     created_at: datetime
@@ -0,0 +1,425 @@
+"""
+Batch Scoring Job Service.
+Runs offline bulk scoring of CSV/Parquet datasets across a process pool and tracks progress in Redis.
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import redis.asyncio as redis
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.deployment import Deployment
+from app.models.organization_membership import OrganizationMembership
+from app.schemas.batch_job import BatchJobCreate
+from app.services.inference_service import InferenceService
+from app.services.model_loader import ModelLoader, normalize_framework
+from app.services.schema_validator import CompiledSchema
+
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {"completed", "failed", "cancelled"}
+MAX_RECORDED_FAILURES = 100
+
+
+# Worker process state, populated once per process by _init_worker
+_worker_model: Any = None
+_worker_framework: Optional[str] = None
+_worker_schema: Optional[CompiledSchema] = None
+_worker_service: Optional[InferenceService] = None
+
+
+class _WorkerModelLoader(ModelLoader):
+    """ModelLoader used only for its framework loaders; no cache or cleanup task."""
+
+    def __init__(self):
+        pass
+
+
+def _init_worker(model_path: str, framework: str, model_schema: Optional[Dict[str, Any]] = None):
+    """Load the job's model and compile its input schema once per worker process."""
+    global _worker_model, _worker_framework, _worker_schema, _worker_service
+    _worker_model = asyncio.run(
+        _WorkerModelLoader()._load_by_framework(Path(model_path), framework)
+    )
+    _worker_framework = framework
+    _worker_schema = CompiledSchema(model_schema) if model_schema else None
+    _worker_service = InferenceService()
+
+
+def _score_chunk(batch):
+    """
+    Score one record batch inside a worker process and return prediction columns.
+
+    The batch is validated and preprocessed against the model schema as online
+    requests are, column by column where the schema allows it; a violation
+    fails the chunk.
+    """
+    import pandas as pd
+    import pyarrow as pa
+
+    if _worker_schema is None:
+        df: pd.DataFrame = batch.to_pandas()
+    elif _worker_schema.columnar:
+        columns = {
+            name: column.to_numpy(zero_copy_only=False)
+            for name, column in zip(batch.schema.names, batch.columns)
+        }
+        df = pd.DataFrame(_worker_schema.validate_columns(columns))
+    else:
+        df = pd.DataFrame(_worker_schema.validate(batch.to_pylist()))
+    if _worker_framework in ['sklearn', 'xgboost', 'lightgbm', 'catboost']:
+        input_data = df
+    elif _worker_framework in ['pytorch', 'tensorflow']:
+        input_data = df.to_numpy(dtype=np.float32)
+    elif _worker_framework == 'onnx' and hasattr(_worker_model, 'prepare_frame'):
+        input_data = _worker_model.prepare_frame(df)
+    elif _worker_framework == 'onnx':
+        input_data = {"input": df.to_numpy(dtype=np.float32)}
+    else:
+        input_data = df.to_dict("records")
+
+    result = _worker_service._run_prediction_sync(_worker_model, input_data, _worker_framework)
+
+    if isinstance(result, dict):
+        predictions = result.get('predictions')
+        probabilities = result.get('probabilities')
+    else:
+        predictions = result
+        probabilities = None
+
+    predictions = np.asarray(predictions)
+    columns = {"prediction": pa.array(predictions.tolist())}
+    if probabilities is not None:
+        columns["probabilities"] = pa.array(
+            np.asarray(probabilities, dtype=np.float64).tolist(),
+            type=pa.list_(pa.float64())
+        )
+    return pa.record_batch(list(columns.values()), names=list(columns.keys()))
+
+
+def _resolve_path(path: str, organization_id: str) -> Tuple[Any, str]:
+    """
+    Return a pyarrow filesystem and path for a job's dataset or output location.
+
+    Jobs only reach their organization's data: local paths are taken relative
+    to BATCH_JOB_DATA_ROOT/<organization_id>/, and object storage paths must
+    name BATCH_JOB_S3_BUCKET with a key under <organization_id>/.
+
+    Raises:
+        HTTPException: 400 if the path is, or resolves to, anywhere else
+    """
+    from pyarrow import fs
+
+    def outside():
+        return HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Path {path!r} is outside the organization's batch data"
+        )
+
+    if path.startswith("s3://"):
+        bucket, _, key = path[len("s3://"):].partition("/")
+        parts = key.split("/")
+        if (
+            bucket != settings.BATCH_JOB_S3_BUCKET
+            or len(parts) < 2
+            or parts[0] != organization_id
+            or any(part in ("", ".", "..") for part in parts)
+        ):
+            raise outside()
+        filesystem = fs.S3FileSystem(
+            access_key=settings.MINIO_ACCESS_KEY,
+            secret_key=settings.MINIO_SECRET_KEY,
+            endpoint_override=settings.MINIO_ENDPOINT,
+            scheme="https" if settings.MINIO_SECURE else "http"
+        )
+        return filesystem, f"{bucket}/{key}"
+
+    root = (Path(settings.BATCH_JOB_DATA_ROOT) / organization_id).resolve()
+    if ".." in Path(path).parts:
+        raise outside()
+    # Absolute paths replace the root when joined, and symlinks are followed, so both are caught here
+    resolved = (root / path).resolve()
+    if resolved == root or not resolved.is_relative_to(root):
+        raise outside()
+    return fs.LocalFileSystem(), str(resolved)
+
+
+class BatchJobRunner:
+    """Executes bulk scoring jobs and persists their progress in Redis."""
+
+    def __init__(self):
+        self.redis_client = redis.from_url(settings.REDIS_URL)
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.state_ttl = settings.BATCH_JOB_TTL_DAYS * 86400
+
+    async def submit(
+        self,
+        deployment: Deployment,
+        model_path: str,
+        framework: str,
+        data: BatchJobCreate
+    ) -> Dict[str, Any]:
+        """Register a job and start it in the background."""
+        job_id = str(uuid.uuid4())
+        organization_id = str(deployment.organization_id)
+        output_path = data.output_path or f"outputs/{job_id}.parquet"
+        _resolve_path(data.input_path, organization_id)
+        _resolve_path(output_path, organization_id)
+        input_format = data.input_format or Path(data.input_path).suffix.lstrip(".").lower()
+        if input_format not in ("csv", "parquet"):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cannot infer dataset format; set input_format to csv or parquet"
+            )
+
+        job = {
+            "job_id": job_id,
+            "deployment_id": str(deployment.id),
+            "organization_id": organization_id,
+            "status": "pending",
+            "input_path": data.input_path,
+            "output_path": output_path,
+            "rows_processed": 0,
+            "rows_failed": 0,
+            "chunks_completed": 0,
+            "chunks_failed": 0,
+            "throughput_rows_per_sec": None,
+            "error": None,
+            "created_at": datetime.utcnow().isoformat(),
+            "started_at": None,
+            "completed_at": None,
+            "details": {
+                "input_format": input_format,
+                "chunk_size": data.chunk_size or settings.BATCH_JOB_CHUNK_SIZE,
+                "max_workers": data.max_workers or settings.BATCH_JOB_MAX_WORKERS,
+                "framework": framework
+            }
+        }
+        await self._save(job)
+
+        self.tasks[job_id] = asyncio.create_task(
+            self._run(job, model_path, framework, deployment.model_version.model_schema, data)
+        )
+        self.tasks[job_id].add_done_callback(lambda _: self.tasks.pop(job_id, None))
+        return job
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raw = await self.redis_client.get(f"batch_job:{job_id}")
+        if not raw:
+            return None
+        job = json.loads(raw)
+        failures = await self.redis_client.lrange(f"batch_job_failures:{job_id}", 0, -1)
+        job["failures"] = [json.loads(f) for f in failures]
+        return job
+
+    async def cancel(self, job_id: str):
+        """Request cancellation; honoured by whichever worker owns the job."""
+        await self.redis_client.setex(f"batch_job_cancel:{job_id}", self.state_ttl, "1")
+
+    async def _save(self, job: Dict[str, Any]):
+        await self.redis_client.setex(
+            f"batch_job:{job['job_id']}", self.state_ttl, json.dumps(job, default=str)
+        )
+
+    async def _record_failure(self, job: Dict[str, Any], failure: Dict[str, Any]):
+        key = f"batch_job_failures:{job['job_id']}"
+        await self.redis_client.rpush(key, json.dumps(failure))
+        await self.redis_client.ltrim(key, 0, MAX_RECORDED_FAILURES - 1)
+        await self.redis_client.expire(key, self.state_ttl)
+
+    async def _run(
+        self,
+        job: Dict[str, Any],
+        model_path: str,
+        framework: str,
+        model_schema: Optional[Dict[str, Any]],
+        data: BatchJobCreate
+    ):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+
+        loop = asyncio.get_running_loop()
+        details = job["details"]
+        max_workers = details["max_workers"]
+        executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_path, framework, model_schema)
+        )
+        writer = None
+        pending = deque()
+        start = time.monotonic()
+
+        job["status"] = "running"
+        job["started_at"] = datetime.utcnow().isoformat()
+        await self._save(job)
+
+        async def handle(entry):
+            nonlocal writer
+            chunk_index, row_start, passthrough, future = entry
+            row_count = passthrough.num_rows
+            try:
+                scored = await future
+            except BrokenProcessPool:
+                raise
+            except Exception as e:
+                job["chunks_failed"] += 1
+                job["rows_failed"] += row_count
+                await self._record_failure(job, {
+                    "chunk_index": chunk_index,
+                    "row_start": row_start,
+                    "row_count": row_count,
+                    "error": str(e)
+                })
+                if data.max_failed_chunks is not None and job["chunks_failed"] > data.max_failed_chunks:
+                    raise RuntimeError(f"Aborted after {job['chunks_failed']} failed chunks")
+            else:
+                arrays = [pa.array(np.arange(row_start, row_start + row_count))]
+                names = ["_row"]
+                arrays += passthrough.columns
+                names += passthrough.schema.names
+                arrays += scored.columns
+                names += scored.schema.names
+                table = pa.Table.from_arrays(arrays, names=names)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, table.schema, filesystem=out_fs)
+                else:
+                    table = table.cast(writer.schema)
+                await loop.run_in_executor(None, writer.write_table, table)
+                job["chunks_completed"] += 1
+                job["rows_processed"] += row_count
+
+            elapsed = time.monotonic() - start
+            job["throughput_rows_per_sec"] = round(job["rows_processed"] / elapsed, 2) if elapsed > 0 else None
+            await self._save(job)
+
+        try:
+            in_fs, in_path = _resolve_path(job["input_path"], job["organization_id"])
+            out_fs, output_path = _resolve_path(job["output_path"], job["organization_id"])
+            if not job["output_path"].startswith("s3://"):
+                Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+
+            dataset = ds.dataset(in_path, format=details["input_format"], filesystem=in_fs)
+            passthrough_columns = list(data.passthrough_columns)
+            feature_columns = data.feature_columns or [
+                name for name in dataset.schema.names if name not in passthrough_columns
+            ]
+            batches = dataset.to_batches(
+                columns=feature_columns + passthrough_columns,
+                batch_size=details["chunk_size"]
+            )
+
+            chunk_index = 0
+            row_start = 0
+            while True:
+                batch = await loop.run_in_executor(None, next, batches, None)
+                if batch is None:
+                    break
+                if await self.redis_client.exists(f"batch_job_cancel:{job['job_id']}"):
+                    job["status"] = "cancelled"
+                    break
+
+                features = batch.select(feature_columns)
+                passthrough = batch.select(passthrough_columns)
+                future = loop.run_in_executor(executor, _score_chunk, features)
+                pending.append((chunk_index, row_start, passthrough, future))
+                chunk_index += 1
+                row_start += batch.num_rows
+
+                # Bound in-flight chunks and write results in input order
+                while len(pending) >= max_workers * 2:
+                    await handle(pending.popleft())
+
+            while pending and job["status"] != "cancelled":
+                await handle(pending.popleft())
+
+            if job["status"] != "cancelled":
+                job["status"] = "completed"
+
+        except Exception as e:
+            logger.error(f"Batch job {job['job_id']} failed: {str(e)}")
+            job["status"] = "failed"
+            job["error"] = str(e)
+        finally:
+            for _, _, _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+            if writer is not None:
+                await loop.run_in_executor(None, writer.close)
+            job["completed_at"] = datetime.utcnow().isoformat()
+            await self._save(job)
+            logger.info(
+                f"Batch job {job['job_id']} {job['status']}: "
+                f"{job['rows_processed']} rows scored, {job['rows_failed']} failed"
+            )
+
+
+batch_job_runner = BatchJobRunner()
+
+
+class BatchJobService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _ensure_org_role(self, organization_id: uuid.UUID, user_id: uuid.UUID, min_role: str) -> None:
+        role_hierarchy = {"viewer": 1, "developer": 2, "admin": 3}
+        membership: Optional[OrganizationMembership] = (
+            self.db.query(OrganizationMembership)
+            .filter(
+                OrganizationMembership.organization_id == organization_id,
+                OrganizationMembership.user_id == user_id,
+            )
+            .first()
+        )
+        if not membership:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No access to organization")
+        if role_hierarchy.get(membership.role, 0) < role_hierarchy.get(min_role, 0):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient role for action")
+
+    async def create_job(self, user_id: uuid.UUID, data: BatchJobCreate) -> Dict[str, Any]:
+        deployment = (
+            self.db.query(Deployment)
+            .filter(Deployment.id == data.deployment_id, Deployment.deleted_at.is_(None))
+            .first()
+        )
+        if not deployment:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Deployment not found")
+        self._ensure_org_role(deployment.organization_id, user_id, "developer")
+
+        model_version = deployment.model_version
+        framework = normalize_framework(model_version.model.framework)
+        return await batch_job_runner.submit(deployment, model_version.model_file_path, framework, data)
+
+    async def get_job(self, job_id: str, user_id: uuid.UUID) -> Dict[str, Any]:
+        job = await batch_job_runner.get_job(job_id)
+        if not job:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Batch job not found")
+        self._ensure_org_role(uuid.UUID(job["organization_id"]), user_id, "viewer")
+        return job
+
+    async def cancel_job(self, job_id: str, user_id: uuid.UUID) -> Dict[str, Any]:
+        job = await batch_job_runner.get_job(job_id)
+        if not job:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Batch job not found")
+        self._ensure_org_role(uuid.UUID(job["organization_id"]), user_id, "developer")
+        if job["status"] in TERMINAL_STATUSES:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Batch job already {job['status']}")
+        await batch_job_runner.cancel(job_id)
+        return job
@@ -0,0 +1,199 @@
+"""
+Batch Tuner.
+Benchmarks a model version across batch sizes and stores the throughput-optimal size.
+
+Tuning is scheduled from request paths, so the benchmark runs in a freshly
+spawned process, as version profiling does: the API worker neither loads a
+second copy of the model nor spends its inference threads on the sweep.
+"""
+
+import asyncio
+import logging
+import random
+import statistics
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import redis.asyncio as redis
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.model_version import ModelVersion
+from app.services.inference_service import InferenceService, ServingTarget
+from app.services.model_loader import ModelLoader
+
+
+logger = logging.getLogger(__name__)
+
+
+def synthetic_instances(model_schema: Dict[str, Any], count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Rows for benchmarking: the schema's `examples` if present, otherwise
+    values generated from the input_schema properties and their constraints.
+    """
+    examples = model_schema.get('examples') or model_schema.get('input_schema', {}).get('examples')
+    if examples:
+        return [dict(examples[i % len(examples)]) for i in range(count)]
+
+    rng = random.Random(seed)
+    properties = model_schema.get('input_schema', {}).get('properties', {})
+
+    def value_for(spec: Dict[str, Any]) -> Any:
+        if 'enum' in spec:
+            return rng.choice(spec['enum'])
+        kind = spec.get('type', 'number')
+        low = spec.get('minimum', 0)
+        high = spec.get('maximum', max(low, 0) + 1)
+        if kind == 'integer':
+            return rng.randint(int(low), int(high))
+        if kind == 'boolean':
+            return rng.random() < 0.5
+        if kind == 'string':
+            return ''
+        if kind == 'array':
+            return [rng.uniform(0, 1) for _ in range(spec.get('minItems', 1))]
+        return rng.uniform(low, high)
+
+    return [{name: value_for(spec) for name, spec in properties.items()} for _ in range(count)]
+
+
+async def benchmark_batch(
+    inference_service: InferenceService,
+    model: Any,
+    target: Any,
+    instances: List[Dict[str, Any]],
+    repeats: int
+) -> Dict[str, Any]:
+    """Latency percentiles and throughput of scoring `instances` as one batch, after a warm-up call."""
+    validated = await inference_service.validate_input(instances, target.model_version.model_schema or {})
+    await inference_service.predict(model=model, instances=validated, deployment=target)  # warm up
+
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await inference_service.predict(model=model, instances=validated, deployment=target)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    p95 = samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))]
+    median = statistics.median(samples)
+    return {
+        'batch_size': len(instances),
+        'p50_ms': round(median, 3),
+        'p95_ms': round(p95, 3),
+        'rows_per_second': round(len(instances) / (median / 1000), 1) if median else None
+    }
+
+
+class BatchSizeTuner:
+    """Finds the batch size with the best throughput whose p95 latency stays under a ceiling."""
+
+    def __init__(self, inference_service: Optional[InferenceService] = None, redis_client: Optional[redis.Redis] = None):
+        self.inference_service = inference_service or InferenceService()
+        self.redis_client = redis_client or redis.from_url(settings.REDIS_URL)
+
+    async def tune(
+        self,
+        model: Any,
+        target: Any,
+        candidates: Optional[Sequence[int]] = None,
+        latency_ceiling_ms: Optional[float] = None,
+        repeats: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Benchmark `model` at each candidate batch size.
+
+        Sizes are tried in increasing order and the sweep stops at the first
+        one whose p95 latency exceeds the ceiling, since larger batches only get slower.
+
+        Returns:
+            The chosen batch size, the ceiling and per-candidate measurements
+        """
+        candidates = sorted(candidates or settings.BATCH_TUNING_CANDIDATES)
+        ceiling = latency_ceiling_ms or settings.BATCH_TUNING_LATENCY_CEILING_MS
+        repeats = repeats or settings.BATCH_TUNING_REPEATS
+        rows = synthetic_instances(target.model_version.model_schema or {}, candidates[-1])
+
+        results = []
+        for batch_size in candidates:
+            results.append(await benchmark_batch(self.inference_service, model, target, rows[:batch_size], repeats))
+            if results[-1]['p95_ms'] > ceiling:
+                break
+
+        within = [r for r in results if r['p95_ms'] <= ceiling]
+        best = max(within, key=lambda r: r['rows_per_second'] or 0) if within else results[0]
+        return {
+            'optimal_batch_size': best['batch_size'],
+            'latency_ceiling_ms': ceiling,
+            'candidates': results,
+            'tuned_at': datetime.utcnow().isoformat()
+        }
+
+    async def tune_and_store(self, model_version_id: Any, deployment_config: Optional[Dict[str, Any]] = None):
+        """
+        Tune a model version in a spawned process and save the result on it.
+
+        Runs as a background task, waiting on a thread so the event loop keeps
+        serving. A Redis lock keeps several workers from tuning the same
+        version at once.
+        """
+        # Imported here: the profiler builds on this module's benchmarks
+        from app.services.version_profiler import run_isolated
+
+        lock_key = f"batch_tuning:{model_version_id}"
+        try:
+            if not await self.redis_client.set(lock_key, "1", nx=True, ex=int(settings.BATCH_TUNING_TIMEOUT_SECONDS) + 60):
+                return
+        except Exception as e:
+            logger.error(f"Failed to acquire batch tuning lock: {str(e)}")
+            return
+
+        db = SessionLocal()
+        try:
+            version = db.query(ModelVersion).filter(ModelVersion.id == model_version_id).first()
+            if version is None or version.optimal_batch_size:
+                return
+            result = await asyncio.get_running_loop().run_in_executor(
+                None,
+                run_isolated,
+                tune_version,
+                (str(model_version_id), deployment_config),
+                settings.BATCH_TUNING_TIMEOUT_SECONDS
+            )
+
+            version.optimal_batch_size = result['optimal_batch_size']
+            version.serving_profile = {**(version.serving_profile or {}), 'batch_tuning': result}
+            db.commit()
+            logger.info(f"Tuned batch size for model version {model_version_id}: {result['optimal_batch_size']}")
+        except Exception as e:
+            # Keep the lock until it expires so a failing version isn't retuned on every request
+            db.rollback()
+            logger.error(f"Batch size tuning failed for model version {model_version_id}: {str(e)}")
+            return
+        finally:
+            db.close()
+        try:
+            await self.redis_client.delete(lock_key)
+        except Exception as e:
+            logger.error(f"Failed to release batch tuning lock: {str(e)}")
+
+
+async def _tune(model_version_id: str, deployment_config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    db = SessionLocal()
+    try:
+        version = db.query(ModelVersion).filter(ModelVersion.id == model_version_id).first()
+        if version is None:
+            raise ValueError(f"Model version {model_version_id} not found")
+        model = await ModelLoader().get_model(model_version_id)
+        return await BatchSizeTuner().tune(model, ServingTarget(version, deployment_config))
+    finally:
+        db.close()
+
+
+def tune_version(model_version_id: str, deployment_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Tune a model version in the current process; the entry point of the tuning process."""
+    logging.basicConfig(level=getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO))
+    return asyncio.run(_tune(model_version_id, deployment_config))
+
+
+batch_size_tuner = BatchSizeTuner()
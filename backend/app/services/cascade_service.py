@@ -0,0 +1,226 @@
+"""
+Cascade Service.
+Chains model versions so rows a cheap model is unsure about escalate to a more expensive one.
+"""
+
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis.asyncio as redis
+from prometheus_client import Counter
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.model_version import ModelVersion
+from app.schemas.inference import PredictionResult
+from app.services.inference_service import InferenceService, ServingTarget
+from app.services.model_loader import ModelLoader
+
+
+logger = logging.getLogger(__name__)
+
+CASCADE_ROWS = Counter(
+    "inference_cascade_rows_total",
+    "Rows scored by each cascade stage, by whether the stage answered or escalated them",
+    ["deployment_id", "stage", "outcome"]
+)
+
+
+@dataclass
+class CascadeStage:
+    """One model in a cascade; rows below `threshold` confidence go to the next stage."""
+
+    model_version: Any
+    threshold: Optional[float] = None
+    load_options: Optional[Dict[str, Any]] = None
+
+
+def cascade_config(deployment: Any) -> Optional[Dict[str, Any]]:
+    """The deployment's cascade settings, or None for a single-model deployment."""
+    config = (deployment.deployment_config or {}).get("cascade")
+    return config if config and config.get("stages") else None
+
+
+def cascade_fingerprint(config: Dict[str, Any]) -> str:
+    """Short digest of a cascade's stages and thresholds, to namespace its cached results."""
+    encoded = json.dumps(config, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()[:12]
+
+
+class CascadeService:
+    """
+    Runs cascade deployments.
+
+    The deployment's own model version is the first stage and
+    `deployment_config["cascade"]` lists the rest:
+
+        {"threshold": 0.9,
+         "stages": [{"model_version_id": "...", "threshold": 0.8, "serving": {...}},
+                    {"model_version_id": "..."}]}
+
+    Each stage scores only the rows escalated to it. Rows without a
+    confidence (e.g. regression outputs) are answered by the first stage
+    that scores them, and the last stage answers everything it receives.
+    """
+
+    def __init__(
+        self,
+        inference_service: InferenceService,
+        model_loader: ModelLoader,
+        redis_client: Optional[redis.Redis] = None
+    ):
+        self.inference_service = inference_service
+        self.model_loader = model_loader
+        self.redis_client = redis_client or redis.from_url(settings.REDIS_URL)
+        # Smoothed milliseconds per row by model version, for estimating savings
+        self.row_cost_ms: Dict[str, float] = {}
+
+    def resolve_stages(self, db: Session, deployment: Any, load_options: Optional[Dict[str, Any]]) -> Optional[List[CascadeStage]]:
+        """Load the cascade's model versions, or return None if the deployment isn't a cascade."""
+        config = cascade_config(deployment)
+        if config is None:
+            return None
+
+        ids = [stage["model_version_id"] for stage in config["stages"]]
+        versions = {
+            str(version.id): version
+            for version in db.query(ModelVersion).filter(ModelVersion.id.in_(ids)).all()
+        }
+        stages = [CascadeStage(deployment.model_version, config.get("threshold", settings.CASCADE_DEFAULT_THRESHOLD), load_options)]
+        for stage in config["stages"]:
+            version = versions.get(str(stage["model_version_id"]))
+            if version is None:
+                raise ValueError(f"Cascade stage model version {stage['model_version_id']} not found")
+            stages.append(CascadeStage(
+                version,
+                stage.get("threshold", settings.CASCADE_DEFAULT_THRESHOLD),
+                stage.get("serving")
+            ))
+        return stages
+
+    async def predict(
+        self,
+        deployment: Any,
+        stages: List[CascadeStage],
+        instances: List[Dict[str, Any]]
+    ) -> Tuple[List[Any], Dict[str, Any]]:
+        """
+        Score raw instances through the cascade.
+
+        Every stage validates rows against its own version's schema.
+
+        Returns:
+            Predictions in input order, and a report with per-stage row counts
+            and latency plus the estimated time saved against sending every
+            row to the last stage
+        """
+        results: List[Any] = [None] * len(instances)
+        pending = list(range(len(instances)))
+        report_stages = []
+        total_ms = 0.0
+
+        for position, stage in enumerate(stages):
+            last = position == len(stages) - 1
+            start = time.perf_counter()
+            model = await self.model_loader.get_model(stage.model_version.id, stage.load_options)
+            validated = await self.inference_service.validate_input(
+                [instances[i] for i in pending],
+                stage.model_version.model_schema
+            )
+            predictions = await self.inference_service.predict(
+                model=model,
+                instances=validated,
+                deployment=ServingTarget(stage.model_version, deployment.deployment_config, deployment.id)
+            )
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            total_ms += elapsed_ms
+            self._observe_cost(stage.model_version.id, elapsed_ms, len(pending))
+
+            escalated = []
+            for i, prediction in zip(pending, predictions):
+                confidence = prediction.confidence if isinstance(prediction, PredictionResult) else None
+                if not last and confidence is not None and confidence < stage.threshold:
+                    escalated.append(i)
+                else:
+                    results[i] = prediction
+            report_stages.append({
+                "stage": position,
+                "model_version_id": str(stage.model_version.id),
+                "rows": len(pending),
+                "answered": len(pending) - len(escalated),
+                "latency_ms": round(elapsed_ms, 2)
+            })
+            pending = escalated
+            if not pending:
+                break
+
+        final_cost = self.row_cost_ms.get(str(stages[-1].model_version.id))
+        full_ms = final_cost * len(instances) if final_cost is not None else None
+        return results, {
+            "stages": report_stages,
+            "latency_ms": round(total_ms, 2),
+            "saved_ms": round(full_ms - total_ms, 2) if full_ms is not None else None
+        }
+
+    def _observe_cost(self, model_version_id: Any, elapsed_ms: float, rows: int):
+        if not rows:
+            return
+        key = str(model_version_id)
+        per_row = elapsed_ms / rows
+        previous = self.row_cost_ms.get(key)
+        self.row_cost_ms[key] = per_row if previous is None else 0.9 * previous + 0.1 * per_row
+
+    async def record(self, deployment_id: Any, report: Dict[str, Any]):
+        """Accumulate per-stage counts, latency and savings, shared across workers."""
+        for stage in report["stages"]:
+            CASCADE_ROWS.labels(str(deployment_id), str(stage["stage"]), "answered").inc(stage["answered"])
+            CASCADE_ROWS.labels(str(deployment_id), str(stage["stage"]), "escalated").inc(stage["rows"] - stage["answered"])
+        try:
+            key = f"cascade_stats:{deployment_id}"
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.hincrby(key, "requests", 1)
+            for stage in report["stages"]:
+                prefix = f"stage{stage['stage']}"
+                pipe.hincrby(key, f"{prefix}:requests", 1)
+                pipe.hincrby(key, f"{prefix}:rows", stage["rows"])
+                pipe.hincrby(key, f"{prefix}:answered", stage["answered"])
+                pipe.hincrbyfloat(key, f"{prefix}:latency_ms", stage["latency_ms"])
+            if report["saved_ms"] is not None:
+                pipe.hincrbyfloat(key, "saved_ms", report["saved_ms"])
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to record cascade stats: {str(e)}")
+
+    async def get_stats(self, deployment_id: Any) -> Dict[str, Any]:
+        """Per-stage hit ratio (rows answered / rows received), mean latency per request reaching it and total time saved."""
+        try:
+            raw = await self.redis_client.hgetall(f"cascade_stats:{deployment_id}")
+        except Exception as e:
+            logger.error(f"Failed to read cascade stats: {str(e)}")
+            return {}
+        stats = {
+            (k.decode() if isinstance(k, bytes) else k): float(v)
+            for k, v in raw.items()
+        }
+        stages = []
+        position = 0
+        while f"stage{position}:rows" in stats:
+            rows = stats[f"stage{position}:rows"]
+            reached = stats.get(f"stage{position}:requests", 0)
+            stages.append({
+                "stage": position,
+                "requests": int(reached),
+                "rows": int(rows),
+                "hit_ratio": round(stats.get(f"stage{position}:answered", 0) / rows, 4) if rows else 0.0,
+                "avg_latency_ms": round(stats.get(f"stage{position}:latency_ms", 0) / reached, 2) if reached else 0.0
+            })
+            position += 1
+        return {
+            "requests": int(stats.get("requests", 0)),
+            "stages": stages,
+            "saved_ms": round(stats.get("saved_ms", 0.0), 2)
+        }
@@ -1,13 +1,20 @@
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
-from typing import List, Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional
 import uuid
 from datetime import datetime
 
+from app.core.config import settings
 from app.models.deployment import Deployment
 from app.models.deployment_history import DeploymentHistory
+from app.models.model import Model
+from app.models.model_version import ModelVersion
 from app.models.organization_membership import OrganizationMembership
+from app.services.batch_job_service import _resolve_path
+from app.services.inference_cache import publish_invalidation
+from app.services.pipeline_service import build_plan
+from app.services.version_profiler import capacity_regressions
 from app.schemas.deployment import (
     DeploymentCreate,
     DeploymentUpdate,
@@ -33,6 +40,142 @@ class DeploymentService:
         if role_hierarchy.get(membership.role, 0) < role_hierarchy.get(min_role, 0):
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient role for action")
 
+    def _validate_cascade(self, organization_id: uuid.UUID, deployment_config: Optional[Dict[str, Any]]) -> None:
+        cascade = (deployment_config or {}).get("cascade")
+        if not cascade:
+            return
+        stages = cascade.get("stages")
+        if not isinstance(stages, list) or not stages:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cascade needs at least one stage after the deployment's model version")
+        thresholds = [cascade.get("threshold")] + [stage.get("threshold") for stage in stages]
+        if any(t is not None and not (isinstance(t, (int, float)) and 0 <= t <= 1) for t in thresholds):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cascade thresholds must be between 0 and 1")
+        try:
+            ids = [uuid.UUID(str(stage["model_version_id"])) for stage in stages]
+        except (KeyError, ValueError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Every cascade stage needs a valid model_version_id")
+        found = {
+            row.id
+            for row in self.db.query(ModelVersion.id)
+            .join(Model, Model.id == ModelVersion.model_id)
+            .filter(ModelVersion.id.in_(ids), Model.organization_id == organization_id, ModelVersion.deleted_at.is_(None))
+            .all()
+        }
+        missing = [str(i) for i in ids if i not in found]
+        if missing:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Cascade stage model versions not found: {', '.join(missing)}")
+
+    def _validate_pipeline(self, organization_id: uuid.UUID, deployment_config: Optional[Dict[str, Any]]) -> None:
+        pipeline = (deployment_config or {}).get("pipeline")
+        if not pipeline:
+            return
+        if (deployment_config or {}).get("cascade"):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="A deployment can be a cascade or a pipeline, not both")
+        nodes = pipeline.get("nodes")
+        if not isinstance(nodes, dict) or not nodes:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Pipeline needs at least one node")
+        try:
+            ids = [uuid.UUID(str(spec["model_version_id"])) for spec in nodes.values() if "transform" not in spec]
+        except (KeyError, ValueError, TypeError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Every pipeline model node needs a valid model_version_id")
+        versions = {
+            str(row.id): row
+            for row in self.db.query(ModelVersion.id)
+            .join(Model, Model.id == ModelVersion.model_id)
+            .filter(ModelVersion.id.in_(ids), Model.organization_id == organization_id, ModelVersion.deleted_at.is_(None))
+            .all()
+        } if ids else {}
+        try:
+            build_plan(pipeline, versions)
+        except (ValueError, TypeError, AttributeError) as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid pipeline: {e}")
+
+    def _validate_traffic(self, organization_id: uuid.UUID, deployment_config: Optional[Dict[str, Any]]) -> None:
+        traffic = (deployment_config or {}).get("traffic")
+        if not traffic:
+            return
+        split = traffic.get("split") or []
+        shadow = traffic.get("shadow")
+        if not isinstance(split, list) or (shadow is not None and not isinstance(shadow, dict)):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Traffic split must be a list and shadow an object")
+        if split and ((deployment_config or {}).get("cascade") or (deployment_config or {}).get("pipeline")):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cascade and pipeline deployments can't split traffic")
+        weights = [variant.get("weight") for variant in split]
+        if any(not (isinstance(w, (int, float)) and 0 < w <= 1) for w in weights) or sum(weights) > 1:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Split weights must be between 0 and 1 and sum to at most 1")
+        if shadow is not None:
+            rate = shadow.get("sample_rate")
+            if rate is not None and not (isinstance(rate, (int, float)) and 0 <= rate <= 1):
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Shadow sample_rate must be between 0 and 1")
+        try:
+            ids = [uuid.UUID(str(entry["model_version_id"])) for entry in split + ([shadow] if shadow else [])]
+        except (KeyError, ValueError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Every split version and the shadow need a valid model_version_id")
+        found = {
+            row.id
+            for row in self.db.query(ModelVersion.id)
+            .join(Model, Model.id == ModelVersion.model_id)
+            .filter(ModelVersion.id.in_(ids), Model.organization_id == organization_id, ModelVersion.deleted_at.is_(None))
+            .all()
+        } if ids else set()
+        missing = [str(i) for i in ids if i not in found]
+        if missing:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Traffic model versions not found: {', '.join(missing)}")
+
+    def _validate_precomputed(self, organization_id: uuid.UUID, deployment_config: Optional[Dict[str, Any]]) -> None:
+        precomputed = (deployment_config or {}).get("precomputed")
+        if not precomputed:
+            return
+        if not isinstance(precomputed, dict) or not all(isinstance(precomputed.get(k), str) and precomputed.get(k) for k in ("entity_key", "source_path")):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Precomputed serving needs an entity_key and a source_path")
+        interval = precomputed.get("refresh_interval_s")
+        if interval is not None and not (isinstance(interval, (int, float)) and not isinstance(interval, bool) and interval > 0):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Precomputed refresh_interval_s must be a positive number of seconds")
+        if precomputed.get("source_format") not in (None, "csv", "parquet"):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Precomputed source_format must be csv or parquet")
+        # The source is read by a batch job, so it must lie in the organization's batch data
+        _resolve_path(precomputed["source_path"], str(organization_id))
+
+    def _validate_model_version(self, organization_id: uuid.UUID, model_version_id: uuid.UUID) -> None:
+        found = (
+            self.db.query(ModelVersion.id)
+            .join(Model, Model.id == ModelVersion.model_id)
+            .filter(ModelVersion.id == model_version_id, Model.organization_id == organization_id, ModelVersion.deleted_at.is_(None))
+            .first()
+        )
+        if not found:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Model version not found: {model_version_id}")
+
+    def _validate_features(self, deployment_config: Optional[Dict[str, Any]]) -> None:
+        features = (deployment_config or {}).get("features")
+        if not features:
+            return
+        if not isinstance(features, dict) or not all(isinstance(features.get(k), str) and features.get(k) for k in ("feature_set", "entity_key")):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Features need a feature_set and an entity_key")
+
+    def _check_capacity(self, dep: Deployment, candidate_version_id: uuid.UUID) -> None:
+        if dep.environment not in settings.PROFILING_GATE_ENVIRONMENTS:
+            return
+        profiles = {
+            row.id: (row.serving_profile or {}).get("performance") or {}
+            for row in self.db.query(ModelVersion.id, ModelVersion.serving_profile)
+            .filter(ModelVersion.id.in_([dep.model_version_id, candidate_version_id]))
+            .all()
+        }
+        regressions = capacity_regressions(
+            profiles.get(dep.model_version_id, {}),
+            profiles.get(candidate_version_id, {}),
+            settings.PROFILING_MAX_REGRESSION
+        )
+        if regressions:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=(
+                    f"Model version regresses serving capacity by more than {settings.PROFILING_MAX_REGRESSION:.0%}: "
+                    f"{'; '.join(regressions)}. Set allow_capacity_regression to deploy it anyway"
+                )
+            )
+
     def list_deployments(self, organization_id: uuid.UUID, project_id: Optional[uuid.UUID], user_id: uuid.UUID, skip: int, limit: int) -> Tuple[List[Deployment], int]:
         self._ensure_org_role(organization_id, user_id, "viewer")
         query = self.db.query(Deployment).filter(Deployment.organization_id == organization_id, Deployment.deleted_at.is_(None))
@@ -44,6 +187,11 @@ class DeploymentService:
 
     def create_deployment(self, creator_user_id: uuid.UUID, data: DeploymentCreate) -> Deployment:
         self._ensure_org_role(data.organization_id, creator_user_id, "developer")
+        self._validate_cascade(data.organization_id, data.deployment_config)
+        self._validate_pipeline(data.organization_id, data.deployment_config)
+        self._validate_traffic(data.organization_id, data.deployment_config)
+        self._validate_features(data.deployment_config)
+        self._validate_precomputed(data.organization_id, data.deployment_config)
         dep = Deployment(
             id=uuid.uuid4(),
             organization_id=data.organization_id,
@@ -94,12 +242,38 @@ class DeploymentService:
         if not dep:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Deployment not found")
         self._ensure_org_role(dep.organization_id, user_id, "developer")
-        for field in ["name", "environment", "endpoint_url", "instance_type", "min_instances", "max_instances", "auto_scaling", "deployment_config", "health_check_path", "status"]:
+        if data.deployment_config is not None:
+            self._validate_cascade(dep.organization_id, data.deployment_config)
+            self._validate_pipeline(dep.organization_id, data.deployment_config)
+            self._validate_traffic(dep.organization_id, data.deployment_config)
+            self._validate_features(data.deployment_config)
+            self._validate_precomputed(dep.organization_id, data.deployment_config)
+        if data.model_version_id is not None and data.model_version_id != dep.model_version_id:
+            self._validate_model_version(dep.organization_id, data.model_version_id)
+            if not data.allow_capacity_regression:
+                self._check_capacity(dep, data.model_version_id)
+        previous_version_id = dep.model_version_id
+        for field in ["name", "model_version_id", "environment", "endpoint_url", "instance_type", "min_instances", "max_instances", "auto_scaling", "deployment_config", "health_check_path", "status"]:
             value = getattr(data, field, None)
             if value is not None:
                 setattr(dep, field, value)
+        version_changed = dep.model_version_id != previous_version_id
+        if version_changed:
+            self.db.add(DeploymentHistory(
+                id=uuid.uuid4(),
+                deployment_id=dep.id,
+                model_version_id=dep.model_version_id,
+                action="update",
+                status="completed",
+                performed_by=user_id,
+                started_at=datetime.utcnow(),
+                completed_at=datetime.utcnow(),
+            ))
         self.db.commit()
         self.db.refresh(dep)
+        if version_changed:
+            # Drop cached predictions of the replaced version, in every namespace, from every worker's local cache
+            publish_invalidation([previous_version_id])
         return dep
 
     def list_history(self, deployment_id: uuid.UUID, user_id: uuid.UUID, skip: int, limit: int) -> Tuple[List[DeploymentHistory], int]:
@@ -0,0 +1,268 @@
+"""
+Online Feature Store.
+Precomputed entity features held in a columnar in-process tier backed by Redis, joined into inference requests by entity key.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import orjson
+import redis.asyncio as redis
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.organization_membership import OrganizationMembership
+from app.schemas.feature_store import FeatureIngestRequest, FeatureLoadRequest, FeatureSetStats
+
+
+logger = logging.getLogger(__name__)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class FeatureTable:
+    """
+    One feature set's rows in this process, stored column by column.
+
+    Numeric columns are float64 arrays with NaN for missing values and
+    other columns are object arrays, so a batch lookup is one fancy-index
+    gather per column. Each row is stamped with when it was written, and
+    rows older than the local TTL are treated as misses.
+    """
+
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.columns: Dict[str, np.ndarray] = {}
+        self.stamps = np.zeros(0, dtype=np.float64)
+        self.size = 0
+
+    def _grow(self, needed: int):
+        capacity = len(self.stamps)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+        self.stamps = np.concatenate([self.stamps, np.zeros(capacity - len(self.stamps))])
+        for name, column in self.columns.items():
+            self.columns[name] = self._extend(column, capacity)
+
+    @staticmethod
+    def _extend(column: np.ndarray, capacity: int) -> np.ndarray:
+        if column.dtype == np.float64:
+            padding = np.full(capacity - len(column), np.nan)
+        else:
+            padding = np.full(capacity - len(column), None, dtype=object)
+        return np.concatenate([column, padding])
+
+    def upsert(self, keys: List[str], rows: List[Dict[str, Any]], stamp: float):
+        """Replace the rows for `keys`; columns a row lacks become missing."""
+        positions = []
+        for key in keys:
+            position = self.index.get(key)
+            if position is None:
+                position = self.index[key] = self.size
+                self.size += 1
+            positions.append(position)
+        self._grow(self.size)
+        capacity = len(self.stamps)
+
+        names = set(self.columns)
+        for row in rows:
+            names.update(row)
+        for name in names:
+            values = [row.get(name) for row in rows]
+            column = self.columns.get(name)
+            numeric = all(value is None or _is_number(value) for value in values)
+            if column is None:
+                column = np.full(capacity, np.nan) if numeric else np.full(capacity, None, dtype=object)
+            elif column.dtype == np.float64 and not numeric:
+                widened = column.astype(object)
+                widened[np.isnan(column)] = None
+                column = widened
+            if column.dtype == np.float64:
+                column[positions] = [np.nan if value is None else value for value in values]
+            else:
+                for position, value in zip(positions, values):
+                    column[position] = value
+            self.columns[name] = column
+        self.stamps[positions] = stamp
+
+    def get_many(self, keys: List[str], max_age: float) -> List[Optional[Dict[str, Any]]]:
+        """Rows for keys written within `max_age` seconds; None for the rest."""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(keys)
+        oldest = time.time() - max_age
+        found = []
+        positions = []
+        for i, key in enumerate(keys):
+            position = self.index.get(key)
+            if position is not None and self.stamps[position] >= oldest:
+                found.append(i)
+                positions.append(position)
+        if not found:
+            return results
+        gathered = [(name, column[positions].tolist()) for name, column in self.columns.items()]
+        for j, i in enumerate(found):
+            row = {}
+            for name, values in gathered:
+                value = values[j]
+                # None marks a missing object value, NaN a missing number
+                if value is not None and value == value:
+                    row[name] = value
+            results[i] = row
+        return results
+
+
+class FeatureStore:
+    """
+    Two-tier online feature store, scoped per organization.
+
+    Redis holds every row of a feature set, as one JSON value per entity
+    under `features:<organization>:<feature_set>:<entity>`. Each worker
+    keeps a FeatureTable of the rows it has read or written recently.
+    Lookups check the local tier first and fetch everything it lacks from
+    Redis in a single MGET.
+    """
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        self.redis_client = redis_client or redis.from_url(settings.REDIS_URL)
+        self.tables: Dict[str, FeatureTable] = {}
+
+    def _table(self, name: str, incoming: int = 0) -> FeatureTable:
+        table = self.tables.get(name)
+        if table is None or table.size + incoming > settings.FEATURE_STORE_LOCAL_MAX_ROWS:
+            # Start over rather than evict row by row; Redis still has everything
+            table = self.tables[name] = FeatureTable()
+        return table
+
+    async def put(self, organization_id: Any, feature_set: str, entity_key: str, rows: List[Dict[str, Any]]) -> int:
+        """Write rows to both tiers; each replaces its entity's previous row."""
+        name = f"{organization_id}:{feature_set}"
+        keys = []
+        features = []
+        for row in rows:
+            if row.get(entity_key) is None:
+                raise ValueError(f"Row without '{entity_key}'")
+            keys.append(str(row[entity_key]))
+            features.append({column: value for column, value in row.items() if column != entity_key})
+
+        ttl = settings.FEATURE_STORE_REDIS_TTL_S or None
+        for start in range(0, len(keys), settings.FEATURE_STORE_WRITE_BATCH):
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key, row in zip(keys[start:start + settings.FEATURE_STORE_WRITE_BATCH], features[start:start + settings.FEATURE_STORE_WRITE_BATCH]):
+                pipe.set(f"features:{name}:{key}", orjson.dumps(row, default=str), ex=ttl)
+            await pipe.execute()
+        self._table(name, len(keys)).upsert(keys, features, time.time())
+        return len(keys)
+
+    async def get_many(self, organization_id: Any, feature_set: str, keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Feature rows for entity keys, None where neither tier has one."""
+        name = f"{organization_id}:{feature_set}"
+        table = self.tables.get(name)
+        results = table.get_many(keys, settings.FEATURE_STORE_LOCAL_TTL_S) if table else [None] * len(keys)
+        missing = list(dict.fromkeys(key for key, row in zip(keys, results) if row is None))
+        if not missing:
+            return results
+
+        try:
+            values = await self.redis_client.mget([f"features:{name}:{key}" for key in missing])
+        except Exception as e:
+            logger.error(f"Failed to read features for {feature_set}: {str(e)}")
+            return results
+        fetched = {key: orjson.loads(value) for key, value in zip(missing, values) if value is not None}
+        if fetched:
+            self._table(name, len(fetched)).upsert(list(fetched), list(fetched.values()), time.time())
+        return [row if row is not None else fetched.get(key) for key, row in zip(keys, results)]
+
+    async def load(self, organization_id: Any, feature_set: str, data: FeatureLoadRequest) -> int:
+        """
+        Bulk-write a CSV/Parquet dataset into the feature set, in FEATURE_STORE_WRITE_BATCH-row batches.
+
+        The path is confined to the organization's batch data, as batch job
+        paths are; `authorize_load` rejects anything else before this runs.
+        """
+        import pyarrow.dataset as ds
+        from app.services.batch_job_service import _resolve_path
+
+        loop = asyncio.get_running_loop()
+        columns = None
+        if data.columns is not None:
+            columns = [data.entity_key] + [column for column in data.columns if column != data.entity_key]
+        loaded = 0
+        try:
+            filesystem, path = _resolve_path(data.path, str(organization_id))
+            dataset = ds.dataset(path, format=data.format or Path(data.path).suffix.lstrip(".").lower(), filesystem=filesystem)
+            batches = dataset.to_batches(columns=columns, batch_size=settings.FEATURE_STORE_WRITE_BATCH)
+            while True:
+                batch = await loop.run_in_executor(None, next, batches, None)
+                if batch is None:
+                    break
+                loaded += await self.put(organization_id, feature_set, data.entity_key, batch.to_pylist())
+        except Exception as e:
+            logger.error(f"Loading feature set {feature_set} failed after {loaded} rows: {str(e)}")
+            return loaded
+        logger.info(f"Loaded {loaded} rows into feature set {feature_set}")
+        return loaded
+
+    def stats(self, organization_id: Any, feature_set: str) -> FeatureSetStats:
+        table = self.tables.get(f"{organization_id}:{feature_set}")
+        return FeatureSetStats(
+            feature_set=feature_set,
+            local_rows=table.size if table else 0,
+            columns=sorted(table.columns) if table else []
+        )
+
+
+feature_store = FeatureStore()
+
+
+class FeatureStoreService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _ensure_org_role(self, organization_id: uuid.UUID, user_id: uuid.UUID, min_role: str) -> None:
+        role_hierarchy = {"viewer": 1, "developer": 2, "admin": 3}
+        membership: Optional[OrganizationMembership] = (
+            self.db.query(OrganizationMembership)
+            .filter(
+                OrganizationMembership.organization_id == organization_id,
+                OrganizationMembership.user_id == user_id,
+            )
+            .first()
+        )
+        if not membership:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No access to organization")
+        if role_hierarchy.get(membership.role, 0) < role_hierarchy.get(min_role, 0):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient role for action")
+
+    async def ingest(self, user_id: uuid.UUID, feature_set: str, data: FeatureIngestRequest) -> FeatureSetStats:
+        self._ensure_org_role(data.organization_id, user_id, "developer")
+        try:
+            written = await feature_store.put(data.organization_id, feature_set, data.entity_key, data.rows)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        stats = feature_store.stats(data.organization_id, feature_set)
+        stats.loaded_rows = written
+        return stats
+
+    def authorize_load(self, user_id: uuid.UUID, data: FeatureLoadRequest) -> None:
+        from app.services.batch_job_service import _resolve_path
+
+        self._ensure_org_role(data.organization_id, user_id, "developer")
+        _resolve_path(data.path, str(data.organization_id))
+        fmt = data.format or Path(data.path).suffix.lstrip(".").lower()
+        if fmt not in ("csv", "parquet"):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cannot infer dataset format; set format to csv or parquet"
+            )
+
+    def get_stats(self, user_id: uuid.UUID, organization_id: uuid.UUID, feature_set: str) -> FeatureSetStats:
+        self._ensure_org_role(organization_id, user_id, "viewer")
+        return feature_store.stats(organization_id, feature_set)
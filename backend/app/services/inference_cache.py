@@ -0,0 +1,499 @@
+"""
+Inference Cache.
+Per-instance, content-addressed prediction cache backed by Redis.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import orjson
+import redis as redis_sync
+import redis.asyncio as redis
+from prometheus_client import Counter
+
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "inference_cache:invalidate"
+RESULTS_CHANNEL = "inference_cache:results"
+
+CACHE_LOOKUPS = Counter(
+    "inference_cache_lookups_total",
+    "Per-instance inference cache lookups by tier",
+    ["deployment_id", "result"]
+)
+
+COALESCED_REQUESTS = Counter(
+    "inference_coalesced_instances_total",
+    "Instances served from an identical in-flight prediction instead of the model",
+    ["deployment_id", "scope"]
+)
+
+
+def canonical_encoding(instance: Dict[str, Any]) -> bytes:
+    """Stable byte encoding of an instance, independent of key order and process."""
+    try:
+        return orjson.dumps(instance, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str)
+    except TypeError:
+        # orjson refuses integers beyond 64 bits
+        return json.dumps(
+            instance,
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False,
+            default=str
+        ).encode("utf-8")
+
+
+def instance_digest(instance: Dict[str, Any]) -> str:
+    """BLAKE2b digest of an instance's canonical encoding."""
+    return hashlib.blake2b(canonical_encoding(instance), digest_size=16).hexdigest()
+
+
+class FrequencySketch:
+    """
+    Count-min sketch with 4-bit saturating counters and periodic aging.
+
+    Used as the TinyLFU admission filter: it estimates how often a key
+    has been requested recently without storing the keys themselves.
+    """
+
+    DEPTH = 4
+    MAX_COUNT = 15
+
+    def __init__(self, width: int = 4096):
+        self.width = 1 << max(4, (width - 1).bit_length())
+        self.mask = self.width - 1
+        self.tables = [bytearray(self.width) for _ in range(self.DEPTH)]
+        self.additions = 0
+        self.sample_size = 10 * self.width
+
+    def _indexes(self, key: str) -> Iterable[Tuple[bytearray, int]]:
+        h = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(h, "little")
+        for i, table in enumerate(self.tables):
+            yield table, (value >> (16 * i)) & self.mask
+
+    def increment(self, key: str):
+        for table, index in self._indexes(key):
+            if table[index] < self.MAX_COUNT:
+                table[index] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self._age()
+
+    def estimate(self, key: str) -> int:
+        return min(table[index] for table, index in self._indexes(key))
+
+    def _age(self):
+        for table in self.tables:
+            for i in range(self.width):
+                table[i] >>= 1
+        self.additions //= 2
+
+
+class LocalCache:
+    """
+    Bounded in-process cache with TinyLFU admission, LRU eviction by size and TTLs.
+
+    A new entry is only admitted over the LRU victim if the sketch has seen
+    it requested more often, so one-off keys cannot flush hot ones.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.entries: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        self.used_bytes = 0
+        self.sketch = FrequencySketch(width=max(1024, max_bytes // 512))
+
+    def get(self, key: str) -> Optional[Any]:
+        self.sketch.increment(key)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, size, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: Any, size: int, ttl_seconds: Optional[float] = None) -> bool:
+        """Insert an entry if it passes admission. Returns whether it was stored."""
+        if size > self.max_bytes:
+            return False
+        if key in self.entries:
+            self._remove(key)
+
+        if self.used_bytes + size > self.max_bytes and self.entries:
+            victim = next(iter(self.entries))
+            if self.sketch.estimate(key) <= self.sketch.estimate(victim):
+                return False
+            while self.used_bytes + size > self.max_bytes and self.entries:
+                self._remove(next(iter(self.entries)))
+
+        ttl = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        self.entries[key] = (value, size, time.monotonic() + ttl)
+        self.used_bytes += size
+        return True
+
+    def invalidate_prefix(self, prefix: str) -> int:
+        keys = [key for key in self.entries if key.startswith(prefix)]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def _remove(self, key: str):
+        _, size, _ = self.entries.pop(key)
+        self.used_bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.entries),
+            "used_bytes": self.used_bytes,
+            "max_bytes": self.max_bytes
+        }
+
+
+@dataclass
+class Flight:
+    """
+    A request's share of in-flight predictions after claiming its missed digests.
+
+    `leading` digests must be scored by the caller; `waiting` digests are
+    already being scored elsewhere (in this worker or, for `remote`, another one).
+    """
+
+    model_version_id: Any
+    distributed: bool
+    leading: List[str] = field(default_factory=list)
+    waiting: Dict[str, "asyncio.Future"] = field(default_factory=dict)
+    remote: List[str] = field(default_factory=list)
+    locks: Dict[str, str] = field(default_factory=dict)
+
+
+# Sync client for publish_invalidation, created on first use; its connection pool is shared by all callers
+_publisher: Optional[redis_sync.Redis] = None
+
+
+def publish_invalidation(model_version_ids: Sequence[Any]):
+    """
+    Tell every worker to drop L1 entries for the given model versions.
+
+    Synchronous so it can be called from the (sync) deployment service.
+    """
+    global _publisher
+    try:
+        if _publisher is None:
+            _publisher = redis_sync.from_url(settings.REDIS_URL)
+        _publisher.publish(
+            INVALIDATION_CHANNEL,
+            json.dumps({"model_version_ids": [str(v) for v in model_version_ids]})
+        )
+    except Exception as e:
+        logger.error(f"Failed to publish inference cache invalidation: {str(e)}")
+
+
+class InferenceCache:
+    """
+    Caches individual prediction rows keyed by model version and input digest.
+
+    Lookups go to the in-process L1 first and fall back to Redis (L2) for
+    the remaining keys in a single MGET.
+    """
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        self.redis_client = redis_client or redis.from_url(settings.REDIS_URL)
+        self.ttl = settings.INFERENCE_CACHE_TTL
+        self.local = LocalCache(
+            max_bytes=settings.INFERENCE_L1_CACHE_MAX_BYTES,
+            ttl_seconds=min(settings.INFERENCE_L1_CACHE_TTL, self.ttl)
+        )
+        self.listener_task: Optional[asyncio.Task] = None
+        self.in_flight: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def key(model_version_id: Any, digest: str) -> str:
+        return f"inference:{model_version_id}:{digest}"
+
+    async def lookup(
+        self,
+        model_version_id: Any,
+        digests: Sequence[str]
+    ) -> Tuple[List[Optional[Dict[str, Any]]], Dict[str, int]]:
+        """
+        Look up cached rows in L1, then the remainder in Redis with one MGET.
+
+        Returns:
+            One entry per digest (the cached row or None on a miss) and
+            hit counts per tier
+        """
+        self._ensure_listener()
+        counts = {"l1_hits": 0, "l2_hits": 0, "misses": 0}
+        if not digests:
+            return [], counts
+
+        keys = [self.key(model_version_id, d) for d in digests]
+        rows: List[Optional[Dict[str, Any]]] = [self.local.get(k) for k in keys]
+        remaining = [i for i, row in enumerate(rows) if row is None]
+        counts["l1_hits"] = len(keys) - len(remaining)
+
+        if remaining:
+            try:
+                values = await self.redis_client.mget([keys[i] for i in remaining])
+            except Exception as e:
+                logger.error(f"Inference cache lookup failed: {str(e)}")
+                values = [None] * len(remaining)
+            for i, value in zip(remaining, values):
+                if value:
+                    rows[i] = orjson.loads(value)
+                    self.local.put(keys[i], rows[i], len(value))
+                    counts["l2_hits"] += 1
+
+        counts["misses"] = len(keys) - counts["l1_hits"] - counts["l2_hits"]
+        return rows, counts
+
+    @staticmethod
+    def body_key(model_version_id: Any, body_digest: str) -> str:
+        return f"inference:{model_version_id}:body:{body_digest}"
+
+    def body_digests(self, model_version_id: Any, body_digest: str) -> Optional[List[str]]:
+        """
+        Instance digests of a request body seen before on this worker.
+
+        Lets byte-identical repeat requests be looked up without decoding
+        the body. L1 only, so unseen bodies cost no Redis round trip.
+        """
+        return self.local.get(self.body_key(model_version_id, body_digest))
+
+    def remember_body(self, model_version_id: Any, body_digest: str, digests: List[str]):
+        """Record a body's instance digests for `body_digests`."""
+        self.local.put(self.body_key(model_version_id, body_digest), digests, 33 * len(digests))
+
+    async def get_many(
+        self,
+        model_version_id: Any,
+        digests: Sequence[str]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Look up cached rows; see `lookup` for per-tier hit counts."""
+        rows, _ = await self.lookup(model_version_id, digests)
+        return rows
+
+    async def set_many(self, model_version_id: Any, rows: Dict[str, Dict[str, Any]]):
+        """Store scored rows in L1 and in Redis with one pipelined round trip."""
+        if not rows:
+            return
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for digest, row in rows.items():
+                key = self.key(model_version_id, digest)
+                encoded = orjson.dumps(row, default=str)
+                self.local.put(key, row, len(encoded))
+                pipe.setex(key, self.ttl, encoded)
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Inference cache write failed: {str(e)}")
+
+    async def claim(
+        self,
+        model_version_id: Any,
+        digests: Sequence[str],
+        distributed: bool = False,
+        lock_ms: int = 2000
+    ) -> Flight:
+        """
+        Join identical in-flight predictions or become their leader.
+
+        With `distributed`, leadership is also claimed across workers with a
+        short Redis lock; digests locked elsewhere are awaited via pub/sub.
+        """
+        self._ensure_listener()
+        loop = asyncio.get_running_loop()
+        flight = Flight(model_version_id=model_version_id, distributed=distributed)
+        for digest in digests:
+            key = self.key(model_version_id, digest)
+            future = self.in_flight.get(key)
+            if future is not None:
+                flight.waiting[digest] = future
+            else:
+                self.in_flight[key] = loop.create_future()
+                flight.leading.append(digest)
+
+        if distributed and flight.leading:
+            await self._claim_locks(flight, lock_ms)
+        return flight
+
+    async def _claim_locks(self, flight: Flight, lock_ms: int):
+        keys = [self.key(flight.model_version_id, d) for d in flight.leading]
+        token = uuid.uuid4().hex
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key in keys:
+                pipe.set(f"{key}:lock", token, nx=True, px=lock_ms)
+            acquired = await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to acquire coalescing locks: {str(e)}")
+            return
+
+        leading = []
+        for digest, key, ok in zip(flight.leading, keys, acquired):
+            if ok:
+                leading.append(digest)
+                flight.locks[key] = token
+            else:
+                flight.waiting[digest] = self.in_flight[key]
+                flight.remote.append(digest)
+        flight.leading = leading
+
+        # The other worker may have finished before we started listening
+        if flight.remote:
+            rows = await self.get_many(flight.model_version_id, flight.remote)
+            for digest, row in zip(flight.remote, rows):
+                if row is not None:
+                    self._resolve(self.key(flight.model_version_id, digest), row)
+
+    async def complete(self, flight: Flight, rows: Dict[str, Dict[str, Any]]):
+        """
+        Hand the leader's results to everyone waiting on them.
+
+        Digests missing from `rows` (the leader failed) resolve to None so
+        followers fall back to scoring them themselves.
+        """
+        keys = {self.key(flight.model_version_id, d): rows.get(d) for d in flight.leading}
+        for key, row in keys.items():
+            self._resolve(key, row)
+        if not flight.locks:
+            return
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.publish(RESULTS_CHANNEL, json.dumps({key: keys[key] for key in flight.locks}, default=str))
+            for key in flight.locks:
+                pipe.delete(f"{key}:lock")
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to publish coalesced results: {str(e)}")
+
+    async def wait(self, flight: Flight, timeout: float) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Await the rows this request is following.
+
+        Returns:
+            Row per waiting digest, or None where the leader failed or timed out
+        """
+        if not flight.waiting:
+            return {}
+        futures = list(flight.waiting.values())
+        await asyncio.wait([asyncio.shield(f) for f in futures], timeout=max(timeout, 0))
+        self.abandon(flight)
+        return {
+            digest: future.result() if future.done() else None
+            for digest, future in flight.waiting.items()
+        }
+
+    def abandon(self, flight: Flight):
+        """
+        Stop waiting on other workers' results for this flight.
+
+        Remote waits are owned by the request that claimed them, so local
+        followers of those digests are released with no result (and score
+        the rows themselves) once it times out or fails before waiting.
+        """
+        for digest in flight.remote:
+            self._resolve(self.key(flight.model_version_id, digest), None)
+
+    def _resolve(self, key: str, row: Optional[Dict[str, Any]]):
+        future = self.in_flight.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(row)
+
+    def invalidate_local(self, model_version_ids: Sequence[Any]) -> int:
+        """Drop this worker's L1 entries for the given model versions, including their cascade and pipeline namespaces."""
+        return sum(
+            self.local.invalidate_prefix(f"inference:{model_version_id}{separator}")
+            for model_version_id in model_version_ids
+            for separator in (":", "+")
+        )
+
+    def _ensure_listener(self):
+        """Start the pub/sub invalidation listener once an event loop is running."""
+        if self.listener_task is None or self.listener_task.done():
+            self.listener_task = asyncio.get_running_loop().create_task(self._listen_for_invalidations())
+
+    async def _listen_for_invalidations(self):
+        while True:
+            try:
+                pubsub = self.redis_client.pubsub()
+                await pubsub.subscribe(INVALIDATION_CHANNEL, RESULTS_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    channel = message["channel"]
+                    channel = channel.decode() if isinstance(channel, bytes) else channel
+                    payload = json.loads(message["data"])
+                    if channel == RESULTS_CHANNEL:
+                        for key, row in payload.items():
+                            self._resolve(key, row)
+                        continue
+                    removed = self.invalidate_local(payload.get("model_version_ids", []))
+                    logger.info(f"Invalidated {removed} local inference cache entries")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Inference cache invalidation listener failed: {str(e)}")
+                await asyncio.sleep(5)
+
+    async def record_lookups(self, deployment_id: Any, counts: Dict[str, int]):
+        """Count hits per tier and misses per deployment, shared across workers."""
+        CACHE_LOOKUPS.labels(str(deployment_id), "l1_hit").inc(counts.get("l1_hits", 0))
+        CACHE_LOOKUPS.labels(str(deployment_id), "l2_hit").inc(counts.get("l2_hits", 0))
+        CACHE_LOOKUPS.labels(str(deployment_id), "miss").inc(counts.get("misses", 0))
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for counter in ("l1_hits", "l2_hits", "misses"):
+                pipe.hincrby(f"inference_cache_stats:{deployment_id}", counter, counts.get(counter, 0))
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to record inference cache stats: {str(e)}")
+
+    async def record_coalesced(self, deployment_id: Any, local: int, remote: int):
+        """Count instances served by another request's in-flight prediction."""
+        COALESCED_REQUESTS.labels(str(deployment_id), "local").inc(local)
+        COALESCED_REQUESTS.labels(str(deployment_id), "remote").inc(remote)
+        try:
+            await self.redis_client.hincrby(f"inference_cache_stats:{deployment_id}", "coalesced", local + remote)
+        except Exception as e:
+            logger.error(f"Failed to record coalescing stats: {str(e)}")
+
+    async def get_stats(self, deployment_id: Any) -> Dict[str, Any]:
+        """Aggregate L1, L2 and overall hit rates for a deployment."""
+        try:
+            raw = await self.redis_client.hgetall(f"inference_cache_stats:{deployment_id}")
+        except Exception as e:
+            logger.error(f"Failed to read inference cache stats: {str(e)}")
+            return {}
+        stats = {k.decode() if isinstance(k, bytes) else k: int(v) for k, v in raw.items()}
+        l1_hits = stats.get("l1_hits", 0)
+        l2_hits = stats.get("l2_hits", 0)
+        misses = stats.get("misses", 0)
+        total = l1_hits + l2_hits + misses
+        l2_lookups = l2_hits + misses
+        return {
+            "l1_hits": l1_hits,
+            "l2_hits": l2_hits,
+            "misses": misses,
+            "l1_hit_rate": round(l1_hits / total, 4) if total else 0.0,
+            "l2_hit_rate": round(l2_hits / l2_lookups, 4) if l2_lookups else 0.0,
+            "hit_rate": round((l1_hits + l2_hits) / total, 4) if total else 0.0,
+            "coalesced": stats.get("coalesced", 0),
+            "local": self.local.stats()
+        }
@@ -12,25 +12,61 @@ from datetime import datetime
 import asyncio
 import pickle
 import joblib
+import orjson
+import weakref
+from concurrent.futures import Executor
 from pathlib import Path
 
+from app.core.config import settings
+from app.core.scheduler import FairScheduler
 from app.models.deployment import Deployment
 from app.schemas.inference import PredictionResult
+from app.services.feature_store import feature_store
+from app.services.onnx_model import OnnxModel
+from app.services.schema_validator import CompiledSchema
+from app.services.sparse_features import SPARSE_FRAMEWORKS
+from app.services.tf_model import TensorflowModel
 from app.core.exceptions import ValidationError, ModelError, InferenceError
 
 
 logger = logging.getLogger(__name__)
 
 
+class ServingTarget:
+    """
+    The deployment-shaped view of a model version that `InferenceService.predict` expects.
+    
+    Used to score versions that aren't a deployment's own, e.g. while tuning,
+    in later cascade stages or for a canary's share of traffic.
+    """
+    
+    def __init__(self, model_version: Any, deployment_config: Optional[Dict[str, Any]] = None, id: Any = None):
+        self.id = id
+        self.model_version = model_version
+        self.deployment_config = deployment_config or {}
+    
+    @property
+    def model_version_id(self) -> Any:
+        return self.model_version.id
+
+
 class InferenceService:
     """Service for handling model inference operations."""
     
-    def __init__(self):
+    def __init__(self, executor: Optional[Executor] = None):
         self.supported_frameworks = {
             'sklearn', 'xgboost', 'lightgbm', 'pytorch', 'tensorflow', 
             'onnx', 'mlflow', 'catboost', 'prophet'
         }
         self.preprocessing_cache = {}
+        # Model execution runs off the event loop so abandoned requests can be cancelled,
+        # fair-queued across organizations and API-key tiers
+        self.executor = executor or FairScheduler(
+            max_workers=settings.INFERENCE_WORKER_THREADS,
+            thread_name_prefix="inference"
+        )
+        # Per-booster metadata (feature order, objective, applied thread count)
+        self._booster_meta = weakref.WeakKeyDictionary()
         
     async def validate_input(
         self, 
@@ -51,142 +87,54 @@ class InferenceService:
             ValidationError: If validation fails
         """
         try:
-            validated_instances = []
-            
-            # Get schema requirements
-            required_features = model_schema.get('input_schema', {}).get('required', [])
-            feature_types = model_schema.get('input_schema', {}).get('properties', {})
-            
-            for i, instance in enumerate(instances):
-                # Check required features
-                missing_features = set(required_features) - set(instance.keys())
-                if missing_features:
-                    raise ValidationError(
-                        f"Instance {i}: Missing required features: {missing_features}"
-                    )
-                
-                # Validate feature types and values
-                validated_instance = await self._validate_instance_types(
-                    instance, feature_types, i
-                )
-                
-                # Apply preprocessing if defined
-                if 'preprocessing' in model_schema:
-                    validated_instance = await self._apply_preprocessing(
-                        validated_instance, model_schema['preprocessing']
-                    )
-                
-                validated_instances.append(validated_instance)
-                
-            return validated_instances
-            
+            return self._compiled_schema(model_schema).validate(instances)
         except Exception as e:
             logger.error(f"Input validation failed: {str(e)}")
             raise ValidationError(f"Input validation failed: {str(e)}")
     
-    async def _validate_instance_types(
-        self, 
-        instance: Dict[str, Any], 
-        feature_types: Dict[str, Any], 
-        instance_index: int
-    ) -> Dict[str, Any]:
-        """Validate and convert feature types."""
-        validated = {}
+    async def join_features(
+        self,
+        instances: List[Dict[str, Any]],
+        deployment: Deployment
+    ) -> List[Dict[str, Any]]:
+        """
+        Fill instances from the online feature store by entity key.
         
-        for feature, value in instance.items():
-            if feature in feature_types:
-                expected_type = feature_types[feature].get('type')
-                
-                try:
-                    if expected_type == 'number':
-                        validated[feature] = float(value)
-                    elif expected_type == 'integer':
-                        validated[feature] = int(value)
-                    elif expected_type == 'string':
-                        validated[feature] = str(value)
-                    elif expected_type == 'boolean':
-                        validated[feature] = bool(value)
-                    elif expected_type == 'array':
-                        if not isinstance(value, list):
-                            raise ValueError(f"Expected array for {feature}")
-                        validated[feature] = value
-                    else:
-                        validated[feature] = value
-                        
-                    # Check value constraints
-                    await self._validate_constraints(
-                        feature, validated[feature], feature_types[feature]
-                    )
-                    
-                except (ValueError, TypeError) as e:
-                    raise ValidationError(
-                        f"Instance {instance_index}: Invalid type for feature '{feature}': {str(e)}"
-                    )
-            else:
-                # Unknown feature - keep as is but log warning
-                logger.warning(f"Unknown feature '{feature}' in instance {instance_index}")
-                validated[feature] = value
-                
-        return validated
-    
-    async def _validate_constraints(
-        self, 
-        feature: str, 
-        value: Any, 
-        constraints: Dict[str, Any]
-    ):
-        """Validate feature constraints like min, max, enum values."""
-        if 'minimum' in constraints and value < constraints['minimum']:
-            raise ValidationError(f"Feature '{feature}' value {value} below minimum {constraints['minimum']}")
-            
-        if 'maximum' in constraints and value > constraints['maximum']:
-            raise ValidationError(f"Feature '{feature}' value {value} above maximum {constraints['maximum']}")
-            
-        if 'enum' in constraints and value not in constraints['enum']:
-            raise ValidationError(f"Feature '{feature}' value {value} not in allowed values {constraints['enum']}")
-            
-        if 'pattern' in constraints and isinstance(value, str):
-            import re
-            if not re.match(constraints['pattern'], value):
-                raise ValidationError(f"Feature '{feature}' value doesn't match pattern {constraints['pattern']}")
+        `deployment_config["features"]` names the feature set and the
+        instance field holding the entity key. Stored features are fetched in
+        one batched lookup; values sent in the instance take precedence, and
+        the entity key itself is dropped since it isn't a model feature.
+        Instances whose entity has no stored row are passed on as sent.
+        """
+        config = (deployment.deployment_config or {}).get("features")
+        if not config:
+            return instances
+        entity_key = config["entity_key"]
+        keys = [
+            str(instance[entity_key]) if instance.get(entity_key) is not None else None
+            for instance in instances
+        ]
+        present = [key for key in keys if key is not None]
+        rows = await feature_store.get_many(deployment.organization_id, config["feature_set"], present) if present else []
+        stored = dict(zip(present, rows))
+        joined = []
+        for instance, key in zip(instances, keys):
+            features = stored.get(key) if key is not None else None
+            row = {**features, **instance} if features else dict(instance)
+            row.pop(entity_key, None)
+            joined.append(row)
+        return joined
     
-    async def _apply_preprocessing(
-        self, 
-        instance: Dict[str, Any], 
-        preprocessing_config: Dict[str, Any]
-    ) -> Dict[str, Any]:
-        """Apply preprocessing transformations."""
-        processed = instance.copy()
-        
-        # Apply scaling
-        if 'scaling' in preprocessing_config:
-            for feature, scale_config in preprocessing_config['scaling'].items():
-                if feature in processed:
-                    if scale_config['type'] == 'standard':
-                        mean = scale_config['mean']
-                        std = scale_config['std']
-                        processed[feature] = (processed[feature] - mean) / std
-                    elif scale_config['type'] == 'minmax':
-                        min_val = scale_config['min']
-                        max_val = scale_config['max']
-                        processed[feature] = (processed[feature] - min_val) / (max_val - min_val)
-        
-        # Apply encoding
-        if 'encoding' in preprocessing_config:
-            for feature, encode_config in preprocessing_config['encoding'].items():
-                if feature in processed:
-                    if encode_config['type'] == 'onehot':
-                        # One-hot encoding
-                        categories = encode_config['categories']
-                        value = processed.pop(feature)
-                        for category in categories:
-                            processed[f"{feature}_{category}"] = 1 if value == category else 0
-                    elif encode_config['type'] == 'label':
-                        # Label encoding
-                        mapping = encode_config['mapping']
-                        processed[feature] = mapping.get(processed[feature], 0)
-        
-        return processed
+    def _compiled_schema(self, model_schema: Dict[str, Any]) -> CompiledSchema:
+        """Compiled validator for a schema, cached by the schema's canonical bytes."""
+        key = orjson.dumps(model_schema, option=orjson.OPT_SORT_KEYS, default=str)
+        compiled = self.preprocessing_cache.get(key)
+        if compiled is None:
+            if len(self.preprocessing_cache) >= 256:
+                self.preprocessing_cache.clear()
+            compiled = CompiledSchema(model_schema)
+            self.preprocessing_cache[key] = compiled
+        return compiled
     
     async def predict(
         self, 
@@ -209,14 +157,10 @@ class InferenceService:
             InferenceError: If prediction fails
         """
         try:
-            # Convert instances to appropriate format
-            input_data = await self._prepare_model_input(instances, deployment)
-            
-            # Make predictions based on model framework
-            predictions = await self._run_prediction(model, input_data, deployment)
+            predictions = await self.predict_raw(model, instances, deployment)
             
             # Postprocess predictions
-            processed_predictions = await self._postprocess_predictions(
+            processed_predictions = await self.postprocess_predictions(
                 predictions, deployment, instances
             )
             
@@ -226,6 +170,173 @@ class InferenceService:
             logger.error(f"Prediction failed: {str(e)}")
             raise InferenceError(f"Model prediction failed: {str(e)}")
     
+    async def predict_raw(self, model: Any, instances: Any, deployment: Deployment) -> Any:
+        """
+        Run the model and return its output before postprocessing.
+        
+        `instances` are validated instance dicts, or an already-built feature
+        matrix (e.g. another model's output inside a pipeline), which is handed
+        to the model as is.
+        
+        Returns:
+            The framework's raw output: an array, or a dict of 'predictions'
+            and 'probabilities'
+        """
+        model_framework = deployment.model_version.framework
+        loop = asyncio.get_running_loop()
+        if isinstance(instances, np.ndarray):
+            if self._is_native_booster(model, model_framework):
+                return await loop.run_in_executor(
+                    self.executor,
+                    self._run_booster_prediction_sync,
+                    model,
+                    np.asarray(instances, dtype=np.float32),
+                    model_framework,
+                    self._booster_options(deployment)
+                )
+            if isinstance(model, (OnnxModel, TensorflowModel)):
+                return await loop.run_in_executor(self.executor, model.predict, model.prepare_inputs(instances))
+            return await self._run_prediction(model, instances, deployment)
+        
+        model_schema = deployment.model_version.model_schema
+        sparse_layout = self._compiled_schema(model_schema).sparse if model_schema else None
+        if sparse_layout is not None:
+            # Sparse/hashed encodings: one CSR matrix in the schema's column layout
+            input_data = sparse_layout.encode(instances)
+            return await self._run_sparse_prediction(model, input_data, deployment)
+        if self._is_native_booster(model, model_framework):
+            # Raw boosters take a contiguous array straight into in-place prediction
+            input_data = self._prepare_booster_input(model, instances, model_framework, model_schema)
+            return await loop.run_in_executor(
+                self.executor,
+                self._run_booster_prediction_sync,
+                model,
+                input_data,
+                model_framework,
+                self._booster_options(deployment)
+            )
+        if isinstance(model, (OnnxModel, TensorflowModel)):
+            # Named inputs are built from the I/O metadata resolved at load
+            input_data = model.prepare_inputs(instances)
+            return await loop.run_in_executor(self.executor, model.predict, input_data)
+        
+        # Convert instances to appropriate format
+        input_data = await self._prepare_model_input(instances, deployment)
+        
+        # Make predictions based on model framework
+        return await self._run_prediction(model, input_data, deployment)
+    
+    def supports_columns(self, model: Any, deployment: Deployment) -> bool:
+        """Whether `predict_columns` can score this model straight from feature columns."""
+        model_schema = deployment.model_version.model_schema
+        if model_schema and not self._compiled_schema(model_schema).columnar:
+            return False
+        if isinstance(model, TensorflowModel):
+            return len(model.input_specs) == 1
+        return isinstance(model, OnnxModel) or deployment.model_version.framework in (
+            'sklearn', 'xgboost', 'lightgbm', 'catboost', 'pytorch'
+        )
+
+    async def predict_columns(self, model: Any, columns: Dict[str, np.ndarray], deployment: Deployment) -> Any:
+        """
+        Validate and score a batch held as one numpy array per feature.
+
+        Columnar counterpart of validate_input + predict_raw for binary
+        clients, skipping per-row dicts entirely. Only for models where
+        `supports_columns` holds.
+
+        Returns:
+            The framework's raw output, as predict_raw does
+        """
+        model_schema = deployment.model_version.model_schema
+        try:
+            if model_schema:
+                columns = self._compiled_schema(model_schema).validate_columns(columns)
+        except Exception as e:
+            logger.error(f"Input validation failed: {str(e)}")
+            raise ValidationError(f"Input validation failed: {str(e)}")
+
+        model_framework = deployment.model_version.framework
+        loop = asyncio.get_running_loop()
+        if self._is_native_booster(model, model_framework):
+            feature_names = self._booster_feature_order(model, model_framework, model_schema)
+            rows = len(next(iter(columns.values()))) if columns else 0
+            missing = np.full(rows, np.nan, dtype=np.float32)
+            matrix = np.column_stack([columns.get(feature, missing) for feature in feature_names]).astype(np.float32)
+            return await loop.run_in_executor(
+                self.executor,
+                self._run_booster_prediction_sync,
+                model,
+                matrix,
+                model_framework,
+                self._booster_options(deployment)
+            )
+        if isinstance(model, OnnxModel):
+            feeds = model.prepare_frame(pd.DataFrame(columns, copy=False))
+            return await loop.run_in_executor(self.executor, model.predict, feeds)
+        matrix_input = isinstance(model, TensorflowModel) or model_framework == 'pytorch'
+        if matrix_input:
+            matrix = np.column_stack(list(columns.values())).astype(np.float32)
+            if isinstance(model, TensorflowModel):
+                return await loop.run_in_executor(self.executor, model.predict, model.prepare_inputs(matrix))
+            return await self._run_prediction(model, matrix, deployment)
+        return await self._run_prediction(model, pd.DataFrame(columns, copy=False), deployment)
+
+    def postprocess_columns(self, predictions: Any, deployment: Deployment) -> Dict[str, Any]:
+        """
+        Raw model output as whole columns, mirroring postprocess_predictions.
+
+        Returns:
+            'predictions' and, when the model produced them, 'probabilities'
+            (rows x classes), 'classes' (names of the probability columns, for
+            classifiers) and 'confidence'
+        """
+        if isinstance(predictions, dict):
+            pred_values = np.asarray(predictions.get('predictions', []))
+            probabilities = predictions.get('probabilities', None)
+        else:
+            pred_values = np.asarray(predictions)
+            probabilities = None
+        output: Dict[str, Any] = {'predictions': pred_values}
+        if probabilities is None:
+            return output
+
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        output['confidence'] = probabilities.max(axis=1)
+        if deployment.model_version.model.problem_type == 'classification':
+            class_names = deployment.model_version.model_schema.get('output_schema', {}).get('classes', [])
+            if not class_names or len(class_names) != probabilities.shape[1]:
+                class_names = [f"class_{j}" for j in range(probabilities.shape[1])]
+            output['probabilities'] = probabilities
+            output['classes'] = [str(name) for name in class_names]
+        return output
+
+    async def _run_sparse_prediction(self, model: Any, matrix: Any, deployment: Deployment) -> Any:
+        """
+        Score a CSR matrix.
+        
+        sklearn, XGBoost and LightGBM models take it as is; other frameworks
+        get it densified to a float32 matrix.
+        """
+        model_framework = deployment.model_version.framework
+        loop = asyncio.get_running_loop()
+        if self._is_native_booster(model, model_framework):
+            return await loop.run_in_executor(
+                self.executor,
+                self._run_booster_prediction_sync,
+                model,
+                matrix,
+                model_framework,
+                self._booster_options(deployment)
+            )
+        if model_framework in SPARSE_FRAMEWORKS:
+            return await self._run_prediction(model, matrix, deployment)
+        
+        dense = matrix.toarray()
+        if isinstance(model, (OnnxModel, TensorflowModel)):
+            return await loop.run_in_executor(self.executor, model.predict, model.prepare_inputs(dense))
+        return await self._run_prediction(model, dense, deployment)
+    
     async def _prepare_model_input(
         self, 
         instances: List[Dict[str, Any]], 
@@ -271,8 +382,33 @@ class InferenceService:
         input_data: Any, 
         deployment: Deployment
     ) -> Any:
-        """Run the actual model prediction."""
+        """Run the actual model prediction on the inference executor."""
         model_framework = deployment.model_version.framework
+        options = (deployment.deployment_config or {}).get(model_framework, {})
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor,
+            self._run_prediction_sync,
+            model,
+            input_data,
+            model_framework,
+            options
+        )
+    
+    def _run_prediction_sync(
+        self, 
+        model: Any, 
+        input_data: Any, 
+        model_framework: str,
+        options: Optional[Dict[str, Any]] = None
+    ) -> Any:
+        """
+        Run the actual model prediction.
+        
+        `options` are the deployment's settings for this framework, from
+        deployment_config[<framework>].
+        """
+        options = options or {}
         
         try:
             if model_framework in ['sklearn', 'xgboost', 'lightgbm', 'catboost']:
@@ -289,22 +425,29 @@ class InferenceService:
                 
             elif model_framework == 'pytorch':
                 import torch
-                model.eval()
-                with torch.no_grad():
-                    if isinstance(input_data, np.ndarray):
-                        input_tensor = torch.FloatTensor(input_data)
-                    else:
-                        input_tensor = input_data
+                # Eval mode is set once at load; torch's intra-op pool is process-wide
+                threads = options.get('threads', settings.TORCH_THREADS)
+                if threads and torch.get_num_threads() != threads:
+                    torch.set_num_threads(threads)
+                if isinstance(input_data, np.ndarray):
+                    # Shares the numpy buffer instead of copying it
+                    input_tensor = torch.from_numpy(np.ascontiguousarray(input_data))
+                else:
+                    input_tensor = input_data
+                with torch.inference_mode():
                     predictions = model(input_tensor)
-                    return predictions.numpy() if hasattr(predictions, 'numpy') else predictions
+                return predictions.numpy() if hasattr(predictions, 'numpy') else predictions
                     
             elif model_framework == 'tensorflow':
+                if isinstance(model, TensorflowModel):
+                    return model.predict(model.prepare_inputs(input_data))
                 predictions = model.predict(input_data)
                 return predictions
                 
             elif model_framework == 'onnx':
-                import onnxruntime as ort
-                # Assume model is an ONNX session
+                if isinstance(model, OnnxModel):
+                    return model.predict(input_data)
+                # Bare InferenceSession: single input
                 input_name = model.get_inputs()[0].name
                 predictions = model.run(None, {input_name: input_data['input']})
                 return predictions[0]
@@ -319,7 +462,125 @@ class InferenceService:
         except Exception as e:
             raise InferenceError(f"Model prediction failed: {str(e)}")
     
-    async def _postprocess_predictions(
+    def _is_native_booster(self, model: Any, model_framework: str) -> bool:
+        """Whether the model is a raw xgboost/lightgbm Booster rather than an sklearn wrapper."""
+        if model_framework == 'xgboost':
+            import xgboost as xgb
+            return isinstance(model, xgb.Booster)
+        if model_framework == 'lightgbm':
+            import lightgbm as lgb
+            return isinstance(model, lgb.Booster)
+        return False
+    
+    def _booster_options(self, deployment: Deployment) -> Dict[str, Any]:
+        """Per-deployment booster settings from deployment_config["booster"]."""
+        config = (deployment.deployment_config or {}).get('booster', {})
+        return {
+            'threads': config.get('threads', settings.BOOSTER_THREADS),
+            'tree_limit': config.get('tree_limit')
+        }
+    
+    def _get_booster_meta(self, model: Any, model_framework: str) -> Dict[str, Any]:
+        """Read feature names and objective once per loaded booster."""
+        meta = self._booster_meta.get(model)
+        if meta is not None:
+            return meta
+        
+        if model_framework == 'xgboost':
+            learner = json.loads(model.save_config())['learner']
+            meta = {
+                'feature_names': model.feature_names,
+                'objective': learner['objective']['name']
+            }
+        else:
+            feature_names = model.feature_name()
+            meta = {
+                # LightGBM names unnamed features Column_0, Column_1, ...
+                'feature_names': None if feature_names == [f"Column_{i}" for i in range(len(feature_names))] else feature_names,
+                'objective': str(model.params.get('objective', ''))
+            }
+        self._booster_meta[model] = meta
+        return meta
+    
+    def _booster_feature_order(
+        self, 
+        model: Any, 
+        model_framework: str, 
+        model_schema: Optional[Dict[str, Any]]
+    ) -> List[str]:
+        """
+        Column order a booster was trained on: its own feature names, or
+        failing those the input_schema properties in declaration order.
+        
+        Raises:
+            InferenceError: If the booster has no feature names and the schema declares no properties
+        """
+        feature_names = self._get_booster_meta(model, model_framework)['feature_names']
+        if feature_names:
+            return feature_names
+        schema_order = list(((model_schema or {}).get('input_schema') or {}).get('properties', {}))
+        if not schema_order:
+            raise InferenceError(
+                "Booster has no feature names; declare input_schema properties in training column order"
+            )
+        return schema_order
+    
+    def _prepare_booster_input(
+        self, 
+        model: Any, 
+        instances: List[Dict[str, Any]], 
+        model_framework: str,
+        model_schema: Optional[Dict[str, Any]] = None
+    ) -> np.ndarray:
+        """Build a C-contiguous float32 matrix in the booster's feature order; missing values become NaN."""
+        feature_names = self._booster_feature_order(model, model_framework, model_schema)
+        return np.array(
+            [[instance.get(feature, np.nan) for feature in feature_names] for instance in instances],
+            dtype=np.float32
+        )
+    
+    def _run_booster_prediction_sync(
+        self, 
+        model: Any, 
+        input_data: np.ndarray, 
+        model_framework: str, 
+        options: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Run xgboost/lightgbm in-place prediction and split out class probabilities.
+        
+        LightGBM takes its thread count per call. An XGBoost booster's nthread
+        is a parameter of the (shared) booster, so it is set once at load instead.
+        """
+        meta = self._get_booster_meta(model, model_framework)
+        threads = options.get('threads')
+        tree_limit = options.get('tree_limit')
+        
+        try:
+            if model_framework == 'xgboost':
+                kwargs = {'iteration_range': (0, tree_limit)} if tree_limit else {}
+                output = model.inplace_predict(input_data, **kwargs)
+            else:
+                kwargs = {}
+                if threads:
+                    kwargs['num_threads'] = threads
+                if tree_limit:
+                    kwargs['num_iteration'] = tree_limit
+                output = model.predict(input_data, **kwargs)
+        except Exception as e:
+            raise InferenceError(f"Model prediction failed: {str(e)}")
+        
+        objective = meta['objective']
+        if objective.startswith('binary') and output.ndim == 1 and objective != 'binary:logitraw':
+            return {
+                'predictions': (output >= 0.5).astype(np.int64),
+                'probabilities': np.column_stack([1.0 - output, output])
+            }
+        if objective.startswith('multi') and output.ndim == 2:
+            return {'predictions': output.argmax(axis=1), 'probabilities': output}
+        return {'predictions': output, 'probabilities': None}
+    
+    async def postprocess_predictions(
         self, 
         predictions: Any, 
         deployment: Deployment, 
@@ -0,0 +1,116 @@
+"""
+Micro-Batcher.
+Merges small concurrent predictions for the same model version into one batched model call.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from prometheus_client import Histogram
+
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+MICRO_BATCH_ROWS = Histogram(
+    "inference_micro_batch_rows",
+    "Rows per batched model call, and the number of requests merged into it",
+    ["deployment_id", "unit"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+)
+
+
+def micro_batching_config(deployment: Any) -> Dict[str, Any]:
+    """Batch window for a deployment, with defaults from settings."""
+    config = (deployment.deployment_config or {}).get("batching", {})
+    return {
+        "max_wait_ms": config.get("max_wait_ms", settings.MICRO_BATCH_MAX_WAIT_MS),
+        "max_batch_size": config.get("max_batch_size")
+    }
+
+
+@dataclass
+class _OpenBatch:
+    """Validated rows waiting for the next batched call, and the callers owed a slice of its result."""
+
+    model: Any
+    deployment: Any
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+    waiters: List[Tuple[int, int, asyncio.Future]] = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+class MicroBatcher:
+    """
+    Collects validated instances for one model version and scores them together.
+
+    A batch is sent to the model when it holds `max_batch_size` rows or when
+    its first rows have waited `max_wait_ms`, whichever comes first; a caller's
+    rows are never split across batches. Each caller gets back its own rows'
+    predictions; if the batched call fails, every caller in it gets the error.
+    """
+
+    def __init__(self, inference_service):
+        self.inference_service = inference_service
+        self.open: Dict[Tuple[str, str], _OpenBatch] = {}
+        self.running: set = set()
+
+    async def predict(
+        self,
+        model: Any,
+        instances: List[Dict[str, Any]],
+        deployment: Any,
+        max_batch_size: int,
+        max_wait_ms: float
+    ) -> List[Any]:
+        """Score validated instances as part of the deployment's next batch."""
+        key = (str(deployment.id), str(deployment.model_version_id))
+        batch = self.open.get(key)
+        if batch is not None and (batch.model is not model or len(batch.rows) + len(instances) > max_batch_size):
+            # A reloaded model, or rows that would overflow the batch, start the next one
+            self._flush(key)
+            batch = None
+        if batch is None:
+            batch = self.open[key] = _OpenBatch(model, deployment)
+            batch.timer = asyncio.get_running_loop().call_later(max_wait_ms / 1000.0, self._flush, key)
+
+        future = asyncio.get_running_loop().create_future()
+        start = len(batch.rows)
+        batch.rows.extend(instances)
+        batch.waiters.append((start, len(batch.rows), future))
+        if len(batch.rows) >= max_batch_size:
+            self._flush(key)
+        return await future
+
+    def _flush(self, key: Tuple[str, str]):
+        batch = self.open.pop(key, None)
+        if batch is None:
+            return
+        batch.timer.cancel()
+        task = asyncio.ensure_future(self._run(batch))
+        self.running.add(task)
+        task.add_done_callback(self.running.discard)
+
+    async def _run(self, batch: _OpenBatch):
+        deployment_id = str(batch.deployment.id)
+        MICRO_BATCH_ROWS.labels(deployment_id, "rows").observe(len(batch.rows))
+        MICRO_BATCH_ROWS.labels(deployment_id, "requests").observe(len(batch.waiters))
+        try:
+            predictions = await self.inference_service.predict(
+                model=batch.model,
+                instances=batch.rows,
+                deployment=batch.deployment
+            )
+        except Exception as e:
+            logger.error(f"Micro-batch of {len(batch.rows)} rows failed for deployment {deployment_id}: {str(e)}")
+            for _, _, future in batch.waiters:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for start, end, future in batch.waiters:
+            # Callers that gave up (deadline, disconnect) have cancelled their futures
+            if not future.done():
+                future.set_result(predictions[start:end])
@@ -13,7 +13,9 @@ from typing import Dict, Any, Optional, Union
 from datetime import datetime, timedelta
 from pathlib import Path
 import hashlib
+import importlib
 import json
+import zipfile
 
 from app.core.config import settings
 from app.models.model_version import ModelVersion
@@ -22,6 +24,31 @@ from app.core.exceptions import ModelError
 
 logger = logging.getLogger(__name__)
 
+# Framework names recorded on models that mean the same loader
+FRAMEWORK_ALIASES = {'scikit-learn': 'sklearn'}
+
+
+def normalize_framework(framework: str) -> str:
+    """Canonical name of a model's framework, e.g. 'Scikit-Learn' -> 'sklearn'."""
+    framework = framework.lower()
+    return FRAMEWORK_ALIASES.get(framework, framework)
+
+
+def optimized_model_path(cache_key: str, requested: Any) -> Path:
+    """
+    Where an ONNX session caches its optimized graph for a loaded model.
+
+    Files live under ONNX_OPTIMIZED_MODEL_DIR/<cache_key>/; a relative
+    `requested` name picks the file there, and absolute or `..` paths from
+    serving config are ignored in favour of the default name.
+    """
+    directory = Path(settings.ONNX_OPTIMIZED_MODEL_DIR) / str(cache_key).replace(':', '-')
+    name = Path(str(requested)) if isinstance(requested, str) else Path('optimized.onnx')
+    if name.is_absolute() or '..' in name.parts or not name.name:
+        logger.warning(f"Ignoring optimized_model_filepath {requested!r}; ONNX graphs are cached under {directory}")
+        name = Path('optimized.onnx')
+    return directory / name
+
 
 class ModelLoader:
     """Service for loading and managing ML models in memory."""
@@ -35,15 +62,30 @@ class ModelLoader:
         self.max_models_in_memory = settings.MAX_MODELS_IN_MEMORY or 10
         self.model_ttl_hours = settings.MODEL_TTL_HOURS or 24
         
-        # Start cleanup task
-        asyncio.create_task(self._cleanup_task())
+        # Cleanup task starts with the first get_model, once an event loop is running
+        self.cleanup_task: Optional[asyncio.Task] = None
+    
+    @staticmethod
+    def model_key(model_version_id: str, load_options: Optional[Dict[str, Any]] = None) -> str:
+        """Cache key for a model version loaded with optional deployment-specific load options."""
+        if not load_options:
+            return model_version_id
+        digest = hashlib.sha1(json.dumps(load_options, sort_keys=True, default=str).encode()).hexdigest()
+        return f"{model_version_id}:{digest[:12]}"
     
-    async def get_model(self, model_version_id: str) -> Any:
+    def has_room_for(self, model_version_id: str, load_options: Optional[Dict[str, Any]] = None) -> bool:
+        """Whether get_model can return this model without unloading another one."""
+        key = self.model_key(model_version_id, load_options)
+        return key in self.loaded_models or len(self.loaded_models) < self.max_models_in_memory
+    
+    async def get_model(self, model_version_id: str, load_options: Optional[Dict[str, Any]] = None) -> Any:
         """
         Get a loaded model by version ID. Load if not already in memory.
         
         Args:
             model_version_id: Model version ID
+            load_options: Deployment overrides for the version's model_schema["serving"]
+                (e.g. ONNX session options); each distinct set is loaded separately
             
         Returns:
             Loaded model object
@@ -51,6 +93,12 @@ class ModelLoader:
         Raises:
             ModelError: If model loading fails
         """
+        if self.cleanup_task is None:
+            self.cleanup_task = asyncio.create_task(self._cleanup_task())
+        
+        if load_options:
+            return await self._get_model_variant(model_version_id, load_options)
+        
         # Update access time
         self.access_times[model_version_id] = datetime.utcnow()
         
@@ -83,8 +131,44 @@ class ModelLoader:
             logger.info(f"Model {model_version_id} loaded into memory")
             return model
     
-    async def _load_model_from_storage(self, model_version_id: str) -> Any:
+    async def _get_model_variant(self, model_version_id: str, load_options: Dict[str, Any]) -> Any:
+        """get_model for a version loaded with deployment-specific options."""
+        key = self.model_key(model_version_id, load_options)
+        self.access_times[key] = datetime.utcnow()
+        if key in self.loaded_models:
+            return self.loaded_models[key]
+        
+        if key not in self.model_locks:
+            self.model_locks[key] = asyncio.Lock()
+        async with self.model_locks[key]:
+            if key in self.loaded_models:
+                return self.loaded_models[key]
+            model = await self._load_model_from_storage(model_version_id, load_options, key)
+            await self._ensure_memory_capacity()
+            self.loaded_models[key] = model
+            self.load_times[key] = datetime.utcnow()
+            self.access_times[key] = datetime.utcnow()
+            logger.info(f"Model {key} loaded into memory")
+            return model
+    
+    @staticmethod
+    def _merge_options(base: Dict[str, Any], overrides: Dict[str, Any]) -> Dict[str, Any]:
+        merged = dict(base)
+        for name, value in overrides.items():
+            if isinstance(value, dict) and isinstance(merged.get(name), dict):
+                merged[name] = ModelLoader._merge_options(merged[name], value)
+            else:
+                merged[name] = value
+        return merged
+    
+    async def _load_model_from_storage(
+        self, 
+        model_version_id: str, 
+        load_options: Optional[Dict[str, Any]] = None, 
+        key: Optional[str] = None
+    ) -> Any:
         """Load model from file storage."""
+        key = key or model_version_id
         try:
             # Get model version info from database
             from app.core.deps import get_db
@@ -109,11 +193,15 @@ class ModelLoader:
                 raise ModelError(f"Model file not found: {model_path}")
             
             # Load based on framework and file extension
-            framework = model_version.framework.lower()
-            model = await self._load_by_framework(model_path, framework)
+            framework = normalize_framework(model_version.framework)
+            serving_options = self._merge_options(
+                (model_version.model_schema or {}).get('serving', {}),
+                load_options or {}
+            )
+            model = await self._load_by_framework(model_path, framework, serving_options, cache_key=key)
             
             # Store metadata
-            self.model_metadata[model_version_id] = {
+            self.model_metadata[key] = {
                 'framework': framework,
                 'model_path': str(model_path),
                 'file_size': model_path.stat().st_size,
@@ -129,23 +217,40 @@ class ModelLoader:
             logger.error(f"Failed to load model {model_version_id}: {str(e)}")
             raise ModelError(f"Model loading failed: {str(e)}")
     
-    async def _load_by_framework(self, model_path: Path, framework: str) -> Any:
-        """Load model based on its framework."""
+    async def _load_by_framework(
+        self, 
+        model_path: Path, 
+        framework: str, 
+        serving_options: Optional[Dict[str, Any]] = None,
+        cache_key: Optional[str] = None
+    ) -> Any:
+        """
+        Load model based on its framework.
+        
+        Args:
+            model_path: Local path of the model artifact
+            framework: Model framework name
+            serving_options: Load-time options from the version's model_schema["serving"],
+                keyed by framework (e.g. {"torch": {"compile": "torchscript"}})
+            cache_key: Loaded-model key (version and load options) that on-disk
+                artifacts derived from the model are stored under
+        """
+        serving_options = serving_options or {}
         try:
             if framework in ['sklearn', 'scikit-learn']:
                 return await self._load_sklearn_model(model_path)
             elif framework == 'xgboost':
-                return await self._load_xgboost_model(model_path)
+                return await self._load_xgboost_model(model_path, serving_options.get('xgboost', {}))
             elif framework == 'lightgbm':
                 return await self._load_lightgbm_model(model_path)
             elif framework == 'catboost':
                 return await self._load_catboost_model(model_path)
             elif framework == 'pytorch':
-                return await self._load_pytorch_model(model_path)
+                return await self._load_pytorch_model(model_path, serving_options.get('torch', {}))
             elif framework == 'tensorflow':
-                return await self._load_tensorflow_model(model_path)
+                return await self._load_tensorflow_model(model_path, serving_options.get('tensorflow', {}))
             elif framework == 'onnx':
-                return await self._load_onnx_model(model_path)
+                return await self._load_onnx_model(model_path, serving_options.get('onnx', {}), cache_key)
             elif framework == 'mlflow':
                 return await self._load_mlflow_model(model_path)
             else:
@@ -165,21 +270,33 @@ class ModelLoader:
         else:
             raise ModelError(f"Unsupported sklearn model format: {model_path.suffix}")
     
-    async def _load_xgboost_model(self, model_path: Path) -> Any:
-        """Load XGBoost model."""
+    async def _load_xgboost_model(self, model_path: Path, options: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Load XGBoost model.
+        
+        options["threads"] (default BOOSTER_THREADS) is set on the booster
+        here: nthread is booster state, and a loaded model is shared by
+        concurrent predictions, so it must not change per call.
+        """
         import xgboost as xgb
         
+        threads = (options or {}).get('threads', settings.BOOSTER_THREADS)
         if model_path.suffix == '.json':
             model = xgb.XGBClassifier()
             model.load_model(str(model_path))
-            return model
         elif model_path.suffix == '.pkl':
-            return pickle.load(open(model_path, 'rb'))
+            with open(model_path, 'rb') as f:
+                model = pickle.load(f)
         else:
             # Try native XGBoost format
             model = xgb.Booster()
             model.load_model(str(model_path))
-            return model
+        if threads:
+            if isinstance(model, xgb.Booster):
+                model.set_param({'nthread': threads})
+            elif isinstance(model, xgb.XGBModel):
+                model.set_params(n_jobs=threads)
+        return model
     
     async def _load_lightgbm_model(self, model_path: Path) -> Any:
         """Load LightGBM model."""
@@ -201,41 +318,144 @@ class ModelLoader:
             model.load_model(str(model_path))
             return model
     
-    async def _load_pytorch_model(self, model_path: Path) -> Any:
-        """Load PyTorch model."""
+    async def _load_pytorch_model(self, model_path: Path, options: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Load a PyTorch model ready for serving.
+        
+        The model is put in eval mode with gradients disabled once, here, rather
+        than per request. A bare state_dict needs options["model_class"]
+        ("package.module:ClassName", plus optional "init_kwargs") to rebuild the
+        module. options["compile"] opts in to "torchscript" (scripted, or traced
+        when "example_input_shape" is given, then frozen) or "compile" (torch.compile).
+        """
         import torch
         
-        # Load model state dict or full model
-        if model_path.suffix == '.pth' or model_path.suffix == '.pt':
-            return torch.load(model_path, map_location='cpu')
-        else:
+        options = options or {}
+        if model_path.suffix not in ('.pth', '.pt'):
             raise ModelError(f"Unsupported PyTorch model format: {model_path.suffix}")
+        
+        if self._is_torchscript_archive(model_path):
+            model = torch.jit.load(str(model_path), map_location='cpu')
+        else:
+            # Full-model pickles need weights_only=False on torch >= 2.6
+            model = torch.load(model_path, map_location='cpu', weights_only=False)
+            if isinstance(model, dict):
+                model = self._build_from_state_dict(model, options)
+        
+        if not isinstance(model, torch.nn.Module):
+            raise ModelError(f"Expected a torch.nn.Module, got {type(model).__name__}")
+        
+        model.eval()
+        for parameter in model.parameters():
+            parameter.requires_grad_(False)
+        
+        compile_mode = options.get('compile')
+        if compile_mode == 'torchscript':
+            if not isinstance(model, torch.jit.ScriptModule):
+                example_shape = options.get('example_input_shape')
+                if example_shape:
+                    model = torch.jit.trace(model, torch.zeros(*example_shape))
+                else:
+                    model = torch.jit.script(model)
+            model = torch.jit.freeze(model)
+        elif compile_mode == 'compile':
+            model = torch.compile(model, **options.get('compile_options', {}))
+        elif compile_mode:
+            raise ModelError(f"Unsupported PyTorch compile mode: {compile_mode}")
+        
+        return model
+    
+    def _is_torchscript_archive(self, model_path: Path) -> bool:
+        """TorchScript archives are zip files with serialized code alongside the weights."""
+        if not zipfile.is_zipfile(model_path):
+            return False
+        with zipfile.ZipFile(model_path) as archive:
+            return any('/code/' in name for name in archive.namelist())
     
-    async def _load_tensorflow_model(self, model_path: Path) -> Any:
-        """Load TensorFlow/Keras model."""
+    def _build_from_state_dict(self, state_dict: Dict[str, Any], options: Dict[str, Any]) -> Any:
+        """Instantiate the configured module class and load a state_dict into it."""
+        model_class = options.get('model_class')
+        if not model_class:
+            raise ModelError(
+                "PyTorch artifact is a state_dict; set model_schema.serving.torch.model_class "
+                "to 'package.module:ClassName' so the module can be rebuilt"
+            )
+        module_name, _, class_name = model_class.partition(':')
+        try:
+            cls = getattr(importlib.import_module(module_name), class_name)
+        except (ImportError, AttributeError) as e:
+            raise ModelError(f"Cannot import PyTorch model class {model_class}: {str(e)}")
+        model = cls(**options.get('init_kwargs', {}))
+        model.load_state_dict(state_dict)
+        return model
+    
+    async def _load_tensorflow_model(self, model_path: Path, options: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Load a TensorFlow/Keras model as a single concrete function.
+        
+        SavedModels resolve options["signature"] (default serving_default) once;
+        Keras models are traced with a fixed input signature. See TensorflowModel
+        for batch_buckets, inputs, output and jit_compile.
+        """
         import tensorflow as tf
+        from app.services.tf_model import TensorflowModel
         
+        options = options or {}
         if model_path.is_dir():
             # SavedModel format
-            return tf.saved_model.load(str(model_path))
-        elif model_path.suffix == '.h5':
-            # HDF5 format
-            return tf.keras.models.load_model(str(model_path))
+            return TensorflowModel.from_saved_model(tf.saved_model.load(str(model_path)), options)
+        elif model_path.suffix in ('.h5', '.keras'):
+            return TensorflowModel.from_keras(tf.keras.models.load_model(str(model_path)), options)
         else:
             raise ModelError(f"Unsupported TensorFlow model format: {model_path.suffix}")
     
-    async def _load_onnx_model(self, model_path: Path) -> Any:
-        """Load ONNX model."""
+    async def _load_onnx_model(
+        self, 
+        model_path: Path, 
+        options: Optional[Dict[str, Any]] = None, 
+        cache_key: Optional[str] = None
+    ) -> Any:
+        """
+        Load an ONNX model into an inference session.
+        
+        options["session"] holds ORT session settings (see build_session_options,
+        plus providers from ONNX_ALLOWED_PROVIDERS and optimized_model_filepath,
+        a file name under the model's optimized_model_path directory);
+        options["inputs"] maps input names to feature lists for multi-input models.
+        """
         import onnxruntime as ort
+        from app.services.onnx_model import OnnxModel, build_session_options
+        
+        options = options or {}
+        session_config = options.get('session', {})
+        session_options = build_session_options(ort, session_config)
         
-        # Create inference session
-        session_options = ort.SessionOptions()
-        session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        providers = session_config.get('providers', ['CPUExecutionProvider'])
+        disallowed = [p for p in providers if p not in settings.ONNX_ALLOWED_PROVIDERS]
+        if disallowed:
+            raise ModelError(f"ONNX execution providers not allowed: {', '.join(map(str, disallowed))}")
         
-        return ort.InferenceSession(
-            str(model_path), 
+        source = model_path
+        cache_file = session_config.get('optimized_model_filepath')
+        if cache_file and cache_key:
+            cache_path = optimized_model_path(cache_key, cache_file)
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            if cache_path.exists() and cache_path.stat().st_mtime >= model_path.stat().st_mtime:
+                # Graph was optimized on a previous load; skip rewriting it again
+                source = cache_path
+                session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+            else:
+                session_options.optimized_model_filepath = str(cache_path)
+        
+        session = ort.InferenceSession(
+            str(source), 
             session_options,
-            providers=['CPUExecutionProvider']  # Add GPU providers if available
+            providers=providers
+        )
+        return OnnxModel(
+            session,
+            input_mapping=options.get('inputs'),
+            feature_order=options.get('feature_order')
         )
     
     async def _load_mlflow_model(self, model_path: Path) -> Any:
@@ -0,0 +1,218 @@
+"""
+ONNX Model.
+ONNX Runtime session wrapper with cached I/O metadata, named-input mapping and IOBinding.
+"""
+
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.exceptions import InferenceError, ModelError
+
+
+logger = logging.getLogger(__name__)
+
+ONNX_DTYPES = {
+    'tensor(float)': np.float32,
+    'tensor(double)': np.float64,
+    'tensor(float16)': np.float16,
+    'tensor(int64)': np.int64,
+    'tensor(int32)': np.int32,
+    'tensor(int8)': np.int8,
+    'tensor(uint8)': np.uint8,
+    'tensor(bool)': np.bool_,
+}
+
+
+@dataclass(frozen=True)
+class TensorInfo:
+    """Name, shape and numpy dtype of a session input or output."""
+
+    name: str
+    shape: tuple
+    dtype: Optional[type]
+
+    @classmethod
+    def from_node(cls, node: Any) -> "TensorInfo":
+        return cls(name=node.name, shape=tuple(node.shape), dtype=ONNX_DTYPES.get(node.type))
+
+    def concrete_shape(self, batch_size: int) -> Optional[tuple]:
+        """Shape for a given batch size, or None if any other dimension is dynamic."""
+        if not self.shape:
+            return None
+        rest = self.shape[1:]
+        if not all(isinstance(dim, int) for dim in rest):
+            return None
+        return (batch_size, *rest)
+
+
+def build_session_options(ort: Any, config: Dict[str, Any]) -> Any:
+    """
+    Translate a deployment's session config into ort.SessionOptions.
+
+    Supported keys: graph_optimization_level (disable|basic|extended|all),
+    execution_mode (sequential|parallel), enable_mem_arena, enable_mem_pattern,
+    intra_op_num_threads and inter_op_num_threads.
+    """
+    levels = {
+        'disable': ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+        'basic': ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+        'extended': ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+        'all': ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+    }
+    modes = {
+        'sequential': ort.ExecutionMode.ORT_SEQUENTIAL,
+        'parallel': ort.ExecutionMode.ORT_PARALLEL,
+    }
+
+    options = ort.SessionOptions()
+    try:
+        options.graph_optimization_level = levels[config.get('graph_optimization_level', 'all')]
+        options.execution_mode = modes[config.get('execution_mode', 'sequential')]
+    except KeyError as e:
+        raise ModelError(f"Invalid ONNX session option value: {str(e)}")
+    options.enable_cpu_mem_arena = config.get('enable_mem_arena', True)
+    options.enable_mem_pattern = config.get('enable_mem_pattern', True)
+    if config.get('intra_op_num_threads'):
+        options.intra_op_num_threads = config['intra_op_num_threads']
+    if config.get('inter_op_num_threads'):
+        options.inter_op_num_threads = config['inter_op_num_threads']
+    return options
+
+
+class OnnxModel:
+    """
+    A loaded ONNX Runtime session ready for serving.
+
+    Input and output metadata is read once at load. Request features map to
+    named inputs through `input_mapping` ({input_name: [feature, ...]}, from the
+    version's model_schema); a single-input model takes all features.
+    Outputs with a static non-batch shape are written into per-thread buffers
+    bound with IOBinding and reused across requests of the same batch size.
+    """
+
+    def __init__(
+        self,
+        session: Any,
+        input_mapping: Optional[Dict[str, List[str]]] = None,
+        feature_order: Optional[Sequence[str]] = None
+    ):
+        self.session = session
+        self.inputs = [TensorInfo.from_node(node) for node in session.get_inputs()]
+        self.outputs = [TensorInfo.from_node(node) for node in session.get_outputs()]
+        self.input_mapping = input_mapping or {}
+        self.feature_order = list(feature_order or [])
+        self._local = threading.local()
+        # IOBinding only handles numeric tensors; sequence/map outputs (e.g. ZipMap) use session.run
+        self.use_binding = all(tensor.dtype is not None for tensor in self.outputs)
+
+        unmapped = [i.name for i in self.inputs if i.name not in self.input_mapping]
+        if len(self.inputs) > 1 and unmapped:
+            raise ModelError(
+                f"ONNX model has inputs {unmapped} without a feature mapping in "
+                f"model_schema.serving.onnx.inputs"
+            )
+
+    def run(self, *args, **kwargs) -> Any:
+        """Plain session.run, for callers that expect an InferenceSession."""
+        return self.session.run(*args, **kwargs)
+
+    def _features_for(self, tensor: TensorInfo, available: Sequence[str]) -> List[str]:
+        features = self.input_mapping.get(tensor.name)
+        if features:
+            return features
+        if self.feature_order and set(self.feature_order) <= set(available):
+            return self.feature_order
+        return list(available)
+
+    def prepare_inputs(self, instances: Any) -> Dict[str, np.ndarray]:
+        """
+        Build one contiguous array per named input from request instances.
+
+        A single-input model also accepts an already-encoded feature matrix.
+        """
+        if isinstance(instances, np.ndarray):
+            if len(self.inputs) != 1:
+                raise InferenceError("Multi-input ONNX models need named features")
+            tensor = self.inputs[0]
+            return {tensor.name: np.ascontiguousarray(instances, dtype=tensor.dtype or np.float32)}
+
+        available = list(instances[0].keys())
+        feeds = {}
+        for tensor in self.inputs:
+            features = self._features_for(tensor, available)
+            try:
+                feeds[tensor.name] = np.array(
+                    [[instance[feature] for feature in features] for instance in instances],
+                    dtype=tensor.dtype or np.float32
+                )
+            except KeyError as e:
+                raise InferenceError(f"Missing feature {str(e)} for ONNX input '{tensor.name}'")
+        return feeds
+
+    def prepare_frame(self, df: Any) -> Dict[str, np.ndarray]:
+        """Build named input arrays from a pandas DataFrame (bulk scoring)."""
+        available = list(df.columns)
+        return {
+            tensor.name: np.ascontiguousarray(
+                df[self._features_for(tensor, available)].to_numpy(dtype=tensor.dtype or np.float32)
+            )
+            for tensor in self.inputs
+        }
+
+    def _output_buffers(self, batch_size: int) -> Dict[str, np.ndarray]:
+        cache = getattr(self._local, 'buffers', None)
+        if cache is None or cache[0] != batch_size:
+            buffers = {}
+            for tensor in self.outputs:
+                shape = tensor.concrete_shape(batch_size)
+                if shape is not None and tensor.dtype is not None:
+                    buffers[tensor.name] = np.empty(shape, dtype=tensor.dtype)
+            cache = (batch_size, buffers)
+            self._local.buffers = cache
+        return cache[1]
+
+    def predict(self, feeds: Dict[str, np.ndarray]) -> Any:
+        """
+        Run the session through IOBinding.
+
+        Bound buffers are reused by the next call on this thread, so outputs
+        are returned as Python lists. A second 2-D float output is treated as
+        class probabilities.
+        """
+        if not self.use_binding:
+            return self._format(self.session.run(None, feeds))
+
+        batch_size = len(next(iter(feeds.values())))
+        binding = self.session.io_binding()
+        for name, array in feeds.items():
+            binding.bind_cpu_input(name, array)
+
+        buffers = self._output_buffers(batch_size)
+        for tensor in self.outputs:
+            buffer = buffers.get(tensor.name)
+            if buffer is not None:
+                binding.bind_output(tensor.name, 'cpu', 0, buffer.dtype, buffer.shape, buffer.ctypes.data)
+            else:
+                binding.bind_output(tensor.name, 'cpu')
+
+        self.session.run_with_iobinding(binding)
+
+        results = [
+            buffers[tensor.name] if tensor.name in buffers else value.numpy()
+            for tensor, value in zip(self.outputs, binding.get_outputs())
+        ]
+        return self._format(results)
+
+    def _format(self, results: List[Any]) -> Any:
+        results = [value.tolist() if hasattr(value, 'tolist') else value for value in results]
+        if (
+            len(self.outputs) == 2
+            and len(self.outputs[1].shape) == 2
+            and self.outputs[1].dtype in (np.float32, np.float64)
+        ):
+            return {'predictions': results[0], 'probabilities': results[1]}
+        return results[0]
@@ -0,0 +1,265 @@
+"""
+Pipeline Service.
+Runs a DAG of model versions and array transforms inside a single inference request.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models.model_version import ModelVersion
+from app.services.inference_service import InferenceService, ServingTarget
+from app.services.model_loader import ModelLoader
+
+
+logger = logging.getLogger(__name__)
+
+INPUT = "input"
+
+
+def _single(inputs: List[np.ndarray]) -> np.ndarray:
+    if len(inputs) != 1:
+        raise ValueError("Transform takes exactly one input")
+    return inputs[0]
+
+
+def _platt(inputs, a: float = -1.0, b: float = 0.0):
+    # Platt scaling of a score column: 1 / (1 + exp(a * x + b))
+    x = _single(inputs)
+    if x.shape[1] == 2:
+        x = x[:, 1:]
+    positive = 1.0 / (1.0 + np.exp(a * x + b))
+    return np.hstack([1.0 - positive, positive])
+
+
+def _softmax(inputs):
+    x = _single(inputs)
+    shifted = np.exp(x - x.max(axis=1, keepdims=True))
+    return shifted / shifted.sum(axis=1, keepdims=True)
+
+
+def _weighted_mean(inputs, weights: Optional[List[float]] = None):
+    if len({x.shape for x in inputs}) != 1:
+        raise ValueError("Ensemble inputs must have the same shape")
+    return np.average(np.stack(inputs), axis=0, weights=weights)
+
+
+# Array transforms available to pipeline nodes: fn(inputs, **params) -> 2-D array
+TRANSFORMS: Dict[str, Callable[..., np.ndarray]] = {
+    "concat": lambda inputs: inputs[0] if len(inputs) == 1 else np.hstack(inputs),
+    "mean": lambda inputs: _weighted_mean(inputs),
+    "weighted_mean": _weighted_mean,
+    "select": lambda inputs, columns: _single(inputs)[:, columns],
+    "sigmoid": lambda inputs: 1.0 / (1.0 + np.exp(-_single(inputs))),
+    "softmax": _softmax,
+    "platt": _platt,
+    "scale": lambda inputs, factor=1.0, offset=0.0: _single(inputs) * factor + offset,
+}
+
+
+def pipeline_config(deployment: Any) -> Optional[Dict[str, Any]]:
+    """The deployment's pipeline DAG, or None for a single-model deployment."""
+    config = (deployment.deployment_config or {}).get("pipeline")
+    return config if config and config.get("nodes") else None
+
+
+def pipeline_fingerprint(config: Dict[str, Any]) -> str:
+    """Short digest of a pipeline's DAG, to namespace its cached results."""
+    encoded = json.dumps(config, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()[:12]
+
+
+@dataclass
+class PipelineNode:
+    """A model version or transform fed by the request input or other nodes' outputs."""
+
+    name: str
+    inputs: List[str]
+    model_version: Any = None
+    load_options: Optional[Dict[str, Any]] = None
+    output: Optional[str] = None
+    transform: Optional[Callable[..., np.ndarray]] = None
+    params: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class PipelinePlan:
+    """Nodes grouped into levels; every node in a level only depends on earlier levels."""
+
+    levels: List[List[PipelineNode]]
+    output: PipelineNode
+
+
+def build_plan(config: Dict[str, Any], versions: Dict[str, Any]) -> PipelinePlan:
+    """
+    Validate a pipeline config and order its nodes.
+
+    Raises:
+        ValueError: Unknown transform or input, model version not in
+            `versions`, a cycle, or an unknown output node
+    """
+    nodes: Dict[str, PipelineNode] = {}
+    for name, spec in config["nodes"].items():
+        if name == INPUT:
+            raise ValueError(f"'{INPUT}' is reserved for the request instances")
+        inputs = spec.get("inputs") or [INPUT]
+        if "transform" in spec:
+            transform = TRANSFORMS.get(spec["transform"])
+            if transform is None:
+                raise ValueError(f"Node '{name}': unknown transform '{spec['transform']}'")
+            if INPUT in inputs:
+                raise ValueError(f"Node '{name}': transforms take node outputs, not the raw input")
+            nodes[name] = PipelineNode(name, inputs, transform=transform, params=spec.get("params", {}))
+        else:
+            version = versions.get(str(spec.get("model_version_id")))
+            if version is None:
+                raise ValueError(f"Node '{name}': model version {spec.get('model_version_id')} not found")
+            if INPUT in inputs and len(inputs) > 1:
+                raise ValueError(f"Node '{name}': '{INPUT}' can't be combined with other inputs")
+            nodes[name] = PipelineNode(
+                name,
+                inputs,
+                model_version=version,
+                load_options=spec.get("serving"),
+                output=spec.get("output")
+            )
+
+    for node in nodes.values():
+        unknown = [i for i in node.inputs if i != INPUT and i not in nodes]
+        if unknown:
+            raise ValueError(f"Node '{node.name}': unknown inputs {unknown}")
+
+    levels: List[List[PipelineNode]] = []
+    done = {INPUT}
+    remaining = dict(nodes)
+    while remaining:
+        ready = [node for node in remaining.values() if all(i in done for i in node.inputs)]
+        if not ready:
+            raise ValueError(f"Pipeline has a cycle through {sorted(remaining)}")
+        levels.append(ready)
+        for node in ready:
+            done.add(node.name)
+            del remaining[node.name]
+
+    output = config.get("output") or levels[-1][-1].name
+    if output not in nodes:
+        raise ValueError(f"Pipeline output '{output}' is not a node")
+    return PipelinePlan(levels, nodes[output])
+
+
+def as_matrix(raw: Any, output: Optional[str] = None) -> np.ndarray:
+    """
+    A model's raw output as a 2-D array, without copying where possible.
+
+    `output` picks 'predictions' or 'probabilities' from frameworks that
+    return both; the default is probabilities when present.
+    """
+    if isinstance(raw, dict):
+        probabilities = raw.get("probabilities")
+        if output == "predictions" or probabilities is None:
+            raw = raw.get("predictions")
+        else:
+            raw = probabilities
+    array = np.asarray(raw)
+    return array.reshape(-1, 1) if array.ndim == 1 else array
+
+
+class PipelineService:
+    """
+    Runs pipeline deployments.
+
+    `deployment_config["pipeline"]` describes the DAG:
+
+        {"nodes": {"features": {"model_version_id": "..."},
+                   "scorer": {"model_version_id": "...", "inputs": ["features"]},
+                   "calibrated": {"transform": "platt", "params": {"a": -2.0}, "inputs": ["scorer"]}},
+         "output": "calibrated"}
+
+    Model nodes default to the request instances as input, validated against
+    their own version's schema; fed by other nodes they receive those nodes'
+    output arrays directly. Nodes in the same level run concurrently, with
+    model execution on the inference executor.
+    """
+
+    def __init__(self, inference_service: InferenceService, model_loader: ModelLoader):
+        self.inference_service = inference_service
+        self.model_loader = model_loader
+
+    def resolve(self, db: Session, deployment: Any) -> Optional[PipelinePlan]:
+        """Load the pipeline's model versions and order its nodes, or return None if it isn't a pipeline."""
+        config = pipeline_config(deployment)
+        if config is None:
+            return None
+        ids = [spec["model_version_id"] for spec in config["nodes"].values() if "model_version_id" in spec]
+        versions = {
+            str(version.id): version
+            for version in db.query(ModelVersion).filter(ModelVersion.id.in_(ids)).all()
+        } if ids else {}
+        return build_plan(config, versions)
+
+    async def predict(
+        self,
+        deployment: Any,
+        plan: PipelinePlan,
+        instances: List[Dict[str, Any]]
+    ) -> Tuple[List[Any], Dict[str, Any]]:
+        """
+        Run the DAG over raw instances.
+
+        Returns:
+            Postprocessed predictions from the output node, and a report with
+            each node's latency
+        """
+        outputs: Dict[str, np.ndarray] = {}
+        raw_outputs: Dict[str, Any] = {}
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+
+        async def run(node: PipelineNode):
+            node_start = time.perf_counter()
+            if node.transform is not None:
+                result = node.transform([outputs[i] for i in node.inputs], **node.params)
+            else:
+                target = ServingTarget(node.model_version, deployment.deployment_config, deployment.id)
+                model = await self.model_loader.get_model(node.model_version.id, node.load_options)
+                if node.inputs == [INPUT]:
+                    data = await self.inference_service.validate_input(instances, node.model_version.model_schema)
+                else:
+                    arrays = [outputs[i] for i in node.inputs]
+                    data = arrays[0] if len(arrays) == 1 else np.hstack(arrays)
+                raw_outputs[node.name] = await self.inference_service.predict_raw(model, data, target)
+                result = as_matrix(raw_outputs[node.name], node.output)
+            outputs[node.name] = result
+            timings[node.name] = (time.perf_counter() - node_start) * 1000
+
+        for level in plan.levels:
+            await asyncio.gather(*(run(node) for node in level))
+
+        output = plan.output
+        if output.model_version is not None:
+            # A model at the end is postprocessed exactly like a single-model deployment
+            raw = raw_outputs[output.name]
+            target = ServingTarget(output.model_version, deployment.deployment_config, deployment.id)
+        else:
+            matrix = outputs[output.name]
+            if matrix.shape[1] > 1:
+                raw = {"predictions": matrix.argmax(axis=1), "probabilities": matrix}
+            else:
+                raw = {"predictions": matrix[:, 0], "probabilities": None}
+            target = deployment
+        predictions = await self.inference_service.postprocess_predictions(raw, target, instances)
+
+        return predictions, {
+            "nodes": [
+                {"node": node.name, "latency_ms": round(timings[node.name], 2)}
+                for level in plan.levels for node in level
+            ],
+            "latency_ms": round((time.perf_counter() - start) * 1000, 2)
+        }
@@ -0,0 +1,386 @@
+"""
+Precomputed Prediction Store.
+Bulk-scored predictions for a known entity set, served from memory-mapped sorted key/value files.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+import orjson
+import redis.asyncio as redis
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.deployment import Deployment
+from app.schemas.batch_job import BatchJobCreate
+from app.services.batch_job_service import _resolve_path, batch_job_runner
+from app.services.inference_service import InferenceService
+from app.services.model_loader import normalize_framework
+
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"MLPCKV01"
+# Rows postprocessed per step while building, to keep event loop pauses short
+ENCODE_BATCH_ROWS = 2000
+
+
+def precomputed_config(deployment: Any) -> Optional[Dict[str, Any]]:
+    """The deployment's precomputed serving settings, or None if it only scores live."""
+    config = (deployment.deployment_config or {}).get("precomputed")
+    return config if config and config.get("entity_key") and config.get("source_path") else None
+
+
+def without_entity_key(config: Dict[str, Any], instance: Dict[str, Any]) -> Dict[str, Any]:
+    """An instance as the model sees it; the entity key is never a feature."""
+    return {name: value for name, value in instance.items() if name != config["entity_key"]}
+
+
+def key_hash(key: str) -> int:
+    """64-bit hash an entity key is indexed under."""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class PrecomputedTable:
+    """
+    A read-only, memory-mapped prediction file.
+
+    Layout: MAGIC, a length-prefixed JSON header padded to 8 bytes, then
+    `n` sorted uint64 key hashes, `n` value offsets, `n` value lengths and
+    the value blob. Each value is `[key, row]` JSON, so a hash collision is
+    detected and treated as a miss. Pages are shared through the OS page
+    cache by every worker that maps the same file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:8] != MAGIC:
+            raise ValueError(f"{path} is not a precomputed prediction file")
+        (header_len,) = struct.unpack_from("<I", self._mm, 8)
+        self.header = json.loads(self._mm[12:12 + header_len])
+        n = self.header["rows"]
+        start = 12 + header_len
+        start += -start % 8
+        self._hashes = np.frombuffer(self._mm, dtype="<u8", count=n, offset=start)
+        self._offsets = np.frombuffer(self._mm, dtype="<u8", count=n, offset=start + 8 * n)
+        self._lengths = np.frombuffer(self._mm, dtype="<u8", count=n, offset=start + 16 * n)
+        self._blob = start + 24 * n
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    @property
+    def model_version_id(self) -> str:
+        return self.header["model_version_id"]
+
+    @property
+    def built_at(self) -> float:
+        return self.header["built_at"]
+
+    def get_many(self, keys: List[Optional[str]]) -> List[Optional[Dict[str, Any]]]:
+        """Rows for each key by binary search over the hash index; None for missing keys."""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(keys)
+        present = [(i, key) for i, key in enumerate(keys) if key is not None]
+        if not present or not len(self._hashes):
+            return results
+        hashes = np.fromiter((key_hash(key) for _, key in present), dtype=np.uint64, count=len(present))
+        positions = np.searchsorted(self._hashes, hashes)
+        n = len(self._hashes)
+        for (i, key), h, position in zip(present, hashes, positions):
+            # Equal hashes are adjacent; check each candidate's stored key
+            while position < n and self._hashes[position] == h:
+                start = self._blob + int(self._offsets[position])
+                stored_key, row = orjson.loads(self._mm[start:start + int(self._lengths[position])])
+                if stored_key == key:
+                    results[i] = row
+                    break
+                position += 1
+        return results
+
+
+class PrecomputedTableWriter:
+    """
+    Builds a PrecomputedTable file from unsorted (key, row) pairs.
+
+    Values stream to a temporary blob file; only the 24-byte index entry
+    per row is kept in memory, and it is sorted once on `finish`.
+    """
+
+    def __init__(self, path: str, header: Dict[str, Any]):
+        self.path = path
+        self.header = header
+        self._blob = tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix=".blob", delete=False)
+        self._hashes: List[int] = []
+        self._lengths: List[int] = []
+
+    def add(self, keys: Iterable[str], rows: Iterable[Dict[str, Any]]):
+        for key, row in zip(keys, rows):
+            value = orjson.dumps([key, row], option=orjson.OPT_SERIALIZE_NUMPY)
+            self._blob.write(value)
+            self._hashes.append(key_hash(key))
+            self._lengths.append(len(value))
+
+    def finish(self) -> str:
+        """Write the sorted index and blob to `path` and return it."""
+        self._blob.flush()
+        hashes = np.asarray(self._hashes, dtype=np.uint64)
+        lengths = np.asarray(self._lengths, dtype=np.uint64)
+        offsets = np.zeros(len(lengths), dtype=np.uint64)
+        if len(lengths):
+            np.cumsum(lengths[:-1], out=offsets[1:])
+        order = np.argsort(hashes, kind="stable")
+
+        header = json.dumps({**self.header, "rows": len(hashes)}).encode("utf-8")
+        prefix = MAGIC + struct.pack("<I", len(header)) + header
+        prefix += b"\0" * (-len(prefix) % 8)
+        try:
+            with open(self.path, "wb") as out:
+                out.write(prefix)
+                for column in (hashes, offsets, lengths):
+                    out.write(column[order].astype("<u8").tobytes())
+                self._blob.seek(0)
+                shutil.copyfileobj(self._blob, out, 16 * 1024 * 1024)
+                out.flush()
+                os.fsync(out.fileno())
+        finally:
+            self._blob.close()
+            os.unlink(self._blob.name)
+        return self.path
+
+
+class PrecomputedStore:
+    """
+    Precomputed serving for deployments with `deployment_config["precomputed"]`:
+
+        {"entity_key": "customer_id",
+         "source_path": "entities/customers.parquet",
+         "refresh_interval_s": 86400,
+         "fallback": true}
+
+    `source_path` is a batch job input path, so it lies in the organization's
+    batch data. The entity table is bulk-scored with the batch job runner,
+    which writes its scores there under precomputed/<deployment_id>/. They are
+    encoded into a new file under PRECOMPUTED_DIR/<deployment_id>/, then published by
+    atomically repointing a `current` symlink. Workers notice the swap within
+    PRECOMPUTED_RELOAD_CHECK_S and map the new file; lookups in flight keep
+    the old mapping until they finish. The entity key is never a model
+    feature, so it is dropped from rows that fall back to live inference.
+    """
+
+    def __init__(self, inference_service: InferenceService, redis_client: Optional[redis.Redis] = None):
+        self.inference_service = inference_service
+        self.redis_client = redis_client or redis.from_url(settings.REDIS_URL)
+        self.tables: Dict[str, PrecomputedTable] = {}
+        self._checked_at: Dict[str, float] = {}
+        # When this worker last scheduled a rebuild, so stale tables don't schedule one per request
+        self._refresh_claims: Dict[str, float] = {}
+        self.building: Set[str] = set()
+
+    def _directory(self, deployment_id: Any) -> Path:
+        return Path(settings.PRECOMPUTED_DIR) / str(deployment_id)
+
+    def table(self, deployment: Any) -> Optional[PrecomputedTable]:
+        """The deployment's current table, reopened if another worker published a new one."""
+        key = str(deployment.id)
+        now = time.monotonic()
+        if now - self._checked_at.get(key, float("-inf")) >= settings.PRECOMPUTED_RELOAD_CHECK_S:
+            self._checked_at[key] = now
+            current = self._directory(key) / "current"
+            try:
+                path = str(current.parent / os.readlink(current))
+            except OSError:
+                path = None
+            table = self.tables.get(key)
+            if path is None:
+                self.tables.pop(key, None)
+            elif table is None or table.path != path:
+                try:
+                    self.tables[key] = PrecomputedTable(path)
+                except (OSError, ValueError) as e:
+                    logger.error(f"Failed to open precomputed table {path}: {str(e)}")
+        return self.tables.get(key)
+
+    def needs_refresh(self, deployment: Any, table: Optional[PrecomputedTable]) -> bool:
+        """True when there is no table, it was scored by another model version, or it is older than the refresh interval."""
+        if table is None or table.model_version_id != str(deployment.model_version_id):
+            return True
+        interval = precomputed_config(deployment).get("refresh_interval_s", settings.PRECOMPUTED_REFRESH_INTERVAL_S)
+        return time.time() - table.built_at > interval
+
+    def claim_refresh(self, deployment_id: Any) -> bool:
+        """Whether to schedule a rebuild now; at most once per PRECOMPUTED_REFRESH_LOCK_S per worker until one succeeds."""
+        key = str(deployment_id)
+        now = time.monotonic()
+        if now - self._refresh_claims.get(key, float("-inf")) < settings.PRECOMPUTED_REFRESH_LOCK_S:
+            return False
+        self._refresh_claims[key] = now
+        return True
+
+    def lookup(self, deployment: Any, instances: List[Dict[str, Any]]) -> Optional[List[Optional[Dict[str, Any]]]]:
+        """
+        Precomputed rows for instances by their entity key.
+
+        Returns None when there is no usable table (missing, or scored by a
+        different model version than the deployment now serves).
+        """
+        table = self.table(deployment)
+        if table is None or table.model_version_id != str(deployment.model_version_id):
+            return None
+        entity_key = precomputed_config(deployment)["entity_key"]
+        keys = [
+            str(instance[entity_key]) if instance.get(entity_key) is not None else None
+            for instance in instances
+        ]
+        return table.get_many(keys)
+
+    async def refresh(self, deployment_id: Any):
+        """
+        Bulk-score the deployment's entity table and publish a new file.
+
+        Runs as a background task. A Redis lock keeps several workers from
+        building at once; a failed build keeps the lock until it expires.
+        """
+        key = str(deployment_id)
+        lock_key = f"precomputed_refresh:{key}"
+        try:
+            if not await self.redis_client.set(lock_key, "1", nx=True, ex=settings.PRECOMPUTED_REFRESH_LOCK_S):
+                return
+        except Exception as e:
+            logger.error(f"Failed to acquire precomputed refresh lock: {str(e)}")
+            return
+
+        self.building.add(key)
+        directory = self._directory(key)
+        scores = None
+        db = SessionLocal()
+        try:
+            deployment = db.query(Deployment).filter(Deployment.id == deployment_id).first()
+            config = precomputed_config(deployment) if deployment else None
+            if config is None:
+                return
+            version = deployment.model_version
+            directory.mkdir(parents=True, exist_ok=True)
+            # Batch jobs only write to the organization's batch data, so the scores land there
+            scores_path = f"precomputed/{key}/scores-{uuid.uuid4().hex}.parquet"
+            scores = _resolve_path(scores_path, str(deployment.organization_id))
+
+            job = await batch_job_runner.submit(
+                deployment,
+                version.model_file_path,
+                normalize_framework(version.model.framework),
+                BatchJobCreate(
+                    deployment_id=deployment.id,
+                    input_path=config["source_path"],
+                    input_format=config.get("source_format"),
+                    output_path=scores_path,
+                    feature_columns=config.get("feature_columns"),
+                    passthrough_columns=[config["entity_key"]]
+                )
+            )
+            task = batch_job_runner.tasks.get(job["job_id"])
+            if task is not None:
+                await task
+            job = await batch_job_runner.get_job(job["job_id"])
+            if job["status"] != "completed":
+                raise RuntimeError(f"Scoring job {job['job_id']} {job['status']}: {job.get('error')}")
+
+            built_at = time.time()
+            path = directory / f"{version.id}-{datetime.utcfromtimestamp(built_at).strftime('%Y%m%d%H%M%S')}.kv"
+            writer = PrecomputedTableWriter(str(path), {
+                "model_version_id": str(version.id),
+                "entity_key": config["entity_key"],
+                "built_at": built_at
+            })
+            await self._encode_scores(scores, config["entity_key"], deployment, writer)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, writer.finish)
+            self._publish(directory, path)
+            self._checked_at.pop(key, None)
+            self._refresh_claims.pop(key, None)
+            logger.info(f"Published precomputed predictions for deployment {key}: {job['rows_processed']} rows")
+        except Exception as e:
+            logger.error(f"Precomputed refresh failed for deployment {key}: {str(e)}")
+            return
+        finally:
+            db.close()
+            self.building.discard(key)
+            if scores is not None:
+                self._remove_scores(*scores)
+        try:
+            await self.redis_client.delete(lock_key)
+        except Exception as e:
+            logger.error(f"Failed to release precomputed refresh lock: {str(e)}")
+
+    @staticmethod
+    def _remove_scores(filesystem: Any, path: str):
+        try:
+            filesystem.delete_file(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Failed to remove precomputed scores {path}: {str(e)}")
+
+    async def _encode_scores(self, scores: Any, entity_key: str, deployment: Any, writer: PrecomputedTableWriter):
+        """Postprocess the job's raw predictions into response rows, as live inference would; `scores` is their resolved (filesystem, path)."""
+        import pyarrow.parquet as pq
+
+        filesystem, scores_path = scores
+        loop = asyncio.get_running_loop()
+        with filesystem.open_input_file(scores_path) as source:
+            batches = pq.ParquetFile(source).iter_batches(batch_size=ENCODE_BATCH_ROWS)
+            while True:
+                batch = await loop.run_in_executor(None, next, batches, None)
+                if batch is None:
+                    break
+                columns = batch.to_pydict()
+                raw = {
+                    "predictions": np.asarray(columns["prediction"]),
+                    "probabilities": np.asarray(columns["probabilities"]) if "probabilities" in columns else None
+                }
+                predictions = await self.inference_service.postprocess_predictions(raw, deployment, [])
+                rows = [
+                    p.dict(exclude={"index"}) if hasattr(p, "dict") else {"prediction": p}
+                    for p in predictions
+                ]
+                await loop.run_in_executor(None, writer.add, [str(k) for k in columns[entity_key]], rows)
+
+    def _publish(self, directory: Path, path: Path):
+        """Point `current` at the new file in one rename and remove all but the previous file."""
+        current = directory / "current"
+        try:
+            previous = os.readlink(current)
+        except OSError:
+            previous = None
+        staging = directory / f".current-{uuid.uuid4().hex}"
+        os.symlink(path.name, staging)
+        os.replace(staging, current)
+        for stale in directory.glob("*.kv"):
+            if stale.name not in (path.name, previous):
+                stale.unlink()
+
+    def get_stats(self, deployment: Any) -> Dict[str, Any]:
+        """The table this worker serves from: rows, model version and age."""
+        table = self.table(deployment)
+        if table is None:
+            return {"rows": 0, "building": str(deployment.id) in self.building}
+        return {
+            "rows": len(table),
+            "model_version_id": table.model_version_id,
+            "age_seconds": round(time.time() - table.built_at, 1),
+            "building": str(deployment.id) in self.building
+        }
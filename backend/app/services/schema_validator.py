@@ -0,0 +1,320 @@
+"""
+Schema Validator.
+Model input schemas compiled once into per-feature converters, checks and preprocessing steps.
+"""
+
+import logging
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.exceptions import ValidationError
+from app.services.sparse_features import SparseLayout, is_sparse_encoding
+
+
+logger = logging.getLogger(__name__)
+
+TYPE_CONVERTERS = {
+    'number': float,
+    'integer': int,
+    'string': str,
+    'boolean': bool,
+}
+
+
+def _array_converter(feature: str) -> Callable[[Any], Any]:
+    def convert(value: Any) -> Any:
+        if not isinstance(value, list):
+            raise ValueError(f"Expected array for {feature}")
+        return value
+    return convert
+
+
+def _constraint_checks(feature: str, constraints: Dict[str, Any]) -> List[Callable[[Any], None]]:
+    """Checks for minimum, maximum, enum and pattern, in that order."""
+    checks = []
+
+    if 'minimum' in constraints:
+        minimum = constraints['minimum']
+
+        def check_minimum(value):
+            if value < minimum:
+                raise ValidationError(f"Feature '{feature}' value {value} below minimum {minimum}")
+        checks.append(check_minimum)
+
+    if 'maximum' in constraints:
+        maximum = constraints['maximum']
+
+        def check_maximum(value):
+            if value > maximum:
+                raise ValidationError(f"Feature '{feature}' value {value} above maximum {maximum}")
+        checks.append(check_maximum)
+
+    if 'enum' in constraints:
+        allowed = constraints['enum']
+        try:
+            lookup = frozenset(allowed)
+        except TypeError:
+            lookup = allowed
+
+        def check_enum(value):
+            try:
+                ok = value in lookup
+            except TypeError:
+                ok = value in allowed
+            if not ok:
+                raise ValidationError(f"Feature '{feature}' value {value} not in allowed values {allowed}")
+        checks.append(check_enum)
+
+    if 'pattern' in constraints:
+        pattern = constraints['pattern']
+        compiled = re.compile(pattern)
+
+        def check_pattern(value):
+            if isinstance(value, str) and not compiled.match(value):
+                raise ValidationError(f"Feature '{feature}' value doesn't match pattern {pattern}")
+        checks.append(check_pattern)
+
+    return checks
+
+
+COLUMN_TYPES = {
+    'number': np.float64,
+    'integer': np.int64,
+    'boolean': np.bool_,
+}
+
+
+def _column_converter(feature: str, kind: Optional[str]) -> Callable[[np.ndarray], np.ndarray]:
+    """Whole-column counterpart of TYPE_CONVERTERS; nulls are rejected as the row converters do."""
+    def convert(column: np.ndarray) -> np.ndarray:
+        if column.dtype == object and any(value is None for value in column):
+            raise ValueError("null value")
+        if kind == 'string':
+            return column if column.dtype == object else column.astype(str).astype(object)
+        if kind == 'integer' and column.dtype.kind == 'f' and np.isnan(column).any():
+            raise ValueError("cannot convert float NaN to integer")
+        return column.astype(COLUMN_TYPES[kind]) if kind in COLUMN_TYPES else column
+    return convert
+
+
+def _column_checks(feature: str, constraints: Dict[str, Any]) -> List[Callable[[np.ndarray], None]]:
+    """Whole-column minimum, maximum and enum checks, reporting the first offending value."""
+    checks = []
+
+    def first(column: np.ndarray, bad: np.ndarray) -> Any:
+        return column[np.argmax(bad)]
+
+    if 'minimum' in constraints:
+        minimum = constraints['minimum']
+
+        def check_minimum(column):
+            bad = column < minimum
+            if bad.any():
+                raise ValidationError(f"Feature '{feature}' value {first(column, bad)} below minimum {minimum}")
+        checks.append(check_minimum)
+
+    if 'maximum' in constraints:
+        maximum = constraints['maximum']
+
+        def check_maximum(column):
+            bad = column > maximum
+            if bad.any():
+                raise ValidationError(f"Feature '{feature}' value {first(column, bad)} above maximum {maximum}")
+        checks.append(check_maximum)
+
+    if 'enum' in constraints:
+        allowed = constraints['enum']
+
+        def check_enum(column):
+            bad = ~np.isin(column, np.array(allowed, dtype=object))
+            if bad.any():
+                raise ValidationError(f"Feature '{feature}' value {first(column, bad)} not in allowed values {allowed}")
+        checks.append(check_enum)
+
+    return checks
+
+
+def _preprocessing_steps(config: Dict[str, Any]) -> List[Callable[[Dict[str, Any]], None]]:
+    """
+    In-place scaling then encoding steps, matching the order they are declared in.
+
+    Sparse encodings are skipped; their raw values are encoded by the SparseLayout.
+    """
+    steps = []
+
+    for feature, scale_config in config.get('scaling', {}).items():
+        if scale_config['type'] == 'standard':
+            offset, divisor = scale_config['mean'], scale_config['std']
+        elif scale_config['type'] == 'minmax':
+            offset, divisor = scale_config['min'], scale_config['max'] - scale_config['min']
+        else:
+            continue
+
+        def scale(row, feature=feature, offset=offset, divisor=divisor):
+            if feature in row:
+                row[feature] = (row[feature] - offset) / divisor
+        steps.append(scale)
+
+    for feature, encode_config in config.get('encoding', {}).items():
+        if is_sparse_encoding(encode_config):
+            continue
+        if encode_config['type'] == 'onehot':
+            columns = [(category, f"{feature}_{category}") for category in encode_config['categories']]
+
+            def onehot(row, feature=feature, columns=columns):
+                if feature in row:
+                    value = row.pop(feature)
+                    for category, column in columns:
+                        row[column] = 1 if value == category else 0
+            steps.append(onehot)
+        elif encode_config['type'] == 'label':
+            mapping = encode_config['mapping']
+
+            def label(row, feature=feature, mapping=mapping):
+                if feature in row:
+                    row[feature] = mapping.get(row[feature], 0)
+            steps.append(label)
+
+    return steps
+
+
+def _column_preprocessing_steps(config: Dict[str, Any]) -> List[Callable[[Dict[str, np.ndarray]], None]]:
+    """Whole-column versions of _preprocessing_steps, applied to a dict of columns in the same order."""
+    steps = []
+
+    for feature, scale_config in config.get('scaling', {}).items():
+        if scale_config['type'] == 'standard':
+            offset, divisor = scale_config['mean'], scale_config['std']
+        elif scale_config['type'] == 'minmax':
+            offset, divisor = scale_config['min'], scale_config['max'] - scale_config['min']
+        else:
+            continue
+
+        def scale(columns, feature=feature, offset=offset, divisor=divisor):
+            if feature in columns:
+                columns[feature] = (columns[feature] - offset) / divisor
+        steps.append(scale)
+
+    for feature, encode_config in config.get('encoding', {}).items():
+        if encode_config['type'] == 'onehot':
+            columns_out = [(category, f"{feature}_{category}") for category in encode_config['categories']]
+
+            def onehot(columns, feature=feature, columns_out=columns_out):
+                if feature in columns:
+                    values = columns.pop(feature)
+                    for category, column in columns_out:
+                        columns[column] = (values == category).astype(np.int64)
+            steps.append(onehot)
+        elif encode_config['type'] == 'label':
+            mapping = encode_config['mapping']
+
+            def label(columns, feature=feature, mapping=mapping):
+                if feature in columns:
+                    columns[feature] = np.array([mapping.get(value, 0) for value in columns[feature].tolist()])
+            steps.append(label)
+
+    return steps
+
+
+class CompiledSchema:
+    """
+    A model_schema resolved into plain callables.
+
+    Per-feature type conversion and constraint checks, the required-feature
+    set and preprocessing steps are built once, so validating a row is a
+    single pass over its values with no schema lookups. `sparse` is the CSR
+    layout when the schema declares sparse or hashed encodings.
+    """
+
+    def __init__(self, model_schema: Dict[str, Any]):
+        input_schema = model_schema.get('input_schema', {})
+        self.required = frozenset(input_schema.get('required', []))
+        self.features: Dict[str, Tuple[Optional[Callable], List[Callable]]] = {}
+        self.column_features: Dict[str, Tuple[Callable, List[Callable]]] = {}
+        for feature, spec in input_schema.get('properties', {}).items():
+            kind = spec.get('type')
+            converter = _array_converter(feature) if kind == 'array' else TYPE_CONVERTERS.get(kind)
+            self.features[feature] = (converter, _constraint_checks(feature, spec))
+            self.column_features[feature] = (_column_converter(feature, kind), _column_checks(feature, spec))
+        self.preprocessing = _preprocessing_steps(model_schema['preprocessing']) if 'preprocessing' in model_schema else []
+        self.column_preprocessing = _column_preprocessing_steps(model_schema['preprocessing']) if 'preprocessing' in model_schema else []
+        self.sparse = SparseLayout.from_schema(model_schema)
+        # Array features, patterns and sparse encodings are only validated row by row
+        self.columnar = self.sparse is None and not any(
+            spec.get('type') == 'array' or 'pattern' in spec
+            for spec in input_schema.get('properties', {}).values()
+        )
+
+    def validate(self, instances: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Convert, check and preprocess instances.
+
+        Raises:
+            ValidationError: On the first missing feature, bad type or violated constraint
+        """
+        features = self.features
+        validated_instances = []
+        for i, instance in enumerate(instances):
+            if not self.required <= instance.keys():
+                raise ValidationError(
+                    f"Instance {i}: Missing required features: {set(self.required - instance.keys())}"
+                )
+
+            validated = {}
+            for feature, value in instance.items():
+                compiled = features.get(feature)
+                if compiled is None:
+                    # Unknown feature - keep as is but log warning
+                    logger.warning(f"Unknown feature '{feature}' in instance {i}")
+                    validated[feature] = value
+                    continue
+                converter, checks = compiled
+                try:
+                    if converter is not None:
+                        value = converter(value)
+                    for check in checks:
+                        check(value)
+                except (ValueError, TypeError) as e:
+                    raise ValidationError(f"Instance {i}: Invalid type for feature '{feature}': {str(e)}")
+                validated[feature] = value
+
+            for step in self.preprocessing:
+                step(validated)
+            validated_instances.append(validated)
+        return validated_instances
+
+    def validate_columns(self, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Convert, check and preprocess a batch held column by column.
+
+        Same rules as `validate`, one numpy operation per feature instead of
+        one call per value. Only valid for schemas where `columnar` is set.
+
+        Raises:
+            ValidationError: On a missing feature, bad type or violated constraint
+        """
+        missing = self.required - columns.keys()
+        if missing:
+            raise ValidationError(f"Missing required features: {set(missing)}")
+
+        validated = {}
+        for feature, column in columns.items():
+            compiled = self.column_features.get(feature)
+            if compiled is None:
+                logger.warning(f"Unknown feature '{feature}' in columnar batch")
+                validated[feature] = column
+                continue
+            converter, checks = compiled
+            try:
+                column = converter(column)
+                for check in checks:
+                    check(column)
+            except (ValueError, TypeError) as e:
+                raise ValidationError(f"Invalid type for feature '{feature}': {str(e)}")
+            validated[feature] = column
+
+        for step in self.column_preprocessing:
+            step(validated)
+        return validated
@@ -0,0 +1,145 @@
+"""
+Sparse Features.
+CSR encoding for high-cardinality categorical and hashed features declared in a model schema.
+"""
+
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.exceptions import ValidationError
+
+
+logger = logging.getLogger(__name__)
+
+# Frameworks whose estimators take scipy.sparse input directly
+SPARSE_FRAMEWORKS = {'sklearn', 'xgboost', 'lightgbm'}
+
+
+def is_sparse_encoding(encode_config: Dict[str, Any]) -> bool:
+    """Encodings that are left raw by validation and encoded into the CSR matrix instead."""
+    return encode_config.get('type') == 'hash' or (
+        encode_config.get('type') == 'onehot' and encode_config.get('sparse', False)
+    )
+
+
+def _values(value: Any) -> Sequence[Any]:
+    """A feature value or multi-valued list of them (e.g. a bag of tags)."""
+    if value is None:
+        return ()
+    return value if isinstance(value, (list, tuple)) else (value,)
+
+
+def _onehot_block(feature: str, config: Dict[str, Any]) -> Tuple[int, Callable]:
+    index = {category: i for i, category in enumerate(config['categories'])}
+
+    def encode(value: Any) -> List[Tuple[int, float]]:
+        # Unknown categories encode to all zeros, as in the dense one-hot
+        return [(index[v], 1.0) for v in _values(value) if v in index]
+    return len(index), encode
+
+
+def _hash_block(feature: str, config: Dict[str, Any]) -> Tuple[int, Callable]:
+    """
+    Feature hashing compatible with sklearn's FeatureHasher on dict input.
+
+    Strings hash as the token "feature=value" with weight 1, numbers as
+    the token "feature" weighted by the value; with `alternate_sign` the
+    hash's sign flips the weight so collisions cancel out on average.
+    """
+    from sklearn.utils import murmurhash3_32
+
+    n_features = int(config.get('n_features', 2 ** 20))
+    alternate_sign = config.get('alternate_sign', True)
+    if n_features < 1:
+        raise ValidationError(f"Hashed feature '{feature}' needs n_features >= 1")
+
+    def encode(value: Any) -> List[Tuple[int, float]]:
+        entries = []
+        for v in _values(value):
+            if isinstance(v, str):
+                token, weight = f"{feature}={v}", 1.0
+            else:
+                token, weight = feature, float(v)
+            h = murmurhash3_32(token, seed=0)
+            if alternate_sign and h < 0:
+                weight = -weight
+            entries.append((abs(h) % n_features, weight))
+        return entries
+    return n_features, encode
+
+
+class SparseLayout:
+    """
+    Column layout of a schema's sparse model input.
+
+    Dense columns come first, in `preprocessing.dense_columns` order or else
+    the input_schema property order (with dense one-hots expanded to their
+    `feature_category` columns), followed by one block per sparse encoding
+    in declaration order. Missing dense values are left out of the matrix,
+    which XGBoost and LightGBM treat as missing and sklearn as zero.
+    """
+
+    def __init__(self, dense_columns: List[str], blocks: List[Tuple[str, int, int, Callable]]):
+        self.dense_columns = dense_columns
+        self.blocks = blocks
+        self.width = len(dense_columns) + sum(width for _, _, width, _ in blocks)
+
+    @classmethod
+    def from_schema(cls, model_schema: Dict[str, Any]) -> Optional["SparseLayout"]:
+        """Build the layout, or None if the schema declares no sparse encodings."""
+        encoding = model_schema.get('preprocessing', {}).get('encoding', {})
+        sparse = {feature: config for feature, config in encoding.items() if is_sparse_encoding(config)}
+        if not sparse:
+            return None
+
+        dense_columns = model_schema['preprocessing'].get('dense_columns')
+        if dense_columns is None:
+            dense_columns = []
+            for feature in model_schema.get('input_schema', {}).get('properties', {}):
+                config = encoding.get(feature, {})
+                if feature in sparse:
+                    continue
+                if config.get('type') == 'onehot':
+                    dense_columns.extend(f"{feature}_{category}" for category in config['categories'])
+                else:
+                    dense_columns.append(feature)
+
+        blocks = []
+        offset = len(dense_columns)
+        for feature, config in sparse.items():
+            if config['type'] == 'hash':
+                width, encode = _hash_block(feature, config)
+            else:
+                width, encode = _onehot_block(feature, config)
+            blocks.append((feature, offset, width, encode))
+            offset += width
+        return cls(list(dense_columns), blocks)
+
+    def encode(self, instances: List[Dict[str, Any]]) -> Any:
+        """Encode validated instances into a float32 scipy.sparse CSR matrix."""
+        from scipy import sparse
+
+        data: List[float] = []
+        indices: List[int] = []
+        indptr = [0]
+        for instance in instances:
+            for column, name in enumerate(self.dense_columns):
+                value = instance.get(name)
+                if value is not None:
+                    indices.append(column)
+                    data.append(float(value))
+            for feature, offset, _, encode in self.blocks:
+                for index, weight in encode(instance.get(feature)):
+                    indices.append(offset + index)
+                    data.append(weight)
+            indptr.append(len(indices))
+
+        matrix = sparse.csr_matrix(
+            (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(instances), self.width)
+        )
+        # Hash collisions within a row become duplicate entries
+        matrix.sum_duplicates()
+        return matrix
@@ -0,0 +1,155 @@
+"""
+TensorFlow Model.
+Serving wrapper around a concrete TensorFlow function with a fixed input signature.
+"""
+
+import bisect
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.exceptions import InferenceError, ModelError
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+
+
+class TensorflowModel:
+    """
+    A TensorFlow model resolved to one concrete function at load.
+
+    SavedModels use their serving signature; Keras models are traced once
+    with a fixed [None, ...] input signature. Batches are zero-padded up to
+    the next bucket size (and split above the largest) so the function only
+    ever sees a small, fixed set of shapes.
+    """
+
+    def __init__(
+        self,
+        function: Any,
+        input_specs: Dict[str, Any],
+        input_mapping: Optional[Dict[str, List[str]]] = None,
+        output_name: Optional[str] = None,
+        batch_buckets: Optional[Sequence[int]] = None,
+        keyword_inputs: bool = True,
+        source: Any = None
+    ):
+        self.function = function
+        # Signatures only hold weak references to the SavedModel's variables
+        self.source = source
+        self.input_specs = input_specs
+        self.input_mapping = input_mapping or {}
+        self.output_name = output_name
+        self.batch_buckets = sorted(batch_buckets or DEFAULT_BATCH_BUCKETS)
+        self.keyword_inputs = keyword_inputs
+
+        unmapped = [name for name in input_specs if name not in self.input_mapping]
+        if len(input_specs) > 1 and unmapped:
+            raise ModelError(
+                f"TensorFlow signature has inputs {unmapped} without a feature mapping in "
+                f"model_schema.serving.tensorflow.inputs"
+            )
+
+    @classmethod
+    def from_saved_model(cls, loaded: Any, options: Dict[str, Any]) -> "TensorflowModel":
+        signature_key = options.get('signature', 'serving_default')
+        if signature_key not in loaded.signatures:
+            raise ModelError(
+                f"SavedModel has no '{signature_key}' signature; available: {list(loaded.signatures.keys())}"
+            )
+        signature = loaded.signatures[signature_key]
+        input_specs = dict(signature.structured_input_signature[1])
+        return cls(
+            signature,
+            input_specs,
+            input_mapping=options.get('inputs'),
+            output_name=options.get('output'),
+            batch_buckets=options.get('batch_buckets'),
+            source=loaded
+        )
+
+    @classmethod
+    def from_keras(cls, model: Any, options: Dict[str, Any]) -> "TensorflowModel":
+        import tensorflow as tf
+
+        if len(model.inputs) != 1:
+            raise ModelError("Only single-input Keras models are supported; export a SavedModel signature instead")
+        keras_input = model.inputs[0]
+        spec = tf.TensorSpec([None, *keras_input.shape[1:]], keras_input.dtype, name='input')
+        traced = tf.function(
+            lambda x: model(x, training=False),
+            input_signature=[spec],
+            jit_compile=options.get('jit_compile', False)
+        )
+        return cls(
+            traced.get_concrete_function(),
+            {'input': spec},
+            input_mapping=options.get('inputs'),
+            batch_buckets=options.get('batch_buckets'),
+            keyword_inputs=False,
+            source=model
+        )
+
+    def _bucket_for(self, batch_size: int) -> int:
+        index = bisect.bisect_left(self.batch_buckets, batch_size)
+        return self.batch_buckets[min(index, len(self.batch_buckets) - 1)]
+
+    def prepare_inputs(self, data: Any) -> Dict[str, np.ndarray]:
+        """
+        Build one array per signature input.
+
+        Accepts the float32 matrix the service already builds for single-input
+        models, or instance dicts when inputs are mapped by feature name.
+        """
+        if isinstance(data, np.ndarray):
+            if len(self.input_specs) != 1:
+                raise InferenceError("Multi-input TensorFlow models need named features")
+            name, spec = next(iter(self.input_specs.items()))
+            return {name: data.astype(spec.dtype.as_numpy_dtype, copy=False)}
+
+        feeds = {}
+        for name, spec in self.input_specs.items():
+            features = self.input_mapping.get(name) or list(data[0].keys())
+            try:
+                feeds[name] = np.array(
+                    [[instance[feature] for feature in features] for instance in data],
+                    dtype=spec.dtype.as_numpy_dtype
+                )
+            except KeyError as e:
+                raise InferenceError(f"Missing feature {str(e)} for TensorFlow input '{name}'")
+        return feeds
+
+    def predict(self, feeds: Dict[str, np.ndarray]) -> np.ndarray:
+        """Run padded bucket-sized slices through the concrete function."""
+        batch_size = len(next(iter(feeds.values())))
+        largest = self.batch_buckets[-1]
+        outputs = []
+        for start in range(0, batch_size, largest):
+            chunk = {name: array[start:start + largest] for name, array in feeds.items()}
+            rows = len(next(iter(chunk.values())))
+            padded_size = self._bucket_for(rows)
+            if padded_size > rows:
+                chunk = {
+                    name: np.pad(array, [(0, padded_size - rows)] + [(0, 0)] * (array.ndim - 1))
+                    for name, array in chunk.items()
+                }
+            outputs.append(self._call(chunk)[:rows])
+        return np.concatenate(outputs) if len(outputs) > 1 else outputs[0]
+
+    def _call(self, feeds: Dict[str, np.ndarray]) -> np.ndarray:
+        import tensorflow as tf
+
+        tensors = {name: tf.constant(array) for name, array in feeds.items()}
+        if self.keyword_inputs:
+            result = self.function(**tensors)
+        else:
+            result = self.function(*tensors.values())
+        if isinstance(result, dict):
+            name = self.output_name or sorted(result)[0]
+            if name not in result:
+                raise InferenceError(f"TensorFlow signature has no output '{name}'")
+            result = result[name]
+        return result.numpy()
@@ -0,0 +1,350 @@
+"""
+Traffic Service.
+Weighted canary splits between model versions and shadow evaluation of a challenger version.
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set
+
+import redis.asyncio as redis
+from prometheus_client import Counter
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.model_monitoring import ModelMonitoring
+from app.models.model_version import ModelVersion
+from app.schemas.inference import PredictionResult
+from app.services.inference_service import InferenceService, ServingTarget
+from app.services.model_loader import ModelLoader
+
+
+logger = logging.getLogger(__name__)
+
+SHADOW_ROWS = Counter(
+    "inference_shadow_rows_total",
+    "Rows scored by shadow challengers, by agreement with the primary",
+    ["deployment_id", "outcome"]
+)
+
+
+def traffic_config(deployment: Any) -> Dict[str, Any]:
+    """The deployment's canary split and shadow settings, empty when it has neither."""
+    return (deployment.deployment_config or {}).get("traffic") or {}
+
+
+def prediction_value(prediction: Any) -> Any:
+    """The bare prediction from a PredictionResult, cached row or raw model output."""
+    if isinstance(prediction, PredictionResult):
+        return prediction.prediction
+    if isinstance(prediction, dict):
+        return prediction.get("prediction")
+    return prediction
+
+
+def predictions_agree(primary: Any, challenger: Any, tolerance: float) -> bool:
+    """Numbers agree within `tolerance` (absolute or relative); anything else must be equal."""
+    numeric = (int, float)
+    if isinstance(primary, numeric) and isinstance(challenger, numeric):
+        return math.isclose(primary, challenger, rel_tol=tolerance, abs_tol=tolerance)
+    return primary == challenger
+
+
+def _lower_priority():
+    # Linux nice values are per thread, so this only deprioritizes the shadow workers
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), settings.SHADOW_NICENESS)
+    except (AttributeError, OSError) as e:
+        logger.warning(f"Could not lower shadow thread priority: {str(e)}")
+
+
+class TrafficService:
+    """
+    Canary and shadow traffic for a deployment.
+
+    `deployment_config["traffic"]` holds both:
+
+        {"split": [{"model_version_id": "...", "weight": 0.1, "serving": {...}}],
+         "shadow": {"model_version_id": "...", "sample_rate": 0.05, "tolerance": 1e-6}}
+
+    Split weights are request fractions; the deployment's own version takes
+    whatever is left. A sampled request is re-scored by the shadow version
+    after its response is sent, on a small executor of low-priority threads,
+    and the two versions' agreement and per-row latency are aggregated into
+    ModelMonitoring every SHADOW_MONITORING_WINDOW shadowed requests.
+    Samples are skipped while loading the challenger would unload another
+    model, so shadowing never evicts the versions serving traffic.
+    """
+
+    def __init__(self, model_loader: ModelLoader, redis_client: Optional[redis.Redis] = None):
+        self.model_loader = model_loader
+        self.redis_client = redis_client or redis.from_url(settings.REDIS_URL)
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.SHADOW_WORKER_THREADS,
+            thread_name_prefix="shadow",
+            initializer=_lower_priority
+        )
+        self.inference_service = InferenceService(executor=self.executor)
+        self.in_flight: Set[asyncio.Task] = set()
+
+    def choose_target(self, db: Session, deployment: Any, client_id: Optional[str] = None) -> Any:
+        """
+        Pick the version that serves this request.
+
+        Returns the deployment itself, or a ServingTarget for a canary version.
+        With `"sticky": true` a client always lands on the same version.
+        """
+        config = traffic_config(deployment)
+        split = config.get("split")
+        if not split:
+            return deployment
+
+        if config.get("sticky") and client_id:
+            digest = hashlib.blake2b(f"{deployment.id}:{client_id}".encode("utf-8"), digest_size=8).digest()
+            draw = int.from_bytes(digest, "big") / 2 ** 64
+        else:
+            draw = random.random()
+
+        cumulative = 0.0
+        for variant in split:
+            cumulative += variant["weight"]
+            if draw < cumulative:
+                version = db.query(ModelVersion).filter(ModelVersion.id == variant["model_version_id"]).first()
+                if version is None:
+                    logger.warning(f"Canary model version {variant['model_version_id']} not found; serving primary")
+                    return deployment
+                # Load options belong to the version, so the primary's don't carry over
+                deployment_config = {
+                    key: value for key, value in deployment.deployment_config.items()
+                    if key not in ("traffic", "serving")
+                }
+                if variant.get("serving"):
+                    deployment_config["serving"] = variant["serving"]
+                return ServingTarget(version, deployment_config, deployment.id)
+        return deployment
+
+    def sample_shadow(self, deployment: Any) -> Optional[Dict[str, Any]]:
+        """The shadow settings if this request should be shadowed, else None."""
+        shadow = traffic_config(deployment).get("shadow")
+        if not shadow or random.random() >= shadow.get("sample_rate", settings.SHADOW_SAMPLE_RATE):
+            return None
+        return shadow
+
+    async def submit(
+        self,
+        deployment_id: Any,
+        deployment_config: Dict[str, Any],
+        shadow: Dict[str, Any],
+        instances: List[Dict[str, Any]],
+        primary: List[Any],
+        primary_ms: float
+    ):
+        """
+        Start a shadow evaluation detached from the request and return at once.
+
+        Called as a background task, so it runs after the response is sent.
+        Samples beyond SHADOW_MAX_IN_FLIGHT are shed rather than queued.
+        """
+        if len(self.in_flight) >= settings.SHADOW_MAX_IN_FLIGHT:
+            SHADOW_ROWS.labels(str(deployment_id), "shed").inc(len(instances))
+            await self._record(deployment_id, {"shed": 1})
+            return
+        rows = settings.SHADOW_MAX_ROWS
+        task = asyncio.ensure_future(self.evaluate(
+            deployment_id,
+            deployment_config,
+            shadow,
+            instances[:rows],
+            primary[:rows],
+            primary_ms * min(1.0, rows / len(instances)) if instances else primary_ms
+        ))
+        self.in_flight.add(task)
+        task.add_done_callback(self.in_flight.discard)
+
+    async def evaluate(
+        self,
+        deployment_id: Any,
+        deployment_config: Dict[str, Any],
+        shadow: Dict[str, Any],
+        instances: List[Dict[str, Any]],
+        primary: List[Any],
+        primary_ms: float
+    ):
+        """Score instances with the shadow version and record how it compares to the primary."""
+        if not instances:
+            return
+        loop = asyncio.get_running_loop()
+        db = SessionLocal()
+        try:
+            # Session work blocks, so it runs on the default executor rather than the event loop
+            version = await loop.run_in_executor(None, self._find_version, db, shadow["model_version_id"])
+            if version is None:
+                raise ValueError(f"Shadow model version {shadow['model_version_id']} not found")
+            if not self.model_loader.has_room_for(version.id, shadow.get("serving")):
+                SHADOW_ROWS.labels(str(deployment_id), "skipped").inc(len(instances))
+                await self._record(deployment_id, {"skipped": 1})
+                return
+            model = await self.model_loader.get_model(version.id, shadow.get("serving"))
+            start = time.perf_counter()
+            validated = await self.inference_service.validate_input(instances, version.model_schema)
+            predictions = await self.inference_service.predict(
+                model=model,
+                instances=validated,
+                deployment=ServingTarget(version, deployment_config, deployment_id)
+            )
+            shadow_ms = (time.perf_counter() - start) * 1000
+
+            tolerance = shadow.get("tolerance", settings.SHADOW_AGREEMENT_TOLERANCE)
+            agreed = 0
+            abs_error = 0.0
+            for expected, actual in zip(primary, predictions):
+                expected, actual = prediction_value(expected), prediction_value(actual)
+                agreed += predictions_agree(expected, actual, tolerance)
+                if isinstance(expected, (int, float)) and isinstance(actual, (int, float)):
+                    abs_error += abs(expected - actual)
+            SHADOW_ROWS.labels(str(deployment_id), "agreed").inc(agreed)
+            SHADOW_ROWS.labels(str(deployment_id), "disagreed").inc(len(instances) - agreed)
+
+            window = await self._record(deployment_id, {
+                "requests": 1,
+                "rows": len(instances),
+                "agreed": agreed,
+                "abs_error": abs_error,
+                "primary_ms": primary_ms,
+                "shadow_ms": shadow_ms
+            })
+            if window:
+                await loop.run_in_executor(None, self._store_window, db, deployment_id, shadow, window)
+        except Exception as e:
+            await loop.run_in_executor(None, db.rollback)
+            SHADOW_ROWS.labels(str(deployment_id), "failed").inc(len(instances))
+            logger.error(f"Shadow evaluation failed for deployment {deployment_id}: {str(e)}")
+            await self._record(deployment_id, {"failed": 1})
+        finally:
+            await loop.run_in_executor(None, db.close)
+
+    @staticmethod
+    def _find_version(db: Session, model_version_id: Any) -> Optional[ModelVersion]:
+        version = db.query(ModelVersion).filter(ModelVersion.id == model_version_id).first()
+        if version is not None:
+            # Scoring reads the model's problem_type; load it here rather than lazily on the event loop
+            version.model
+        return version
+
+    async def _record(self, deployment_id: Any, counts: Dict[str, float]) -> Optional[Dict[str, float]]:
+        """
+        Add to the shared totals and the current monitoring window.
+
+        Returns the window's totals, and starts a new window, when this
+        request completes it.
+        """
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key in (f"shadow_stats:{deployment_id}", f"shadow_window:{deployment_id}"):
+                for field, amount in counts.items():
+                    if isinstance(amount, float):
+                        pipe.hincrbyfloat(key, field, amount)
+                    else:
+                        pipe.hincrby(key, field, amount)
+            results = await pipe.execute()
+            if "requests" not in counts:
+                return None
+            window_requests = results[len(counts) + list(counts).index("requests")]
+            if int(window_requests) % settings.SHADOW_MONITORING_WINDOW:
+                return None
+            pipe = self.redis_client.pipeline(transaction=True)
+            pipe.hgetall(f"shadow_window:{deployment_id}")
+            pipe.delete(f"shadow_window:{deployment_id}")
+            window, _ = await pipe.execute()
+            return {
+                (k.decode() if isinstance(k, bytes) else k): float(v)
+                for k, v in window.items()
+            }
+        except Exception as e:
+            logger.error(f"Failed to record shadow stats: {str(e)}")
+            return None
+
+    def _store_window(self, db: Session, deployment_id: Any, shadow: Dict[str, Any], window: Dict[str, float]):
+        rows = window.get("rows", 0)
+        if not rows:
+            return
+        agreement = window.get("agreed", 0) / rows
+        primary_ms = window.get("primary_ms", 0) / rows
+        shadow_ms = window.get("shadow_ms", 0) / rows
+        min_agreement = shadow.get("min_agreement", settings.SHADOW_MIN_AGREEMENT)
+        metrics = [
+            ("shadow_agreement", agreement, min_agreement, agreement < min_agreement),
+            ("shadow_mean_abs_error", window.get("abs_error", 0) / rows, None, False),
+            ("shadow_latency_ms_per_row", shadow_ms, None, False),
+            ("primary_latency_ms_per_row", primary_ms, None, False),
+        ]
+        if primary_ms:
+            metrics.append(("shadow_latency_ratio", shadow_ms / primary_ms, None, False))
+        for name, value, threshold_min, is_anomaly in metrics:
+            db.add(ModelMonitoring(
+                deployment_id=deployment_id,
+                metric_name=name,
+                value=value,
+                threshold_min=threshold_min,
+                is_anomaly=is_anomaly
+            ))
+        db.commit()
+
+    async def record_variant(self, deployment_id: Any, model_version_id: Any, latency_ms: float):
+        """Count a request served by one side of a canary split, with its latency."""
+        try:
+            key = f"traffic_stats:{deployment_id}"
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.hincrby(key, f"{model_version_id}:requests", 1)
+            pipe.hincrbyfloat(key, f"{model_version_id}:latency_ms", latency_ms)
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to record traffic split stats: {str(e)}")
+
+    async def get_stats(self, deployment_id: Any) -> Dict[str, Any]:
+        """Requests and mean latency per split version, and cumulative shadow agreement and latency."""
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.hgetall(f"traffic_stats:{deployment_id}")
+            pipe.hgetall(f"shadow_stats:{deployment_id}")
+            split_raw, shadow_raw = await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to read traffic stats: {str(e)}")
+            return {}
+
+        def decode(raw):
+            return {(k.decode() if isinstance(k, bytes) else k): float(v) for k, v in raw.items()}
+
+        split_stats = decode(split_raw)
+        versions = {}
+        for field, value in split_stats.items():
+            version_id, _, name = field.rpartition(":")
+            if name == "requests":
+                versions[version_id] = {
+                    "requests": int(value),
+                    "avg_latency_ms": round(split_stats.get(f"{version_id}:latency_ms", 0) / value, 2) if value else 0.0
+                }
+
+        shadow = decode(shadow_raw)
+        rows = shadow.get("rows", 0)
+        return {
+            "split": versions,
+            "shadow": {
+                "requests": int(shadow.get("requests", 0)),
+                "rows": int(rows),
+                "shed": int(shadow.get("shed", 0)),
+                "skipped": int(shadow.get("skipped", 0)),
+                "failed": int(shadow.get("failed", 0)),
+                "agreement": round(shadow.get("agreed", 0) / rows, 4) if rows else None,
+                "primary_ms_per_row": round(shadow.get("primary_ms", 0) / rows, 3) if rows else None,
+                "shadow_ms_per_row": round(shadow.get("shadow_ms", 0) / rows, 3) if rows else None
+            }
+        }
@@ -0,0 +1,229 @@
+"""
+Version Profiler.
+Measures how fast and how heavy a model version is, in a process of its own, and stores the result on the version.
+
+Each newly registered version is loaded in a freshly spawned interpreter, so a
+model that leaks, segfaults or eats the node's memory takes down the profiling
+process and not an API worker. The child measures:
+
+- load time;
+- resident memory before and after loading, and its peak;
+- latency and throughput at each of PROFILING_BATCH_SIZES, scored from
+  synthetic rows built from the model schema.
+
+The profile is stored in `serving_profile["performance"]`. DeploymentService
+compares it with the serving version's profile before moving a gated
+deployment to the new version.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import resource
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import psutil
+import redis.asyncio as redis
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.model_version import ModelVersion
+from app.services.batch_tuner import benchmark_batch, synthetic_instances
+from app.services.inference_service import InferenceService, ServingTarget
+from app.services.model_loader import ModelLoader
+
+
+logger = logging.getLogger(__name__)
+
+# Differences below these are measurement noise, not regressions
+_LATENCY_FLOOR_MS = 1.0
+_MEMORY_FLOOR_BYTES = 64 * 1024 * 1024
+
+
+class ProfilingError(Exception):
+    """Raised when the profiling process fails, crashes or runs out of time."""
+
+
+def _run_child(connection, fn: Callable, args: tuple):
+    try:
+        connection.send(("ok", fn(*args)))
+    except BaseException as e:
+        connection.send(("error", f"{type(e).__name__}: {str(e)}"))
+    finally:
+        connection.close()
+
+
+def run_isolated(fn: Callable, args: tuple, timeout: float) -> Any:
+    """
+    Call `fn(*args)` in a freshly spawned process and return its result.
+
+    `fn` must be importable by name and its result picklable. The process is
+    killed if it has not answered within `timeout` seconds.
+
+    Raises:
+        ProfilingError: If the call raised, the process died or the timeout passed
+    """
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_run_child, args=(sender, fn, args), daemon=True)
+    process.start()
+    sender.close()
+    try:
+        if not receiver.poll(timeout):
+            raise ProfilingError(f"Profiling did not finish within {timeout:g}s")
+        status, payload = receiver.recv()
+    except EOFError:
+        process.join(5)
+        raise ProfilingError(f"Profiling process exited with code {process.exitcode}")
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        receiver.close()
+    if status != "ok":
+        raise ProfilingError(payload)
+    return payload
+
+
+async def _profile(model_version_id: str, batch_sizes: List[int], repeats: int) -> Dict[str, Any]:
+    process = psutil.Process()
+    db = SessionLocal()
+    try:
+        version = db.query(ModelVersion).filter(ModelVersion.id == model_version_id).first()
+        if version is None:
+            raise ProfilingError(f"Model version {model_version_id} not found")
+        baseline_rss = process.memory_info().rss
+        start = time.perf_counter()
+        model = await ModelLoader().get_model(model_version_id)
+        load_seconds = time.perf_counter() - start
+        loaded_rss = process.memory_info().rss
+
+        target = ServingTarget(version)
+        inference_service = InferenceService()
+        rows = synthetic_instances(version.model_schema or {}, max(batch_sizes))
+        batches = [
+            await benchmark_batch(inference_service, model, target, rows[:batch_size], repeats)
+            for batch_size in sorted(batch_sizes)
+        ]
+    finally:
+        db.close()
+
+    single_row = next((batch for batch in batches if batch['batch_size'] == 1), None)
+    return {
+        'status': 'completed',
+        'load_seconds': round(load_seconds, 3),
+        'baseline_rss_bytes': baseline_rss,
+        'model_rss_bytes': max(0, loaded_rss - baseline_rss),
+        'peak_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        'batches': batches,
+        'peak_rows_per_second': max((batch['rows_per_second'] or 0) for batch in batches),
+        'single_row_p95_ms': single_row['p95_ms'] if single_row else None,
+        'cpu_count': os.cpu_count()
+    }
+
+
+def profile_version(model_version_id: str, batch_sizes: List[int], repeats: int) -> Dict[str, Any]:
+    """Profile a model version in the current process; the entry point of the profiling process."""
+    logging.basicConfig(level=getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO))
+    return asyncio.run(_profile(model_version_id, batch_sizes, repeats))
+
+
+def capacity_regressions(current: Dict[str, Any], candidate: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Where the candidate version's performance profile is worse than the current one's by more than `threshold`.
+
+    Profiles that are missing, failed, or were measured on hosts with a
+    different CPU count aren't comparable, and yield no regressions.
+
+    Returns:
+        One description per regressed measure; empty if the candidate may be served
+    """
+    if (
+        current.get('status') != 'completed'
+        or candidate.get('status') != 'completed'
+        or current.get('cpu_count') != candidate.get('cpu_count')
+    ):
+        return []
+
+    regressions = []
+    measures = (
+        ('peak_rows_per_second', 'peak throughput (rows/s)', True, 0),
+        ('single_row_p95_ms', 'single-row p95 latency (ms)', False, _LATENCY_FLOOR_MS),
+        ('model_rss_bytes', 'resident memory (bytes)', False, _MEMORY_FLOOR_BYTES)
+    )
+    for name, label, higher_is_better, floor in measures:
+        before, after = current.get(name), candidate.get(name)
+        if not before or after is None or max(before, after) < floor:
+            continue
+        change = (after - before) / before
+        if (-change if higher_is_better else change) > threshold:
+            regressions.append(f"{label} {before:g} -> {after:g} ({change:+.0%})")
+    return regressions
+
+
+class VersionProfiler:
+    """Profiles registered model versions out of process and stores the results."""
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        self.redis_client = redis_client or redis.from_url(settings.REDIS_URL)
+
+    async def profile(
+        self,
+        model_version_id: Any,
+        batch_sizes: Optional[Sequence[int]] = None,
+        repeats: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Profile a version in a spawned process, waiting on a thread so the event loop keeps serving."""
+        args = (str(model_version_id), list(batch_sizes or settings.PROFILING_BATCH_SIZES), repeats or settings.PROFILING_REPEATS)
+        result = await asyncio.get_running_loop().run_in_executor(
+            None, run_isolated, profile_version, args, settings.PROFILING_TIMEOUT_SECONDS
+        )
+        return {**result, 'profiled_at': datetime.utcnow().isoformat()}
+
+    async def profile_and_store(self, model_version_id: Any):
+        """
+        Profile a model version and save the result on it.
+
+        Runs as a background task. A Redis lock keeps several workers from
+        profiling the same version at once. A failed profile is stored too,
+        with its error, so it isn't retried on every registration.
+        """
+        lock_key = f"version_profiling:{model_version_id}"
+        try:
+            if not await self.redis_client.set(lock_key, "1", nx=True, ex=int(settings.PROFILING_TIMEOUT_SECONDS) + 60):
+                return
+        except Exception as e:
+            logger.error(f"Failed to acquire profiling lock: {str(e)}")
+            return
+
+        try:
+            result = await self.profile(model_version_id)
+            logger.info(
+                f"Profiled model version {model_version_id}: load {result['load_seconds']}s, "
+                f"{result['model_rss_bytes']} bytes, {result['peak_rows_per_second']} rows/s"
+            )
+        except Exception as e:
+            logger.error(f"Profiling failed for model version {model_version_id}: {str(e)}")
+            result = {'status': 'failed', 'error': str(e), 'profiled_at': datetime.utcnow().isoformat()}
+
+        db = SessionLocal()
+        try:
+            version = db.query(ModelVersion).filter(ModelVersion.id == model_version_id).first()
+            if version is not None:
+                version.serving_profile = {**(version.serving_profile or {}), 'performance': result}
+                db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to store profile of model version {model_version_id}: {str(e)}")
+        finally:
+            db.close()
+        try:
+            await self.redis_client.delete(lock_key)
+        except Exception as e:
+            logger.error(f"Failed to release profiling lock: {str(e)}")
+
+
+version_profiler = VersionProfiler()
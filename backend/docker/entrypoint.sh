@@ -17,6 +17,12 @@ print(max(2, mp.cpu_count()))
 PY
 )}
 
+# Unix socket inference server for clients on this host (see app/api/v1/inference_uds.py)
+if [ "${UDS_ENABLED:-false}" = "true" ]; then
+  echo "Starting Unix socket inference server"
+  python -m app.api.v1.inference_uds &
+fi
+
 echo "Starting server with gunicorn ($WORKERS workers)"
 exec gunicorn app.main:app \
   --workers "$WORKERS" \
@@ -0,0 +1,94 @@
+"""
+Benchmark the native XGBoost/LightGBM booster path against the DataFrame path.
+
+Run from the backend directory:
+    python -m scripts.benchmark_boosters --rows 1 100 10000 --repeat 50
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.services.inference_service import InferenceService
+
+
+def make_data(n_rows: int, n_features: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    features = [f"f{i}" for i in range(n_features)]
+    X = pd.DataFrame(rng.random((n_rows, n_features)), columns=features)
+    y = (X["f0"] + X["f1"] > 1.0).astype(int)
+    return X, y
+
+
+def time_ms(fn, repeat: int) -> float:
+    fn()  # warm up
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def build_models(X: pd.DataFrame, y: pd.Series):
+    """Return (framework, sklearn wrapper, raw booster) pairs trained on the same data."""
+    models = []
+    try:
+        import xgboost as xgb
+        wrapper = xgb.XGBClassifier(n_estimators=200, max_depth=6).fit(X, y)
+        models.append(("xgboost", wrapper, wrapper.get_booster()))
+    except ImportError:
+        print("xgboost not installed, skipping")
+    try:
+        import lightgbm as lgb
+        wrapper = lgb.LGBMClassifier(n_estimators=200, num_leaves=63, verbose=-1).fit(X, y)
+        models.append(("lightgbm", wrapper, wrapper.booster_))
+    except ImportError:
+        print("lightgbm not installed, skipping")
+    return models
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 100, 10000])
+    parser.add_argument("--features", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--tree-limit", type=int, default=None)
+    args = parser.parse_args()
+
+    service = InferenceService()
+    X_train, y_train = make_data(5000, args.features)
+    options = {"threads": args.threads, "tree_limit": args.tree_limit}
+
+    print(f"{'framework':<10} {'rows':>7} {'dataframe ms':>14} {'native ms':>11} {'speedup':>8}")
+    for framework, wrapper, booster in build_models(X_train, y_train):
+        for n_rows in args.rows:
+            X, _ = make_data(n_rows, args.features, seed=n_rows)
+            instances = X.to_dict(orient="records")
+
+            # Current path: DataFrame per request into the sklearn-style wrapper
+            dataframe_ms = time_ms(
+                lambda: service._run_prediction_sync(wrapper, pd.DataFrame(instances), framework),
+                args.repeat
+            )
+            native_ms = time_ms(
+                lambda: service._run_booster_prediction_sync(
+                    booster,
+                    service._prepare_booster_input(booster, instances, framework),
+                    framework,
+                    options
+                ),
+                args.repeat
+            )
+            print(
+                f"{framework:<10} {n_rows:>7} {dataframe_ms:>14.3f} {native_ms:>11.3f} "
+                f"{dataframe_ms / native_ms:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Benchmark the gRPC inference endpoint against REST for the same deployment.
+
+Needs a running API with GRPC_ENABLED=true. Instances are random numbers for
+the numeric features in the deployment's schema (or --features f0..fN).
+Caching is bypassed on both paths so every request reaches the model, which
+also lets gRPC take its columnar path. Clients decode what they would in
+practice: the whole JSON body for REST, the prediction column for gRPC.
+
+Run from the backend directory:
+    python -m scripts.benchmark_grpc --deployment churn --rows 1 100 1000 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any, Dict, List
+
+import grpc
+import httpx
+import numpy as np
+import orjson
+
+from app.api.v1.inference_grpc import SERVICE_NAME, read_predictions, write_instances
+
+
+def make_instances(features: List[str], n_rows: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    values = rng.random((n_rows, len(features)))
+    return [dict(zip(features, row)) for row in values.tolist()]
+
+
+async def schema_features(client: httpx.AsyncClient, deployment: str) -> List[str]:
+    response = await client.get(f"/api/v1/inference/{deployment}/schema")
+    response.raise_for_status()
+    properties = response.json()["schema"].get("input_schema", {}).get("properties", {})
+    return [name for name, spec in properties.items() if spec.get("type") in ("number", "integer")]
+
+
+async def measure(call, requests: int, concurrency: int) -> Dict[str, float]:
+    """Per-request latencies (ms) and requests/s for `requests` calls, `concurrency` at a time."""
+    await call()  # warm up
+    latencies: List[float] = []
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            await call()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies),
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "rps": requests / elapsed
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--deployment", required=True)
+    parser.add_argument("--rest", default="http://localhost:8000")
+    parser.add_argument("--grpc", default="localhost:50051")
+    parser.add_argument("--api-key", default="benchmark")
+    parser.add_argument("--features", type=int, default=None, help="Use f0..fN instead of the deployment schema")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--stream-rows", type=int, default=100000)
+    parser.add_argument("--stream-chunk", type=int, default=1000)
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {args.api_key}"}
+    metadata = (("x-deployment", args.deployment), ("authorization", f"Bearer {args.api_key}"), ("x-use-cache", "false"))
+    async with httpx.AsyncClient(base_url=args.rest, headers=headers, timeout=60) as client, \
+            grpc.aio.insecure_channel(args.grpc) as channel:
+        features = [f"f{i}" for i in range(args.features)] if args.features else await schema_features(client, args.deployment)
+        predict = channel.unary_unary(f"/{SERVICE_NAME}/Predict")
+        predict_stream = channel.stream_stream(f"/{SERVICE_NAME}/PredictStream")
+
+        print(f"{'rows':>6} {'transport':<6} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>9} {'rows/s':>11}")
+        for n_rows in args.rows:
+            instances = make_instances(features, n_rows, seed=n_rows)
+
+            async def rest_call():
+                body = orjson.dumps({"instances": instances, "use_cache": False})
+                response = await client.post(
+                    f"/api/v1/inference/{args.deployment}", content=body,
+                    headers={"content-type": "application/json"}
+                )
+                response.raise_for_status()
+                orjson.loads(response.content)
+
+            async def grpc_call():
+                table, _ = read_predictions(await predict(write_instances(instances), metadata=metadata))
+                table.column("prediction").to_numpy()
+
+            for name, call in (("rest", rest_call), ("grpc", grpc_call)):
+                result = await measure(call, args.requests, args.concurrency)
+                print(f"{n_rows:>6} {name:<6} {result['p50']:>9.2f} {result['p99']:>9.2f} "
+                      f"{result['rps']:>9.1f} {result['rps'] * n_rows:>11.0f}")
+
+        # Bulk scoring: NDJSON batch stream vs the bidirectional gRPC stream
+        chunks = [
+            make_instances(features, min(args.stream_chunk, args.stream_rows - start), seed=start)
+            for start in range(0, args.stream_rows, args.stream_chunk)
+        ]
+
+        async def ndjson_body():
+            for chunk in chunks:
+                yield b"".join(orjson.dumps(row) + b"\n" for row in chunk)
+
+        start = time.perf_counter()
+        async with client.stream(
+            "POST", f"/api/v1/inference/{args.deployment}/batch/stream",
+            params={"batch_size": args.stream_chunk}, content=ndjson_body(),
+            headers={"content-type": "application/x-ndjson"}
+        ) as response:
+            async for _ in response.aiter_lines():
+                pass
+        rest_s = time.perf_counter() - start
+
+        async def grpc_messages():
+            for chunk in chunks:
+                yield write_instances(chunk)
+
+        start = time.perf_counter()
+        async for message in predict_stream(grpc_messages(), metadata=metadata[:2]):
+            read_predictions(message)[0].column("prediction").to_numpy()
+        grpc_s = time.perf_counter() - start
+
+        print(f"\nstream of {args.stream_rows} rows in chunks of {args.stream_chunk}:")
+        print(f"  rest ndjson  {rest_s:8.2f} s  {args.stream_rows / rest_s:>11.0f} rows/s")
+        print(f"  grpc arrow   {grpc_s:8.2f} s  {args.stream_rows / grpc_s:>11.0f} rows/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,105 @@
+"""
+Benchmark the Unix socket inference server against loopback HTTP for the same deployment.
+
+Needs the API on loopback and `python -m app.api.v1.inference_uds` running on
+the same host. Instances are random numbers for the numeric features in the
+deployment's schema (or --features f0..fN). Caching is bypassed on both
+paths so every request reaches the model. HTTP requests go over a pool of
+keep-alive connections; the Unix socket client pipelines them on one.
+
+Run from the backend directory:
+    python -m scripts.benchmark_uds --deployment churn --rows 1 10 100 --concurrency 1 16
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any, Dict, List
+
+import httpx
+import numpy as np
+import orjson
+
+from app.api.v1.inference_uds import UnixSocketClient
+from app.core.config import settings
+
+
+def make_instances(features: List[str], n_rows: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    values = rng.random((n_rows, len(features)))
+    return [dict(zip(features, row)) for row in values.tolist()]
+
+
+async def schema_features(client: httpx.AsyncClient, deployment: str) -> List[str]:
+    response = await client.get(f"/api/v1/inference/{deployment}/schema")
+    response.raise_for_status()
+    properties = response.json()["schema"].get("input_schema", {}).get("properties", {})
+    return [name for name, spec in properties.items() if spec.get("type") in ("number", "integer")]
+
+
+async def measure(call, requests: int, concurrency: int) -> Dict[str, float]:
+    """Per-request latencies (ms) and requests/s for `requests` calls, `concurrency` at a time."""
+    await call()  # warm up
+    latencies: List[float] = []
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            await call()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies),
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "rps": requests / elapsed
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--deployment", required=True)
+    parser.add_argument("--http", default="http://127.0.0.1:8000")
+    parser.add_argument("--uds", default=settings.UDS_PATH)
+    parser.add_argument("--api-key", default="benchmark")
+    parser.add_argument("--features", type=int, default=None, help="Use f0..fN instead of the deployment schema")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16])
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {args.api_key}", "content-type": "application/json"}
+    async with httpx.AsyncClient(base_url=args.http, headers=headers, timeout=60) as client:
+        features = [f"f{i}" for i in range(args.features)] if args.features else await schema_features(client, args.deployment)
+        uds = await UnixSocketClient(args.uds).connect()
+
+        print(f"{'rows':>6} {'conc':>5} {'transport':<9} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>9}")
+        for n_rows in args.rows:
+            instances = make_instances(features, n_rows, seed=n_rows)
+
+            async def http_call():
+                body = orjson.dumps({"instances": instances, "use_cache": False})
+                response = await client.post(f"/api/v1/inference/{args.deployment}", content=body)
+                response.raise_for_status()
+                orjson.loads(response.content)
+
+            async def uds_call():
+                status, _ = await uds.predict(args.deployment, instances, use_cache=False)
+                if status != 200:
+                    raise RuntimeError(f"Unix socket request failed with status {status}")
+
+            for concurrency in args.concurrency:
+                for name, call in (("http", http_call), ("uds", uds_call)):
+                    result = await measure(call, args.requests, concurrency)
+                    print(f"{n_rows:>6} {concurrency:>5} {name:<9} {result['p50']:>9.2f} "
+                          f"{result['p99']:>9.2f} {result['rps']:>9.1f}")
+        await uds.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
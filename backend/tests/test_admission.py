@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.admission import (
+    AdaptiveConcurrencyLimiter,
+    AdmissionController,
+    ClientDisconnected,
+    DeadlineExceeded,
+    parse_deadline,
+)
+
+
+class _FakeRequest:
+    def __init__(self, disconnected=False):
+        self.disconnected = disconnected
+
+    async def is_disconnected(self):
+        return self.disconnected
+
+
+def test_parse_deadline_prefers_earliest():
+    now = 1000.0
+    headers = {"x-request-deadline": "1000.5", "x-request-timeout-ms": "200"}
+    assert parse_deadline(headers, now=now) == pytest.approx(1000.2)
+    assert parse_deadline({}, now=now) is None
+    assert parse_deadline({"x-request-timeout-ms": "soon"}, now=now) is None
+
+
+def test_limiter_sheds_above_limit():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, min_limit=1)
+    assert limiter.try_acquire()
+    assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+    limiter.release(0.01)
+    assert limiter.try_acquire()
+
+
+def test_limiter_shrinks_when_latency_inflates():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=50, tolerance=1.0, smoothing=0.5)
+    for _ in range(50):
+        limiter.in_flight = 50
+        limiter.release(0.01)
+    baseline = limiter.limit
+    for _ in range(20):
+        limiter.in_flight = 50
+        limiter.release(0.5)
+    assert limiter.limit < baseline
+
+
+def test_limiter_backs_off_on_drops():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=10, backoff_ratio=0.5)
+    limiter.in_flight = 1
+    limiter.release(0.0, dropped=True)
+    assert limiter.current_limit == 5
+
+
+@pytest.mark.asyncio
+async def test_run_guarded_abandons_expired_work():
+    controller = AdmissionController()
+    with pytest.raises(DeadlineExceeded):
+        await controller.run_guarded(asyncio.sleep(1), _FakeRequest(), deadline=time.time() + 0.05)
+
+
+@pytest.mark.asyncio
+async def test_run_guarded_abandons_disconnected_clients():
+    controller = AdmissionController()
+    with pytest.raises(ClientDisconnected):
+        await controller.run_guarded(asyncio.sleep(1), _FakeRequest(disconnected=True))
@@ -0,0 +1,161 @@
+import asyncio
+import pickle
+import uuid
+from types import SimpleNamespace
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from fastapi import FastAPI, HTTPException
+from starlette.testclient import TestClient
+
+from app.api.dependencies import get_current_active_user
+from app.api.v1 import batch_jobs
+from app.core.config import settings
+from app.core.database import get_db
+from app.models.deployment import Deployment
+from app.models.organization_membership import OrganizationMembership
+from app.schemas.batch_job import BatchJobCreate
+from app.services import batch_job_service
+from app.services.batch_job_service import BatchJobRunner, _resolve_path
+
+linear_model = pytest.importorskip("sklearn.linear_model")
+
+ORG = "2f1c6a53-0c8e-4a43-9d55-5a8f0c1f7b10"
+SCHEMA = {
+    "input_schema": {"required": ["x"], "properties": {"x": {"type": "number", "minimum": 0}}},
+    "preprocessing": {"scaling": {"x": {"type": "standard", "mean": 1.0, "std": 2.0}}}
+}
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.lists = {}
+
+    async def setex(self, key, ttl, value):
+        self.values[key] = value
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def exists(self, key):
+        return int(key in self.values)
+
+    async def rpush(self, key, value):
+        self.lists.setdefault(key, []).append(value)
+
+    async def lrange(self, key, start, end):
+        return list(self.lists.get(key, []))
+
+    async def ltrim(self, key, start, end):
+        pass
+
+    async def expire(self, key, ttl):
+        pass
+
+
+@pytest.fixture
+def data_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "BATCH_JOB_DATA_ROOT", str(tmp_path / "batch"))
+    monkeypatch.setattr(settings, "BATCH_JOB_S3_BUCKET", "batch-data")
+    org_dir = tmp_path / "batch" / ORG
+    org_dir.mkdir(parents=True)
+    return org_dir
+
+
+def test_paths_are_confined_to_the_organizations_batch_data(data_root, tmp_path):
+    _, resolved = _resolve_path("in/data.parquet", ORG)
+    assert resolved == str(data_root / "in" / "data.parquet")
+    _, resolved = _resolve_path(str(data_root / "data.csv"), ORG)
+    assert resolved == str(data_root / "data.csv")
+    _, resolved = _resolve_path(f"s3://batch-data/{ORG}/in/data.parquet", ORG)
+    assert resolved == f"batch-data/{ORG}/in/data.parquet"
+
+    (tmp_path / "secret.csv").write_text("x\n1\n")
+    (data_root / "link.csv").symlink_to(tmp_path / "secret.csv")
+    other_org = str(uuid.uuid4())
+    for path in (
+        "../secret.csv",
+        "in/../../secret.csv",
+        "/etc/passwd",
+        str(tmp_path / "secret.csv"),
+        "link.csv",
+        ".",
+        "s3://mlops-artifacts/models/model.pkl",
+        f"s3://batch-data/{other_org}/data.parquet",
+        f"s3://batch-data/{ORG}/../{other_org}/data.parquet",
+        f"s3://batch-data/{ORG}",
+    ):
+        with pytest.raises(HTTPException) as raised:
+            _resolve_path(path, ORG)
+        assert raised.value.status_code == 400, path
+
+
+def test_runner_validates_and_preprocesses_chunks_like_online_scoring(data_root, tmp_path):
+    model = linear_model.LinearRegression().fit(np.array([[0.0], [1.0]]), np.array([0.0, 1.0]))
+    model_path = tmp_path / "model.pkl"
+    model_path.write_bytes(pickle.dumps(model))
+    pq.write_table(pa.table({"id": list("abcdef"), "x": [1.0, 3.0, 5.0, -1.0, 7.0, 9.0]}), data_root / "in.parquet")
+
+    runner = BatchJobRunner()
+    runner.redis_client = _FakeRedis()
+    deployment = SimpleNamespace(id="dep", organization_id=ORG, model_version=SimpleNamespace(model_schema=SCHEMA))
+    data = BatchJobCreate(
+        deployment_id=uuid.uuid4(), input_path="in.parquet", output_path="out/scored.parquet",
+        passthrough_columns=["id"], chunk_size=2, max_workers=1
+    )
+
+    async def run():
+        job = await runner.submit(deployment, str(model_path), "sklearn", data)
+        await runner.tasks[job["job_id"]]
+        return await runner.get_job(job["job_id"])
+
+    job = asyncio.run(run())
+    assert job["status"] == "completed", job["error"]
+    # The chunk holding x=-1 breaks the schema's minimum and fails as a whole
+    assert job["rows_processed"] == 4 and job["chunks_failed"] == 1
+    assert job["failures"][0]["row_start"] == 2 and "below minimum" in job["failures"][0]["error"]
+
+    scored = pq.read_table(data_root / "out" / "scored.parquet").to_pydict()
+    assert scored["_row"] == [0, 1, 4, 5] and scored["id"] == ["a", "b", "e", "f"]
+    # Predictions come from standard-scaled inputs, (x - 1) / 2
+    assert np.allclose(scored["prediction"], [0.0, 1.0, 3.0, 4.0])
+
+
+def test_api_rejects_paths_outside_the_organization_and_normalizes_the_framework(data_root, monkeypatch):
+    user_id = uuid.uuid4()
+    deployment = SimpleNamespace(
+        id=uuid.uuid4(), organization_id=uuid.UUID(ORG),
+        model_version=SimpleNamespace(
+            model_file_path="/models/m.pkl", model_schema=SCHEMA, model=SimpleNamespace(framework="Scikit-Learn")
+        )
+    )
+    rows = {Deployment: deployment, OrganizationMembership: SimpleNamespace(role="developer")}
+    db = SimpleNamespace(query=lambda model: SimpleNamespace(
+        filter=lambda *args: SimpleNamespace(first=lambda: rows[model])
+    ))
+    started = []
+
+    async def run(job, model_path, framework, model_schema, data):
+        started.append((framework, model_schema))
+
+    monkeypatch.setattr(batch_job_service.batch_job_runner, "redis_client", _FakeRedis())
+    monkeypatch.setattr(batch_job_service.batch_job_runner, "_run", run)
+    app = FastAPI()
+    app.include_router(batch_jobs.router, prefix="/batch-jobs")
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_current_active_user] = lambda: SimpleNamespace(id=user_id)
+    client = TestClient(app)
+
+    body = {"deployment_id": str(deployment.id), "input_path": "in.parquet"}
+    for paths in ({"input_path": "../../etc/passwd"}, {"output_path": "/tmp/evil.parquet"}, {"input_path": "s3://mlops-artifacts/in.parquet"}):
+        response = client.post("/batch-jobs/", json={**body, **paths})
+        assert response.status_code == 400, paths
+
+    response = client.post("/batch-jobs/", json=body)
+    assert response.status_code == 202, response.text
+    job = response.json()
+    assert job["output_path"] == f"outputs/{job['job_id']}.parquet"
+    assert job["details"]["framework"] == "sklearn" and started == [("sklearn", SCHEMA)]
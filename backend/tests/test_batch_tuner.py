@@ -0,0 +1,103 @@
+import time
+import types
+
+import numpy as np
+import pytest
+
+from app.services import batch_tuner, version_profiler
+from app.services.batch_tuner import BatchSizeTuner, synthetic_instances
+from app.services.inference_service import ServingTarget
+
+SCHEMA = {
+    "input_schema": {
+        "required": ["age", "plan"],
+        "properties": {
+            "age": {"type": "integer", "minimum": 18, "maximum": 90},
+            "plan": {"type": "string", "enum": ["free", "pro"]},
+            "score": {"type": "number"},
+        },
+    }
+}
+
+
+class _FixedOverheadModel:
+    """5ms per call plus 0.5ms per row: throughput improves with batch size until the ceiling."""
+
+    def predict(self, X):
+        time.sleep(0.005 + 0.0005 * len(X))
+        return np.zeros(len(X))
+
+
+def test_synthetic_rows_respect_schema_constraints():
+    rows = synthetic_instances(SCHEMA, 50)
+    assert len(rows) == 50
+    assert all(18 <= r["age"] <= 90 and r["plan"] in ("free", "pro") for r in rows)
+    assert synthetic_instances({"examples": [{"a": 1}, {"a": 2}]}, 3) == [{"a": 1}, {"a": 2}, {"a": 1}]
+
+
+@pytest.mark.asyncio
+async def test_picks_best_throughput_within_latency_ceiling():
+    version = types.SimpleNamespace(
+        framework="sklearn",
+        model_schema=SCHEMA,
+        model=types.SimpleNamespace(problem_type="regression"),
+    )
+    tuner = BatchSizeTuner(redis_client=object())
+    result = await tuner.tune(
+        _FixedOverheadModel(),
+        ServingTarget(version),
+        candidates=[1, 10, 100, 1000],
+        latency_ceiling_ms=40,
+        repeats=3,
+    )
+
+    # 100 rows (~55ms) breaks the ceiling, so the sweep stops before 1000
+    assert [c["batch_size"] for c in result["candidates"]] == [1, 10, 100]
+    assert result["optimal_batch_size"] == 10
+
+
+class _FakeRedis:
+    async def set(self, *args, **kwargs):
+        return True
+
+    async def delete(self, key):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_tuning_runs_in_an_isolated_process_and_stores_the_result(monkeypatch):
+    version = types.SimpleNamespace(
+        framework="sklearn",
+        model_schema=SCHEMA,
+        model=types.SimpleNamespace(problem_type="regression"),
+        optimal_batch_size=None,
+        serving_profile=None,
+    )
+    session = types.SimpleNamespace(
+        query=lambda *args: types.SimpleNamespace(filter=lambda *args: types.SimpleNamespace(first=lambda: version)),
+        commit=lambda: None,
+        rollback=lambda: None,
+        close=lambda: None,
+    )
+    isolated = []
+
+    def run_isolated(fn, args, timeout):
+        # Stands in for the spawned process: records the call and runs the child's entry point
+        isolated.append((fn, args))
+        return fn(*args)
+
+    class _Loader:
+        async def get_model(self, model_version_id):
+            return _FixedOverheadModel()
+
+    monkeypatch.setattr(batch_tuner, "SessionLocal", lambda: session)
+    monkeypatch.setattr(batch_tuner, "ModelLoader", _Loader)
+    monkeypatch.setattr(version_profiler, "run_isolated", run_isolated)
+    monkeypatch.setattr(batch_tuner.settings, "BATCH_TUNING_CANDIDATES", [1, 10])
+    monkeypatch.setattr(batch_tuner.settings, "BATCH_TUNING_REPEATS", 2)
+
+    await BatchSizeTuner(redis_client=_FakeRedis()).tune_and_store("v1", {"sklearn": {}})
+
+    assert isolated == [(batch_tuner.tune_version, ("v1", {"sklearn": {}}))]
+    assert version.optimal_batch_size in (1, 10)
+    assert version.serving_profile["batch_tuning"]["optimal_batch_size"] == version.optimal_batch_size
@@ -0,0 +1,84 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.exceptions import InferenceError
+from app.services.inference_service import InferenceService
+from app.services.model_loader import ModelLoader
+
+
+def _training_data():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.random((300, 3)), columns=["a", "b", "c"])
+    y = (X["a"] > 0.5).astype(int)
+    return X, y
+
+
+@pytest.mark.parametrize("framework", ["xgboost", "lightgbm"])
+def test_native_booster_matches_sklearn_wrapper(framework):
+    X, y = _training_data()
+    if framework == "xgboost":
+        xgb = pytest.importorskip("xgboost")
+        wrapper = xgb.XGBClassifier(n_estimators=20).fit(X, y)
+        booster = wrapper.get_booster()
+    else:
+        lgb = pytest.importorskip("lightgbm")
+        wrapper = lgb.LGBMClassifier(n_estimators=20, verbose=-1).fit(X, y)
+        booster = wrapper.booster_
+
+    service = InferenceService()
+    # Keys deliberately out of training order: the booster's feature names decide column order
+    instances = [{"c": r.c, "a": r.a, "b": r.b} for r in X.head(10).itertuples()]
+    assert service._is_native_booster(booster, framework)
+
+    result = service._run_booster_prediction_sync(
+        booster,
+        service._prepare_booster_input(booster, instances, framework),
+        framework,
+        {"threads": 1, "tree_limit": None}
+    )
+    np.testing.assert_array_equal(result["predictions"], wrapper.predict(X.head(10)))
+    np.testing.assert_allclose(result["probabilities"], wrapper.predict_proba(X.head(10)), rtol=1e-5)
+
+
+@pytest.mark.parametrize("framework", ["xgboost", "lightgbm"])
+def test_unnamed_booster_features_follow_the_schema_not_the_request(framework):
+    X, y = _training_data()
+    if framework == "xgboost":
+        xgb = pytest.importorskip("xgboost")
+        wrapper = xgb.XGBClassifier(n_estimators=20).fit(X.to_numpy(), y)
+        booster = wrapper.get_booster()
+    else:
+        lgb = pytest.importorskip("lightgbm")
+        wrapper = lgb.LGBMClassifier(n_estimators=20, verbose=-1).fit(X.to_numpy(), y)
+        booster = wrapper.booster_
+
+    service = InferenceService()
+    schema = {"input_schema": {"properties": {"a": {"type": "number"}, "b": {"type": "number"}, "c": {"type": "number"}}}}
+    instances = [{"c": r.c, "a": r.a, "b": r.b} for r in X.head(10).itertuples()]
+    matrix = service._prepare_booster_input(booster, instances, framework, schema)
+    np.testing.assert_array_equal(matrix, X.head(10).to_numpy(dtype=np.float32))
+
+    with pytest.raises(InferenceError, match="no feature names"):
+        service._prepare_booster_input(booster, instances, framework, {})
+
+
+@pytest.mark.asyncio
+async def test_xgboost_threads_are_set_at_load_not_per_prediction(tmp_path):
+    xgb = pytest.importorskip("xgboost")
+    X, y = _training_data()
+    path = tmp_path / "model.ubj"
+    xgb.XGBClassifier(n_estimators=5).fit(X, y).get_booster().save_model(str(path))
+
+    booster = await ModelLoader.__new__(ModelLoader)._load_xgboost_model(path, {"threads": 2})
+    nthread = lambda: json.loads(booster.save_config())["learner"]["generic_param"]["nthread"]
+    assert nthread() == "2"
+
+    service = InferenceService()
+    instances = [{"a": r.a, "b": r.b, "c": r.c} for r in X.head(3).itertuples()]
+    service._run_booster_prediction_sync(
+        booster, service._prepare_booster_input(booster, instances, "xgboost"), "xgboost", {"threads": 7, "tree_limit": None}
+    )
+    assert nthread() == "2"
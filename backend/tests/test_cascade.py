@@ -0,0 +1,89 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services.cascade_service import CascadeService, CascadeStage
+from app.services.inference_service import InferenceService
+
+linear_model = pytest.importorskip("sklearn.linear_model")
+
+
+SCHEMA = {"input_schema": {"required": ["x"], "properties": {"x": {"type": "number"}}}}
+
+
+class _FakePipeline:
+    def __init__(self, store):
+        self.store = store
+        self.ops = []
+
+    def hincrby(self, key, field, amount):
+        self.ops.append((field, amount))
+
+    hincrbyfloat = hincrby
+
+    async def execute(self):
+        for field, amount in self.ops:
+            self.store[field] = self.store.get(field, 0) + amount
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.store = {}
+
+    def pipeline(self, transaction=False):
+        return _FakePipeline(self.store)
+
+    async def hgetall(self, key):
+        return {k.encode(): str(v).encode() for k, v in self.store.items()}
+
+
+class _Loader:
+    def __init__(self, models):
+        self.models = models
+
+    async def get_model(self, model_version_id, load_options=None):
+        return self.models[model_version_id]
+
+
+def _version(version_id):
+    return SimpleNamespace(
+        id=version_id,
+        framework="sklearn",
+        model_schema=SCHEMA,
+        model=SimpleNamespace(problem_type="classification"),
+    )
+
+
+def test_cascade_escalates_only_low_confidence_rows():
+    X = np.linspace(-3, 3, 200).reshape(-1, 1)
+    y = (X[:, 0] > 0).astype(int)
+    cheap = linear_model.LogisticRegression(C=0.05).fit(X, y)
+    heavy = linear_model.LogisticRegression(C=100).fit(X, y)
+    scored_by_heavy = []
+    heavy_predict = heavy.predict
+    heavy.predict = lambda data: scored_by_heavy.append(len(data)) or heavy_predict(data)
+
+    redis_client = _FakeRedis()
+    service = CascadeService(InferenceService(), _Loader({"cheap": cheap, "heavy": heavy}), redis_client)
+    stages = [CascadeStage(_version("cheap"), 0.9), CascadeStage(_version("heavy"))]
+    deployment = SimpleNamespace(id="dep", deployment_config={})
+    instances = [{"x": x} for x in (-2.5, -0.1, 0.05, 2.5)]
+
+    async def run():
+        results, report = await service.predict(deployment, stages, instances)
+        await service.record(deployment.id, report)
+        return results, report, await service.get_stats(deployment.id)
+
+    results, report, stats = asyncio.run(run())
+
+    cheap_confidence = cheap.predict_proba(np.array([[r["x"]] for r in instances])).max(axis=1)
+    escalated = int((cheap_confidence < 0.9).sum())
+    assert 0 < escalated < len(instances)
+    assert scored_by_heavy == [escalated]
+    assert [r.prediction for r in results] == [0, 0, 1, 1]
+    assert [(s["rows"], s["answered"]) for s in report["stages"]] == [(4, 4 - escalated), (escalated, escalated)]
+    assert report["saved_ms"] is not None
+    assert stats["stages"][0]["hit_ratio"] == pytest.approx((4 - escalated) / 4)
+    assert stats["stages"][1]["hit_ratio"] == 1.0
@@ -0,0 +1,103 @@
+import asyncio
+import gzip
+import zlib
+
+import orjson
+import pytest
+from fastapi import FastAPI, Request
+from starlette.testclient import TestClient
+
+from app.core import compression
+from app.core.compression import CompressionMiddleware, negotiate_encoding
+
+
+def _client(monkeypatch) -> TestClient:
+    monkeypatch.setattr(compression.settings, "COMPRESSION_MIN_BYTES", 100)
+    monkeypatch.setattr(compression.settings, "COMPRESSION_OFFLOAD_BYTES", 1000)
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        body = await request.body()
+        return {"size": len(body), "rows": orjson.loads(body)["rows"]}
+
+    return TestClient(app)
+
+
+def test_negotiation_prefers_the_best_rated_available_encoding():
+    assert negotiate_encoding("gzip") == "gzip"
+    assert negotiate_encoding("gzip;q=0.5, br;q=0") == "gzip"
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("") is None
+    if "zstd" in compression.CODECS:
+        assert negotiate_encoding("gzip, zstd") == "zstd"
+        assert negotiate_encoding("*;q=0.8, gzip;q=0.9") == "gzip"
+
+
+def test_request_and_response_bodies_are_decoded_and_encoded(monkeypatch):
+    client = _client(monkeypatch)
+    payload = orjson.dumps({"rows": [{"a": i} for i in range(500)]})
+
+    # gzip request in, gzip response out; large bodies go through the worker thread
+    response = client.post(
+        "/echo", content=gzip.compress(payload),
+        headers={"Content-Encoding": "gzip", "Accept-Encoding": "gzip"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.json()["size"] == len(payload)
+
+    # Small responses are not worth compressing
+    small = client.post("/echo", content=b'{"rows": []}', headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers and small.json() == {"size": 12, "rows": []}
+
+    assert client.post("/echo", content=payload, headers={"Content-Encoding": "lzma"}).status_code == 415
+    truncated = client.post("/echo", content=gzip.compress(payload)[:50], headers={"Content-Encoding": "gzip"})
+    assert truncated.status_code == 400
+
+    monkeypatch.setattr(compression.settings, "COMPRESSION_MAX_DECODED_BYTES", 1000)
+    assert client.post("/echo", content=gzip.compress(payload), headers={"Content-Encoding": "gzip"}).status_code == 413
+
+
+@pytest.mark.parametrize("encoding", ["zstd", "br"])
+def test_optional_encodings_round_trip(monkeypatch, encoding):
+    if encoding not in compression.CODECS:
+        pytest.skip(f"{encoding} support is not installed")
+    client = _client(monkeypatch)
+    payload = orjson.dumps({"rows": list(range(1000))})
+    encoder = compression.CODECS[encoding][0]()
+    with client.stream(
+        "POST", "/echo", content=encoder.encode(payload, True),
+        headers={"Content-Encoding": encoding, "Accept-Encoding": encoding}
+    ) as response:
+        assert response.headers["content-encoding"] == encoding
+        raw = b"".join(response.iter_raw())
+    assert orjson.loads(compression.CODECS[encoding][1]().decode(raw))["size"] == len(payload)
+
+
+def test_streamed_responses_are_flushed_chunk_by_chunk(monkeypatch):
+    monkeypatch.setattr(compression.settings, "COMPRESSION_MIN_BYTES", 100)
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/x-ndjson")]})
+        for i in range(3):
+            await send({"type": "http.response.body", "body": orjson.dumps({"row": i}) + b"\n", "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(CompressionMiddleware(app)(scope, receive, send))
+    assert (b"content-encoding", b"gzip") in sent[0]["headers"]
+    # Each line is flushed as its own chunk, decodable as soon as it arrives
+    decoder = zlib.decompressobj(31)
+    assert [decoder.decompress(message["body"]) for message in sent[1:]] == [b'{"row":0}\n', b'{"row":1}\n', b'{"row":2}\n', b""]
+    assert decoder.eof
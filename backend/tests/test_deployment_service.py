@@ -0,0 +1,96 @@
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.models.deployment import Deployment
+from app.models.organization_membership import OrganizationMembership
+from app.schemas.deployment import DeploymentUpdate
+from app.services import deployment_service
+from app.services.deployment_service import DeploymentService
+
+
+class _FakeSession:
+    """Answers the service's queries by entity: the deployment, a developer membership and the org's versions."""
+
+    def __init__(self, deployment, org_versions):
+        self.deployment = deployment
+        self.org_versions = org_versions
+        self.added = []
+        self.commits = 0
+
+    def query(self, entity, *entities):
+        session = self
+
+        class _Query:
+            def join(self, *args):
+                return self
+
+            def filter(self, *criteria):
+                self.criteria = criteria
+                return self
+
+            def first(self):
+                if entity is Deployment:
+                    return session.deployment
+                if entity is OrganizationMembership:
+                    return SimpleNamespace(role="developer")
+                # ModelVersion.id == <id>, scoped to the deployment's organization
+                wanted = self.criteria[0].right.value
+                return SimpleNamespace(id=wanted) if wanted in session.org_versions else None
+
+        return _Query()
+
+    def add(self, row):
+        self.added.append(row)
+
+    def commit(self):
+        self.commits += 1
+
+    def refresh(self, row):
+        pass
+
+
+def test_changing_the_model_version_checks_it_belongs_to_the_organization(monkeypatch):
+    current, replacement, foreign = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    deployment = SimpleNamespace(
+        id=uuid.uuid4(), organization_id=uuid.uuid4(), model_version_id=current, environment="development"
+    )
+    db = _FakeSession(deployment, {current, replacement})
+    invalidated = []
+    monkeypatch.setattr(deployment_service, "publish_invalidation", invalidated.extend)
+    monkeypatch.setattr(deployment_service, "DeploymentHistory", SimpleNamespace)
+    service = DeploymentService(db)
+
+    with pytest.raises(HTTPException) as raised:
+        service.update_deployment(deployment.id, uuid.uuid4(), DeploymentUpdate(model_version_id=foreign))
+    assert raised.value.status_code == 400 and str(foreign) in raised.value.detail
+    assert deployment.model_version_id == current and db.commits == 0 and invalidated == []
+
+    service.update_deployment(deployment.id, uuid.uuid4(), DeploymentUpdate(model_version_id=replacement))
+    assert deployment.model_version_id == replacement and db.commits == 1
+    assert [row.action for row in db.added] == ["update"] and invalidated == [current]
+
+
+def test_precomputed_config_is_validated_like_the_other_serving_modes(monkeypatch, tmp_path):
+    monkeypatch.setattr(deployment_service.settings, "BATCH_JOB_DATA_ROOT", str(tmp_path))
+    deployment = SimpleNamespace(id=uuid.uuid4(), organization_id=uuid.uuid4(), model_version_id=uuid.uuid4(), deployment_config={})
+    db = _FakeSession(deployment, set())
+    service = DeploymentService(db)
+
+    for precomputed in (
+        {"entity_key": "id"},
+        {"entity_key": "id", "source_path": "entities.parquet", "refresh_interval_s": 0},
+        {"entity_key": "id", "source_path": "entities.parquet", "source_format": "json"},
+        {"entity_key": "id", "source_path": "/etc/entities.parquet"},
+        {"entity_key": "id", "source_path": "s3://features/customers.parquet"},
+    ):
+        with pytest.raises(HTTPException) as raised:
+            service.update_deployment(deployment.id, uuid.uuid4(), DeploymentUpdate(deployment_config={"precomputed": precomputed}))
+        assert raised.value.status_code == 400, precomputed
+    assert db.commits == 0
+
+    config = {"precomputed": {"entity_key": "id", "source_path": "entities/customers.parquet", "refresh_interval_s": 3600}}
+    service.update_deployment(deployment.id, uuid.uuid4(), DeploymentUpdate(deployment_config=config))
+    assert deployment.deployment_config == config and db.commits == 1
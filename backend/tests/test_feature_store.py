@@ -0,0 +1,115 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.schemas.feature_store import FeatureLoadRequest
+from app.services import inference_service as inference_module
+from app.services.feature_store import FeatureStore, FeatureStoreService, FeatureTable
+from app.services.inference_service import InferenceService
+
+
+class _FakePipeline:
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+
+    def set(self, key, value, ex=None):
+        self.redis_client.values[key] = value
+
+    async def execute(self):
+        return []
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.mgets = []
+
+    def pipeline(self, transaction=False):
+        return _FakePipeline(self)
+
+    async def mget(self, keys):
+        self.mgets.append(list(keys))
+        return [self.values.get(key) for key in keys]
+
+
+def test_table_keeps_columns_typed_and_replaces_rows():
+    table = FeatureTable()
+    table.upsert(["a", "b"], [{"spend": 10, "tier": "gold"}, {"spend": 2.5}], stamp=1e12)
+    assert table.columns["spend"].dtype == np.float64
+    assert table.get_many(["b", "a", "zz"], max_age=60) == [{"spend": 2.5}, {"spend": 10.0, "tier": "gold"}, None]
+
+    # A non-numeric value widens the column; a rewritten row drops columns it no longer has
+    table.upsert(["a"], [{"spend": "n/a"}], stamp=1e12)
+    assert table.get_many(["a", "b"], max_age=60) == [{"spend": "n/a"}, {"spend": 2.5}]
+    assert table.get_many(["b"], max_age=-1e13) == [None]
+
+
+def test_join_fetches_missing_entities_from_redis_in_one_batch(monkeypatch):
+    redis_client = _FakeRedis()
+    writer = FeatureStore(redis_client)
+    reader = FeatureStore(redis_client)
+    monkeypatch.setattr(inference_module, "feature_store", reader)
+    monkeypatch.setattr(settings, "FEATURE_STORE_LOCAL_TTL_S", 60.0)
+    deployment = SimpleNamespace(
+        organization_id="org",
+        deployment_config={"features": {"feature_set": "customers", "entity_key": "customer_id"}},
+    )
+
+    async def run():
+        await writer.put("org", "customers", "customer_id", [
+            {"customer_id": 1, "spend": 10.0, "visits": 3},
+            {"customer_id": 2, "spend": 4.0, "visits": 1},
+        ])
+        service = InferenceService()
+        instances = [{"customer_id": 2}, {"customer_id": 1, "visits": 9}, {"customer_id": 7}, {"customer_id": 2}]
+        first = await service.join_features(instances, deployment)
+        second = await service.join_features(instances, deployment)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == [
+        {"spend": 4.0, "visits": 1},
+        {"spend": 10.0, "visits": 9},
+        {},
+        {"spend": 4.0, "visits": 1},
+    ]
+    assert second == first
+    # One MGET for the first join; the second only asks again for the unknown entity
+    assert redis_client.mgets == [
+        ["features:org:customers:2", "features:org:customers:1", "features:org:customers:7"],
+        ["features:org:customers:7"],
+    ]
+
+
+def test_load_reads_only_the_organizations_batch_data(tmp_path, monkeypatch):
+    organization_id = uuid.uuid4()
+    monkeypatch.setattr(settings, "BATCH_JOB_DATA_ROOT", str(tmp_path))
+    (tmp_path / str(organization_id)).mkdir()
+    pq.write_table(
+        pa.table({"customer_id": [1, 2, 3], "spend": [10.0, 4.0, 7.5], "note": ["a", "b", "c"]}),
+        tmp_path / str(organization_id) / "customers.parquet"
+    )
+    store = FeatureStore(_FakeRedis())
+    request = FeatureLoadRequest(
+        organization_id=organization_id, entity_key="customer_id", path="customers.parquet", columns=["spend"]
+    )
+
+    assert asyncio.run(store.load(organization_id, "customers", request)) == 3
+    rows = asyncio.run(store.get_many(organization_id, "customers", ["3", "1"]))
+    assert rows == [{"spend": 7.5}, {"spend": 10.0}]
+
+    membership = SimpleNamespace(role="developer")
+    db = SimpleNamespace(query=lambda model: SimpleNamespace(filter=lambda *args: SimpleNamespace(first=lambda: membership)))
+    service = FeatureStoreService(db)
+    service.authorize_load(uuid.uuid4(), request)
+    for path in ("../customers.parquet", "/etc/passwd.csv", "s3://mlops-artifacts/customers.parquet"):
+        with pytest.raises(HTTPException) as raised:
+            service.authorize_load(uuid.uuid4(), request.model_copy(update={"path": path}))
+        assert raised.value.status_code == 400, path
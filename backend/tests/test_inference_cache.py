@@ -0,0 +1,154 @@
+import asyncio
+
+import pytest
+
+from app.services import inference_cache as inference_cache_module
+from app.services.inference_cache import InferenceCache, LocalCache, instance_digest, publish_invalidation
+
+
+class _FakePipeline:
+    def __init__(self, store):
+        self.store = store
+        self.ops = []
+
+    def setex(self, key, ttl, value):
+        self.ops.append((key, value))
+
+    def hincrby(self, key, field, amount):
+        self.ops.append(((key, field), amount))
+
+    async def execute(self):
+        for key, value in self.ops:
+            if isinstance(key, tuple):
+                self.store[key] = self.store.get(key, 0) + value
+            else:
+                self.store[key] = value if isinstance(value, bytes) else value.encode()
+
+
+class _FakePubSub:
+    async def subscribe(self, *channels):
+        pass
+
+    async def listen(self):
+        await asyncio.Event().wait()
+        yield
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.store = {}
+        self.mget_calls = 0
+
+    async def mget(self, keys):
+        self.mget_calls += 1
+        return [self.store.get(k) for k in keys]
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self.store)
+
+    async def hgetall(self, key):
+        return {f.encode(): v for k, v in self.store.items() if isinstance(k, tuple) and k[0] == key for f in [k[1]]}
+
+    def pubsub(self):
+        return _FakePubSub()
+
+
+def test_digest_is_stable_and_order_independent():
+    assert instance_digest({"a": 1, "b": "x"}) == instance_digest({"b": "x", "a": 1})
+    assert instance_digest({"a": 1}) != instance_digest({"a": 2})
+
+
+@pytest.mark.asyncio
+async def test_partial_hits_are_namespaced_by_model_version():
+    client = _FakeRedis()
+    cache = InferenceCache(client)
+    rows = [{"a": 1}, {"a": 2}]
+    digests = [instance_digest(r) for r in rows]
+
+    await cache.set_many("v1", {digests[0]: {"prediction": 1}})
+
+    assert await cache.get_many("v1", digests) == [{"prediction": 1}, None]
+    assert await cache.get_many("v2", digests) == [None, None]
+    assert client.mget_calls == 2
+
+
+@pytest.mark.asyncio
+async def test_local_tier_serves_hits_and_is_invalidated_per_version():
+    client = _FakeRedis()
+    cache = InferenceCache(client)
+    digest = instance_digest({"a": 1})
+    await cache.set_many("v1", {digest: {"prediction": 1}})
+    # Cascade and pipeline namespaces of the same version, and an unrelated version
+    await cache.set_many("v1+cascade", {digest: {"prediction": 2}})
+    await cache.set_many("v10", {digest: {"prediction": 3}})
+
+    rows, counts = await cache.lookup("v1", [digest])
+    assert rows == [{"prediction": 1}]
+    assert counts == {"l1_hits": 1, "l2_hits": 0, "misses": 0}
+    assert client.mget_calls == 0
+
+    assert cache.invalidate_local(["v1"]) == 2
+    assert cache.local.stats()["entries"] == 1
+    rows, counts = await cache.lookup("v1", [digest])
+    assert counts == {"l1_hits": 0, "l2_hits": 1, "misses": 0}
+
+
+def test_local_cache_admission_keeps_frequent_entries():
+    cache = LocalCache(max_bytes=100, ttl_seconds=60)
+    for _ in range(5):
+        cache.get("hot")
+    cache.put("hot", 1, 100)
+
+    assert not cache.put("cold", 2, 100)
+    assert cache.get("hot") == 1
+
+
+@pytest.mark.asyncio
+async def test_hit_rate_is_tracked_per_deployment():
+    cache = InferenceCache(_FakeRedis())
+    await cache.record_lookups("dep", {"l1_hits": 2, "l2_hits": 1, "misses": 1})
+    stats = await cache.get_stats("dep")
+    assert stats["hit_rate"] == 0.75
+    assert stats["l1_hit_rate"] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_identical_in_flight_misses_are_coalesced():
+    cache = InferenceCache(_FakeRedis())
+    leader = await cache.claim("v1", ["d1", "d2"])
+    follower = await cache.claim("v1", ["d1", "d3"])
+    assert leader.leading == ["d1", "d2"]
+    assert follower.leading == ["d3"]
+    assert list(follower.waiting) == ["d1"]
+
+    # d2 failed on the leader: nobody waits on it, and it is claimable again
+    await cache.complete(leader, {"d1": {"prediction": 1}})
+    assert await cache.wait(follower, timeout=1) == {"d1": {"prediction": 1}}
+    assert (await cache.claim("v1", ["d2"])).leading == ["d2"]
+
+
+@pytest.mark.asyncio
+async def test_failed_leader_releases_followers_with_no_result():
+    cache = InferenceCache(_FakeRedis())
+    leader = await cache.claim("v1", ["d1"])
+    follower = await cache.claim("v1", ["d1"])
+    await cache.complete(leader, {})
+    assert await cache.wait(follower, timeout=1) == {"d1": None}
+
+
+def test_invalidations_are_published_through_one_shared_client(monkeypatch):
+    clients = []
+
+    class _SyncRedis:
+        def __init__(self):
+            self.published = []
+            clients.append(self)
+
+        def publish(self, channel, message):
+            self.published.append(channel)
+
+    monkeypatch.setattr(inference_cache_module, "_publisher", None)
+    monkeypatch.setattr(inference_cache_module.redis_sync, "from_url", lambda url: _SyncRedis())
+    publish_invalidation(["v1"])
+    publish_invalidation(["v2"])
+    assert len(clients) == 1 and len(clients[0].published) == 2
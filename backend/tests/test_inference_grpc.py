@@ -0,0 +1,137 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+grpc = pytest.importorskip("grpc")
+pytest.importorskip("pyarrow")
+
+from app.api.v1 import inference_grpc
+from app.schemas.inference import PredictionResult
+
+
+def test_prediction_payloads_keep_types_and_fall_back_to_json():
+    payload = inference_grpc.write_predictions(
+        [
+            {"index": 0, "prediction": 1, "confidence": 0.9, "probabilities": {"no": 0.1, "yes": 0.9}},
+            {"index": 1, "error": "bad row"},
+        ],
+        {"cached": False}
+    )
+    table, metadata = inference_grpc.read_predictions(payload)
+    rows = inference_grpc.prediction_rows(table)
+    assert rows == [
+        {"index": 0, "prediction": 1, "confidence": 0.9, "probabilities": {"no": 0.1, "yes": 0.9}, "error": None},
+        {"index": 1, "prediction": None, "confidence": None, "probabilities": None, "error": "bad row"},
+    ]
+    assert metadata == {"cached": False}
+
+    # Columnar output encodes to the same rows as the row-by-row results
+    columns = inference_grpc.write_columns(
+        {
+            "predictions": np.array([1, 0]),
+            "probabilities": np.array([[0.1, 0.9], [0.8, 0.2]]),
+            "classes": ["no", "yes"],
+            "confidence": np.array([0.9, 0.8]),
+        },
+        offset=5
+    )
+    assert inference_grpc.prediction_rows(inference_grpc.read_predictions(columns)[0]) == [
+        {"index": 5, "prediction": 1, "confidence": 0.9, "probabilities": {"no": 0.1, "yes": 0.9}, "error": None},
+        {"index": 6, "prediction": 0, "confidence": 0.8, "probabilities": {"no": 0.8, "yes": 0.2}, "error": None},
+    ]
+
+    # Predictions without a common Arrow type travel as JSON strings
+    table, metadata = inference_grpc.read_predictions(
+        inference_grpc.write_predictions([{"index": 0, "prediction": "cat"}, {"index": 1, "prediction": [1, 2]}])
+    )
+    assert table.column("prediction").to_pylist() == ['"cat"', "[1,2]"]
+    assert metadata is None
+
+
+def test_columnar_validation_matches_row_validation():
+    from app.services.schema_validator import CompiledSchema
+
+    schema = CompiledSchema({
+        "input_schema": {
+            "required": ["age", "plan"],
+            "properties": {
+                "age": {"type": "integer", "minimum": 0},
+                "spend": {"type": "number"},
+                "plan": {"type": "string", "enum": ["free", "pro"]},
+                "region": {"type": "string"},
+            },
+        },
+        "preprocessing": {
+            "scaling": {"spend": {"type": "standard", "mean": 10.0, "std": 2.0}},
+            "encoding": {
+                "plan": {"type": "onehot", "categories": ["free", "pro"]},
+                "region": {"type": "label", "mapping": {"eu": 1, "us": 2}},
+            },
+        },
+    })
+    instances = [
+        {"age": 30.0, "spend": 12.0, "plan": "pro", "region": "eu"},
+        {"age": 41.0, "spend": 8.0, "plan": "free", "region": "apac"},
+    ]
+    table = inference_grpc.read_table(inference_grpc.write_instances(instances))
+    columns = schema.validate_columns(inference_grpc.table_columns(table))
+    assert schema.columnar
+    assert [{name: column[i].item() for name, column in columns.items()} for i in range(2)] == schema.validate(instances)
+
+    from app.core.exceptions import ValidationError
+    with pytest.raises(ValidationError, match="below minimum"):
+        schema.validate_columns({"age": np.array([3, -1]), "plan": np.array(["pro", "pro"], dtype=object)})
+    with pytest.raises(ValidationError, match="not in allowed values"):
+        schema.validate_columns({"age": np.array([3]), "plan": np.array(["team"], dtype=object)})
+    with pytest.raises(ValidationError, match="Invalid type for feature 'age'"):
+        schema.validate_columns({"age": np.array([3, None], dtype=object), "plan": np.array(["pro", "pro"], dtype=object)})
+
+
+def test_predict_rpc_scores_arrow_instances_through_the_shared_path(monkeypatch):
+    deployment = SimpleNamespace(
+        id="dep", organization_id="org", status="active", deployment_config={}, model_version_id="v1",
+        model_version=SimpleNamespace(model_id="m", version="1.0.0", model=SimpleNamespace(name="model"))
+    )
+    seen = {}
+
+    async def get_deployment_by_name(db, name):
+        return deployment if name == "churn" else None
+
+    async def allow(*args, **kwargs):
+        return True
+
+    async def serve_instances(db, dep, serving, digests, load_instances, use_cache, client, deadline, background_tasks):
+        seen.update(instances=load_instances(), use_cache=use_cache, deadline=deadline)
+        return [PredictionResult(prediction=row["x"] * 2, index=i) for i, row in enumerate(load_instances())], {"cached": False}
+
+    monkeypatch.setattr(inference_grpc, "SessionLocal", lambda: SimpleNamespace(close=lambda: None))
+    monkeypatch.setattr(inference_grpc, "get_deployment_by_name", get_deployment_by_name)
+    monkeypatch.setattr(inference_grpc, "serve_instances", serve_instances)
+    monkeypatch.setattr(inference_grpc.rate_limiter, "check_rate_limit", allow)
+    monkeypatch.setattr(inference_grpc.rate_limiter, "get_tier", allow)
+    monkeypatch.setattr(inference_grpc.traffic_service, "choose_target", lambda db, dep, client_id: dep)
+    monkeypatch.setattr(inference_grpc, "log_inference_request", allow)
+
+    async def run():
+        server = grpc.aio.server(handlers=[inference_grpc.inference_handler()])
+        port = server.add_insecure_port("127.0.0.1:0")
+        await server.start()
+        try:
+            async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as channel:
+                predict = channel.unary_unary(f"/{inference_grpc.SERVICE_NAME}/Predict")
+                payload = inference_grpc.write_instances([{"x": 1.5}, {"x": 2.0}])
+                response = await predict(payload, metadata=(("x-deployment", "churn"),), timeout=5)
+                with pytest.raises(grpc.aio.AioRpcError) as missing:
+                    await predict(payload, metadata=(("x-deployment", "other"),), timeout=5)
+                return inference_grpc.read_predictions(response), missing.value.code()
+        finally:
+            await server.stop(0)
+
+    (table, metadata), missing_code = asyncio.run(run())
+    rows = inference_grpc.prediction_rows(table)
+    assert [(row["index"], row["prediction"]) for row in rows] == [(0, 3.0), (1, 4.0)]
+    assert metadata["model_info"]["model_name"] == "model" and metadata["cached"] is False
+    assert seen["instances"] == [{"x": 1.5}, {"x": 2.0}] and seen["use_cache"] is True and seen["deadline"] is not None
+    assert missing_code == grpc.StatusCode.NOT_FOUND
@@ -0,0 +1,381 @@
+import asyncio
+import hashlib
+from types import SimpleNamespace
+
+import orjson
+import pytest
+from fastapi import BackgroundTasks, FastAPI
+from starlette.testclient import TestClient
+
+from app.api.v1 import inference
+from app.core.scheduler import execution_class
+from app.schemas.inference import PredictionResult
+
+
+class _FakeRedis:
+    """Just enough Redis for the rate limiter: tiers by key and rate windows that keep their members."""
+
+    def __init__(self, tiers):
+        self.tiers = tiers
+        self.reads = []
+        self.windows = {}
+
+    async def zadd(self, key, mapping):
+        self.windows.setdefault(key, set()).update(mapping)
+
+    async def zcard(self, key):
+        return len(self.windows.get(key, ()))
+
+    async def zrange(self, key, start, end):
+        return list(self.windows.get(key, ()))
+
+    async def get(self, key):
+        self.reads.append(key)
+        tier = self.tiers.get(key)
+        return tier.encode() if tier else None
+
+    def __getattr__(self, name):
+        async def noop(*args, **kwargs):
+            return 0
+        return noop
+
+
+def _client(monkeypatch, redis=None):
+    deployment = SimpleNamespace(
+        id="dep", organization_id="org-1", status="active", deployment_config={}, model_version_id="v1",
+        model_version=SimpleNamespace(model_id="m", version="1.0.0", model_schema={}, model=SimpleNamespace(name="model"))
+    )
+    seen = {}
+
+    async def get_deployment_by_name(db, name):
+        return deployment
+
+    async def serve_instances(db, dep, serving, digests, load_instances, use_cache, client, deadline, background_tasks):
+        seen["execution_class"] = execution_class.get()
+        return [PredictionResult(prediction=row["x"], index=i) for i, row in enumerate(load_instances())], {"cached": False}
+
+    async def noop(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(inference, "get_deployment_by_name", get_deployment_by_name)
+    monkeypatch.setattr(inference, "serve_instances", serve_instances)
+    monkeypatch.setattr(inference, "log_inference_request", noop)
+    monkeypatch.setattr(inference, "log_batch_inference_request", noop)
+    monkeypatch.setattr(inference.traffic_service, "choose_target", lambda db, dep, client_id: dep)
+    monkeypatch.setattr(inference.rate_limiter, "redis_client", redis or _FakeRedis({}))
+    monkeypatch.setattr(inference.rate_limiter, "_tiers", {})
+
+    app = FastAPI()
+    app.include_router(inference.router)
+    app.dependency_overrides[inference.get_db] = lambda: None
+    return TestClient(app), seen
+
+
+def test_bearer_credentials_are_rate_limited_and_scheduled_by_key_hash(monkeypatch):
+    key_hash = hashlib.sha256(b"sk-live-123").hexdigest()
+    redis = _FakeRedis({f"api_key_tier:{key_hash}": "enterprise"})
+    client, seen = _client(monkeypatch, redis)
+
+    response = client.post(
+        "/inference/churn",
+        json={"instances": [{"x": 1}, {"x": 2}]},
+        headers={"Authorization": "Bearer sk-live-123"}
+    )
+    assert response.status_code == 200, response.text
+    assert [row["prediction"] for row in response.json()["predictions"]] == [1, 2]
+    assert seen["execution_class"].tenant == "org-1" and seen["execution_class"].tier == "enterprise"
+    # The raw key never reaches Redis, and repeated lookups come from the tier cache
+    assert all("sk-live-123" not in key for key in redis.reads)
+    client.post("/inference/churn", json={"instances": [{"x": 3}]}, headers={"Authorization": "Bearer sk-live-123"})
+    assert redis.reads.count(f"api_key_tier:{key_hash}") == 1
+
+
+async def _chunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def _rows(*chunks):
+    async def collect():
+        return [item async for item in inference.iter_ndjson_rows(_chunks(*chunks))]
+    return asyncio.run(collect())
+
+
+def test_ndjson_rows_are_framed_across_chunks_and_bad_lines_reported_in_place():
+    rows = _rows(b'{"a": 1}\n{"a"', b': 2}\n\n  \nnot json\n[1]\n{"a": 3}')
+    assert [(index, row) for index, row, error in rows if error is None] == [(0, {"a": 1}), (1, {"a": 2}), (4, {"a": 3})]
+    errors = {index: error for index, row, error in rows if error is not None}
+    assert errors[2].startswith("Invalid JSON") and errors[3] == "Each line must be a JSON object"
+
+
+def test_ndjson_lines_over_the_size_cap_end_the_stream(monkeypatch):
+    monkeypatch.setattr(inference.settings, "STREAM_MAX_LINE_BYTES", 16)
+    with pytest.raises(inference.StreamFormatError):
+        _rows(b'{"a": 1}\n{"padding": "' + b"x" * 32)
+
+
+def _stream_client(monkeypatch, instance_quota):
+    client, seen = _client(monkeypatch)
+    scored = []
+
+    async def get_model(model_version_id, options=None):
+        return "model"
+
+    async def score_rows(deployment, serving, model, composite, rows):
+        scored.append(len(rows))
+        return [PredictionResult(prediction=row["x"] * 10) for row in rows]
+
+    monkeypatch.setattr(inference.model_loader, "get_model", get_model)
+    monkeypatch.setattr(inference, "resolve_composite", lambda db, serving: None)
+    monkeypatch.setattr(inference, "score_rows", score_rows)
+    monkeypatch.setitem(inference.rate_limiter.default_limits, "batch_instances_per_minute", instance_quota)
+    return client, scored
+
+
+def test_stream_scores_chunks_and_ends_with_metadata(monkeypatch):
+    client, scored = _stream_client(monkeypatch, instance_quota=100)
+    body = b'{"x": 1}\n{"x": 2}\nnot json\n{"x": 3}\n'
+    response = client.post("/inference/churn/batch/stream?batch_size=2", content=body, headers={"Authorization": "Bearer k"})
+
+    lines = [orjson.loads(line) for line in response.content.splitlines()]
+    assert response.status_code == 200 and scored == [2, 1]
+    assert [(line["index"], line.get("prediction")) for line in lines[:-1]] == [(0, 10), (1, 20), (2, None), (3, 30)]
+    assert lines[-1]["metadata"]["total_instances"] == 4 and lines[-1]["metadata"]["failed_predictions"] == 1
+
+
+def test_stream_stops_once_the_batch_instance_quota_is_used_up(monkeypatch):
+    client, scored = _stream_client(monkeypatch, instance_quota=3)
+    body = b"".join(b'{"x": %d}\n' % i for i in range(6))
+    response = client.post("/inference/churn/batch/stream?batch_size=2", content=body, headers={"Authorization": "Bearer k"})
+
+    lines = [orjson.loads(line) for line in response.content.splitlines()]
+    # The first chunk fits the quota; the second would exceed it, so the stream ends in-band
+    assert scored == [2]
+    # A charged chunk is one counter member carrying its row count, not one member per row
+    key_hash = hashlib.sha256(b"k").hexdigest()
+    assert len(inference.rate_limiter.redis_client.windows[f"rate_limit:batch_instances:{key_hash}:minute"]) == 1
+    assert [line["index"] for line in lines[:-1]] == [0, 1]
+    assert lines[-1] == {"error": "Batch instance rate limit exceeded"}
+
+
+def test_stream_releases_its_admission_slot_when_setup_fails_or_the_body_never_starts(monkeypatch):
+    client, scored = _stream_client(monkeypatch, instance_quota=100)
+
+    async def redis_down(*args, **kwargs):
+        raise ConnectionError("redis unavailable")
+
+    monkeypatch.setattr(inference.rate_limiter, "check_rate_limit", redis_down)
+    response = client.post("/inference/churn/batch/stream", content=b'{"x": 1}\n', headers={"Authorization": "Bearer k"})
+    assert response.status_code == 500 and scored == []
+    assert inference.admission_controller.limiters["dep"].in_flight == 0
+
+    # A client that is gone before the first byte is sent never iterates the body
+    released = []
+
+    async def body():
+        yield b"never sent"
+
+    async def send(message):
+        raise OSError("connection reset")
+
+    response = inference.NDJSONStreamingResponse(body(), background=inference.BackgroundTask(released.append, "released"))
+    with pytest.raises(OSError):
+        asyncio.run(response({"type": "http"}, None, send))
+    assert released == ["released"]
+
+
+class _DictCache:
+    def __init__(self):
+        self.rows = {}
+
+    async def lookup(self, namespace, digests):
+        found = [self.rows.get((namespace, digest)) for digest in digests]
+        return found, {"hits": sum(1 for row in found if row is not None)}
+
+    async def record_lookups(self, *args):
+        pass
+
+    async def set_many(self, namespace, rows):
+        self.rows.update({(namespace, digest): row for digest, row in rows.items()})
+
+
+def test_entity_key_requests_are_cached_by_their_joined_features(monkeypatch):
+    deployment = SimpleNamespace(
+        id="dep", organization_id="org-1", model_version_id="v1",
+        deployment_config={"features": {"feature_set": "users", "entity_key": "user_id"}, "coalescing": {"enabled": False}}
+    )
+    stored = {"u1": {"spend": 1.0}}
+
+    async def join_features(instances, dep):
+        return [{**stored[instance["user_id"]]} for instance in instances]
+
+    async def score_instances(serving, instances, client, deadline, composite, batched):
+        return {digest: {"prediction": row["spend"]} for digest, row in instances.items()}, None
+
+    monkeypatch.setattr(inference, "inference_cache", _DictCache())
+    monkeypatch.setattr(inference.inference_service, "join_features", join_features)
+    monkeypatch.setattr(inference, "score_instances", score_instances)
+    monkeypatch.setattr(inference, "resolve_composite", lambda db, serving: None)
+    monkeypatch.setattr(inference.traffic_service, "sample_shadow", lambda dep: None)
+
+    def predict():
+        instances = [{"user_id": "u1"}]
+        digests = [inference.instance_digest(instance) for instance in instances]
+        merged, served = asyncio.run(inference.serve_instances(
+            None, deployment, deployment, digests, lambda: instances, True, None, None, BackgroundTasks()
+        ))
+        return merged[0].prediction, served["cached"]
+
+    assert predict() == (1.0, False)
+    assert predict() == (1.0, True)
+    # The request is unchanged, but the model would now see different features
+    stored["u1"] = {"spend": 2.0}
+    assert predict() == (2.0, False)
+
+
+class _LockedRedis:
+    """Coalescing locks where some keys are already held by another worker; nothing is cached."""
+
+    def __init__(self, held):
+        self.held = held
+
+    def pipeline(self, transaction=True):
+        redis = self
+
+        class _Pipeline:
+            def __init__(self):
+                self.results = []
+
+            def set(self, key, value, nx=False, px=None):
+                self.results.append(key not in redis.held)
+
+            def __getattr__(self, name):
+                return lambda *args, **kwargs: self.results.append(0)
+
+            async def execute(self):
+                return self.results
+
+        return _Pipeline()
+
+    async def mget(self, keys):
+        return [None] * len(keys)
+
+    def pubsub(self):
+        class _PubSub:
+            async def subscribe(self, *channels):
+                pass
+
+            async def listen(self):
+                await asyncio.Event().wait()
+                yield
+        return _PubSub()
+
+
+def test_a_failed_leader_releases_followers_of_its_remote_digests(monkeypatch):
+    deployment = SimpleNamespace(
+        id="dep", organization_id="org-1", model_version_id="v1",
+        deployment_config={"coalescing": {"enabled": True, "distributed": True}}
+    )
+    instances = [{"x": 1}, {"x": 2}]
+    digests = [inference.instance_digest(instance) for instance in instances]
+
+    async def score_instances(serving, instances, client, deadline, composite, batched):
+        raise RuntimeError("model crashed")
+
+    monkeypatch.setattr(inference, "score_instances", score_instances)
+    monkeypatch.setattr(inference, "resolve_composite", lambda db, serving: None)
+
+    async def run():
+        # Another worker is already scoring the second row
+        cache = inference.InferenceCache(_LockedRedis({f"{inference.InferenceCache.key('v1', digests[1])}:lock"}))
+        monkeypatch.setattr(inference, "inference_cache", cache)
+        with pytest.raises(RuntimeError):
+            await inference.serve_instances(
+                None, deployment, deployment, digests, lambda: instances, True, None, None, BackgroundTasks()
+            )
+        cache.listener_task.cancel()
+        return cache.in_flight
+
+    assert asyncio.run(run()) == {}
+
+
+def _chunk_scorer(monkeypatch, delays, failing=()):
+    """Score chunks after a per-chunk delay, recording what ran concurrently and what was cancelled."""
+    state = {"running": 0, "peak": 0, "started": [], "cancelled": []}
+
+    async def validate_input(instances, schema):
+        return instances
+
+    async def predict(model, instances, deployment):
+        offset = instances[0]["i"]
+        state["started"].append(offset)
+        state["running"] += 1
+        state["peak"] = max(state["peak"], state["running"])
+        try:
+            await asyncio.sleep(delays[offset])
+        except asyncio.CancelledError:
+            state["cancelled"].append(offset)
+            raise
+        finally:
+            state["running"] -= 1
+        if offset in failing:
+            raise ValueError(f"bad value in chunk {offset}")
+        return [row["i"] * 10 for row in instances]
+
+    monkeypatch.setattr(inference.inference_service, "validate_input", validate_input)
+    monkeypatch.setattr(inference.inference_service, "predict", predict)
+    return state
+
+
+def _chunks_of(count, size):
+    return [(offset, [{"i": offset + j} for j in range(size)]) for offset in range(0, count, size)]
+
+
+def test_pipelined_chunks_come_back_in_order_with_failures_in_place(monkeypatch):
+    # Later chunks finish first; the chunk at offset 4 fails
+    state = _chunk_scorer(monkeypatch, {0: 0.05, 2: 0.02, 4: 0.0, 6: 0.0}, failing={4})
+    deployment = SimpleNamespace(model_version=SimpleNamespace(model_schema={}))
+    results = asyncio.run(inference.score_chunks_pipelined("model", deployment, _chunks_of(8, 2), 2, False))
+
+    assert results[0] == [0, 10] and results[1] == [20, 30] and results[3] == [60, 70]
+    assert isinstance(results[2], ValueError)
+    assert state["peak"] == 2 and state["cancelled"] == []
+
+
+def test_fail_on_error_cancels_unfinished_chunks(monkeypatch):
+    state = _chunk_scorer(monkeypatch, {0: 0.0, 2: 5.0, 4: 0.0}, failing={0})
+    deployment = SimpleNamespace(model_version=SimpleNamespace(model_schema={}))
+
+    async def run():
+        with pytest.raises(inference.BatchChunkError, match="Rows 0-1 failed: bad value in chunk 0"):
+            await inference.score_chunks_pipelined("model", deployment, _chunks_of(6, 2), 2, True)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    # The running chunk is cancelled and the queued one never starts
+    assert state["started"] == [0, 2] and state["cancelled"] == [2]
+
+
+def test_batch_route_reports_a_failed_chunk_as_a_client_error(monkeypatch):
+    client, _ = _client(monkeypatch)
+    _chunk_scorer(monkeypatch, {0: 0.0, 2: 0.0}, failing={2})
+
+    async def get_model(model_version_id, options=None):
+        return "model"
+
+    async def join_features(instances, deployment):
+        return instances
+
+    monkeypatch.setattr(inference.model_loader, "get_model", get_model)
+    monkeypatch.setattr(inference.inference_service, "join_features", join_features)
+    monkeypatch.setattr(inference, "resolve_composite", lambda db, serving: None)
+    monkeypatch.setattr(inference.traffic_service, "sample_shadow", lambda dep: None)
+    body = {"instances": [{"i": i} for i in range(4)], "batch_size": 2}
+
+    response = client.post("/inference/churn/batch", json={**body, "fail_on_error": True}, headers={"Authorization": "Bearer k"})
+    assert response.status_code == 422, response.text
+    assert "Rows 2-3 failed" in response.json()["detail"]
+
+    response = client.post("/inference/churn/batch", json={**body, "fail_on_error": False}, headers={"Authorization": "Bearer k"})
+    assert response.status_code == 200, response.text
+    assert response.json()["metadata"]["failed_predictions"] == 2
@@ -0,0 +1,57 @@
+import asyncio
+import os
+import stat
+from types import SimpleNamespace
+
+from fastapi import HTTPException
+
+from app.api.v1 import inference_uds
+
+
+def test_pipelined_requests_are_answered_by_id_over_a_permissioned_socket(monkeypatch, tmp_path):
+    deployment = SimpleNamespace(id="dep", status="active")
+    lookups = []
+
+    async def get_deployment_by_name(db, name):
+        lookups.append(name)
+        return deployment if name == "churn" else None
+
+    async def serve_session_request(db, dep, client_id, api_key, request, start_time, peer):
+        # Later requests finish first, so replies come back out of order
+        await asyncio.sleep(0.01 * (3 - request.instances[0]["x"]))
+        if request.instances[0]["x"] == 2:
+            raise HTTPException(status_code=429, detail="Rate limit exceeded")
+        return {"predictions": [{"prediction": request.instances[0]["x"] * 2, "index": 0}], "metadata": {"client": client_id}}
+
+    monkeypatch.setattr(inference_uds, "SessionLocal", lambda: SimpleNamespace(close=lambda: None))
+    monkeypatch.setattr(inference_uds, "get_deployment_by_name", get_deployment_by_name)
+    monkeypatch.setattr(inference_uds, "serve_session_request", serve_session_request)
+    path = str(tmp_path / "inference.sock")
+    sock = inference_uds.bind_socket(path, 0o600)
+
+    async def run():
+        server = await asyncio.start_unix_server(inference_uds.handle_connection, sock=sock)
+        async with server:
+            client = await inference_uds.UnixSocketClient(path).connect()
+            replies = await asyncio.gather(*[client.predict("churn", [{"x": x}]) for x in range(3)])
+            missing = await client.predict("other", [{"x": 1}])
+            invalid = await client.predict("churn", [])
+
+            # An unreadable frame closes its own connection only
+            reader, writer = await asyncio.open_unix_connection(path)
+            writer.write(b"\x07" + bytes(10))
+            closed = await reader.read()
+            still_serving = await client.predict("churn", [{"x": 0}])
+            await client.close()
+            return replies, missing, invalid, closed, still_serving
+
+    replies, missing, invalid, closed, still_serving = asyncio.run(run())
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert [status for status, _ in replies] == [200, 200, 429]
+    assert [body["predictions"][0]["prediction"] for _, body in replies[:2]] == [0, 2]
+    assert replies[0][1]["metadata"]["client"] == f"uds:{os.getuid()}"
+    assert missing == (404, {"detail": "Deployment not found or inactive"})
+    assert invalid[0] == 422
+    assert closed == b"" and still_serving[0] == 200
+    # The deployment is looked up once per connection
+    assert lookups.count("churn") == 1
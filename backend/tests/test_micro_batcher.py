@@ -0,0 +1,50 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.services.micro_batcher import MicroBatcher
+
+
+class _FakeInferenceService:
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    async def predict(self, model, instances, deployment):
+        self.batches.append(len(instances))
+        if self.fail:
+            raise RuntimeError("model crashed")
+        return [instance["x"] * 10 for instance in instances]
+
+
+def test_concurrent_requests_share_model_calls_up_to_the_batch_size():
+    service = _FakeInferenceService()
+    batcher = MicroBatcher(service)
+    deployment = SimpleNamespace(id="dep", model_version_id="v1")
+    model = object()
+
+    async def run():
+        calls = [
+            batcher.predict(model, [{"x": i}, {"x": i + 0.5}], deployment, max_batch_size=4, max_wait_ms=50)
+            for i in range(5)
+        ]
+        return await asyncio.gather(*calls)
+
+    results = asyncio.run(run())
+    assert results == [[i * 10, i * 10 + 5] for i in range(5)]
+    # Two full batches go out at once, the leftover when its window closes; requests are never split
+    assert service.batches == [4, 4, 2]
+
+
+def test_a_failed_batch_fails_every_request_in_it():
+    batcher = MicroBatcher(_FakeInferenceService(fail=True))
+    deployment = SimpleNamespace(id="dep", model_version_id="v1")
+
+    async def run():
+        return await asyncio.gather(
+            batcher.predict("model", [{"x": 1}], deployment, max_batch_size=8, max_wait_ms=1),
+            batcher.predict("model", [{"x": 2}], deployment, max_batch_size=8, max_wait_ms=1),
+            return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
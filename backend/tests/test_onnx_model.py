@@ -0,0 +1,77 @@
+import pytest
+
+onnx = pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+
+from onnx import TensorProto, helper
+
+from app.core.config import settings
+from app.core.exceptions import ModelError
+from app.services.model_loader import ModelLoader
+
+MAPPING = {"a": ["x1", "x2"], "b": ["x3", "x4"]}
+
+
+@pytest.fixture
+def two_input_model(tmp_path):
+    graph = helper.make_graph(
+        [helper.make_node("Add", ["a", "b"], ["y"])],
+        "add",
+        [
+            helper.make_tensor_value_info("a", TensorProto.FLOAT, ["batch", 2]),
+            helper.make_tensor_value_info("b", TensorProto.FLOAT, ["batch", 2]),
+        ],
+        [helper.make_tensor_value_info("y", TensorProto.FLOAT, ["batch", 2])],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    path = tmp_path / "model.onnx"
+    onnx.save(model, str(path))
+    return path
+
+
+def _loader():
+    # Skip __init__, which starts the background cleanup task
+    return ModelLoader.__new__(ModelLoader)
+
+
+@pytest.mark.asyncio
+async def test_features_map_to_named_inputs_with_bound_outputs(tmp_path, two_input_model, monkeypatch):
+    monkeypatch.setattr(settings, "ONNX_OPTIMIZED_MODEL_DIR", str(tmp_path / "optimized"))
+    cache_file = tmp_path / "optimized" / "v1-abc" / "graph.onnx"
+    options = {
+        "inputs": MAPPING,
+        "session": {"execution_mode": "parallel", "enable_mem_arena": False, "optimized_model_filepath": "graph.onnx"},
+    }
+    model = await _loader()._load_onnx_model(two_input_model, options, "v1:abc")
+    assert [t.name for t in model.inputs] == ["a", "b"]
+    assert cache_file.exists()
+
+    rows = [{"x4": 4, "x3": 3, "x2": 2, "x1": 1}, {"x1": 10, "x2": 20, "x3": 30, "x4": 40}]
+    assert model.predict(model.prepare_inputs(rows)) == [[4.0, 6.0], [40.0, 60.0]]
+    # Reused buffers must not leak values between calls
+    assert model.predict(model.prepare_inputs(rows[:1])) == [[4.0, 6.0]]
+    assert model.predict(model.prepare_inputs(rows[1:])) == [[40.0, 60.0]]
+
+    reloaded = await _loader()._load_onnx_model(two_input_model, options, "v1:abc")
+    assert reloaded.predict(reloaded.prepare_inputs(rows[:1])) == [[4.0, 6.0]]
+
+
+@pytest.mark.asyncio
+async def test_multi_input_model_requires_mapping(two_input_model):
+    with pytest.raises(ModelError, match="feature mapping"):
+        await _loader()._load_onnx_model(two_input_model, {})
+
+
+@pytest.mark.asyncio
+async def test_session_config_cannot_write_outside_the_cache_or_pick_any_provider(tmp_path, two_input_model, monkeypatch):
+    monkeypatch.setattr(settings, "ONNX_OPTIMIZED_MODEL_DIR", str(tmp_path / "optimized"))
+    for requested in (str(tmp_path / "elsewhere.onnx"), "../../elsewhere.onnx"):
+        options = {"inputs": MAPPING, "session": {"optimized_model_filepath": requested}}
+        await _loader()._load_onnx_model(two_input_model, options, "v1")
+        assert (tmp_path / "optimized" / "v1" / "optimized.onnx").exists()
+        assert not (tmp_path / "elsewhere.onnx").exists()
+
+    options = {"inputs": MAPPING, "session": {"providers": ["CPUExecutionProvider", "MyCustomProvider"]}}
+    with pytest.raises(ModelError, match="MyCustomProvider"):
+        await _loader()._load_onnx_model(two_input_model, options, "v1")
@@ -0,0 +1,84 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services.inference_service import InferenceService
+from app.services.pipeline_service import PipelineService, build_plan
+
+linear_model = pytest.importorskip("sklearn.linear_model")
+
+
+SCHEMA = {"input_schema": {"required": ["x"], "properties": {"x": {"type": "number"}}}}
+
+
+class _Loader:
+    def __init__(self, models):
+        self.models = models
+
+    async def get_model(self, model_version_id, load_options=None):
+        return self.models[model_version_id]
+
+
+def _version(version_id):
+    return SimpleNamespace(
+        id=version_id,
+        framework="sklearn",
+        model_schema=SCHEMA,
+        model=SimpleNamespace(problem_type="classification"),
+    )
+
+
+def _slow(model, seconds):
+    predict_proba = model.predict_proba
+    model.predict_proba = lambda data: time.sleep(seconds) or predict_proba(data)
+    return model
+
+
+def test_ensemble_branches_run_concurrently_and_feed_transform():
+    X = np.linspace(-3, 3, 200).reshape(-1, 1)
+    y = (X[:, 0] > 0).astype(int)
+    a = _slow(linear_model.LogisticRegression(C=0.1).fit(X, y), 0.2)
+    b = _slow(linear_model.LogisticRegression(C=10).fit(X, y), 0.2)
+    config = {
+        "nodes": {
+            "a": {"model_version_id": "a"},
+            "b": {"model_version_id": "b"},
+            "ensemble": {"transform": "mean", "inputs": ["a", "b"]},
+        },
+        "output": "ensemble",
+    }
+    plan = build_plan(config, {"a": _version("a"), "b": _version("b")})
+    assert [[node.name for node in level] for level in plan.levels] == [["a", "b"], ["ensemble"]]
+
+    service = PipelineService(InferenceService(), _Loader({"a": a, "b": b}))
+    deployment = SimpleNamespace(
+        id="dep",
+        deployment_config={"pipeline": config},
+        model_version=_version("a"),
+    )
+    instances = [{"x": x} for x in (-2.0, 0.3, 2.0)]
+    start = time.perf_counter()
+    results, report = asyncio.run(service.predict(deployment, plan, instances))
+    elapsed = time.perf_counter() - start
+
+    rows = np.array([[r["x"]] for r in instances])
+    expected = (a.predict_proba(rows) + b.predict_proba(rows)) / 2
+    assert [r.prediction for r in results] == expected.argmax(axis=1).tolist()
+    assert [r.confidence for r in results] == pytest.approx(expected.max(axis=1).tolist())
+    assert [n["node"] for n in report["nodes"]] == ["a", "b", "ensemble"]
+    # Both branches sleep 0.2s; run one after the other they would take 0.4s
+    assert elapsed < 0.35
+
+
+def test_build_plan_rejects_cycles():
+    config = {
+        "nodes": {
+            "a": {"model_version_id": "a", "inputs": ["b"]},
+            "b": {"model_version_id": "a", "inputs": ["a"]},
+        }
+    }
+    with pytest.raises(ValueError, match="cycle"):
+        build_plan(config, {"a": _version("a")})
@@ -0,0 +1,133 @@
+import asyncio
+import pickle
+import time
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from app.core.config import settings
+from app.services import precomputed_store as store_module
+from app.services.batch_job_service import batch_job_runner
+from app.services.inference_service import InferenceService
+from app.services.precomputed_store import PrecomputedStore, PrecomputedTable, PrecomputedTableWriter
+
+
+def _build(path, keys, version="v1"):
+    writer = PrecomputedTableWriter(str(path), {"model_version_id": version, "entity_key": "id", "built_at": time.time()})
+    writer.add(keys, [{"prediction": int(key[1:]) * 2, "confidence": None} for key in keys])
+    return writer.finish()
+
+
+def test_lookup_by_key_with_misses_and_hash_collisions(tmp_path, monkeypatch):
+    keys = [f"c{i}" for i in range(5000)]
+    table = PrecomputedTable(_build(tmp_path / "a.kv", keys[::-1]))
+    assert len(table) == 5000
+    rows = table.get_many(["c0", "c4999", "c123", "missing", None])
+    assert [row and row["prediction"] for row in rows] == [0, 9998, 246, None, None]
+
+    # Every key hashing alike degrades to a scan of equal hashes, but stays correct
+    monkeypatch.setattr(store_module, "key_hash", lambda key: 7)
+    table = PrecomputedTable(_build(tmp_path / "b.kv", ["c1", "c2", "c3"]))
+    assert [row["prediction"] for row in table.get_many(["c3", "c1"])] == [6, 2]
+    assert table.get_many(["c4"]) == [None]
+
+
+def test_store_picks_up_published_table_and_ignores_other_versions(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PRECOMPUTED_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "PRECOMPUTED_RELOAD_CHECK_S", 0)
+    store = PrecomputedStore(inference_service=None, redis_client=object())
+    deployment = SimpleNamespace(
+        id="dep",
+        model_version_id="v2",
+        deployment_config={"precomputed": {"entity_key": "id", "source_path": "entities.parquet"}},
+    )
+    directory = Path(tmp_path) / "dep"
+    directory.mkdir()
+    assert store.lookup(deployment, [{"id": "c1"}]) is None
+    assert store.needs_refresh(deployment, store.table(deployment))
+
+    store._publish(directory, Path(_build(directory / "old.kv", ["c1"], version="v1")))
+    # Scored by a version the deployment no longer serves
+    assert store.lookup(deployment, [{"id": "c1"}]) is None
+
+    store._publish(directory, Path(_build(directory / "new.kv", ["c1", "c2"], version="v2")))
+    assert store.lookup(deployment, [{"id": "c2"}, {"id": 1}, {"x": 1}]) == [{"prediction": 4, "confidence": None}, None, None]
+    assert not store.needs_refresh(deployment, store.table(deployment))
+    assert store.claim_refresh("dep") and not store.claim_refresh("dep")
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return False
+        self.values[key] = value
+        return True
+
+    async def setex(self, key, ttl, value):
+        self.values[key] = value
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def exists(self, key):
+        return int(key in self.values)
+
+    async def delete(self, key):
+        self.values.pop(key, None)
+
+    async def lrange(self, key, start, end):
+        return []
+
+    async def rpush(self, key, value):
+        pass
+
+    async def ltrim(self, key, start, end):
+        pass
+
+    async def expire(self, key, ttl):
+        pass
+
+
+def test_refresh_scores_the_entity_table_and_publishes_it(tmp_path, monkeypatch):
+    linear_model = pytest.importorskip("sklearn.linear_model")
+    organization_id = "8d0b7c1e-5f8a-4f1e-9a57-3c2f6a1d4e90"
+    monkeypatch.setattr(settings, "BATCH_JOB_DATA_ROOT", str(tmp_path / "batch"))
+    monkeypatch.setattr(settings, "PRECOMPUTED_DIR", str(tmp_path / "precomputed"))
+    monkeypatch.setattr(settings, "PRECOMPUTED_RELOAD_CHECK_S", 0)
+    org_dir = tmp_path / "batch" / organization_id
+    org_dir.mkdir(parents=True)
+    pq.write_table(pa.table({"id": ["c1", "c2", "c3"], "x": [1.0, 2.0, 3.0]}), org_dir / "entities.parquet")
+    model_path = tmp_path / "model.pkl"
+    model_path.write_bytes(pickle.dumps(linear_model.LinearRegression().fit(np.array([[0.0], [1.0]]), np.array([0.0, 2.0]))))
+
+    deployment = SimpleNamespace(
+        id=uuid.uuid4(), organization_id=organization_id, model_version_id="v1",
+        deployment_config={"precomputed": {"entity_key": "id", "source_path": "entities.parquet"}},
+        model_version=SimpleNamespace(
+            id="v1", model_file_path=str(model_path), model_schema={},
+            model=SimpleNamespace(framework="scikit-learn", problem_type="regression")
+        )
+    )
+    session = SimpleNamespace(
+        query=lambda *args: SimpleNamespace(filter=lambda *args: SimpleNamespace(first=lambda: deployment)),
+        close=lambda: None
+    )
+    monkeypatch.setattr(store_module, "SessionLocal", lambda: session)
+    monkeypatch.setattr(batch_job_runner, "redis_client", _FakeRedis())
+    store = PrecomputedStore(InferenceService(), redis_client=_FakeRedis())
+
+    asyncio.run(store.refresh(deployment.id))
+
+    rows = store.lookup(deployment, [{"id": "c3"}, {"id": "c1"}, {"id": "c9"}])
+    assert [row and round(row["prediction"], 6) for row in rows] == [6.0, 2.0, None]
+    # The intermediate scores were written inside the organization's batch data, then removed
+    scores_dir = org_dir / "precomputed" / str(deployment.id)
+    assert scores_dir.is_dir() and not list(scores_dir.iterdir())
@@ -0,0 +1,66 @@
+import pytest
+from fastapi.exceptions import RequestValidationError
+
+from app.core.request_body import decode_request
+from app.schemas.inference import BatchInferenceRequest, InferenceRequest
+from app.services.schema_validator import CompiledSchema
+from app.core.exceptions import ValidationError
+
+
+SCHEMA = {
+    "input_schema": {
+        "required": ["age", "plan"],
+        "properties": {
+            "age": {"type": "integer", "minimum": 0, "maximum": 120},
+            "income": {"type": "number"},
+            "plan": {"type": "string", "enum": ["basic", "pro"]},
+        },
+    },
+    "preprocessing": {
+        "scaling": {"income": {"type": "standard", "mean": 100.0, "std": 50.0}},
+        "encoding": {"plan": {"type": "onehot", "categories": ["basic", "pro"]}},
+    },
+}
+
+
+def test_decode_request_matches_pydantic():
+    raw = b'{"instances": [{"age": 30}], "use_cache": false, "explain": true}'
+    decoded = decode_request(raw, InferenceRequest)
+    assert decoded.model_dump() == InferenceRequest.model_validate_json(raw).model_dump()
+
+    batch = decode_request(b'{"instances": [{"a": 1}], "batch_size": 8}', BatchInferenceRequest)
+    assert batch.batch_size == 8 and batch.fail_on_error is False
+
+
+@pytest.mark.parametrize("raw", [
+    b"not json",
+    b"[]",
+    b'{"use_cache": true}',
+    b'{"instances": []}',
+    b'{"instances": [1, 2]}',
+    b'{"instances": [{"a": 1}], "use_cache": "maybe"}',
+])
+def test_decode_request_rejects_invalid_bodies(raw):
+    with pytest.raises(RequestValidationError):
+        decode_request(raw, InferenceRequest)
+
+
+def test_decode_request_enforces_declared_max_length():
+    raw = b'{"instances": [' + b",".join([b'{"a": 1}'] * 1001) + b"]}"
+    with pytest.raises(RequestValidationError):
+        decode_request(raw, InferenceRequest)
+
+
+def test_compiled_schema_converts_checks_and_preprocesses():
+    rows = CompiledSchema(SCHEMA).validate([{"age": "41", "income": 150, "plan": "pro", "extra": 1}])
+    assert rows == [{"age": 41, "income": 1.0, "extra": 1, "plan_basic": 0, "plan_pro": 1}]
+
+    compiled = CompiledSchema(SCHEMA)
+    with pytest.raises(ValidationError, match="Missing required features"):
+        compiled.validate([{"age": 1}])
+    with pytest.raises(ValidationError, match="above maximum"):
+        compiled.validate([{"age": 130, "plan": "basic"}])
+    with pytest.raises(ValidationError, match="not in allowed values"):
+        compiled.validate([{"age": 1, "plan": "gold"}])
+    with pytest.raises(ValidationError, match="Invalid type for feature 'age'"):
+        compiled.validate([{"age": "old", "plan": "basic"}])
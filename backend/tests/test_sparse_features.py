@@ -0,0 +1,92 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services.inference_service import InferenceService
+from app.services.sparse_features import SparseLayout
+
+sparse = pytest.importorskip("scipy.sparse")
+
+
+SCHEMA = {
+    "input_schema": {
+        "required": ["amount", "merchant"],
+        "properties": {
+            "amount": {"type": "number"},
+            "channel": {"type": "string"},
+            "merchant": {"type": "string"},
+            "tags": {"type": "array"},
+        },
+    },
+    "preprocessing": {
+        "encoding": {
+            "channel": {"type": "onehot", "categories": ["web", "store"]},
+            "merchant": {"type": "onehot", "categories": [f"m{i}" for i in range(5000)], "sparse": True},
+            "tags": {"type": "hash", "n_features": 64},
+        }
+    },
+}
+
+
+def _instances(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            "amount": float(rng.random()),
+            "channel": "web" if i % 2 else "store",
+            "merchant": f"m{rng.integers(0, 6000)}",
+            "tags": [f"t{rng.integers(0, 30)}" for _ in range(3)],
+        }
+        for i in range(n)
+    ]
+
+
+def test_hashing_matches_sklearn_feature_hasher():
+    feature_extraction = pytest.importorskip("sklearn.feature_extraction")
+    layout = SparseLayout.from_schema({
+        "preprocessing": {"encoding": {"tags": {"type": "hash", "n_features": 32}}}
+    })
+    rows = [{"tags": ["a", "b", "a"]}, {"tags": 2.5}]
+    expected = feature_extraction.FeatureHasher(n_features=32).transform(
+        [{"tags=a": 2, "tags=b": 1}, {"tags": 2.5}]
+    )
+    np.testing.assert_allclose(layout.encode(rows).toarray(), expected.toarray())
+
+
+def test_sparse_schema_feeds_csr_to_sklearn_model():
+    linear_model = pytest.importorskip("sklearn.linear_model")
+    service = InferenceService()
+    compiled = service._compiled_schema(SCHEMA)
+    train = compiled.validate(_instances(400))
+    X = compiled.sparse.encode(train)
+    assert X.shape == (400, 1 + 2 + 5000 + 64)
+    # Dense one-hot columns come before the sparse blocks
+    assert compiled.sparse.dense_columns == ["amount", "channel_web", "channel_store"]
+
+    y = (np.asarray(X[:, 0].todense()).ravel() > 0.5).astype(int)
+    model = linear_model.LogisticRegression().fit(X, y)
+    seen = []
+    original_predict = model.predict
+    model.predict = lambda data: seen.append(data) or original_predict(data)
+
+    deployment = SimpleNamespace(
+        id=None,
+        deployment_config={},
+        model_version=SimpleNamespace(
+            framework="sklearn",
+            model_schema=SCHEMA,
+            model=SimpleNamespace(problem_type="classification"),
+        ),
+    )
+    instances = _instances(20, seed=1)
+
+    async def score():
+        validated = await service.validate_input(instances, SCHEMA)
+        return await service.predict(model=model, instances=validated, deployment=deployment)
+
+    results = asyncio.run(score())
+    assert sparse.issparse(seen[0])
+    expected = original_predict(compiled.sparse.encode(compiled.validate(instances)))
+    assert [r.prediction for r in results] == expected.tolist()
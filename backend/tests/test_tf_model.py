@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+
+from app.core.exceptions import ModelError
+from app.services.model_loader import ModelLoader
+
+
+def _loader():
+    # Skip __init__, which starts the background cleanup task
+    return ModelLoader.__new__(ModelLoader)
+
+
+class _TwoInputs(tf.Module):
+    @tf.function(input_signature=[
+        tf.TensorSpec([None, 2], tf.float32, name="a"),
+        tf.TensorSpec([None, 1], tf.float32, name="b"),
+    ])
+    def serve(self, a, b):
+        return {"total": tf.reduce_sum(a, axis=1, keepdims=True) + b}
+
+
+@pytest.mark.asyncio
+async def test_keras_model_is_traced_once_and_padded_to_buckets(tmp_path):
+    keras_model = tf.keras.Sequential([tf.keras.Input(shape=(3,)), tf.keras.layers.Dense(2)])
+    path = tmp_path / "model.keras"
+    keras_model.save(path)
+
+    model = await _loader()._load_tensorflow_model(path, {"batch_buckets": [1, 4]})
+    inputs = np.random.rand(6, 3).astype(np.float32)
+    expected = keras_model(inputs).numpy()
+
+    # 6 rows: one full bucket of 4, then 2 rows padded to 4
+    np.testing.assert_allclose(model.predict(model.prepare_inputs(inputs)), expected, rtol=1e-5)
+    np.testing.assert_allclose(model.predict(model.prepare_inputs(inputs[:1])), expected[:1], rtol=1e-5)
+
+
+@pytest.mark.asyncio
+async def test_saved_model_signature_maps_named_inputs(tmp_path):
+    module = _TwoInputs()
+    tf.saved_model.save(module, str(tmp_path), signatures={"serving_default": module.serve})
+    rows = [{"x": 1.0, "y": 2.0, "z": 10.0}, {"x": 3.0, "y": 4.0, "z": 20.0}]
+
+    with pytest.raises(ModelError, match="feature mapping"):
+        await _loader()._load_tensorflow_model(tmp_path, {})
+    model = await _loader()._load_tensorflow_model(tmp_path, {"inputs": {"a": ["x", "y"], "b": ["z"]}})
+    assert model.predict(model.prepare_inputs(rows)).tolist() == [[13.0], [27.0]]
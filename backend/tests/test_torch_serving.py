@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from app.core.exceptions import ModelError
+from app.services.inference_service import InferenceService
+from app.services.model_loader import ModelLoader
+
+LINEAR = {"model_class": "torch.nn:Linear", "init_kwargs": {"in_features": 3, "out_features": 2}}
+
+
+def _loader():
+    # Skip __init__, which starts the background cleanup task
+    return ModelLoader.__new__(ModelLoader)
+
+
+@pytest.fixture
+def reference():
+    torch.manual_seed(0)
+    return torch.nn.Sequential(torch.nn.Linear(3, 2))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("options", [{}, {"compile": "torchscript"}, {"compile": "torchscript", "example_input_shape": [1, 3]}])
+async def test_full_model_is_served_in_eval_mode(tmp_path, reference, options):
+    path = tmp_path / "model.pt"
+    torch.save(reference, path)
+
+    model = await _loader()._load_pytorch_model(path, options)
+    inputs = np.random.rand(4, 3).astype(np.float32)
+    output = InferenceService()._run_prediction_sync(model, inputs, "pytorch", {"threads": 1})
+
+    assert not getattr(model, "training", False)
+    np.testing.assert_allclose(output, reference(torch.from_numpy(inputs)).detach().numpy(), rtol=1e-5)
+
+
+@pytest.mark.asyncio
+async def test_state_dict_needs_model_class(tmp_path, reference):
+    path = tmp_path / "weights.pt"
+    torch.save(reference[0].state_dict(), path)
+
+    with pytest.raises(ModelError, match="state_dict"):
+        await _loader()._load_pytorch_model(path, {})
+    model = await _loader()._load_pytorch_model(path, LINEAR)
+    assert isinstance(model, torch.nn.Linear)
+
+
+@pytest.mark.asyncio
+async def test_torchscript_archive_is_loaded_with_jit(tmp_path, reference):
+    path = tmp_path / "scripted.pt"
+    torch.jit.save(torch.jit.script(reference), path)
+
+    model = await _loader()._load_pytorch_model(path, {})
+    assert isinstance(model, torch.jit.ScriptModule)
@@ -0,0 +1,184 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services import traffic_service as traffic_module
+from app.services.inference_service import ServingTarget
+from app.services.traffic_service import TrafficService
+
+linear_model = pytest.importorskip("sklearn.linear_model")
+
+
+SCHEMA = {"input_schema": {"required": ["x"], "properties": {"x": {"type": "number"}}}}
+
+
+class _FakePipeline:
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.ops = []
+
+    def hincrby(self, key, field, amount):
+        self.ops.append(("incr", key, field, amount))
+
+    hincrbyfloat = hincrby
+
+    def hgetall(self, key):
+        self.ops.append(("get", key, None, None))
+
+    def delete(self, key):
+        self.ops.append(("delete", key, None, None))
+
+    async def execute(self):
+        results = []
+        for op, key, field, amount in self.ops:
+            store = self.redis_client.hashes.setdefault(key, {})
+            if op == "incr":
+                store[field] = store.get(field, 0) + amount
+                results.append(store[field])
+            elif op == "get":
+                results.append({k.encode(): str(v).encode() for k, v in store.items()})
+            else:
+                results.append(int(bool(self.redis_client.hashes.pop(key, None))))
+        return results
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.hashes = {}
+
+    def pipeline(self, transaction=False):
+        return _FakePipeline(self)
+
+
+class _FakeSession:
+    """Returns one version for every query, and records which threads it was used from."""
+
+    def __init__(self, version):
+        self.version = version
+        self.added = []
+        self.threads = []
+
+    def query(self, *args):
+        self.threads.append(threading.current_thread())
+        return self
+
+    def filter(self, *args):
+        return self
+
+    def first(self):
+        return self.version
+
+    def add(self, row):
+        self.added.append(row)
+
+    def commit(self):
+        self.threads.append(threading.current_thread())
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class _Loader:
+    def __init__(self, model, room=True):
+        self.model = model
+        self.room = room
+        self.loads = 0
+
+    def has_room_for(self, model_version_id, load_options=None):
+        return self.room
+
+    async def get_model(self, model_version_id, load_options=None):
+        self.loads += 1
+        return self.model
+
+
+def _version(version_id):
+    return SimpleNamespace(
+        id=version_id,
+        framework="sklearn",
+        model_schema=SCHEMA,
+        model=SimpleNamespace(problem_type="classification"),
+    )
+
+
+def test_split_routes_weighted_share_and_sticky_clients():
+    canary = _version("canary")
+    service = TrafficService(_Loader(None), _FakeRedis())
+    deployment = SimpleNamespace(
+        id="dep",
+        deployment_config={"serving": {"threads": 2}, "traffic": {"split": [{"model_version_id": "canary", "weight": 0.25}]}},
+    )
+    db = _FakeSession(canary)
+
+    targets = [service.choose_target(db, deployment) for _ in range(4000)]
+    share = sum(isinstance(t, ServingTarget) for t in targets) / len(targets)
+    assert share == pytest.approx(0.25, abs=0.04)
+    routed = next(t for t in targets if isinstance(t, ServingTarget))
+    assert routed.model_version_id == "canary"
+    # The primary's load options don't apply to the canary
+    assert "serving" not in routed.deployment_config
+
+    deployment.deployment_config["traffic"]["sticky"] = True
+    for client in ("a", "b", "c"):
+        first = service.choose_target(db, deployment, client)
+        assert all(type(service.choose_target(db, deployment, client)) is type(first) for _ in range(20))
+
+
+def test_shadow_scores_off_request_path_and_writes_monitoring(monkeypatch):
+    X = np.linspace(-3, 3, 200).reshape(-1, 1)
+    y = (X[:, 0] > 0.5).astype(int)
+    challenger = linear_model.LogisticRegression().fit(X, y)
+    threads = []
+    predict = challenger.predict
+    challenger.predict = lambda data: threads.append(threading.current_thread().name) or predict(data)
+
+    session = _FakeSession(_version("challenger"))
+    monkeypatch.setattr(traffic_module, "SessionLocal", lambda: session)
+    monkeypatch.setattr(traffic_module, "ModelMonitoring", SimpleNamespace)
+    monkeypatch.setattr(settings, "SHADOW_MONITORING_WINDOW", 2)
+    service = TrafficService(_Loader(challenger), _FakeRedis())
+    shadow = {"model_version_id": "challenger", "min_agreement": 0.9}
+    instances = [{"x": x} for x in (-2.0, 0.2, 2.0)]
+    # Primary splits at 0, the challenger at 0.5: they disagree on x=0.2
+    primary = [{"prediction": 0}, {"prediction": 1}, {"prediction": 1}]
+
+    async def run():
+        for _ in range(2):
+            await service.submit("dep", {}, shadow, instances, primary, 3.0)
+        await asyncio.gather(*service.in_flight)
+        return await service.get_stats("dep")
+
+    stats = asyncio.run(run())
+
+    assert threads and all(name.startswith("shadow") for name in threads)
+    # The version lookup and the monitoring commit ran off the event loop thread
+    assert session.threads and threading.main_thread() not in session.threads
+    assert stats["shadow"]["requests"] == 2
+    assert stats["shadow"]["agreement"] == pytest.approx(2 / 3, abs=1e-4)
+    assert stats["shadow"]["primary_ms_per_row"] == pytest.approx(1.0)
+    metrics = {row.metric_name: row for row in session.added}
+    assert metrics["shadow_agreement"].value == pytest.approx(2 / 3)
+    assert metrics["shadow_agreement"].is_anomaly
+    assert "shadow_latency_ratio" in metrics
+
+
+def test_shadow_sample_is_skipped_rather_than_evicting_a_loaded_model(monkeypatch):
+    monkeypatch.setattr(traffic_module, "SessionLocal", lambda: _FakeSession(_version("challenger")))
+    loader = _Loader(None, room=False)
+    service = TrafficService(loader, _FakeRedis())
+
+    async def run():
+        await service.submit("dep", {}, {"model_version_id": "challenger"}, [{"x": 1.0}], [{"prediction": 1}], 1.0)
+        await asyncio.gather(*service.in_flight)
+        return await service.get_stats("dep")
+
+    stats = asyncio.run(run())
+    assert loader.loads == 0
+    assert stats["shadow"]["skipped"] == 1 and stats["shadow"]["failed"] == 0
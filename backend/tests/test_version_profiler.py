@@ -0,0 +1,71 @@
+import os
+import time
+import types
+
+import numpy as np
+import pytest
+
+from app.services import version_profiler
+from app.services.version_profiler import ProfilingError, capacity_regressions, run_isolated
+
+SCHEMA = {"input_schema": {"properties": {"age": {"type": "integer", "minimum": 18, "maximum": 90}}}}
+
+
+class _LinearModel:
+    def __init__(self):
+        self.weights = np.ones(8 * 1024 * 1024)  # 64MB, touched, so loading shows up in resident memory
+
+    def predict(self, X):
+        time.sleep(0.001 + 0.00001 * len(X))
+        return np.zeros(len(X))
+
+
+def test_isolated_calls_run_in_another_process_and_failures_surface():
+    assert run_isolated(os.getpid, (), timeout=30) != os.getpid()
+    with pytest.raises(ProfilingError, match="exited with code 3"):
+        run_isolated(os._exit, (3,), timeout=30)
+    with pytest.raises(ProfilingError, match="within 1s"):
+        run_isolated(time.sleep, (30,), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_profile_measures_load_memory_and_each_batch_size(monkeypatch):
+    version = types.SimpleNamespace(
+        framework="sklearn",
+        model_schema=SCHEMA,
+        model=types.SimpleNamespace(problem_type="regression"),
+    )
+    session = types.SimpleNamespace(
+        query=lambda *args: types.SimpleNamespace(filter=lambda *args: types.SimpleNamespace(first=lambda: version)),
+        close=lambda: None,
+    )
+
+    class _Loader:
+        async def get_model(self, model_version_id):
+            return _LinearModel()
+
+    monkeypatch.setattr(version_profiler, "SessionLocal", lambda: session)
+    monkeypatch.setattr(version_profiler, "ModelLoader", _Loader)
+    profile = await version_profiler._profile("v1", [32, 1], repeats=2)
+
+    assert profile["status"] == "completed"
+    assert [batch["batch_size"] for batch in profile["batches"]] == [1, 32]
+    assert profile["peak_rows_per_second"] == profile["batches"][1]["rows_per_second"]
+    assert profile["single_row_p95_ms"] == profile["batches"][0]["p95_ms"]
+    # ru_maxrss and sampled RSS aren't comparable to the byte, so only the model's own footprint is checked
+    assert profile["model_rss_bytes"] > 32 * 1024 * 1024
+    assert profile["baseline_rss_bytes"] > 0 and profile["peak_rss_bytes"] > 0
+
+
+def test_only_regressions_beyond_the_threshold_block():
+    current = {"status": "completed", "cpu_count": 8, "peak_rows_per_second": 10000.0,
+               "single_row_p95_ms": 4.0, "model_rss_bytes": 500 * 1024 * 1024}
+    slower = {**current, "peak_rows_per_second": 7000.0, "single_row_p95_ms": 4.4}
+    regressions = capacity_regressions(current, slower, threshold=0.2)
+    assert len(regressions) == 1 and regressions[0].startswith("peak throughput (rows/s) 10000 -> 7000 (-30%)")
+
+    heavier = {**current, "model_rss_bytes": 900 * 1024 * 1024}
+    assert capacity_regressions(current, heavier, threshold=0.2)[0].startswith("resident memory")
+    # Profiles from another host size, or a failed profile, can't be compared
+    assert capacity_regressions(current, {**slower, "cpu_count": 4}, threshold=0.2) == []
+    assert capacity_regressions(current, {"status": "failed"}, threshold=0.2) == []